@@ -1,12 +1,19 @@
 from ff3 import FF3Cipher
+from functools import lru_cache
 import hashlib
 import hmac
+import os
 
 # ----------------------------------------------------
 # MODULE PURPOSE: Format-Preserving Encryption (FPE) for Verification Codes
 # ----------------------------------------------------
 # This module provides stateless encryption/decryption functions using the FF3-1 algorithm.
 # It converts a short Message ID (the input, e.g., "78321") into a short, fixed-length Verification Code (the output, e.g., "931084"), and vice-versa, using the farmer's secret key.
+#
+# A second, faster scheme is available: 'hmac' truncates an HMAC-SHA256 of the Message ID
+# to the same number of digits. It costs two SHA-256 compressions instead of FF3-1's AES
+# rounds, but it is one-way: an HMAC VC cannot be decrypted back into its Message ID, so
+# the Server verifies those VCs through its issued-VC index instead of calling the SMC.
 
 # --- Configuration Constants ---
 # MAX_MESSAGE_LENGTH (int): Defines the fixed length of the Verification Code (VC). 
@@ -14,6 +21,11 @@ import hmac
 # CRITICAL: If a Message ID longer than 6 is used, this constant MUST be increased.
 MAX_MESSAGE_LENGTH = 6 
 
+# VC_SCHEMES: 'ff3' (reversible, the default) or 'hmac' (one-way, faster)
+VC_SCHEME_FF3 = 'ff3'
+VC_SCHEME_HMAC = 'hmac'
+VC_SCHEMES = [VC_SCHEME_FF3, VC_SCHEME_HMAC]
+
 # --- Private Key Derivation Helper (Cryptographic Firewall) ---
 
 # The Master Key is the single secret key (K_f) retrieved from the database. i.e the farmer's secret key.
@@ -37,6 +49,17 @@ def derive_ff3_components(master_key: bytes) -> tuple[bytes, bytes]:
     
     return ff3_key, ff3_tweak
 
+# --- Cipher Cache ---
+# Building a cipher costs two HMAC derivations plus an AES key schedule, about as much
+# as the encryption itself. The most recently used farmers' ciphers (and HMAC keys) are
+# kept per process; the Server routes each farmer to the same SMC node so they stay warm.
+# SMC_CIPHER_CACHE_SIZE=0 disables the cache.
+CIPHER_CACHE_SIZE = int(os.environ.get('SMC_CIPHER_CACHE_SIZE', 10_000))
+
+def _cached(function):
+    return lru_cache(maxsize=CIPHER_CACHE_SIZE)(function) if CIPHER_CACHE_SIZE > 0 else function
+
+@_cached
 def get_cipher(farmer_key: bytes) -> FF3Cipher:
     """
     Initializes and returns the FF3Cipher object using derived key components.
@@ -51,12 +74,30 @@ def get_cipher(farmer_key: bytes) -> FF3Cipher:
     # radix=10 enforces numeric-only VCs (digits 0-9)
     return FF3Cipher(key_hex, tweak_hex, radix=10)
 
-def generate_verification_code(farmer_key: bytes, message_id: str) -> str:
+@_cached
+def derive_hmac_key(master_key: bytes) -> bytes:
+    """
+    Derives the 32-byte key used by the 'hmac' VC scheme from the Master Key.
+    A separate context string keeps it independent of the FF3 key and tweak.
+    """
+    return hmac.new(master_key, b'HMAC_VC_KEY_DERIVATION_CONTEXT', hashlib.sha256).digest()
+
+def hmac_verification_code(farmer_key: bytes, padded_message_id: str) -> str:
+    """
+    Truncates HMAC-SHA256(derived key, "VC:" + Message ID) to a 6-digit VC.
+    The first 8 bytes of the MAC are read as an integer and reduced modulo 10^6,
+    so every digit string is (to within 2^-44) equally likely.
+    """
+    mac = hmac.new(derive_hmac_key(farmer_key), b'VC:' + padded_message_id.encode('ascii'), hashlib.sha256).digest()
+    return str(int.from_bytes(mac[:8], 'big') % 10 ** MAX_MESSAGE_LENGTH).zfill(MAX_MESSAGE_LENGTH)
+
+def generate_verification_code(farmer_key: bytes, message_id: str, scheme: str = VC_SCHEME_FF3) -> str:
     """
     Encrypts a Message ID (max 6 digits) into a 6-digit VC.
+    With scheme='hmac' the VC is a truncated HMAC instead (faster, but not reversible).
     """
-    # The cipher is instantiated on-the-fly for each operation
-    cipher = get_cipher(farmer_key)
+    if scheme not in VC_SCHEMES:
+        raise ValueError(f"Unknown VC scheme '{scheme}', expected one of {VC_SCHEMES}.")
     
     if not message_id.isdigit():
         raise ValueError("Input Message ID must be numeric.")
@@ -68,16 +109,38 @@ def generate_verification_code(farmer_key: bytes, message_id: str) -> str:
     # Padding: Zeros are added to the left (e.g., "12345" -> "012345") to meet the fixed 6-digit length required for FF3.
     padded_message_id = message_id.zfill(MAX_MESSAGE_LENGTH)
     
+    if scheme == VC_SCHEME_HMAC:
+        return hmac_verification_code(farmer_key, padded_message_id)
+    
+    # The cipher comes from the per-process cache (built on first use for this farmer)
+    cipher = get_cipher(farmer_key)
+    
     # Encryption generates the VC
     verification_code = cipher.encrypt(padded_message_id)
     
     return verification_code
 
-def regenerate_message_id(farmer_key: bytes, verification_code: str) -> str:
+def verify_verification_code(farmer_key: bytes, message_id: str, verification_code: str, scheme: str = VC_SCHEME_FF3) -> bool:
+    """
+    Checks that a VC was issued for the given Message ID (works for both schemes).
+    """
+    try:
+        expected = generate_verification_code(farmer_key, message_id, scheme)
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected, verification_code)
+
+def regenerate_message_id(farmer_key: bytes, verification_code: str, scheme: str = VC_SCHEME_FF3) -> str:
     """
     Decrypts the 6-digit VC back into the original Message ID.
+    Only 'ff3' VCs can be decrypted; 'hmac' VCs are verified through the Server's issued-VC index.
     """
-    # The cipher is instantiated on-the-fly for each operation
+    if scheme == VC_SCHEME_HMAC:
+        raise ValueError("HMAC verification codes are one-way and cannot be decrypted; verify them through the issued-VC index.")
+    if scheme not in VC_SCHEMES:
+        raise ValueError(f"Unknown VC scheme '{scheme}', expected one of {VC_SCHEMES}.")
+    
+    # The cipher comes from the per-process cache (built on first use for this farmer)
     cipher = get_cipher(farmer_key)
     
     if not verification_code.isdigit():
@@ -0,0 +1,72 @@
+"""
+Wire decoding of farmer secret keys.
+
+Clients send the key together with an explicit `key_encoding`:
+
+    'b64url' - base64url (padding optional) of a key-version byte followed by
+               the raw master key. Version 1 is the only version so far.
+    'legacy' - the old free-form text format (hex, base64 or plain UTF-8,
+               told apart by inspecting the string). Used when a client sends
+               no key_encoding at all, for callers that predate the field.
+"""
+import base64
+import binascii
+
+KEY_ENCODING_B64URL = 'b64url'
+KEY_ENCODING_LEGACY = 'legacy'
+KEY_ENCODINGS = [KEY_ENCODING_B64URL, KEY_ENCODING_LEGACY]
+
+# Key-version bytes accepted in 'b64url' keys
+KEY_VERSION_RAW = 1
+SUPPORTED_KEY_VERSIONS = {KEY_VERSION_RAW}
+
+HEX_DIGITS = set('0123456789abcdefABCDEF')
+
+
+def decode_secret_key(secret_key: str, key_encoding: str = None) -> bytes:
+    """
+    Decode a secret key from the wire into the raw master key bytes.
+
+    Args:
+        secret_key (str): Key as sent by the client
+        key_encoding (str): 'b64url' or 'legacy' (None means 'legacy')
+
+    Returns:
+        bytes: The master key for the crypto operations
+
+    Raises:
+        ValueError: If the key is malformed or the encoding/version is unknown
+    """
+    key_encoding = key_encoding or KEY_ENCODING_LEGACY
+
+    if key_encoding == KEY_ENCODING_B64URL:
+        try:
+            payload = base64.urlsafe_b64decode(secret_key + '=' * (-len(secret_key) % 4))
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Invalid b64url secret key: {e}")
+        if len(payload) < 2:
+            raise ValueError("b64url secret key is too short.")
+        if payload[0] not in SUPPORTED_KEY_VERSIONS:
+            raise ValueError(f"Unsupported key version {payload[0]}.")
+        return payload[1:]
+
+    if key_encoding == KEY_ENCODING_LEGACY:
+        return decode_legacy_secret_key(secret_key)
+
+    raise ValueError(f"Unknown key_encoding '{key_encoding}', expected one of {KEY_ENCODINGS}.")
+
+
+def decode_legacy_secret_key(secret_key: str) -> bytes:
+    """
+    Decode a key in the old free-form format: hex, then base64, then UTF-8 text.
+    """
+    if len(secret_key) % 2 == 0 and secret_key and all(c in HEX_DIGITS for c in secret_key):
+        return bytes.fromhex(secret_key)
+
+    if len(secret_key) % 4 == 0 and secret_key.replace('=', '').replace('+', '').replace('/', '').isalnum():
+        try:
+            return base64.b64decode(secret_key, validate=True)
+        except (binascii.Error, ValueError):
+            pass
+
+    return secret_key.encode('utf-8')
@@ -1,11 +1,19 @@
 from flask import request, Blueprint, jsonify
-from .crypto import generate_verification_code, regenerate_message_id 
-import base64
-import binascii
+from .crypto import generate_verification_code, regenerate_message_id, VC_SCHEME_FF3
+from .keys import decode_secret_key
 
 smc_routes_bp = Blueprint('smc_routes', __name__)
 
 
+@smc_routes_bp.route('/health', methods=['GET'])
+def health():
+    """
+    Liveness check used by the Server's SMC client before it routes traffic
+    back to a node it had ejected.
+    """
+    return jsonify({'status': 'ok'}), 200
+
+
 @smc_routes_bp.route('/get-vc', methods=['POST'])
 def get_vc():
     """
@@ -14,12 +22,15 @@ def get_vc():
     Expected payload:
     {
         "message_id": "string",
-        "secret_key": "bytes"
+        "secret_key": "string",
+        "key_encoding": "b64url",  (optional, defaults to "legacy")
+        "scheme": "ff3" | "hmac"   (optional, defaults to "ff3")
     }
     
     Returns:
     {
-        "vc": "generated_verification_code"
+        "vc": "generated_verification_code",
+        "scheme": "scheme_used"
     }
     """
     try:
@@ -28,6 +39,7 @@ def get_vc():
         # Extract required fields
         message_id = data.get('message_id')
         secret_key = data.get('secret_key')
+        scheme = data.get('scheme') or VC_SCHEME_FF3
         
         # Basic validation
         if not all([message_id, secret_key]):
@@ -37,13 +49,14 @@ def get_vc():
             }), 400
         
         # SMC receives string, converts to bytes
-        secret_key_bytes = decode_secret_key(secret_key)
-        verification_code = generate_verification_code(secret_key_bytes, message_id)
+        secret_key_bytes = decode_secret_key(secret_key, data.get('key_encoding'))
+        verification_code = generate_verification_code(secret_key_bytes, message_id, scheme)
 
         
         
         return jsonify({
-            "vc": verification_code
+            "vc": verification_code,
+            "scheme": scheme
         }), 200
         
     except Exception as e:
@@ -61,7 +74,9 @@ def get_message_id():
     Expected payload:
     {
         "vc": "verification_code",
-        "secret_key": "string"
+        "secret_key": "string",
+        "key_encoding": "b64url",  (optional, defaults to "legacy")
+        "scheme": "ff3"   (optional; "hmac" VCs are one-way and are rejected)
     }
     
     Returns:
@@ -75,6 +90,7 @@ def get_message_id():
         # Extract required fields
         vc = data.get('vc')
         secret_key = data.get('secret_key')
+        scheme = data.get('scheme') or VC_SCHEME_FF3
         
         # Basic validation
         if not all([vc, secret_key]):
@@ -84,8 +100,8 @@ def get_message_id():
             }), 400
         
        
-        secret_key_bytes = decode_secret_key(secret_key)
-        message_id = regenerate_message_id ( secret_key_bytes, vc)
+        secret_key_bytes = decode_secret_key(secret_key, data.get('key_encoding'))
+        message_id = regenerate_message_id ( secret_key_bytes, vc, scheme)
         
         # Placeholder response
         return jsonify({
@@ -97,102 +113,3 @@ def get_message_id():
             'error': 'Invalid request',
             'message': str(e)
         }), 400
-
-
-def decode_secret_key(secret_key_str: str) -> bytes:
-    """
-    Smart decoder that automatically detects and handles multiple secret key formats:
-    - Base64 encoded strings (most common)
-    - Hex encoded strings 
-    - UTF-8 encoded raw bytes (your current format)
-    
-    Args:
-        secret_key_str (str): Secret key as string in any supported format
-        
-    Returns:
-        bytes: The actual secret key bytes for crypto operations
-    """
-    
-    
-    # Try Hex decoding
-    try:
-        # Hex validation: even length, only hex characters
-        if (len(secret_key_str) % 2 == 0 and 
-            all(c in '0123456789abcdefABCDEF' for c in secret_key_str)):
-            
-            decoded = bytes.fromhex(secret_key_str)
-            print(f"✅ Decoded secret key from Hex format")
-            return decoded
-    except Exception:
-        pass  # Not Hex, try next format
-    
-    # Try Base64 decoding first (most common alternative format)
-    try:
-        # Basic Base64 validation: length divisible by 4, valid characters
-        if (len(secret_key_str) % 4 == 0 and 
-            secret_key_str.replace('=', '').replace('+', '').replace('/', '').isalnum()):
-            
-            decoded = base64.b64decode(secret_key_str, validate=True)
-            print(f"✅ Decoded secret key from Base64 format")
-            return decoded
-    except Exception:
-        pass  # Not Base64, try next format
-    
-    
-    
-    # Fallback to UTF-8 encoding (your current method)
-    try:
-        decoded = secret_key_str.encode('utf-8')
-        print(f"✅ Using secret key as UTF-8 string (current format)")
-        return decoded
-    except Exception as e:
-        raise ValueError(f"Unable to decode secret key in any supported format: {e}")
-        
-    
-
-    
-
-
-'''
-def decode_secret_key(secret_key_str: str) -> bytes:
-    print(f"🔍 Trying to decode: '{secret_key_str}'")
-    print(f"   Length: {len(secret_key_str)}")
-    print(f"   Length % 2: {len(secret_key_str) % 2}")
-    print(f"   Length % 4: {len(secret_key_str) % 4}")
-    
-    # Try Hex decoding
-    try:
-        print("   Testing HEX...")
-        if (len(secret_key_str) % 2 == 0 and 
-            all(c in '0123456789abcdefABCDEF' for c in secret_key_str)):
-            print("   HEX validation passed, trying decode...")
-            decoded = bytes.fromhex(secret_key_str)
-            print(f"✅ Decoded secret key from Hex format")
-            return decoded
-        else:
-            print("   HEX validation failed")
-    except Exception as e:
-        print(f"   HEX exception: {e}")
-        pass
-    
-    # Try Base64 decoding
-    try:
-        print("   Testing BASE64...")
-        if (len(secret_key_str) % 4 == 0 and 
-            secret_key_str.replace('=', '').replace('+', '').replace('/', '').isalnum()):
-            print("   BASE64 validation passed, trying decode...")
-            decoded = base64.b64decode(secret_key_str, validate=True)
-            print(f"✅ Decoded secret key from Base64 format")
-            return decoded
-        else:
-            print("   BASE64 validation failed")
-    except Exception as e:
-        print(f"   BASE64 exception: {e}")
-        pass
-    
-    # Fallback to UTF-8
-    print("   Using UTF-8 fallback...")
-    decoded = secret_key_str.encode('utf-8')
-    print(f"✅ Using secret key as UTF-8 string (current format)")
-    return decoded
-'''
\ No newline at end of file
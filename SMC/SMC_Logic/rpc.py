@@ -0,0 +1,194 @@
+"""
+Compact binary RPC transport for the SMC.
+
+An alternative to the JSON/HTTP routes for high-volume callers: one persistent
+TCP or Unix domain socket per client, fixed binary frames, and any number of
+requests in flight per connection (pipelining). Every complete frame that has
+arrived is processed and all their responses go back in a single write, so a
+client that sends a batch of frames gets a batch of responses.
+
+Frame layout (all integers big-endian):
+
+    frame    := length:u32  body[length]
+
+    request  := request_id:u32  op:u8  scheme:u8
+                key_len:u16  key[key_len]          raw master key bytes
+                arg_len:u8   arg[arg_len]          message ID (GET_VC) or VC (GET_MESSAGE_ID), ASCII digits
+
+    response := request_id:u32  status:u8  value_len:u16  value[value_len]
+                status 0: value is the VC / message ID
+                status 1: value is a UTF-8 error message
+
+Responses on a connection come back in request order.
+"""
+import os
+import socket
+import struct
+import socketserver
+
+from .crypto import generate_verification_code, regenerate_message_id, VC_SCHEME_FF3, VC_SCHEME_HMAC
+
+# Operations
+OP_GET_VC = 1
+OP_GET_MESSAGE_ID = 2
+
+# Schemes on the wire
+SCHEME_CODES = {0: VC_SCHEME_FF3, 1: VC_SCHEME_HMAC}
+
+# Response status
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+FRAME_HEADER = struct.Struct('!I')
+REQUEST_HEADER = struct.Struct('!IBBH')     # request_id, op, scheme, key_len
+RESPONSE_HEADER = struct.Struct('!IBH')     # request_id, status, value_len
+
+# Anything larger than this is not a valid request - drop the connection
+MAX_FRAME_SIZE = 4096
+
+RECV_SIZE = 64 * 1024
+
+
+def handle_request(body):
+    """
+    Decode one request body, run the crypto and encode the response body.
+
+    Args:
+        body (bytes): Request frame body
+
+    Returns:
+        bytes: Response frame body
+    """
+    request_id = 0
+    try:
+        request_id, op, scheme_code, key_len = REQUEST_HEADER.unpack_from(body)
+        offset = REQUEST_HEADER.size
+        key = body[offset:offset + key_len]
+        offset += key_len
+        arg_len = body[offset]
+        arg = body[offset + 1:offset + 1 + arg_len].decode('ascii')
+
+        scheme = SCHEME_CODES.get(scheme_code)
+        if scheme is None:
+            raise ValueError(f"Unknown scheme code {scheme_code}.")
+
+        if op == OP_GET_VC:
+            value = generate_verification_code(key, arg, scheme)
+        elif op == OP_GET_MESSAGE_ID:
+            value = regenerate_message_id(key, arg, scheme)
+        else:
+            raise ValueError(f"Unknown operation {op}.")
+
+        encoded = value.encode('ascii')
+        return RESPONSE_HEADER.pack(request_id, STATUS_OK, len(encoded)) + encoded
+
+    except Exception as e:
+        message = str(e).encode('utf-8')[:1024] or b'Invalid request'
+        return RESPONSE_HEADER.pack(request_id, STATUS_ERROR, len(message)) + message
+
+
+class RPCHandler(socketserver.BaseRequestHandler):
+    """Serves one client connection until it closes"""
+
+    def handle(self):
+        sock = self.request
+        if sock.family != socket.AF_UNIX:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        buffer = bytearray()
+        while True:
+            data = sock.recv(RECV_SIZE)
+            if not data:
+                return
+            buffer += data
+
+            # Answer every complete frame received so far with one write
+            responses = []
+            offset = 0
+            while len(buffer) - offset >= FRAME_HEADER.size:
+                (length,) = FRAME_HEADER.unpack_from(buffer, offset)
+                if length > MAX_FRAME_SIZE:
+                    return
+                end = offset + FRAME_HEADER.size + length
+                if len(buffer) < end:
+                    break
+                response = handle_request(bytes(buffer[offset + FRAME_HEADER.size:end]))
+                responses.append(FRAME_HEADER.pack(len(response)) + response)
+                offset = end
+            del buffer[:offset]
+
+            if responses:
+                sock.sendall(b''.join(responses))
+
+
+class ThreadingTCPRPCServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+
+class ThreadingUnixRPCServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def parse_address(address):
+    """
+    Parse an RPC address: 'host:port' for TCP or 'unix:/path/to.sock'.
+
+    Returns:
+        tuple: (family, address) where address is (host, port) or a path
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '0.0.0.0', int(port))
+
+
+def create_server(address):
+    """
+    Bind the RPC server (does not start serving).
+
+    Args:
+        address (str): 'host:port' or 'unix:/path/to.sock'
+
+    Returns:
+        socketserver.BaseServer: The bound server
+    """
+    family, bind_address = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(bind_address):
+            os.unlink(bind_address)
+        return ThreadingUnixRPCServer(bind_address, RPCHandler)
+    return ThreadingTCPRPCServer(bind_address, RPCHandler)
+
+
+def serve(address, processes=1):
+    """
+    Serve RPC requests forever.
+
+    The crypto is CPU-bound, so for more than one core the socket is bound once
+    and `processes - 1` children are forked to accept on it as well.
+
+    Args:
+        address (str): 'host:port' or 'unix:/path/to.sock'
+        processes (int): Number of serving processes
+    """
+    server = create_server(address)
+    children = []
+    for _ in range(max(0, processes - 1)):
+        pid = os.fork()
+        if pid == 0:
+            children = []
+            break
+        children.append(pid)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        for pid in children:
+            try:
+                os.kill(pid, 15)
+            except OSError:
+                pass
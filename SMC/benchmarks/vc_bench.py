@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+VC generation benchmark for the SMC crypto schemes.
+
+Generates VCs in-process (no HTTP) for a set of random farmer keys and message
+IDs and reports VCs/sec for each scheme, so operators can see what switching
+from 'ff3' to 'hmac' buys them. Optionally runs several processes to show
+multi-core throughput.
+
+Usage (from the SMC/ directory):
+    python benchmarks/vc_bench.py
+    python benchmarks/vc_bench.py --count 50000 --schemes hmac
+    python benchmarks/vc_bench.py --processes 4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from multiprocessing import Pool
+
+# Make SMC_Logic importable when run from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SMC_Logic.crypto import (
+    MAX_MESSAGE_LENGTH,
+    VC_SCHEMES,
+    generate_verification_code,
+    regenerate_message_id,
+    VC_SCHEME_FF3,
+)
+
+
+def make_workload(count, farmers, seed):
+    """Random (farmer_key, message_id) pairs, reproducible from the seed"""
+    rng = random.Random(seed)
+    keys = [rng.getrandbits(256).to_bytes(32, 'big') for _ in range(farmers)]
+    return [
+        (keys[i % farmers], str(rng.randrange(1, 10 ** MAX_MESSAGE_LENGTH)))
+        for i in range(count)
+    ]
+
+
+def run_scheme(scheme, workload):
+    """
+    Generate one VC per workload item.
+
+    Returns:
+        float: Elapsed seconds
+    """
+    started = time.perf_counter()
+    for farmer_key, message_id in workload:
+        generate_verification_code(farmer_key, message_id, scheme)
+    return time.perf_counter() - started
+
+
+def run_chunk(task):
+    """Pool worker: (scheme, count, farmers, seed) -> elapsed seconds"""
+    scheme, count, farmers, seed = task
+    return run_scheme(scheme, make_workload(count, farmers, seed))
+
+
+def check_schemes(workload):
+    """Sanity check: FF3 round-trips and both schemes are deterministic"""
+    farmer_key, message_id = workload[0]
+    vc = generate_verification_code(farmer_key, message_id, VC_SCHEME_FF3)
+    assert regenerate_message_id(farmer_key, vc).zfill(MAX_MESSAGE_LENGTH) == message_id.zfill(MAX_MESSAGE_LENGTH)
+    for scheme in VC_SCHEMES:
+        first = generate_verification_code(farmer_key, message_id, scheme)
+        assert first == generate_verification_code(farmer_key, message_id, scheme)
+        assert len(first) == MAX_MESSAGE_LENGTH and first.isdigit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark VC generation per scheme')
+    parser.add_argument('--count', type=int, default=20_000, help='VCs to generate per scheme')
+    parser.add_argument('--farmers', type=int, default=1_000, help='Distinct farmer keys in the workload')
+    parser.add_argument('--schemes', nargs='+', choices=VC_SCHEMES, default=VC_SCHEMES)
+    parser.add_argument('--processes', type=int, default=1, help='Worker processes (one per core for peak throughput)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workload = make_workload(args.count, args.farmers, args.seed)
+    check_schemes(workload)
+
+    print(f"⏱️  Generating {args.count} VCs per scheme ({args.farmers} farmer keys, {args.processes} process(es))...")
+    results = {}
+    for scheme in args.schemes:
+        # Warm-up so imports and first-call costs are not measured
+        run_scheme(scheme, workload[:200])
+
+        if args.processes > 1:
+            per_process = args.count // args.processes
+            tasks = [(scheme, per_process, args.farmers, args.seed + i) for i in range(args.processes)]
+            with Pool(args.processes) as pool:
+                started = time.perf_counter()
+                pool.map(run_chunk, tasks)
+                elapsed = time.perf_counter() - started
+            generated = per_process * args.processes
+        else:
+            elapsed = run_scheme(scheme, workload)
+            generated = args.count
+
+        results[scheme] = generated / elapsed
+        print(f"   {scheme:<5} {results[scheme]:>12,.0f} VCs/sec  ({elapsed * 1e6 / generated:.1f} µs per VC)")
+
+    if len(results) > 1 and results.get(VC_SCHEME_FF3):
+        for scheme, rate in results.items():
+            if scheme != VC_SCHEME_FF3:
+                print(f"✅ {scheme} is {rate / results[VC_SCHEME_FF3]:.1f}x the throughput of {VC_SCHEME_FF3}")
+
+
+if __name__ == '__main__':
+    main()
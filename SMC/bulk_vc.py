@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Offline bulk VC generation for the SMC.
+
+Reads a CSV of (farmer_id, secret_key, message_id[, scheme, key_encoding]) jobs - as written by
+the Server's `populate_db.py export-vc-jobs` - and writes one
+(farmer_id, message_id, verification_code, scheme) row per job, ready for
+`populate_db.py load-vcs`. Campaign crypto can then run days ahead of the send
+window, on every core, instead of one /get-vc request at a time.
+
+Input and output are streamed: jobs are read in chunks, at most a few chunks per
+worker are in flight, and results are written in input order as soon as they
+are ready, so memory stays constant however large the campaign is.
+
+Usage (from the SMC/ directory):
+    python bulk_vc.py --input jobs.csv --output vcs.csv
+    python bulk_vc.py --input jobs.csv --output vcs.csv --processes 8 --chunk-size 2000
+    python bulk_vc.py --input - --output - --scheme hmac < jobs.csv > vcs.csv
+"""
+
+import sys
+import csv
+import time
+import argparse
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+from SMC_Logic.crypto import generate_verification_code, VC_SCHEMES, VC_SCHEME_FF3
+from SMC_Logic.keys import decode_secret_key
+
+INPUT_FIELDS = ['farmer_id', 'secret_key', 'message_id']
+OUTPUT_FIELDS = ['farmer_id', 'message_id', 'verification_code', 'scheme']
+
+# Chunks queued per worker process: enough to keep every core busy, small enough
+# that memory does not grow with the input size
+CHUNKS_IN_FLIGHT_PER_PROCESS = 4
+
+
+def generate_chunk(task):
+    """
+    Pool worker: generate the VCs for one chunk of jobs.
+
+    Args:
+        task (tuple): (list of job dicts, default scheme)
+
+    Returns:
+        tuple: (list of output rows, list of (farmer_id, message_id, error) for rejected jobs)
+    """
+    jobs, default_scheme = task
+    results = []
+    errors = []
+    for job in jobs:
+        scheme = job.get('scheme') or default_scheme
+        try:
+            # Same key decoding and crypto as the /get-vc endpoint, so the VCs match
+            secret_key_bytes = decode_secret_key(job['secret_key'], job.get('key_encoding'))
+            vc = generate_verification_code(secret_key_bytes, job['message_id'], scheme)
+            results.append({
+                'farmer_id': job['farmer_id'],
+                'message_id': job['message_id'],
+                'verification_code': vc,
+                'scheme': scheme,
+            })
+        except Exception as e:
+            errors.append((job.get('farmer_id'), job.get('message_id'), str(e)))
+    return results, errors
+
+
+def iter_chunks(reader, chunk_size):
+    """Yield lists of up to chunk_size input rows"""
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def open_stream(path, mode):
+    """Open a CSV stream ('-' means stdin/stdout)"""
+    if path == '-':
+        return sys.stdin if mode == 'r' else sys.stdout
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def run(input_path, output_path, processes, chunk_size, default_scheme):
+    """
+    Generate VCs for every job in the input file.
+
+    Returns:
+        dict: Counts of VCs written and jobs rejected
+    """
+    counts = {'written': 0, 'rejected': 0}
+    started = time.perf_counter()
+    source = open_stream(input_path, 'r')
+    sink = open_stream(output_path, 'w')
+
+    try:
+        reader = csv.DictReader(source)
+        missing = [field for field in INPUT_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"input is missing column(s): {', '.join(missing)}")
+
+        writer = csv.DictWriter(sink, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+
+        def write(async_result):
+            results, errors = async_result.get()
+            writer.writerows(results)
+            counts['written'] += len(results)
+            counts['rejected'] += len(errors)
+            for farmer_id, message_id, error in errors[:3]:
+                print(f"⚠️  Skipped farmer {farmer_id}, message {message_id}: {error}", file=sys.stderr)
+
+        with Pool(processes) as pool:
+            # Bounded window of chunks in flight; results are written in input order
+            pending = deque()
+            for chunk in iter_chunks(reader, chunk_size):
+                pending.append(pool.apply_async(generate_chunk, ((chunk, default_scheme),)))
+                if len(pending) >= processes * CHUNKS_IN_FLIGHT_PER_PROCESS:
+                    write(pending.popleft())
+                    print(f"   🔐 {counts['written']} VCs written", file=sys.stderr)
+            while pending:
+                write(pending.popleft())
+
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+        else:
+            sink.flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {counts['written']} VCs generated in {elapsed:.1f}s "
+          f"({counts['written'] / elapsed if elapsed else 0:.0f} VCs/s, {processes} processes)", file=sys.stderr)
+    if counts['rejected']:
+        print(f"⚠️  {counts['rejected']} jobs were rejected (see messages above)", file=sys.stderr)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate verification codes for a whole campaign offline')
+    parser.add_argument('--input', required=True, help="Jobs CSV with farmer_id,secret_key,message_id[,scheme,key_encoding] ('-' for stdin)")
+    parser.add_argument('--output', required=True, help="Where to write the VCs CSV ('-' for stdout)")
+    parser.add_argument('--processes', type=int, default=cpu_count(), help='Worker processes (default: one per core)')
+    parser.add_argument('--chunk-size', type=int, default=1_000, help='Jobs per unit of work sent to a worker')
+    parser.add_argument('--scheme', choices=VC_SCHEMES, default=VC_SCHEME_FF3,
+                        help="VC scheme for jobs without a scheme column (default 'ff3')")
+    args = parser.parse_args()
+
+    try:
+        counts = run(args.input, args.output, args.processes, args.chunk_size, args.scheme)
+    except Exception as e:
+        print(f"❌ Bulk VC generation failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    sys.exit(1 if counts['rejected'] else 0)
+
+
+if __name__ == '__main__':
+    main()
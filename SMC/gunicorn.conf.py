@@ -0,0 +1,44 @@
+"""
+Gunicorn serving profile for the SMC.
+
+The SMC is CPU-bound: every request is an FF3-1 encryption or decryption with
+no I/O to wait on. Threads would only contend for the GIL, so it runs one
+single-threaded (sync) worker per core.
+
+Run from the SMC/ directory:
+    gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden with an environment variable (see below) or a
+command line flag, e.g. `gunicorn -c gunicorn.conf.py --workers 4`.
+"""
+import multiprocessing
+import os
+
+# The WSGI app to serve (module:variable)
+wsgi_app = 'main:app'
+
+# --- Listen socket ---
+# The master binds the socket once and every worker accepts on that shared socket.
+bind = os.environ.get('SMC_GUNICORN_BIND', f"0.0.0.0:{os.environ.get('SMC_PORT', 5001)}")
+backlog = int(os.environ.get('SMC_GUNICORN_BACKLOG', 2048))
+
+# --- Workers (CPU-bound profile) ---
+workers = int(os.environ.get('SMC_GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'sync'
+threads = 1
+
+# --- Preloading ---
+# Import the app (and the ff3 library) once in the master; workers fork with it loaded.
+preload_app = True
+
+# --- Graceful recycling ---
+max_requests = int(os.environ.get('SMC_GUNICORN_MAX_REQUESTS', 20000))
+max_requests_jitter = int(os.environ.get('SMC_GUNICORN_MAX_REQUESTS_JITTER', 2000))
+graceful_timeout = int(os.environ.get('SMC_GUNICORN_GRACEFUL_TIMEOUT', 15))
+timeout = int(os.environ.get('SMC_GUNICORN_TIMEOUT', 30))
+
+# --- Logging ---
+# Access logging is off by default: at thousands of VCs per second it costs more than the crypto.
+accesslog = os.environ.get('SMC_GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('SMC_GUNICORN_LOG_LEVEL', 'info')
@@ -1,5 +1,8 @@
 """
 SMC (System Management Component) - Main entry point.
+
+Development:  python main.py
+Production:   gunicorn -c gunicorn.conf.py   (serves main:app with the tuned profile)
 """
 
 import os
@@ -17,6 +20,7 @@ if __name__ == '__main__':
     
     print(f"Starting SMC Service on port {port}")
     print(f"Debug mode: {debug}")
+    print("Note: this is the single-process development server. In production run: gunicorn -c gunicorn.conf.py")
     
     app.run(
         host='0.0.0.0',
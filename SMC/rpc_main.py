@@ -0,0 +1,22 @@
+"""
+SMC binary RPC transport - entry point.
+
+Serves the same VC generation/decryption as main.py over the compact binary
+protocol in SMC_Logic/rpc.py. It can run next to the HTTP service.
+
+    python rpc_main.py                                   # TCP on 0.0.0.0:5002
+    SMC_RPC_BIND=unix:/tmp/smc.sock python rpc_main.py   # Unix domain socket
+    SMC_RPC_PROCESSES=4 python rpc_main.py               # one process per core
+"""
+
+import os
+import multiprocessing
+
+from SMC_Logic.rpc import serve
+
+if __name__ == '__main__':
+    bind = os.environ.get('SMC_RPC_BIND', f"0.0.0.0:{os.environ.get('SMC_RPC_PORT', 5002)}")
+    processes = int(os.environ.get('SMC_RPC_PROCESSES', multiprocessing.cpu_count()))
+
+    print(f"Starting SMC RPC transport on {bind} ({processes} process(es))")
+    serve(bind, processes)
@@ -0,0 +1,281 @@
+"""
+Digest mode: one SMS for several advisories sent to the same farmer.
+
+With SMS_DIGEST_WINDOW set (seconds, default 0 = off), process_complete_advisory
+issues the VC as usual but, instead of sending the SMS straight away, queues
+(title, VC) for the farmer here. SMS_DIGEST_WINDOW seconds after a farmer's
+first queued advisory, everything queued for them goes out as one SMS listing
+each title with its VC (craft_digest_sms). During a busy week a farmer who
+gets a weather alert, a pest advisory and a market update in the same hour
+gets one SMS instead of three.
+
+- A digest never grows past SMS_DIGEST_MAX_SEGMENTS SMS segments (default 3,
+  counted for the encoding it goes out in, see render.py).
+  An advisory that doesn't fit sends the farmer's digest at once and starts
+  the next one.
+- Urgent advisories are never held back: they bypass the digest.
+- Delivery records are written when the digest is sent, one per advisory, so
+  resends and verification work as for single SMS.
+- Queued advisories live in this worker's memory. They are sent on a clean
+  shutdown (atexit, and gunicorn's worker_exit through close_digester); a
+  crash loses them, but as nothing was recorded as delivered a
+  resend (or a resumed campaign) sends them again with the same VC.
+
+snapshot() reports the queue and how many SMS the digests saved, for
+/api/sms/providers.
+"""
+import os
+import time
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .lanes import LANE_BULK, LANE_NORMAL, LANES
+from .render import segment_count
+
+DEFAULT_DIGEST_WINDOW = 0.0
+DEFAULT_MAX_SEGMENTS = 3
+DEFAULT_DIGEST_CONCURRENCY = 8
+
+
+class DigestItem:
+    """One advisory queued for a farmer"""
+
+    __slots__ = ('farmer_id', 'advisory_id', 'title', 'vc', 'lane')
+
+    def __init__(self, farmer_id, advisory_id, title, vc, lane):
+        self.farmer_id = farmer_id
+        self.advisory_id = advisory_id
+        self.title = title
+        self.vc = vc
+        self.lane = lane
+
+
+class PendingDigest:
+    """Advisories queued for one phone number, and when they are due"""
+
+    __slots__ = ('phone_number', 'items', 'due_at')
+
+    def __init__(self, phone_number, due_at):
+        self.phone_number = phone_number
+        self.items = []
+        self.due_at = due_at
+
+
+class Digester:
+    """
+    Holds advisories per farmer for a window and sends each farmer's as one SMS.
+
+    Args:
+        app (Flask): App whose context the sends and delivery records run in
+        window (float): Seconds to hold a farmer's first queued advisory
+        max_segments (int): SMS segments a digest may take
+        send (callable): send(phone_number, items) -> bool, default send_digest
+        concurrency (int): Digests sent in parallel
+    """
+
+    def __init__(self, app=None, window=DEFAULT_DIGEST_WINDOW, max_segments=DEFAULT_MAX_SEGMENTS,
+                 send=None, concurrency=DEFAULT_DIGEST_CONCURRENCY):
+        self.app = app
+        self.window = window
+        self.max_segments = max_segments
+        self.send = send or self.send_digest
+        self.pending = {}
+        # Pending digests in the order they fall due (the window is the same for all)
+        self.due = deque()
+        self.queued = 0
+        self.digests_sent = 0
+        self.advisories_sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sms-digest')
+        self._stopped = False
+        if self.enabled:
+            threading.Thread(target=self._run, name='sms-digest-flusher', daemon=True).start()
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def add(self, phone_number, farmer_id, advisory_id, title, vc, lane=LANE_NORMAL):
+        """
+        Queue one advisory for a farmer.
+
+        Returns:
+            bool: False if the digest doesn't take it (urgent), so the caller sends it now
+        """
+        if not self.enabled or lane not in (LANE_NORMAL, LANE_BULK):
+            return False
+        item = DigestItem(farmer_id, advisory_id, title, vc, lane)
+        full = None
+        with self._lock:
+            digest = self.pending.get(phone_number)
+            if digest and any(queued.advisory_id == advisory_id for queued in digest.items):
+                # The same advisory twice in one window: the farmer gets it once
+                return True
+            if digest and not self._fits(digest.items + [item]):
+                full = self.pending.pop(phone_number)
+                self.queued -= len(full.items)
+                digest = None
+            if digest is None:
+                digest = PendingDigest(phone_number, time.monotonic() + self.window)
+                self.pending[phone_number] = digest
+                self.due.append(digest)
+                self._changed.notify()
+            digest.items.append(item)
+            self.queued += 1
+        if full:
+            self._submit(full)
+        return True
+
+    def _fits(self, items):
+        from .utils import craft_digest_sms
+        return segment_count(craft_digest_sms(items)) <= self.max_segments
+
+    def _run(self):
+        """Send digests as they fall due"""
+        while True:
+            with self._lock:
+                while not self._stopped and (not self.due or self.due[0].due_at > time.monotonic()):
+                    self._changed.wait(self.due[0].due_at - time.monotonic() if self.due else None)
+                if self._stopped:
+                    return
+                digest = self.due.popleft()
+                # Already sent early if a later advisory didn't fit
+                if self.pending.get(digest.phone_number) is not digest:
+                    continue
+                del self.pending[digest.phone_number]
+                self.queued -= len(digest.items)
+            self._submit(digest)
+
+    def _submit(self, digest):
+        self._pool.submit(self._deliver, digest)
+
+    def _deliver(self, digest):
+        try:
+            ok = self.send(digest.phone_number, digest.items)
+        except Exception as e:
+            print(f"❌ Error sending digest to {digest.phone_number}: {e}")
+            ok = False
+        with self._lock:
+            if ok:
+                self.digests_sent += 1
+                self.advisories_sent += len(digest.items)
+            else:
+                self.failed += len(digest.items)
+
+    def send_digest(self, phone_number, items):
+        """Send one farmer's digest and record a delivery per advisory"""
+        from .utils import craft_digest_sms, record_delivery, send_sms_to_farmer
+
+        # Lanes are in priority order: the digest goes in its most pressing advisory's
+        lane = min((item.lane for item in items), key=LANES.index)
+        with self.app.app_context():
+            sms_result = send_sms_to_farmer(phone_number, craft_digest_sms(items), lane=lane)
+            if not sms_result['success']:
+                print(f"❌ Digest SMS to {phone_number} ({len(items)} advisories) not sent: {sms_result['error']}")
+                return False
+            for item in items:
+                record_delivery(item.farmer_id, item.advisory_id, item.vc)
+        print(f"✅ Digest SMS sent to {phone_number} ({len(items)} advisories)")
+        return True
+
+    def flush(self):
+        """Send every queued digest now, from this thread"""
+        with self._lock:
+            digests = list(self.pending.values())
+            self.pending.clear()
+            self.due.clear()
+            self.queued = 0
+        # Not through the pool: at interpreter exit (atexit) it takes no new work
+        for digest in digests:
+            self._deliver(digest)
+        return len(digests)
+
+    def close(self):
+        """Send what is queued, stop the flusher and write the delivery stats the sends counted"""
+        from ..stats import flush_stats
+
+        self.flush()
+        with self._lock:
+            self._stopped = True
+            self._changed.notify_all()
+        self._pool.shutdown(wait=True)
+        # At exit the stats buffer's own atexit flush may already have run (handlers run
+        # in reverse order and the digester usually registers first)
+        flush_stats()
+
+    def snapshot(self):
+        """
+        Queue and savings (for /api/sms/providers).
+
+        Returns:
+            dict
+        """
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'window_seconds': self.window,
+                'max_segments': self.max_segments,
+                'farmers_waiting': len(self.pending),
+                'advisories_waiting': self.queued,
+                'digests_sent': self.digests_sent,
+                'advisories_sent': self.advisories_sent,
+                'sms_saved': self.advisories_sent - self.digests_sent,
+                'failed': self.failed,
+            }
+
+
+# Created on first use, like the SMS router
+_digester = None
+_digester_lock = threading.Lock()
+
+
+def get_digester(app=None):
+    """
+    Return this process's digester, creating it on first use from
+    SMS_DIGEST_WINDOW, SMS_DIGEST_MAX_SEGMENTS and SMS_DIGEST_CONCURRENCY.
+
+    Args:
+        app (Flask): App the digests are sent in (default: the current app)
+
+    Returns:
+        Digester
+    """
+    global _digester
+    if _digester is None:
+        with _digester_lock:
+            if _digester is None:
+                if app is None:
+                    from flask import current_app
+                    app = current_app._get_current_object()
+                _digester = Digester(
+                    app,
+                    window=float(os.getenv('SMS_DIGEST_WINDOW', DEFAULT_DIGEST_WINDOW)),
+                    max_segments=int(os.getenv('SMS_DIGEST_MAX_SEGMENTS', DEFAULT_MAX_SEGMENTS)),
+                    concurrency=int(os.getenv('SMS_DIGEST_CONCURRENCY', DEFAULT_DIGEST_CONCURRENCY))
+                )
+                if _digester.enabled:
+                    # Don't drop queued advisories on a clean shutdown
+                    atexit.register(_digester.close)
+    return _digester
+
+
+def close_digester():
+    """
+    Send this process's queued digests and stop its digester (worker shutdown, tests).
+
+    Returns:
+        bool: True if there was a digester to close
+    """
+    global _digester
+    with _digester_lock:
+        digester, _digester = _digester, None
+    if digester is None:
+        return False
+    if digester.enabled:
+        atexit.unregister(digester.close)
+    digester.close()
+    return True
@@ -0,0 +1,146 @@
+"""
+Priority lanes for outbound SMS.
+
+Every advisory has a priority (advisories.priority, NULL meaning normal) and
+its SMS go out in the lane of that name:
+
+    urgent   emergency alerts (locusts, floods): always served first
+    normal   regular advisories and verification replies
+    bulk     routine campaigns
+
+When provider capacity is short (sends wait for pacing tokens, see
+rate_limit.py), waiting sends are queued per lane and per provider:
+
+- an urgent send goes ahead of every queued normal and bulk send, even ones
+  that have been waiting longer (pre-emption)
+- normal and bulk share what is left by weight (SMS_LANE_WEIGHTS, default
+  normal:4,bulk:1) with stride scheduling, so a big campaign can't starve
+  regular advisories and vice versa
+- SMS_URGENT_RESERVE (default 0.2) keeps a fifth of a second's worth of
+  every bucket's tokens for urgent sends: normal and bulk can't dip into
+  it, so an alert arriving mid-campaign finds capacity waiting for it
+
+The queues only order sends within one process. Between processes (gunicorn
+workers, campaign runners) the same priorities decide each process's share of
+the provider accounts, through the database (rate_share.py).
+
+LaneMetrics keeps the queue wait and the total send time of recent sends per
+lane, for /api/sms/providers.
+"""
+import threading
+from collections import deque
+
+LANE_URGENT = 'urgent'
+LANE_NORMAL = 'normal'
+LANE_BULK = 'bulk'
+LANES = (LANE_URGENT, LANE_NORMAL, LANE_BULK)
+
+DEFAULT_LANE_WEIGHTS = {LANE_NORMAL: 4.0, LANE_BULK: 1.0}
+DEFAULT_URGENT_RESERVE = 0.2
+
+# Recent sends per lane the latency percentiles are computed over
+LATENCY_SAMPLES = 2048
+
+
+def lane_for(priority):
+    """The lane for an advisory priority (None or unknown: normal)"""
+    priority = (priority or '').strip().lower()
+    return priority if priority in LANES else LANE_NORMAL
+
+
+class LaneQueue:
+    """
+    Sends waiting for one provider's capacity, by lane.
+
+    Tickets are plain objects; the caller waits until its ticket is head().
+    """
+
+    def __init__(self, weights=None):
+        weights = {**DEFAULT_LANE_WEIGHTS, **(weights or {})}
+        self.weights = {lane: max(float(weights.get(lane, 1.0)), 1e-3) for lane in LANES}
+        self.waiting = {lane: deque() for lane in LANES}
+        # Stride scheduling: the lane with the lowest pass goes next, and each grant adds 1/weight
+        self.passes = {lane: 0.0 for lane in LANES}
+        self.virtual = 0.0
+
+    def push(self, ticket, lane):
+        if not self.waiting[lane]:
+            # An idle lane doesn't bank credit for the time it had nothing to send
+            self.passes[lane] = max(self.passes[lane], self.virtual)
+        self.waiting[lane].append(ticket)
+
+    def head(self):
+        """The ticket that gets the next token"""
+        if self.waiting[LANE_URGENT]:
+            return self.waiting[LANE_URGENT][0]
+        lanes = [lane for lane in (LANE_NORMAL, LANE_BULK) if self.waiting[lane]]
+        if not lanes:
+            return None
+        return self.waiting[min(lanes, key=lambda lane: self.passes[lane])][0]
+
+    def remove(self, ticket, lane, granted):
+        self.waiting[lane].remove(ticket)
+        if granted and lane != LANE_URGENT:
+            self.passes[lane] += 1.0 / self.weights[lane]
+            self.virtual = self.passes[lane]
+
+    def ahead(self, lane):
+        """Sends that would go before a new send in `lane`"""
+        if lane == LANE_URGENT:
+            return len(self.waiting[LANE_URGENT])
+        return sum(len(queue) for queue in self.waiting.values())
+
+    def depth(self, lane):
+        return len(self.waiting[lane])
+
+
+def percentiles(samples):
+    """p50/p95/p99 of a list of seconds, in milliseconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda fraction: round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 1)
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99)}
+
+
+class LaneMetrics:
+    """Counts and latency samples per lane"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = {lane: 0 for lane in LANES}
+        self.failed = {lane: 0 for lane in LANES}
+        self.queue_waits = {lane: deque(maxlen=LATENCY_SAMPLES) for lane in LANES}
+        self.send_times = {lane: deque(maxlen=LATENCY_SAMPLES) for lane in LANES}
+
+    def record(self, lane, ok, queue_wait, total):
+        """
+        Args:
+            queue_wait (float): Seconds spent waiting for provider capacity
+            total (float): Seconds from the send call to the provider's answer
+        """
+        with self._lock:
+            (self.sent if ok else self.failed)[lane] += 1
+            self.queue_waits[lane].append(queue_wait)
+            self.send_times[lane].append(total)
+
+    def snapshot(self, queued=None):
+        """
+        Args:
+            queued (dict): lane -> sends waiting right now
+
+        Returns:
+            list: One dict per lane
+        """
+        with self._lock:
+            return [
+                {
+                    'lane': lane,
+                    'sent': self.sent[lane],
+                    'failed': self.failed[lane],
+                    'queued': (queued or {}).get(lane, 0),
+                    'queue_wait_ms': percentiles(list(self.queue_waits[lane])),
+                    'send_ms': percentiles(list(self.send_times[lane])),
+                }
+                for lane in LANES
+            ]
@@ -0,0 +1,367 @@
+"""
+Adaptive pacing of outbound SMS (token buckets with AIMD).
+
+Every send takes a token from two buckets: one for the provider account and one
+for the sender ID it goes out under (providers and networks cap both). A bucket
+refills at its current rate, so a burst is spread out instead of tripping the
+provider's throttle. Sends waiting for tokens queue per provider in priority
+lanes (lanes.py): urgent first, the rest by weight.
+
+The rates adapt to what the provider actually accepts (AIMD):
+
+- a throttled send (HTTP 429) or an overloaded provider (5xx) multiplies the
+  rate by SMS_AIMD_DECREASE (0.7), at most once per DECREASE_COOLDOWN so the
+  replies of sends already in flight count as one signal. A Retry-After header
+  also pauses the bucket for that long.
+- while sends are waiting on the bucket (it is the bottleneck), successes
+  raise the rate again: by half the gap to the rate that was last throttled
+  every second, then, past it, by SMS_AIMD_INCREASE messages/sec every second
+  to probe for more. Before the first throttle the rate grows by a quarter
+  every second (slow start), so a low starting rate is left behind quickly.
+
+So the rate settles in a narrow band just under the provider's real limit,
+instead of the slow climb back of plain additive increase.
+
+Starting rates come from SMS_RATE_LIMITS (per provider) and
+SMS_SENDER_RATE_LIMITS (per sender ID), in messages/sec. A bucket without a
+configured rate doesn't pace until the provider first throttles it, then
+starts from the rate it was actually sending at (sender IDs without a
+configured rate are never paced; the account bucket absorbs their throttles).
+
+A bucket's rate is the rate of the whole provider account (or sender ID),
+but buckets live in one process, and every gunicorn worker and
+`populate_db.py run-campaigns` process has its own. Each process paces at its
+share of the account rate: 1/SMS_RATE_PROCESSES to start with (gunicorn.conf.py
+sets it to the worker count unless it is set), then whatever the processes
+agree on through the database (rate_share.py), which also spreads throttles
+and urgent traffic between them.
+"""
+import time
+import threading
+
+from .lanes import DEFAULT_URGENT_RESERVE, LANE_NORMAL, LANE_URGENT, LANES, LaneQueue
+
+DEFAULT_INCREASE = 1.0      # messages/sec added per second while saturated
+DEFAULT_DECREASE = 0.7      # rate multiplier on a throttle or overload
+DEFAULT_MIN_RATE = 1.0      # messages/sec
+
+# Tokens a bucket can hold, in seconds of its rate: a short burst, not a spike
+BURST_SECONDS = 0.25
+
+# Throttle replies within this window (seconds) are one decrease
+DECREASE_COOLDOWN = 1.0
+
+# A bucket counts as saturated while a send waited on it this recently (seconds)
+SATURATED_WINDOW = 1.0
+
+# Share of the gap to the last throttled rate recovered per second
+RECOVERY = 0.5
+
+# Growth per second before the first throttle, as a share of the rate
+SLOW_START = 0.25
+
+
+class AdaptiveBucket:
+    """
+    Token bucket whose rate follows AIMD feedback.
+
+    Args:
+        name (str): For logs and stats
+        rate (float): Starting rate in messages/sec, None to not pace until throttled
+        reserve (float): Seconds of the rate kept for urgent sends
+    """
+
+    def __init__(self, name, rate=None, increase=DEFAULT_INCREASE, decrease=DEFAULT_DECREASE,
+                 min_rate=DEFAULT_MIN_RATE, reserve=DEFAULT_URGENT_RESERVE):
+        self.name = name
+        self.rate = rate
+        self.reserve = reserve
+        self.increase = increase
+        self.decrease = decrease
+        self.min_rate = min_rate
+        self.share = 1.0            # this process's share of the account rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.ceiling = None         # rate at the last throttle
+        self.last_decrease = 0.0
+        self.throttled_at = None    # wall clock of the last decrease, shared with the other processes
+        self.last_wait = 0.0
+        self.throttled = 0
+        # Sends in the current and the previous second, to measure the actual rate
+        self.window_start = self.updated
+        self.window_count = 0
+        self.observed_rate = 0.0
+
+    @property
+    def local_rate(self):
+        """Messages/sec this process may send (None: not paced)"""
+        return self.rate * self.share if self.rate else None
+
+    @property
+    def reserved(self):
+        """Tokens only urgent sends may take"""
+        return self.local_rate * self.reserve if self.rate else 0.0
+
+    @property
+    def capacity(self):
+        return max(1.0, self.local_rate * BURST_SECONDS) + self.reserved if self.rate else 1.0
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.local_rate)
+        self.updated = now
+        if now - self.window_start >= 1.0:
+            self.observed_rate = self.window_count / (now - self.window_start)
+            self.window_start, self.window_count = now, 0
+
+    def wait_time(self, now, lane=LANE_NORMAL):
+        """Seconds until a token is available to a send in `lane` (call with the limiter lock held)"""
+        self._refill(now)
+        wait = max(self.paused_until - now, 0.0)
+        needed = 1 + (0.0 if lane == LANE_URGENT else self.reserved)
+        if self.rate and self.tokens < needed:
+            wait = max(wait, (needed - self.tokens) / self.local_rate)
+        return wait
+
+    def take(self, now):
+        """Take a token (after wait_time came out 0)"""
+        self._refill(now)
+        if self.rate:
+            self.tokens -= 1
+        self.window_count += 1
+
+    def on_success(self, now):
+        """Additive increase, per success, adding up to the per-second step at this process's rate"""
+        if self.rate and now - self.last_wait <= SATURATED_WINDOW:
+            step = self.increase
+            if self.ceiling is None:
+                step = max(step, self.rate * SLOW_START)
+            elif self.rate < self.ceiling:
+                step = max(step, (self.ceiling - self.rate) * RECOVERY)
+            self.rate += step / self.local_rate
+
+    def on_throttle(self, now, retry_after=None):
+        """Multiplicative decrease (once per cooldown); pause for Retry-After"""
+        self.throttled += 1
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if now - self.last_decrease < DECREASE_COOLDOWN:
+            return
+        self.last_decrease = now
+        self.throttled_at = time.time()
+        # Unpaced so far: this process's observed rate stands for its share of the account
+        current = self.rate or max(self.observed_rate, self.window_count / max(now - self.window_start, 1e-3)) / self.share
+        self.ceiling = current
+        self.rate = max(self.min_rate, current * self.decrease)
+        self.tokens = min(self.tokens, self.capacity)
+        print(f"🐢 SMS rate for {self.name} lowered to {self.rate:.1f}/s")
+
+    def adopt(self, rate, throttled_at, now):
+        """Take over the account rate another process lowered after a throttle"""
+        self.ceiling = rate / self.decrease
+        self.rate = rate
+        self.throttled_at = throttled_at
+        self.last_decrease = now
+        self.tokens = min(self.tokens, self.capacity)
+
+    def snapshot(self):
+        return {
+            'rate': round(self.local_rate, 2) if self.rate else None,
+            'account_rate': round(self.rate, 2) if self.rate else None,
+            'share': round(self.share, 4),
+            'throttled': self.throttled,
+        }
+
+
+class RateLimiter:
+    """
+    The buckets for every provider and (provider, sender ID) pair, and the lane
+    queues of sends waiting for them.
+
+    Args:
+        provider_rates (dict): provider name -> starting messages/sec
+        sender_rates (dict): sender ID -> starting messages/sec
+        lane_weights (dict): lane -> weight for normal and bulk (see lanes.py)
+        urgent_reserve (float): Seconds of each bucket's rate kept for urgent sends
+        processes (int): Processes sending through the same accounts; each starts
+            at its share of the configured rates
+    """
+
+    def __init__(self, provider_rates=None, sender_rates=None, increase=DEFAULT_INCREASE,
+                 decrease=DEFAULT_DECREASE, min_rate=DEFAULT_MIN_RATE, lane_weights=None,
+                 urgent_reserve=DEFAULT_URGENT_RESERVE, processes=1):
+        self.provider_rates = provider_rates or {}
+        self.sender_rates = sender_rates or {}
+        # Share of each account this process sends at, until rate_share.py says otherwise
+        self.default_share = 1.0 / max(int(processes), 1)
+        self.shares = {}
+        # Sends asked for per provider and lane since the last demand() call
+        self.arrivals = {}
+        # Called when an urgent send has to wait (rate_share.py syncs early)
+        self.on_urgent_wait = None
+        self.settings = {'increase': increase, 'decrease': decrease, 'min_rate': min_rate,
+                         'reserve': urgent_reserve}
+        self.lane_weights = lane_weights
+        self.buckets = {}
+        self.queues = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _buckets(self, provider, sender):
+        """The provider's and the sender's bucket, created on first use (call with the lock held)"""
+        keys = ((provider, None), (provider, sender or ''))
+        for key in keys:
+            if key not in self.buckets:
+                name, rate = (provider, self.provider_rates.get(provider)) if key[1] is None else \
+                    (f"{provider}/{key[1] or 'default sender'}", self.sender_rates.get(key[1]))
+                self.buckets[key] = AdaptiveBucket(name, rate, **self.settings)
+                self.buckets[key].share = self.shares.get(provider, self.default_share)
+        return [self.buckets[key] for key in keys]
+
+    def _queue(self, provider):
+        if provider not in self.queues:
+            self.queues[provider] = LaneQueue(self.lane_weights)
+        return self.queues[provider]
+
+    def wait_time(self, provider, sender=None, lane=LANE_NORMAL):
+        """Seconds a send in `lane` through this provider and sender would wait for its tokens"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets(provider, sender)
+            wait = max(bucket.wait_time(now, lane) for bucket in buckets)
+            rate = buckets[0].rate
+            ahead = self._queue(provider).ahead(lane)
+            return wait + (ahead / rate if rate else 0.0)
+
+    def acquire(self, provider, sender=None, timeout=None, lane=LANE_NORMAL):
+        """
+        Take a token from both buckets, waiting in the provider's lane queue until
+        it is this send's turn and the tokens are there.
+
+        Returns:
+            bool: False (nothing taken) if that didn't happen within `timeout`
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        ticket = object()
+        with self._changed:
+            buckets = self._buckets(provider, sender)
+            queue = self._queue(provider)
+            queue.push(ticket, lane)
+            arrivals = self.arrivals.setdefault(provider, dict.fromkeys(LANES, 0))
+            arrivals[lane] += 1
+            urgent_waited = False
+            while True:
+                now = time.monotonic()
+                wait = None
+                if queue.head() is ticket:
+                    waits = [bucket.wait_time(now, lane) for bucket in buckets]
+                    wait = max(waits)
+                    if wait <= 0:
+                        for bucket in buckets:
+                            bucket.take(now)
+                        queue.remove(ticket, lane, granted=True)
+                        self._changed.notify_all()
+                        return True
+                    for bucket, bucket_wait in zip(buckets, waits):
+                        if bucket_wait > 0:
+                            bucket.last_wait = now
+                    if lane == LANE_URGENT and not urgent_waited and self.on_urgent_wait:
+                        urgent_waited = True
+                        self.on_urgent_wait()
+                if deadline is not None:
+                    if now >= deadline:
+                        queue.remove(ticket, lane, granted=False)
+                        self._changed.notify_all()
+                        return False
+                    wait = min(wait, deadline - now) if wait is not None else deadline - now
+                # Woken early when the head changes (a grant, a timeout or an urgent arrival)
+                self._changed.wait(wait)
+
+    def feedback(self, provider, sender, result):
+        """Adjust the rates after a send: decrease on throttling or overload, increase on success"""
+        now = time.monotonic()
+        with self._lock:
+            account, sender_bucket = self._buckets(provider, sender)
+            # A 429 doesn't say which limit was hit: an unpaced sender leaves it to the account bucket
+            for bucket in (account, sender_bucket) if sender_bucket.rate else (account,):
+                if result.throttled or result.overloaded:
+                    bucket.on_throttle(now, result.retry_after if result.throttled else None)
+                elif result.ok:
+                    bucket.on_success(now)
+            if result.throttled:
+                self._changed.notify_all()
+
+    def providers(self):
+        """Providers this process has sent (or tried to send) through"""
+        with self._lock:
+            return sorted({provider for provider, _ in self.buckets})
+
+    def demand(self, provider):
+        """
+        Sends asked for through a provider since the last call, and sends waiting now.
+
+        Returns:
+            tuple: (lane -> sends asked for, lane -> sends queued)
+        """
+        with self._lock:
+            arrivals = self.arrivals.pop(provider, None) or dict.fromkeys(LANES, 0)
+            queue = self.queues.get(provider)
+            return arrivals, {lane: queue.depth(lane) if queue else 0 for lane in LANES}
+
+    def account(self, provider):
+        """
+        This process's view of a provider account.
+
+        Returns:
+            tuple: (account rate or None, wall clock of its last throttle or None)
+        """
+        with self._lock:
+            account = self._buckets(provider, None)[0]
+            return account.rate, account.throttled_at
+
+    def set_share(self, provider, share, rate=None, throttled_at=None):
+        """
+        Pace this process at `share` of a provider's accounts, taking over a rate
+        another process lowered more recently than this one (rate, throttled_at).
+        """
+        now = time.monotonic()
+        with self._changed:
+            self.shares[provider] = share
+            account = self._buckets(provider, None)[0]
+            if rate and throttled_at and (account.throttled_at is None or throttled_at > account.throttled_at):
+                account.adopt(rate, throttled_at, now)
+            elif rate and account.rate != rate and throttled_at == account.throttled_at:
+                # Same throttle, but another process has recovered further since
+                account.rate = rate
+            for (name, _), bucket in self.buckets.items():
+                if name == provider:
+                    bucket._refill(now)
+                    bucket.share = share
+                    bucket.tokens = min(bucket.tokens, bucket.capacity)
+            # Waiting sends recompute their wait at the new rate
+            self._changed.notify_all()
+
+    def queued(self):
+        """Sends waiting for capacity right now, per lane"""
+        with self._lock:
+            return {lane: sum(queue.depth(lane) for queue in self.queues.values()) for lane in LANES}
+
+    def _unused_snapshot(self, provider):
+        rate = self.provider_rates.get(provider)
+        share = self.shares.get(provider, self.default_share)
+        return {'rate': round(rate * share, 2) if rate else None, 'account_rate': rate,
+                'share': round(share, 4), 'throttled': 0}
+
+    def snapshot(self, provider):
+        """Rates of a provider's buckets"""
+        with self._lock:
+            account = self.buckets.get((provider, None))
+            return {
+                **(account.snapshot() if account else self._unused_snapshot(provider)),
+                'senders': {
+                    sender or 'default': bucket.snapshot()
+                    for (name, sender), bucket in self.buckets.items()
+                    if name == provider and sender is not None
+                },
+            }
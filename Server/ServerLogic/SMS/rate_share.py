@@ -0,0 +1,251 @@
+"""
+Provider capacity shared by every process that sends SMS.
+
+Pacing buckets and priority lanes (rate_limit.py, lanes.py) live in one
+process, but several processes send through the same provider accounts: every
+gunicorn worker and every `populate_db.py run-campaigns` process. Left alone, a
+campaign runner would never make way for an urgent alert sent from a web
+worker, and a throttle seen by one process would leave the others sending at
+full speed.
+
+So every SMS_RATE_SYNC_INTERVAL seconds (default 1) each process writes one
+sms_rate_shares row per provider: its demand per lane (sends asked for since
+the last sync plus its backlog, in messages/sec) and its view of the account
+rate. It then reads the rows of the other live processes and paces at its
+share of the account (share_rates):
+
+- urgent demand is served first, wherever it comes from, so a campaign runner
+  gives way to an alert sent from a web worker within one sync. A process
+  whose urgent send has to wait syncs straight away.
+- what is left is split between the normal and bulk demand of every process
+  by lane weight (SMS_LANE_WEIGHTS), none getting more than it asks for
+- capacity nobody asks for goes to the processes with demand, in proportion,
+  and every process keeps at least SMS_RATE_MIN so a first send never waits
+  for a sync
+- the process throttled most recently sets the account rate for everyone, so
+  a 429 in one worker slows them all down
+
+Rows not refreshed for STALE_INTERVALS intervals belong to processes that are
+gone: they are ignored, and deleted by the next process to sync. If the
+database can't be reached, a process keeps pacing at its last share.
+SMS_RATE_SYNC_INTERVAL=0 turns sharing off; each process then keeps
+1/SMS_RATE_PROCESSES of the account.
+"""
+import os
+import time
+import atexit
+import socket
+import threading
+
+from sqlalchemy import and_, delete, select, update, insert
+
+from ..models import SMSRateShare
+from .lanes import DEFAULT_LANE_WEIGHTS, LANE_BULK, LANE_NORMAL, LANE_URGENT, LANES
+from .rate_limit import DEFAULT_MIN_RATE
+
+DEFAULT_SYNC_INTERVAL = 1.0
+
+# A row older than this many intervals belongs to a process that has stopped
+STALE_INTERVALS = 3
+
+SHARES = SMSRateShare.__table__
+
+
+def share_rates(demands, account_rate, weights=None, min_rate=DEFAULT_MIN_RATE):
+    """
+    Split an account's rate between the processes sending through it.
+
+    Args:
+        demands (dict): process -> {lane: messages/sec it asks for}
+        account_rate (float): Messages/sec the whole account may send
+        weights (dict): lane -> weight for normal and bulk (SMS_LANE_WEIGHTS)
+        min_rate (float): Messages/sec every process keeps
+
+    Returns:
+        dict: process -> share of the account rate (the shares add up to 1)
+    """
+    if not demands:
+        return {}
+    weights = {**DEFAULT_LANE_WEIGHTS, **(weights or {})}
+    floor = min(min_rate, account_rate / len(demands))
+    rates = dict.fromkeys(demands, floor)
+    capacity = account_rate - floor * len(demands)
+
+    # Urgent first, from every process alike
+    urgent = sum(demand.get(LANE_URGENT, 0.0) for demand in demands.values())
+    if urgent > 0:
+        served = min(capacity / urgent, 1.0)
+        for process, demand in demands.items():
+            rates[process] += demand.get(LANE_URGENT, 0.0) * served
+        capacity -= urgent * served
+
+    # Then normal and bulk by weight, each flow capped at its demand (water-filling)
+    flows = [
+        (process, max(float(weights.get(lane, 1.0)), 1e-3), demand.get(lane, 0.0))
+        for process, demand in demands.items()
+        for lane in (LANE_NORMAL, LANE_BULK)
+        if demand.get(lane, 0.0) > 0
+    ]
+    while flows and capacity > 1e-9:
+        level = capacity / sum(weight for _, weight, _ in flows)
+        satisfied = [flow for flow in flows if flow[2] <= flow[1] * level]
+        if not satisfied:
+            for process, weight, _ in flows:
+                rates[process] += weight * level
+            capacity = 0.0
+            break
+        for process, _, wanted in satisfied:
+            rates[process] += wanted
+            capacity -= wanted
+        flows = [flow for flow in flows if flow not in satisfied]
+
+    # Spare capacity: to whoever is asking, in proportion, else evenly
+    if capacity > 1e-9:
+        asked = {process: sum(demand.get(lane, 0.0) for lane in LANES) for process, demand in demands.items()}
+        total = sum(asked.values())
+        for process in rates:
+            rates[process] += capacity * (asked[process] / total if total else 1.0 / len(rates))
+    return {process: rate / account_rate for process, rate in rates.items()}
+
+
+def account_state(rows):
+    """
+    The account rate the processes agree on: the one lowered most recently,
+    else the highest (processes still climbing before any throttle).
+
+    Returns:
+        tuple: (rate or None, throttled_at or None)
+    """
+    paced = [row for row in rows if row.rate]
+    if not paced:
+        return None, None
+    throttled = [row.throttled_at for row in paced if row.throttled_at is not None]
+    if throttled:
+        latest = max(throttled)
+        return max(row.rate for row in paced if row.throttled_at == latest), latest
+    return max(row.rate for row in paced), None
+
+
+class RateShareSync:
+    """
+    Keeps one process's share of every provider account in step with the others.
+
+    Args:
+        limiter (RateLimiter): This process's buckets
+        engine: SQLAlchemy engine holding sms_rate_shares
+        providers (list): Provider names to share (a process that hasn't sent yet still
+            holds its minimum, so its first urgent send finds capacity)
+        interval (float): Seconds between syncs
+        lane_weights (dict): lane -> weight for normal and bulk
+        min_rate (float): Messages/sec every process keeps
+        process (str): This process's name in the table (default host:pid)
+    """
+
+    def __init__(self, limiter, engine, providers=(), interval=DEFAULT_SYNC_INTERVAL, lane_weights=None,
+                 min_rate=DEFAULT_MIN_RATE, process=None):
+        self.limiter = limiter
+        self.engine = engine
+        self.providers = list(providers)
+        self.interval = interval
+        self.lane_weights = lane_weights
+        self.min_rate = min_rate
+        self.process = (process or f"{socket.gethostname()}:{os.getpid()}")[:64]
+        self.last_sync = time.monotonic()
+        self.syncs = 0
+        self.processes = {}
+        self.failing = False
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        """Sync in the background, and early whenever an urgent send has to wait"""
+        self.limiter.on_urgent_wait = self._wake.set
+        self._thread = threading.Thread(target=self._run, name='sms-rate-share', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stopped:
+                self.sync()
+
+    def sync(self):
+        """
+        Publish this process's demand and pace at its share of each provider account.
+
+        Returns:
+            dict: provider -> this process's share (empty if the database couldn't be reached)
+        """
+        now, started = time.time(), time.monotonic()
+        elapsed = max(started - self.last_sync, 1e-3)
+        self.last_sync = started
+        shares = {}
+        try:
+            with self.engine.begin() as connection:
+                for provider in sorted(set(self.providers) | set(self.limiter.providers())):
+                    shares[provider] = self._sync_provider(connection, provider, now, elapsed)
+        except Exception as e:
+            if not self.failing:
+                print(f"⚠️  Could not share SMS capacity with the other processes ({e}), keeping the current shares")
+            self.failing = True
+            return {}
+        if self.failing:
+            print("✅ Sharing SMS capacity with the other processes again")
+        self.failing = False
+        self.syncs += 1
+        for provider, (share, rate, throttled_at) in shares.items():
+            if share is not None:
+                self.limiter.set_share(provider, share, rate, throttled_at)
+        return {provider: share for provider, (share, _, _) in shares.items()}
+
+    def _sync_provider(self, connection, provider, now, elapsed):
+        arrivals, queued = self.limiter.demand(provider)
+        demand = {lane: arrivals[lane] / elapsed + queued[lane] / self.interval for lane in LANES}
+        rate, throttled_at = self.limiter.account(provider)
+        values = {**demand, 'rate': rate, 'throttled_at': throttled_at, 'updated_at': now}
+
+        mine = and_(SHARES.c.provider == provider, SHARES.c.process == self.process)
+        if not connection.execute(update(SHARES).where(mine).values(**values)).rowcount:
+            connection.execute(insert(SHARES).values(provider=provider, process=self.process, **values))
+
+        cutoff = now - STALE_INTERVALS * self.interval
+        connection.execute(delete(SHARES).where(SHARES.c.provider == provider, SHARES.c.updated_at < cutoff))
+        rows = connection.execute(select(SHARES).where(SHARES.c.provider == provider)).all()
+        self.processes[provider] = len(rows)
+
+        account_rate, latest = account_state(rows)
+        if not account_rate:
+            # Not paced anywhere yet: nothing to split until a provider throttles
+            return None, None, None
+        demands = {row.process: {lane: getattr(row, lane) for lane in LANES} for row in rows}
+        share = share_rates(demands, account_rate, self.lane_weights, self.min_rate)[self.process]
+        return share, account_rate, latest
+
+    def close(self):
+        """Stop syncing and give this process's share back"""
+        self._stopped = True
+        self._wake.set()
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(delete(SHARES).where(SHARES.c.process == self.process))
+        except Exception:
+            pass
+
+    def snapshot(self):
+        """
+        Sharing state (for /api/sms/providers).
+
+        Returns:
+            dict
+        """
+        return {
+            'process': self.process,
+            'interval_seconds': self.interval,
+            'syncs': self.syncs,
+            'ok': not self.failing,
+            'processes': dict(self.processes),
+        }
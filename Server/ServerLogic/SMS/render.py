@@ -0,0 +1,325 @@
+"""
+SMS rendering: encoding, segment counts and GSM-7 normalisation.
+
+An SMS goes out in one of two encodings:
+
+    GSM-7   the GSM 03.38 alphabet: 160 characters in one SMS, 153 per part
+            of a concatenated one. Characters of the extension table
+            (^ { } [ ] ~ | \\ and the euro sign) take two.
+    UCS-2   anything else: 70 UTF-16 code units in one SMS, 67 per part.
+
+A single character outside GSM-7, such as an emoji or a curly quote pasted
+from a word processor, sends the whole message as UCS-2. That can more than
+double its segments, and providers bill per segment. normalize() replaces
+characters that have a GSM-7 equivalent with the same meaning:
+- curly quotes, dashes, odd spaces and ellipses become their plain forms
+- accented letters outside GSM-7 lose their accents
+- zero-width characters are dropped
+Anything else (emoji, non-Latin scripts) is kept, and the message stays
+UCS-2, because dropping it could change what the farmer reads.
+
+render() normalises a message and counts its segments. If the message is
+longer than SMS_MAX_SEGMENTS segments (default 6, a cap many networks put on
+concatenated SMS), it is split into several SMS. Splits fall between words,
+and each SMS starts with "(1/3) " so the farmer reads them in order. Parts
+never split an extension character or a surrogate pair.
+
+Rendered advisory bodies are cached per advisory (SMS_RENDER_CACHE_SIZE
+advisories, default 1024). Every farmer who verifies an advisory gets the
+same body, so it is only rendered once. report() gives the encoding and
+segment cost of an advisory before it is broadcast.
+"""
+import os
+import threading
+import unicodedata
+from functools import lru_cache
+from collections import OrderedDict
+
+ENCODING_GSM7 = 'GSM-7'
+ENCODING_UCS2 = 'UCS-2'
+
+# GSM 03.38 basic character set (without the escape character)
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+
+# Extension table: sent as escape + character, so they count twice
+GSM7_EXTENSION = frozenset("\f^{}\\[~]|€")
+
+# Length limits per encoding: (one SMS, each part of a concatenated SMS)
+SEGMENT_LIMITS = {
+    ENCODING_GSM7: (160, 153),
+    ENCODING_UCS2: (70, 67),
+}
+
+DEFAULT_MAX_SEGMENTS = 6
+DEFAULT_RENDER_CACHE_SIZE = 1024
+
+# Replacements that keep the meaning; everything else outside GSM-7 is left alone
+GSM7_REPLACEMENTS = {
+    # Quotes and apostrophes
+    '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'", '´': "'", '`': "'",
+    '“': '"', '”': '"', '„': '"', '‟': '"', '″': '"', '«': '"', '»': '"',
+    # Dashes and hyphens
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '―': '-', '−': '-',
+    # Spaces (non-breaking, en/em, thin, ideographic...) and tabs
+    '\u00a0': ' ', '\u2000': ' ', '\u2001': ' ', '\u2002': ' ', '\u2003': ' ', '\u2004': ' ',
+    '\u2005': ' ', '\u2006': ' ', '\u2007': ' ', '\u2008': ' ', '\u2009': ' ', '\u200a': ' ',
+    '\u202f': ' ', '\u205f': ' ', '\u3000': ' ', '\t': ' ',
+    # Invisible characters (zero-width spaces and joiners, byte order mark, soft hyphen, variation selectors)
+    '\u200b': '', '\u200c': '', '\u200d': '', '\u2060': '', '\ufeff': '', '\u00ad': '', '\ufe0e': '', '\ufe0f': '',
+    # Punctuation and symbols
+    '…': '...', '•': '-', '·': '.', '‹': '<', '›': '>',
+    '×': 'x', '÷': '/', '½': '1/2', '¼': '1/4', '¾': '3/4',
+    '©': '(C)', '®': '(R)', '™': '(TM)', '°': ' deg ',
+    # Line and paragraph separators
+    '\u2028': '\n', '\u2029': '\n',
+}
+
+
+def is_gsm7(text):
+    """True if every character is in the GSM-7 alphabet (basic or extension)"""
+    return all(char in GSM7_BASIC or char in GSM7_EXTENSION for char in text)
+
+
+def encoding_of(text):
+    return ENCODING_GSM7 if is_gsm7(text) else ENCODING_UCS2
+
+
+def char_units(char, encoding):
+    """Length of one character in its encoding's units (septets or UTF-16 code units)"""
+    if encoding == ENCODING_GSM7:
+        return 2 if char in GSM7_EXTENSION else 1
+    return 2 if ord(char) > 0xFFFF else 1
+
+
+def text_units(text, encoding=None):
+    encoding = encoding or encoding_of(text)
+    return sum(char_units(char, encoding) for char in text)
+
+
+def segment_count(text):
+    """SMS segments a message takes once sent"""
+    encoding = encoding_of(text)
+    single, part = SEGMENT_LIMITS[encoding]
+    units = text_units(text, encoding)
+    if units <= single:
+        return 1
+    # A part never ends halfway through a two-unit character, so count the way a phone splits
+    return len(split_units(text, encoding, part))
+
+
+def split_units(text, encoding, limit):
+    """Split text into chunks of at most `limit` units, never inside a character"""
+    chunks, current, used = [], [], 0
+    for char in text:
+        units = char_units(char, encoding)
+        if used + units > limit:
+            chunks.append(''.join(current))
+            current, used = [], 0
+        current.append(char)
+        used += units
+    if current or not chunks:
+        chunks.append(''.join(current))
+    return chunks
+
+
+def _fold_accent(char):
+    """A GSM-7 letter for an accented letter outside GSM-7 (ê -> e), None if there is none"""
+    base = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+    return base if base and is_gsm7(base) else None
+
+
+@lru_cache(maxsize=4096)
+def normalize(text):
+    """
+    Replace characters outside GSM-7 with GSM-7 equivalents where that keeps the meaning.
+    Titles are normalised for every SMS sent, so the results are cached.
+
+    Returns:
+        str: The normalised text (unchanged if it already was GSM-7)
+    """
+    if is_gsm7(text):
+        return text
+    out = []
+    for char in text:
+        if char in GSM7_BASIC or char in GSM7_EXTENSION:
+            out.append(char)
+        elif char in GSM7_REPLACEMENTS:
+            out.append(GSM7_REPLACEMENTS[char])
+        else:
+            out.append(_fold_accent(char) or char)
+    return ''.join(out)
+
+
+class Rendered:
+    """
+    A message ready to send.
+
+    Attributes:
+        text (str): The normalised message
+        encoding (str): ENCODING_GSM7 or ENCODING_UCS2
+        units (int): Length in septets (GSM-7) or UTF-16 code units (UCS-2)
+        segments (int): SMS segments over all parts
+        parts (list): The SMS to send, in order (one unless it was longer than max_segments)
+        original_encoding (str): Encoding before normalisation
+        original_segments (int): Segments before normalisation
+        non_gsm (list): Characters that kept the message in UCS-2
+    """
+
+    __slots__ = ('text', 'encoding', 'units', 'segments', 'parts', 'original_encoding', 'original_segments', 'non_gsm')
+
+    def to_dict(self):
+        return {
+            'encoding': self.encoding,
+            'characters': len(self.text),
+            'units': self.units,
+            'segments': self.segments,
+            'parts': len(self.parts),
+            'original_encoding': self.original_encoding,
+            'original_segments': self.original_segments,
+            'non_gsm_characters': self.non_gsm,
+        }
+
+
+def split_message(text, max_segments):
+    """
+    Split a message into SMS of at most max_segments segments each, between
+    words where possible, each numbered "(i/n) ".
+
+    Returns:
+        list: The SMS bodies (just [text] if it fits in one)
+    """
+    if segment_count(text) <= max_segments:
+        return [text]
+    encoding = encoding_of(text)
+    # One unit per segment spare: a two-unit character never straddles a segment boundary
+    limit = (SEGMENT_LIMITS[encoding][1] - 1) * max_segments
+    words = text.split(' ')
+    # The label's length depends on how many parts there are: grow the guess until it holds
+    count = 2
+    while True:
+        label = len(f"({count}/{count}) ")
+        parts, current = [], ''
+        for word in words:
+            candidate = f"{current} {word}" if current else word
+            if text_units(candidate, encoding) + label <= limit:
+                current = candidate
+                continue
+            if current:
+                parts.append(current)
+            # A word too long for a whole SMS is cut where it must be
+            pieces = split_units(word, encoding, limit - label)
+            parts.extend(pieces[:-1])
+            current = pieces[-1]
+        if current:
+            parts.append(current)
+        if len(parts) <= count:
+            return [f"({index}/{len(parts)}) {part}" for index, part in enumerate(parts, 1)]
+        count = len(parts)
+
+
+def render(text, max_segments=None):
+    """
+    Normalise a message to GSM-7 where safe, count its segments and split it if it is too long.
+
+    Args:
+        max_segments (int): Segments one SMS may take (default SMS_MAX_SEGMENTS)
+
+    Returns:
+        Rendered
+    """
+    max_segments = max_segments or int(os.getenv('SMS_MAX_SEGMENTS', DEFAULT_MAX_SEGMENTS))
+    rendered = Rendered()
+    rendered.original_encoding = encoding_of(text)
+    rendered.original_segments = segment_count(text)
+    rendered.text = normalize(text)
+    rendered.encoding = encoding_of(rendered.text)
+    rendered.units = text_units(rendered.text, rendered.encoding)
+    rendered.parts = split_message(rendered.text, max_segments)
+    rendered.segments = sum(segment_count(part) for part in rendered.parts)
+    rendered.non_gsm = sorted({char for char in rendered.text if not is_gsm7(char)})
+    return rendered
+
+
+class RenderCache:
+    """Rendered advisory bodies by advisory ID, least recently used dropped first"""
+
+    def __init__(self, size=DEFAULT_RENDER_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, advisory_id, message):
+        """
+        The rendered body of an advisory, rendered again if its message changed.
+
+        Returns:
+            Rendered
+        """
+        key = str(advisory_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == message:
+                self._entries.move_to_end(key)
+                return entry[1]
+        rendered = render(message)
+        with self._lock:
+            self._entries[key] = (message, rendered)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return rendered
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def render_advisory(advisory_id, message):
+    """
+    The rendered body of an advisory, from this process's cache.
+
+    Returns:
+        Rendered
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RenderCache(int(os.getenv('SMS_RENDER_CACHE_SIZE', DEFAULT_RENDER_CACHE_SIZE)))
+    return _cache.get(advisory_id, message)
+
+
+def report(advisory, farmers=None):
+    """
+    What broadcasting an advisory costs in SMS segments, before it is sent.
+
+    Args:
+        advisory: Advisory (or row) with id, title and message
+        farmers (int): Farmers it will go to, for the totals
+
+    Returns:
+        dict: 'notification' (the SMS with the VC every farmer gets) and
+              'full_message' (the SMS a farmer gets after verifying), each
+              with encoding and segments, plus totals when farmers is given
+    """
+    from .utils import craft_sms
+
+    # VCs are 6 digits, so a sample VC gives the notification's exact length. craft_sms
+    # normalises the title: put it back as written to show what normalising saved.
+    crafted = craft_sms(advisory.title, '000000')
+    notification = render(advisory.title + crafted[len(normalize(advisory.title)):])
+    full_message = render_advisory(advisory.id, advisory.message)
+    result = {
+        'advisory_id': advisory.id,
+        'notification': notification.to_dict(),
+        'full_message': full_message.to_dict(),
+    }
+    if farmers is not None:
+        result['farmers'] = farmers
+        result['notification_segments'] = farmers * notification.segments
+        # Only farmers who verify get the full message
+        result['full_message_segments_per_verification'] = full_message.segments
+    return result
@@ -0,0 +1,441 @@
+"""
+Routing of outbound SMS across several providers.
+
+SMS_PROVIDER lists the providers to use, each with an optional weight:
+
+    SMS_PROVIDER=celcom:3,africastalking:1
+
+The router keeps rolling statistics per provider: a moving average of send
+latency and error rate, plus consecutive failures. It picks a provider for
+every message by the SMS_ROUTING strategy:
+
+- 'weighted' (default): split traffic by weight, scaled down for providers
+  that fail or answer slower than SMS_SLOW_LATENCY
+- 'healthiest': always the provider with the best health-adjusted weight
+- 'cheapest': the cheapest healthy provider (SMS_PROVIDER_COSTS)
+
+A send that fails on one provider (timeout, connection error, 5xx, no credit)
+is retried on the next one, so a message only fails if every provider fails
+it. Providers time out after SMS_SEND_TIMEOUT seconds, so one slow aggregator
+delays a message by at most that much before the message fails over. Repeated
+failures eject the provider. After a back-off (5s, doubling up to 120s) one
+message is sent through it as a trial, and a successful trial re-admits it.
+
+Sends are paced per provider and sender ID by adaptive token buckets
+(rate_limit.py). A send the provider throttles (HTTP 429) is not failed: it
+is requeued behind the bucket, which has just slowed down, and goes out on
+whichever provider has capacity first. A message gives up only after waiting
+SMS_QUEUE_TIMEOUT seconds in total.
+
+Every send goes in a priority lane (lanes.py). Urgent sends jump the queue for
+capacity, may use the reserve kept for them, and always pick the healthiest
+provider, whatever SMS_ROUTING says.
+
+A timeout is ambiguous - the provider may still deliver - so a farmer can
+occasionally get the same advisory (with the same VC) from two providers.
+"""
+import os
+import time
+import random
+import threading
+
+from .lanes import DEFAULT_URGENT_RESERVE, LANE_NORMAL, LANE_URGENT, LaneMetrics
+from .rate_limit import DEFAULT_DECREASE, DEFAULT_INCREASE, DEFAULT_MIN_RATE, RateLimiter
+from .sms_service import DEFAULT_SEND_TIMEOUT, SendResult, create_provider
+
+ROUTING_WEIGHTED = 'weighted'
+ROUTING_HEALTHIEST = 'healthiest'
+ROUTING_CHEAPEST = 'cheapest'
+ROUTING_STRATEGIES = (ROUTING_WEIGHTED, ROUTING_HEALTHIEST, ROUTING_CHEAPEST)
+
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.2
+
+# Latency (seconds) above which a provider counts as degraded and loses traffic
+DEFAULT_SLOW_LATENCY = 2.0
+
+# Ejection: consecutive failures, or this error rate once there are enough samples
+EJECT_FAILURES = 3
+EJECT_ERROR_RATE = 0.5
+EJECT_MIN_SAMPLES = 10
+
+# Ejection back-off (seconds): doubles on every failed trial, up to the maximum
+EJECT_BACKOFF = 5.0
+EJECT_BACKOFF_MAX = 120.0
+
+# A degraded provider keeps at least this share of its weight, so recovery is noticed
+MIN_HEALTH = 0.01
+
+# Seconds a message may wait for provider capacity (pacing and throttled retries)
+DEFAULT_QUEUE_TIMEOUT = 30.0
+
+
+class ProviderHealth:
+    """Rolling statistics for one provider"""
+
+    def __init__(self):
+        self.latency = None         # moving average, seconds
+        self.error_rate = 0.0       # moving average, 0..1
+        self.samples = 0
+        self.consecutive_failures = 0
+        self.sent = 0
+        self.failed = 0
+        self.ejected_until = None   # monotonic time of the next trial, None while in rotation
+        self.backoff = 0.0
+        self.on_trial = False
+
+    def record(self, ok, latency):
+        self.samples += 1
+        self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.sent += 1
+            self.consecutive_failures = 0
+        else:
+            self.failed += 1
+            self.consecutive_failures += 1
+
+    def should_eject(self):
+        return (self.consecutive_failures >= EJECT_FAILURES
+                or (self.samples >= EJECT_MIN_SAMPLES and self.error_rate > EJECT_ERROR_RATE))
+
+    def factor(self, slow_latency):
+        """Health as a multiplier of the configured weight: 1 for a fast provider with no errors"""
+        health = 1.0 - self.error_rate
+        if self.latency is not None and self.latency > slow_latency:
+            health *= (slow_latency / self.latency) ** 2
+        return max(health, MIN_HEALTH)
+
+
+class SMSRouter:
+    """
+    Sends SMS through the healthiest (or cheapest) of several providers, with failover.
+
+    Args:
+        providers (list): SMSProvider instances, in order of preference for ties
+        strategy (str): One of ROUTING_STRATEGIES
+        slow_latency (float): Seconds above which a provider is degraded
+        limiter (RateLimiter): Pacing per provider and sender ID (default: unpaced until throttled)
+        queue_timeout (float): Seconds a message may wait for capacity before it fails
+    """
+
+    def __init__(self, providers, strategy=ROUTING_WEIGHTED, slow_latency=DEFAULT_SLOW_LATENCY, limiter=None,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT, rng=None):
+        if not providers:
+            raise ValueError("At least one SMS provider is required")
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"SMS_ROUTING must be one of: {', '.join(ROUTING_STRATEGIES)}")
+        self.providers = {provider.name: provider for provider in providers}
+        self.strategy = strategy
+        self.slow_latency = slow_latency
+        self.health = {name: ProviderHealth() for name in self.providers}
+        self.limiter = limiter or RateLimiter()
+        # Shares of the provider accounts agreed with the other processes (rate_share.py), if any
+        self.rate_share = None
+        self.queue_timeout = queue_timeout
+        self.lanes = LaneMetrics()
+        self._lock = threading.Lock()
+        self._random = rng or random.Random()
+
+    def _score(self, name):
+        return self.providers[name].weight * self.health[name].factor(self.slow_latency)
+
+    def _healthy(self, name):
+        health = self.health[name]
+        return (health.error_rate < EJECT_ERROR_RATE
+                and (health.latency is None or health.latency <= self.slow_latency))
+
+    def _candidates(self, strategy):
+        """
+        Providers to try for one message, in order.
+        A provider due for its trial goes first; ejected ones are left out unless
+        nothing else is left, in which case the one due back soonest is tried.
+
+        Returns:
+            tuple: (candidates, the provider offered for its trial or None)
+        """
+        now = time.monotonic()
+        with self._lock:
+            trial, available, ejected = [], [], []
+            for name, health in self.health.items():
+                if health.ejected_until is None:
+                    available.append(name)
+                elif now >= health.ejected_until and not health.on_trial and not trial:
+                    trial.append(name)
+                else:
+                    ejected.append(name)
+
+            scores = {name: self._score(name) for name in available}
+            available.sort(key=lambda name: -scores[name])
+            if strategy == ROUTING_CHEAPEST:
+                available.sort(key=lambda name: (not self._healthy(name), self.providers[name].cost))
+            elif strategy == ROUTING_WEIGHTED and len(available) > 1:
+                first = self._random.choices(available, weights=[scores[name] for name in available])[0]
+                available.remove(first)
+                available.insert(0, first)
+
+            if not trial and not available:
+                ejected.sort(key=lambda name: self.health[name].ejected_until)
+                return ejected[:1], None
+        return trial + available, (trial[0] if trial else None)
+
+    def _claim_trial(self, name):
+        """
+        Make this send the trial of a provider, once it is picked for it, so
+        concurrent sends keep skipping the provider meanwhile.
+
+        Returns:
+            bool: False if another send claimed the trial first
+        """
+        now = time.monotonic()
+        with self._lock:
+            health = self.health[name]
+            if health.on_trial or health.ejected_until is None or now < health.ejected_until:
+                return False
+            health.ejected_until = now + health.backoff
+            health.on_trial = True
+            return True
+
+    def _release_trial(self, name):
+        """Give back a claimed trial the send didn't decide (no capacity, or throttled)"""
+        with self._lock:
+            health = self.health[name]
+            if health.on_trial:
+                health.on_trial = False
+                health.ejected_until = time.monotonic()
+
+    def _record(self, name, ok, latency):
+        """Update a provider's statistics and eject or re-admit it"""
+        with self._lock:
+            health = self.health[name]
+            health.record(ok, latency)
+            if health.ejected_until is not None:
+                # Only the trial decides; sends already in flight when it was ejected don't
+                if not health.on_trial:
+                    return
+                health.on_trial = False
+                if ok:
+                    health.ejected_until = None
+                    health.consecutive_failures = 0
+                    health.error_rate = 0.0
+                    event = f"✅ SMS provider {name} is healthy again, re-admitted"
+                else:
+                    health.backoff = min(health.backoff * 2, EJECT_BACKOFF_MAX)
+                    health.ejected_until = time.monotonic() + health.backoff
+                    event = f"⚠️  SMS provider {name} failed its trial, ejected for {health.backoff:.0f}s"
+            elif not ok and health.should_eject():
+                health.backoff = EJECT_BACKOFF
+                health.ejected_until = time.monotonic() + health.backoff
+                event = (f"⚠️  SMS provider {name} ejected for {health.backoff:.0f}s "
+                         f"({health.consecutive_failures} consecutive failures, error rate {health.error_rate:.0%})")
+            else:
+                return
+        print(event)
+
+    def _pick(self, candidates, sender, lane):
+        """
+        The first candidate that can send right away, else the one whose
+        buckets free up soonest (ties keep the routing order).
+
+        Returns:
+            tuple: (provider name, sender ID)
+        """
+        best = None
+        for name in candidates:
+            sender_id = sender or self.providers[name].sender
+            wait = self.limiter.wait_time(name, sender_id, lane)
+            if wait <= 0:
+                return name, sender_id
+            if best is None or wait < best[0]:
+                best = (wait, name, sender_id)
+        return best[1], best[2]
+
+    def send(self, phone_number, message, sender=None, lane=LANE_NORMAL):
+        """
+        Send one SMS, pacing it and failing over across providers.
+
+        Args:
+            sender (str): Sender ID to use instead of each provider's configured one
+            lane (str): Priority lane (lanes.LANES)
+
+        Returns:
+            SendResult: The delivering provider's result, or the last failure
+        """
+        started_at = time.monotonic()
+        result = self._send(phone_number, message, sender, lane, started_at)
+        self.lanes.record(lane, result.ok, result.queue_wait, time.monotonic() - started_at)
+        return result
+
+    def _send(self, phone_number, message, sender, lane, started_at):
+        deadline = started_at + self.queue_timeout
+        strategy = ROUTING_HEALTHIEST if lane == LANE_URGENT else self.strategy
+        failed_over = set()
+        queue_wait = 0.0
+        result = None
+        while True:
+            candidates, trial = self._candidates(strategy)
+            candidates = [name for name in candidates if name not in failed_over]
+            if not candidates:
+                break
+            name, sender_id = self._pick(candidates, sender, lane)
+            on_trial = name == trial
+            if on_trial and not self._claim_trial(name):
+                # Another send took the trial meanwhile: pick again without it
+                continue
+            waiting = time.monotonic()
+            acquired = self.limiter.acquire(name, sender_id, timeout=deadline - waiting, lane=lane)
+            queue_wait += time.monotonic() - waiting
+            if not acquired:
+                if on_trial:
+                    self._release_trial(name)
+                result = SendResult(False, name, error=f"No SMS capacity within {self.queue_timeout:.0f}s",
+                                    retryable=True, throttled=True)
+                result.queue_wait = queue_wait
+                return result
+
+            started = time.perf_counter()
+            try:
+                result = self.providers[name].send(phone_number, message, sender=sender)
+            except Exception as e:
+                result = SendResult(False, name, error=f"Provider error: {e}", retryable=True)
+            result.latency = time.perf_counter() - started
+            self.limiter.feedback(name, sender_id, result)
+
+            if result.throttled:
+                # Going too fast is not a failure: requeue behind the (now slower) bucket
+                if on_trial:
+                    self._release_trial(name)
+                continue
+
+            # A rejected number is the message's fault: the provider itself answered fine
+            self._record(name, result.ok or not result.retryable, result.latency)
+            if result.ok or not result.retryable:
+                break
+            print(f"❌ SMS via {name} failed ({result.error}), trying the next provider")
+            failed_over.add(name)
+        result = result or SendResult(False, None, error="No SMS provider available", retryable=True)
+        result.queue_wait = queue_wait
+        return result
+
+    def snapshot(self):
+        """
+        Routing statistics per provider (for /api/sms/providers).
+
+        Returns:
+            list: One dict per provider
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    'provider': name,
+                    'weight': provider.weight,
+                    'cost': provider.cost,
+                    'available': health.ejected_until is None,
+                    'ejected_for_seconds': round(max(health.ejected_until - now, 0), 1) if health.ejected_until else None,
+                    'healthy': self._healthy(name),
+                    'latency_ms': round(health.latency * 1000, 1) if health.latency is not None else None,
+                    'error_rate': round(health.error_rate, 4),
+                    'sent': health.sent,
+                    'failed': health.failed,
+                    'rate_limit': self.limiter.snapshot(name),
+                }
+                for name, provider in self.providers.items()
+                for health in (self.health[name],)
+            ]
+
+    def lane_snapshot(self):
+        """
+        Traffic and latency per priority lane (for /api/sms/providers).
+
+        Returns:
+            list: One dict per lane
+        """
+        return self.lanes.snapshot(self.limiter.queued())
+
+
+def parse_weighted_list(value, default=1.0, lower=True):
+    """
+    Parse 'name:number,name,...' settings.
+
+    Returns:
+        list: (name, number) pairs in order
+    """
+    pairs = []
+    for item in value.split(','):
+        name, _, number = item.strip().partition(':')
+        if name.strip():
+            name = name.strip().lower() if lower else name.strip()
+            pairs.append((name, float(number) if number.strip() else default))
+    return pairs
+
+
+def create_router():
+    """
+    Build the router from SMS_PROVIDER, SMS_ROUTING, SMS_PROVIDER_COSTS,
+    SMS_SEND_TIMEOUT, SMS_SLOW_LATENCY and the pacing settings (SMS_RATE_LIMITS,
+    SMS_SENDER_RATE_LIMITS, SMS_RATE_PROCESSES, SMS_AIMD_INCREASE, SMS_AIMD_DECREASE,
+    SMS_RATE_MIN, SMS_QUEUE_TIMEOUT) and the lane settings (SMS_LANE_WEIGHTS, SMS_URGENT_RESERVE).
+    Called in an app context, it also starts sharing the provider accounts with
+    the other processes through the database every SMS_RATE_SYNC_INTERVAL seconds.
+
+    Returns:
+        SMSRouter
+    """
+    costs = dict(parse_weighted_list(os.getenv('SMS_PROVIDER_COSTS', '')))
+    timeout = float(os.getenv('SMS_SEND_TIMEOUT', DEFAULT_SEND_TIMEOUT))
+    providers = [
+        create_provider(name, weight=weight, cost=costs.get(name, 1.0), timeout=timeout)
+        for name, weight in parse_weighted_list(os.getenv('SMS_PROVIDER', 'celcom'))
+    ]
+    lane_weights = dict(parse_weighted_list(os.getenv('SMS_LANE_WEIGHTS', '')))
+    min_rate = float(os.getenv('SMS_RATE_MIN', DEFAULT_MIN_RATE))
+    limiter = RateLimiter(
+        provider_rates=dict(parse_weighted_list(os.getenv('SMS_RATE_LIMITS', ''))),
+        sender_rates=dict(parse_weighted_list(os.getenv('SMS_SENDER_RATE_LIMITS', ''), lower=False)),
+        increase=float(os.getenv('SMS_AIMD_INCREASE', DEFAULT_INCREASE)),
+        decrease=float(os.getenv('SMS_AIMD_DECREASE', DEFAULT_DECREASE)),
+        min_rate=min_rate,
+        lane_weights=lane_weights,
+        urgent_reserve=float(os.getenv('SMS_URGENT_RESERVE', DEFAULT_URGENT_RESERVE)),
+        processes=int(os.getenv('SMS_RATE_PROCESSES', 1))
+    )
+    router = SMSRouter(
+        providers,
+        strategy=os.getenv('SMS_ROUTING', ROUTING_WEIGHTED).lower(),
+        slow_latency=float(os.getenv('SMS_SLOW_LATENCY', DEFAULT_SLOW_LATENCY)),
+        limiter=limiter,
+        queue_timeout=float(os.getenv('SMS_QUEUE_TIMEOUT', DEFAULT_QUEUE_TIMEOUT))
+    )
+
+    from flask import has_app_context
+    from .rate_share import DEFAULT_SYNC_INTERVAL, RateShareSync
+    from .. import db
+
+    interval = float(os.getenv('SMS_RATE_SYNC_INTERVAL', DEFAULT_SYNC_INTERVAL))
+    if interval > 0 and has_app_context():
+        router.rate_share = RateShareSync(
+            limiter, db.engine, providers=[provider.name for provider in providers],
+            interval=interval, lane_weights=lane_weights, min_rate=min_rate
+        ).start()
+    return router
+
+
+# Created on first use (not at import time) so importing this module stays cheap
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_sms_router():
+    """
+    Return this process's SMS router, creating it on first use.
+
+    Returns:
+        SMSRouter
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = create_router()
+    return _router
@@ -1,114 +1,317 @@
 # sms_service.py
-import africastalking
-import requests
-import json
-from dotenv import load_dotenv
+"""
+SMS providers (aggregators) the Server can send through.
+
+Each provider sends one SMS and returns a SendResult instead of the raw API
+response, so the router (router.py) can tell a delivered message from a failure
+and decide whether another provider should be tried:
+
+- retryable failures (timeouts, connection errors, 5xx, low credit, routing
+  errors) are the provider's problem: the message fails over
+- permanent rejections (invalid or blacklisted number) are the message's
+  problem: another provider would reject it too
+- throttled sends (HTTP 429) were refused for going too fast: the message is
+  requeued and the provider's rate lowered (rate_limit.py)
+"""
 import os
+import abc
+import time
+import random
+import threading
+import itertools
+
+import requests
+
+AFRICASTALKING_SANDBOX_URL = "https://api.sandbox.africastalking.com/version1/messaging"
+
+# Per-recipient codes that reject the message itself, not the provider
+AT_SUCCESS_CODES = {100, 101, 102}                  # Processed, Sent, Queued
+AT_PERMANENT_CODES = {403, 404, 406, 409}           # InvalidPhoneNumber, UnsupportedNumberType, UserInBlacklist, DoNotDisturb
+CELCOM_SUCCESS_CODES = {200}
+CELCOM_PERMANENT_CODES = {1003}                     # Invalid mobile number
 
-load_dotenv()
+DEFAULT_SEND_TIMEOUT = 10.0
 
+HTTP_TOO_MANY_REQUESTS = 429
 
 
-CELCO_URL = os.getenv("CELCO_URL")
-CELCO_API_KEY = os.getenv("CELCO_API_KEY")
-CELCO_PARTNER_ID = os.getenv("CELCO_PARTNER_ID")
-CELCO_SHORTCODE = os.getenv("CELCO_SHORTCODE")
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds form), None if absent or unparseable"""
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
+
+
+def get_celcom_config():
+    """
+    Read the Celcom settings from the environment.
+    Read at send time (not import time) so .env loaded by create_app() is picked up.
+    """
+    return {
+        'url': os.getenv("CELCO_URL"),
+        'api_key': os.getenv("CELCO_API_KEY"),
+        'partner_id': os.getenv("CELCO_PARTNER_ID"),
+        'shortcode': os.getenv("CELCO_SHORTCODE"),
+    }
+
+
+def get_africastalking_config():
+    """Read the Africa's Talking settings from the environment"""
+    return {
+        'url': os.getenv("AFRICASTALKING_URL", AFRICASTALKING_SANDBOX_URL),
+        'username': os.getenv("AFRICASTALKING_USERNAME", "sandbox"),
+        'api_key': os.getenv("AFRICASTALKING_API_KEY"),
+        'sender': os.getenv("AFRICASTALKING_SENDER_ID"),
+    }
 
 
-class SMSService:
-    def __init__(self, username, api_key):
-        print(f"🔧 Initializing SMS Service (HTTP API):")
-        print(f"   Username: '{username}'")
-        print(f"   API Key: '{api_key[:8]}...{api_key[-4:]}' (masked)" if api_key else "   API Key: None")
-        
-        self.username = username
-        self.api_key = api_key
-        self.base_url = "https://api.sandbox.africastalking.com/version1/messaging"
-        print(f"   Using endpoint: {self.base_url}")
+class SendResult:
+    """Outcome of one send attempt through one provider"""
+    __slots__ = ('ok', 'provider', 'message_id', 'error', 'retryable', 'latency', 'status',
+                 'throttled', 'retry_after', 'queue_wait')
 
-    def send_sms(self, phone_number, message, sender=None):
+    def __init__(self, ok, provider, message_id=None, error=None, retryable=False, latency=0.0, status=None,
+                 throttled=False, retry_after=None):
+        self.ok = ok
+        self.provider = provider
+        self.message_id = message_id
+        self.error = error
+        self.retryable = retryable
+        self.latency = latency
+        self.status = status            # HTTP status of the provider's reply, if there was one
+        self.throttled = throttled      # refused for exceeding the rate limit (HTTP 429)
+        self.retry_after = retry_after  # seconds the provider asked us to wait
+        self.queue_wait = 0.0           # seconds the message waited for provider capacity (set by the router)
+
+    @property
+    def overloaded(self):
+        """The provider answered with a server error: back off as well as fail over"""
+        return self.status is not None and self.status >= 500
+
+    def __repr__(self):
+        state = 'ok' if self.ok else ('throttled' if self.throttled else 'retryable' if self.retryable else 'rejected')
+        return f'<SendResult {self.provider} {state} {self.message_id or self.error}>'
+
+
+class SMSProvider(abc.ABC):
+    """
+    Base class: one aggregator account.
+
+    Args:
+        name (str): Provider name in SMS_PROVIDER and in the routing stats
+        weight (float): Share of traffic under weighted routing
+        cost (float): Price of one SMS, for cheapest-first routing
+        timeout (float): Seconds before a send is abandoned and failed over
+    """
+
+    def __init__(self, name, weight=1.0, cost=1.0, timeout=DEFAULT_SEND_TIMEOUT):
+        self.name = name
+        self.weight = weight
+        self.cost = cost
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        # Keep-alive connection per thread
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _post(self, url, **kwargs):
         """
-        Send single SMS using Africa's Talking HTTP API directly
+        POST to the provider API.
+
+        Returns:
+            tuple: (response JSON or None, SendResult on failure or None)
         """
         try:
-            print(f"📤 SMS HTTP API Debug:")
-            print(f"   Phone: '{phone_number}' (type: {type(phone_number)})")
-            print(f"   Message: '{message}' (length: {len(message)})")
-            print(f"   Sender: '{sender}'")
-            
-           
-            # Prepare headers
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'apiKey': self.api_key
-            }
-            
-            # Prepare data for form submission
-            data = {
-                'username': self.username,
-                'to': phone_number,  # Single recipient
-                'message': message,
-                'bulkSMSMode': 1,  # Default bulk SMS mode
-                'enqueue': 1       # Enable queue
-            }
-            
-            # Add sender if provided
-            if sender:
-                data['from'] = sender
-            
-            print(f"   Headers: {headers}")
-            print(f"   Data: {data}")
-            print(f"   URL: {self.base_url}")
-            
-            # Make the HTTP POST request
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                data=data,  # Use data parameter for form encoding
-                timeout=30
-            )
-            
-            print(f"   HTTP Status: {response.status_code}")
-            print(f"   Response Headers: {dict(response.headers)}")
-            print(f"   Raw Response: {response.text}")
-            
-            # Handle response
-            if response.status_code == 200 or response.status_code == 201:
-                try:
-                    json_response = response.json()
-                    print(f"   Parsed Response: {json_response}")
-                    return json_response
-                except json.JSONDecodeError:
-                    print(f"   Failed to parse JSON response")
-                    return {"error": f"Invalid JSON response: {response.text}"}
-            else:
-                print(f"   HTTP Error: {response.status_code}")
-                return {"error": f"HTTP {response.status_code}: {response.text}"}
-                
+            response = self._session().post(url, timeout=self.timeout, **kwargs)
         except requests.exceptions.RequestException as e:
-            print(f"❌ HTTP Request Exception: {str(e)}")
-            return {"error": f"Request failed: {str(e)}"}
-        except Exception as e:
-            print(f"❌ SMS Service Exception: {str(e)}")
-            return {"error": f"SMS service error: {str(e)}"}
-
-
-def send_sms_celcom(mobile, message):
-    """Send SMS using Celcom Africa API"""
-    payload = {
-        "partnerID": CELCO_PARTNER_ID,
-        "apikey": CELCO_API_KEY,
-        "mobile": mobile,
-        "message": message,
-        "shortcode": CELCO_SHORTCODE,
-        "pass_type": "plain"
-    }
+            return None, self.failed(f"Request failed: {e}")
+        if response.status_code == HTTP_TOO_MANY_REQUESTS:
+            return None, SendResult(False, self.name, error="HTTP 429: throttled", retryable=True,
+                                    status=response.status_code, throttled=True,
+                                    retry_after=parse_retry_after(response.headers.get('Retry-After')))
+        if response.status_code >= 300:
+            return None, SendResult(False, self.name, error=f"HTTP {response.status_code}: {response.text[:200]}",
+                                    retryable=True, status=response.status_code)
+        try:
+            return response.json(), None
+        except ValueError:
+            return None, self.failed(f"Invalid JSON response: {response.text[:200]}")
 
-    headers = {"Content-Type": "application/json"}
+    def failed(self, error, retryable=True):
+        return SendResult(False, self.name, error=error, retryable=retryable)
 
-    try:
-        res = requests.post(CELCO_URL, json=payload, headers=headers)
-        return res.json()
-    except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+    @property
+    def sender(self):
+        """Sender ID (shortcode or alphanumeric) messages go out under by default"""
+        return None
+
+    @abc.abstractmethod
+    def send(self, phone_number, message, sender=None):
+        """
+        Send one SMS.
+
+        Args:
+            sender (str): Sender ID to use instead of the configured one
+
+        Returns:
+            SendResult
+        """
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.name}>'
+
+
+class CelcomProvider(SMSProvider):
+    """Celcom Africa bulk SMS API"""
+
+    @property
+    def sender(self):
+        return get_celcom_config()['shortcode']
+
+    def send(self, phone_number, message, sender=None):
+        config = get_celcom_config()
+        if not config['url']:
+            return self.failed("CELCO_URL is not set")
+        payload = {
+            "partnerID": config['partner_id'],
+            "apikey": config['api_key'],
+            "mobile": phone_number,
+            "message": message,
+            "shortcode": sender or config['shortcode'],
+            "pass_type": "plain"
+        }
+        body, failure = self._post(config['url'], json=payload)
+        if failure:
+            return failure
+
+        # {"responses": [{"respose-code": 200, "response-description": "Success", "messageid": ...}]}
+        responses = body.get('responses') if isinstance(body, dict) else None
+        if not responses:
+            return self.failed(f"Unexpected response: {body}")
+        entry = responses[0]
+        code = entry.get('response-code', entry.get('respose-code'))
+        try:
+            code = int(code)
+        except (TypeError, ValueError):
+            return self.failed(f"Unexpected response: {body}")
+        if code in CELCOM_SUCCESS_CODES:
+            return SendResult(True, self.name, message_id=str(entry.get('messageid') or ''))
+        return self.failed(f"{code}: {entry.get('response-description')}", retryable=code not in CELCOM_PERMANENT_CODES)
+
+
+class AfricasTalkingProvider(SMSProvider):
+    """Africa's Talking messaging API"""
+
+    @property
+    def sender(self):
+        return get_africastalking_config()['sender']
+
+    def send(self, phone_number, message, sender=None):
+        config = get_africastalking_config()
+        if not config['api_key']:
+            return self.failed("AFRICASTALKING_API_KEY is not set")
+        data = {
+            'username': config['username'],
+            'to': phone_number,
+            'message': message,
+            'bulkSMSMode': 1,
+            'enqueue': 1
+        }
+        if sender or config['sender']:
+            data['from'] = sender or config['sender']
+        headers = {'Accept': 'application/json', 'apiKey': config['api_key']}
+        body, failure = self._post(config['url'], data=data, headers=headers)
+        if failure:
+            return failure
+
+        # {"SMSMessageData": {"Message": ..., "Recipients": [{"statusCode": 101, "status": "Success", "messageId": ...}]}}
+        recipients = (body.get('SMSMessageData') or {}).get('Recipients') if isinstance(body, dict) else None
+        if not recipients:
+            message_data = (body.get('SMSMessageData') or {}).get('Message') if isinstance(body, dict) else body
+            return self.failed(f"No recipients accepted: {message_data}")
+        recipient = recipients[0]
+        code = recipient.get('statusCode')
+        if code in AT_SUCCESS_CODES:
+            return SendResult(True, self.name, message_id=recipient.get('messageId'))
+        return self.failed(f"{code}: {recipient.get('status')}", retryable=code not in AT_PERMANENT_CODES)
+
+
+class StubProvider(SMSProvider):
+    """
+    Local stand-in for an aggregator: sends nothing, answers after `latency`
+    seconds, fails a `failure_rate` share of sends and throttles (like HTTP 429)
+    sends above `rate_limit` per second. For development (SMS_PROVIDER=stub)
+    and for exercising routing, failover and pacing.
+    The settings can be changed while it is in use.
+    """
+
+    def __init__(self, name, latency=0.0, failure_rate=0.0, rate_limit=None, jitter=0.2, seed=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rate_limit = rate_limit
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._allowance = 0.0
+        self._checked = time.monotonic()
+
+    def _over_limit(self):
+        # The provider's side of rate limiting: a bucket holding one second of sends
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate_limit, self._allowance + (now - self._checked) * self.rate_limit)
+            self._checked = now
+            if self._allowance < 1:
+                return True
+            self._allowance -= 1
+            return False
+
+    def send(self, phone_number, message, sender=None):
+        if self._over_limit():
+            return SendResult(False, self.name, error="HTTP 429: throttled", retryable=True,
+                              status=HTTP_TOO_MANY_REQUESTS, throttled=True)
+        delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+        if delay > self.timeout:
+            time.sleep(self.timeout)
+            return self.failed(f"Request failed: timed out after {self.timeout:.1f}s")
+        if delay > 0:
+            time.sleep(delay)
+        if self._random.random() < self.failure_rate:
+            return SendResult(False, self.name, error="HTTP 503: injected fault", retryable=True, status=503)
+        return SendResult(True, self.name, message_id=f"{self.name}-{next(self._ids)}")
+
+
+PROVIDER_CLASSES = {
+    'celcom': CelcomProvider,
+    'africastalking': AfricasTalkingProvider,
+    'at': AfricasTalkingProvider,
+}
+
+
+def create_provider(name, weight=1.0, cost=1.0, timeout=DEFAULT_SEND_TIMEOUT):
+    """
+    Build a provider by name ('celcom', 'africastalking'/'at', or 'stub' / 'stub-...').
+
+    Raises:
+        ValueError: Unknown provider name
+    """
+    if name == 'stub' or name.startswith('stub-'):
+        return StubProvider(
+            name,
+            latency=float(os.getenv('SMS_STUB_LATENCY', 0)),
+            failure_rate=float(os.getenv('SMS_STUB_FAILURE_RATE', 0)),
+            rate_limit=float(os.getenv('SMS_STUB_RATE_LIMIT', 0)) or None,
+            weight=weight, cost=cost, timeout=timeout
+        )
+    if name not in PROVIDER_CLASSES:
+        raise ValueError(f"Unknown SMS provider '{name}' (expected one of: {', '.join(PROVIDER_CLASSES)}, stub)")
+    return PROVIDER_CLASSES[name](name, weight=weight, cost=cost, timeout=timeout)
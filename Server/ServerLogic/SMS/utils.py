@@ -1,21 +1,8 @@
-import requests
 import os
-from dotenv import load_dotenv
-from .sms_service import SMSService
-from .sms_service import send_sms_celcom
-import os
-
-# Load environment variables
-load_dotenv()
-
-
-
-# Initialize once
-sms_client = SMSService(
-    username=os.getenv("AFRICASTALKING_USERNAME", "sandbox"),
-    api_key=os.getenv("AFRICASTALKING_API_KEY")
-)
-
+from .lanes import LANE_NORMAL, lane_for
+from .router import get_sms_router
+from .digest import get_digester
+from .render import encoding_of, normalize, segment_count
 
 
 def process_complete_advisory(message_id, phone_number):
@@ -48,21 +35,8 @@ def process_complete_advisory(message_id, phone_number):
         farmer_id = farmer_result
         print(f"✅ Found farmer ID: {farmer_id}")
         
-        # Step 0B: Get secret key from database using phone number
-        from ..USSD.utils import get_secret_key_by_phone
-        
-        secret_key = get_secret_key_by_phone(phone_number)
-        if not secret_key:
-            return {
-                'success': False,
-                'error': f'No secret key found for phone number: {phone_number}',
-                'step': 'SECRET_KEY_LOOKUP'
-            }
-        
-        print(f"✅ Found farmer with secret key")
-        
-        # Step 0C: Get advisory title from database
-        advisory_success, advisory_result = get_advisory_title(message_id)
+        # Step 0B: Get the advisory (title and VC scheme) from database
+        advisory_success, advisory_result = get_advisory(message_id)
         if not advisory_success:
             return {
                 'success': False,
@@ -70,36 +44,94 @@ def process_complete_advisory(message_id, phone_number):
                 'step': 'ADVISORY_LOOKUP'
             }
         
-        title = advisory_result
+        title = advisory_result.title
         print(f"✅ Found advisory title: {title}")
         
-
-        # Step 1: Send to SMC
-        smc_response = send_to_smc(message_id, secret_key)
-        if smc_response is None:
+        # Step 0C: Pick the VC scheme (advisory override, else deployment default)
+        from ..vc_index import (
+            vc_index_enabled, record_issued_vc, get_vc_scheme, VCCollision, VC_SCHEME_FF3, VC_SCHEME_HMAC
+        )
+        vc_scheme = get_vc_scheme(advisory_result.vc_scheme)
+        if vc_scheme == VC_SCHEME_HMAC and not vc_index_enabled():
+            # HMAC VCs can only be verified through the index
             return {
                 'success': False,
-                'error': 'Failed to communicate with SMC service',
-                'step': 'SMC_PROCESSING'
+                'error': 'Advisory uses HMAC verification codes, which require VC_VERIFICATION_MODE=index',
+                'step': 'VC_SCHEME'
             }
         
-        # Extract verification code from SMC response
-        verification_code = smc_response.get('vc')
-        if not verification_code:
+        # Step 1: Reuse the VC stored on an earlier delivery record (resends cost no SMC call).
+        # FF3 is deterministic per (farmer key, message ID), so the stored VC is the one the SMC would return.
+        verification_code = get_stored_vc(farmer_id, message_id)
+        vc_source = 'stored'
+        
+        if verification_code:
+            print(f"♻️  Reusing stored VC for farmer {farmer_id}, advisory {message_id}: {verification_code}")
+        else:
+            vc_source = 'smc'
+            vc_success, vc_result = issue_vc(message_id, phone_number, farmer_id, vc_scheme)
+            if not vc_success:
+                return vc_result
+            verification_code = vc_result
+        
+        # Step 1C: Record the VC in the reverse index so verification can skip the SMC
+        if vc_index_enabled():
+            try:
+                recorded = record_issued_vc(farmer_id, message_id, verification_code)
+            except VCCollision as collision:
+                # Truncated HMACs collide now and then, with each other or with an FF3 VC: this
+                # farmer gets a VC of the other scheme for the advisory instead (the index resolves
+                # either). It is stored on the delivery record, so resends reuse it.
+                fallback = VC_SCHEME_FF3 if vc_scheme == VC_SCHEME_HMAC else VC_SCHEME_HMAC
+                print(f"⚠️  {collision}, issuing an {fallback.upper()} VC instead")
+                vc_scheme, vc_source = fallback, 'smc'
+                vc_success, vc_result = issue_vc(message_id, phone_number, farmer_id, vc_scheme)
+                if not vc_success:
+                    return vc_result
+                verification_code = vc_result
+                try:
+                    recorded = record_issued_vc(farmer_id, message_id, verification_code)
+                except VCCollision as collision:
+                    return {
+                        'success': False,
+                        'error': str(collision),
+                        'step': 'VC_COLLISION'
+                    }
+            
+            if recorded:
+                print(f"✅ VC recorded in issued-VC index")
+            elif vc_scheme == VC_SCHEME_HMAC:
+                # An HMAC VC missing from the index could never be verified - don't send it
+                return {
+                    'success': False,
+                    'error': 'Failed to record HMAC verification code in the issued-VC index',
+                    'step': 'VC_INDEX'
+                }
+            else:
+                # Not fatal: verification falls back to SMC decryption for this VC
+                print(f"⚠️  Could not record VC in index, verification will use the SMC")
+        
+        # Step 2 (digest mode): queue the advisory for the farmer's next digest SMS instead
+        lane = lane_for(advisory_result.priority)
+        if get_digester().add(phone_number, farmer_id, message_id, title, verification_code, lane=lane):
+            print(f"🗂️  Advisory {message_id} queued for {phone_number}'s digest")
             return {
-                'success': False,
-                'error': 'No verification code received from SMC',
-                'step': 'SMC_PROCESSING'
+                'success': True,
+                'message': 'Advisory queued for the farmer\'s digest SMS',
+                'verification_code': verification_code,
+                'vc_source': vc_source,
+                'vc_scheme': vc_scheme,
+                'farmer_id': farmer_id,
+                'phone_number': phone_number,
+                'sms_status': 'queued'
             }
         
-        print(f"SMC processing successful. VC: {verification_code}")
-        
         # Step 2: Craft SMS message
         sms_message = craft_sms(title, verification_code)
         print(f"SMS crafted for {phone_number}: {sms_message}")
         
-        # Step 3: Send SMS to farmer
-        sms_result = send_sms_to_farmer(phone_number, sms_message)
+        # Step 3: Send SMS to farmer, in the advisory's priority lane
+        sms_result = send_sms_to_farmer(phone_number, sms_message, lane=lane)
         if not sms_result['success']:
             return {
                 'success': False,
@@ -107,11 +139,16 @@ def process_complete_advisory(message_id, phone_number):
                 'step': 'SMS_SENDING'
             }
         
+        # Step 4: Record the delivery together with its VC
+        record_delivery(farmer_id, message_id, verification_code)
+        
         # Success - return complete result
         return {
             'success': True,
             'message': 'Advisory processed and SMS sent successfully',
             'verification_code': verification_code,
+            'vc_source': vc_source,
+            'vc_scheme': vc_scheme,
             'farmer_id': farmer_id,
             'phone_number': phone_number,
             'sms_content': sms_message,
@@ -126,56 +163,75 @@ def process_complete_advisory(message_id, phone_number):
         }
     
 
-def send_to_smc(message_id, secret_key):
+def issue_vc(message_id, phone_number, farmer_id, scheme):
     """
-    Send message ID and secret key to SMC service via POST request.
+    Get a new VC for a farmer and advisory from the SMC.
     
     Args:
-        message_id (str): The message/advisory ID to send
-        secret_key (str): The secret key for authentication
+        message_id (str): Advisory message ID
+        phone_number (str): Farmer's phone number (to look up their secret key)
+        farmer_id (int): Farmer ID
+        scheme (str): VC scheme ('ff3' or 'hmac')
         
     Returns:
-        dict: Response from SMC API containing verification code (vc)
-        None: If request fails
+        tuple: (success, vc_or_error)
+            - If success: (True, verification_code)
+            - If failure: (False, error response for process_complete_advisory)
     """
-    try:
-        # SMC endpoint URL - replace with actual URL later
-        smc_url = "http://localhost:5001/get-vc" # Dummy URL
-        
-        # Prepare payload - ensure secret_key is converted to string for JSON
-        if isinstance(secret_key, bytes):
-            secret_key_str = secret_key.decode('utf-8')
-        else:
-            secret_key_str = str(secret_key)
-            
-        payload = {
-            "message_id": message_id,
-            "secret_key": secret_key_str
+    # Step 1A: Get secret key from database using phone number (only needed for the SMC)
+    from ..USSD.utils import get_secret_key_by_phone
+    
+    secret_key = get_secret_key_by_phone(phone_number)
+    if not secret_key:
+        return False, {
+            'success': False,
+            'error': f'No secret key found for phone number: {phone_number}',
+            'step': 'SECRET_KEY_LOOKUP'
         }
-        
-        # Headers for the request
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {os.getenv('SMC_API_KEY')}"
+    
+    print(f"✅ Found farmer with secret key")
+    
+    # Step 1B: Send to SMC
+    smc_response = send_to_smc(message_id, secret_key, scheme, farmer_id=farmer_id)
+    if smc_response is None:
+        return False, {
+            'success': False,
+            'error': 'Failed to communicate with SMC service',
+            'step': 'SMC_PROCESSING'
         }
+    
+    # Extract verification code from SMC response
+    verification_code = smc_response.get('vc')
+    if not verification_code:
+        return False, {
+            'success': False,
+            'error': 'No verification code received from SMC',
+            'step': 'SMC_PROCESSING'
+        }
+    
+    print(f"SMC processing successful. VC: {verification_code}")
+    return True, verification_code
+
+
+def send_to_smc(message_id, secret_key, scheme=None, farmer_id=None):
+    """
+    Ask the SMC for the verification code of a message ID.
+    Uses the configured SMC transport and nodes (see ServerLogic/smc_client.py).
+    
+    Args:
+        message_id (str): The message/advisory ID to send
+        secret_key (bytes): The farmer's raw master key (see get_secret_key_by_phone)
+        scheme (str): VC scheme ('ff3' or 'hmac'); None lets the SMC use 'ff3'
+        farmer_id (int): Routes the farmer to the same SMC node every time
         
-        # Send POST request to SMC
-        response = requests.post(
-            smc_url, 
-            json=payload, 
-            headers=headers,
-            timeout=30  # 30 second timeout
-        )
-        
-        # Check if request was successful
-        response.raise_for_status()
-        
-        # Return the JSON response (should contain {"vc": vc})
-        return response.json()
+    Returns:
+        dict: Response from SMC containing verification code (vc)
+        None: If request fails
+    """
+    try:
+        from ..smc_client import get_smc_client
+        return get_smc_client().get_vc(message_id, secret_key, scheme, farmer_id=farmer_id)
         
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending to SMC: {e}")
-        return None
     except Exception as e:
         print(f"Unexpected error: {e}")
         return None
@@ -184,6 +240,8 @@ def send_to_smc(message_id, secret_key):
 def craft_sms(title, vc):
     """
     Craft an SMS message with title, verification code, and USSD code.
+    The title is normalised to GSM-7 where safe (see render.py), so a stray
+    curly quote doesn't send every copy of the SMS as UCS-2.
     
     Args:
         title (str): The advisory title/subject
@@ -197,7 +255,7 @@ def craft_sms(title, vc):
     
     # Format: Title, VC, then USSD code with VC
     sms_message = (
-    f"{title},\n"
+    f"{normalize(title)},\n"
     f"This is your verification code: {vc}\n"
     f"Dial {ussd_code}{vc}# to verify."
 )
@@ -205,47 +263,62 @@ def craft_sms(title, vc):
     return sms_message
 
 
-def send_sms_to_farmer(phone_number, sms_message):
+def craft_digest_sms(items):
+    """
+    Craft one SMS listing several advisories, each title with its verification code.
+    
+    Args:
+        items (list): Queued advisories (SMS/digest.py DigestItem: title, vc)
+        
+    Returns:
+        str: Formatted SMS message ready to send
+    """
+    if len(items) == 1:
+        return craft_sms(items[0].title, items[0].vc)
+    
+    ussd_code = os.getenv('USSD_CODE', 'DEFAULT_USSD')
+    
+    # Format: one line per advisory (title: VC), then how to verify any of them
+    lines = [f"{len(items)} new advisories:"]
+    lines += [f"{normalize(item.title)}: {item.vc}" for item in items]
+    lines.append(f"Dial {ussd_code}<code># to verify.")
+    return "\n".join(lines)
+
+
+def send_sms_to_farmer(phone_number, sms_message, lane=LANE_NORMAL):
     """
-    Send SMS to farmer using Africa's Talking API.
-    Currently a dummy function - will be replaced with actual API integration.
+    Send SMS to farmer through the configured SMS providers.
+    The router picks the healthiest (or cheapest) provider and fails over to the
+    others if it fails (see SMS/router.py).
     
     Args:
         phone_number (str): Farmer's phone number
         sms_message (str): SMS message to send
+        lane (str): Priority lane ('urgent', 'normal' or 'bulk', see SMS/lanes.py)
         
     Returns:
-        dict: Success/failure response
+        dict: Success/failure response, with the provider that sent it
     """
     try:
-        # Dummy implementation - replace with Africa's Talking API
-        print(f"📱 Sending the following SMS to farmer:")
-        print(f"   📞 Phone: {phone_number}")
-        print(f"   💬 Message: {sms_message}")
-        print(f"   ✅ SMS sent successfully (dummy)")
-
-        # # ADD THESE DEBUG PRINTS
-        # print("🔍 Checking Africa's Talking Credentials:")
-        # print(f"   Username: '{os.getenv('AFRICASTALKING_USERNAME', 'sandbox')}'")
-        # print(f"   API Key: '{os.getenv('AFRICASTALKING_API_KEY')}'")
-        # print(f"   API Key length: {len(os.getenv('AFRICASTALKING_API_KEY', '')) if os.getenv('AFRICASTALKING_API_KEY') else 0}")
-
+        print(f"📱 Sending SMS to farmer {phone_number} ({len(sms_message)} characters, "
+              f"{encoding_of(sms_message)}, {segment_count(sms_message)} segment(s))")
+        result = get_sms_router().send(phone_number, sms_message, lane=lane)
         
-        # print(f"📨 Sending SMS to {phone_number}...")
-
-        # response = sms_client.send_sms(
-        #     phone_number,
-        #     sms_message,
-        #     sender="12594"
-        # )
-
-
-        result = send_sms_celcom(phone_number, sms_message)
-        print("✅ SMS sent:", result)
+        if not result.ok:
+            print(f"❌ SMS not sent: {result.error}")
+            return {
+                'success': False,
+                'error': f'Failed to send SMS: {result.error}',
+                'provider': result.provider,
+                'phone_number': phone_number
+            }
         
+        print(f"✅ SMS sent via {result.provider} ({result.latency * 1000:.0f} ms, {lane} lane)")
         return {
             'success': True,
             'message': 'SMS sent successfully',
+            'provider': result.provider,
+            'provider_message_id': result.message_id,
             'phone_number': phone_number,
             'sms_content': sms_message
         }
@@ -258,23 +331,23 @@ def send_sms_to_farmer(phone_number, sms_message):
             'phone_number': phone_number
         }
 
-def get_advisory_title(message_id):
+def get_advisory(message_id):
     """
-    Get advisory title from database using message ID.
+    Get the advisory (title and VC scheme) from database using message ID.
     
     Args:
         message_id (str): Advisory message ID
         
     Returns:
-        tuple: (success, title_or_error)
-            - If success: (True, "Advisory Title")
+        tuple: (success, advisory_or_error)
+            - If success: (True, row with id, title, message, vc_scheme)
             - If failure: (False, "Error message")
     """
     try:
-        from ..models import Advisory
+        from ..queries import advisory_by_id
         from flask import current_app
         
-        print(f"🔍 Looking up advisory title for message ID: {message_id}")
+        print(f"🔍 Looking up advisory for message ID: {message_id}")
         
         with current_app.app_context():
             # Try to convert message_id to integer
@@ -283,20 +356,91 @@ def get_advisory_title(message_id):
             except ValueError:
                 return False, f"Invalid message_id format: {message_id} (must be integer)"
             
-            # Query the database for advisory
-            advisory = Advisory.query.get(advisory_id)
+            # Query the database for advisory (cached statement, one round trip)
+            advisory = advisory_by_id(advisory_id)
             
             if not advisory:
                 return False, f"No advisory found with ID: {message_id}"
             
             print(f"✅ Found advisory: {advisory.title}")
-            return True, advisory.title
+            return True, advisory
                 
     except Exception as e:
-        print(f"❌ Error getting advisory title: {str(e)}")
+        print(f"❌ Error getting advisory: {str(e)}")
         return False, f"Database error while getting advisory: {str(e)}"
 
 
+def get_stored_vc(farmer_id, message_id):
+    """
+    Get the VC already issued to a farmer for an advisory, from its delivery records.
+    Resends, reminders and reconciliation jobs use this instead of calling the SMC.
+    
+    Args:
+        farmer_id (int): Farmer ID
+        message_id (str): Advisory message ID
+        
+    Returns:
+        str: The stored verification code, or None if none has been stored yet
+    """
+    try:
+        from ..queries import stored_vc
+        
+        return stored_vc(farmer_id, int(message_id))
+        
+    except Exception as e:
+        print(f"❌ Error getting stored VC: {str(e)}")
+        return None
+
+
+def record_delivery(farmer_id, message_id, verification_code):
+    """
+    Record that an advisory was sent to a farmer, storing the VC on the delivery record.
+    A planned record (VC pre-generated offline, sent_at still empty) is stamped
+    instead of adding a second record.
+    
+    Args:
+        farmer_id (int): Farmer ID
+        message_id (str): Advisory message ID
+        verification_code (str): VC included in the SMS
+        
+    Returns:
+        FarmingAdvisory: The delivery record, or None on error
+    """
+    try:
+        from ..models import FarmingAdvisory
+        from ..stats import record_sent
+        from .. import db
+        from datetime import datetime
+        
+        delivery = (
+            FarmingAdvisory.query
+            .filter_by(farmer_id=farmer_id, advisory_id=int(message_id), sent_at=None)
+            .order_by(FarmingAdvisory.id)
+            .first()
+        )
+        if delivery:
+            delivery.sent_at = datetime.utcnow()
+            delivery.verification_code = verification_code
+        else:
+            delivery = FarmingAdvisory(
+                farmer_id=farmer_id,
+                advisory_id=int(message_id),
+                verification_code=verification_code
+            )
+            db.session.add(delivery)
+        db.session.commit()
+        
+        record_sent(delivery.advisory_id, delivery.sent_at)
+        print(f"✅ Delivery recorded: {delivery}")
+        return delivery
+        
+    except Exception as e:
+        from .. import db
+        db.session.rollback()
+        print(f"❌ Error recording delivery: {str(e)}")
+        return None
+
+
 def get_farmer_id(phone_number):
     """
     Get farmer ID from database using phone number.
@@ -310,14 +454,14 @@ def get_farmer_id(phone_number):
             - If failure: (False, "Error message")
     """
     try:
-        from ..models import Farmer
+        from ..queries import farmer_by_phone
         from flask import current_app
         
         print(f"🔍 Looking up farmer ID for phone: {phone_number}")
         
         with current_app.app_context():
             # Query the database for farmer
-            farmer = Farmer.query.filter_by(phone=phone_number).first()
+            farmer = farmer_by_phone(phone_number)
             
             if not farmer:
                 return False, f"No farmer found with phone number: {phone_number}"
@@ -1,14 +1,18 @@
-import requests
-import os
-from dotenv import load_dotenv
-from ..models import Farmer, Advisory, FarmingAdvisory
+from ..models import Advisory, FarmingAdvisory
 from ..SMS.utils import send_sms_to_farmer
+from ..SMS.render import render_advisory
+from ..vc_index import vc_index_enabled, lookup_issued_vc
+from ..keys import master_key
+from ..key_snapshot import get_key_snapshot
+from ..queries import farmer_by_phone, advisory_by_id
+from ..db_routing import read
+from ..smc_client import get_smc_client
+from ..stats import record_verified
 from flask import current_app
+from sqlalchemy import select, update
+from datetime import datetime
 from .. import db
 
-# Load environment variables
-load_dotenv()
-
 
 def verify_full_message(phone_number, service_code, text):
     """
@@ -23,17 +27,29 @@ def verify_full_message(phone_number, service_code, text):
     print(f"🔍 Extracted VC: {VC}")
     print(f"🔍 Phone Number in verify full message: {phone_number}")
     
-    #Step 2, Get the secret Key matching that Phone number from DB
-    secret_key = get_secret_key_by_phone(phone_number)
-    if not secret_key:
-        return {'success': False, 'error': 'Farmer not found'}
+    # Step 2 (index mode): Resolve the VC with a single indexed lookup, no crypto needed
+    message_id = None
+    if vc_index_enabled():
+        entry = lookup_issued_vc(phone_number, VC)
+        if entry:
+            message_id, farmer_id = entry
+            print(f"✅ VC found in issued-VC index -> message ID {message_id}")
+        else:
+            print(f"🔍 VC not in index, falling back to SMC decryption")
     
+    if message_id is None:
+        #Step 2, Get the farmer (and their secret key) matching that Phone number
+        farmer_key = get_farmer_key_by_phone(phone_number)
+        if not farmer_key:
+            return {'success': False, 'error': 'Farmer not found'}
+        farmer_id, secret_key = farmer_key
+        
 
-    #Step 3 Send VC and Secret Key to SMC to get the message ID 
-    response = send_vc_to_smc(secret_key, VC)
-    if response is None or 'message_id' not in response:
-        return {'success': False, 'error': 'Failed to verify VC with SMC'}
-    message_id = response['message_id']
+        #Step 3 Send VC and Secret Key to SMC to get the message ID 
+        response = send_vc_to_smc(secret_key, VC, farmer_id=farmer_id)
+        if response is None or 'message_id' not in response:
+            return {'success': False, 'error': 'Failed to verify VC with SMC'}
+        message_id = response['message_id']
 
 
     # Step 4: Use the messageID, to get the full Advisory SMS
@@ -41,18 +57,26 @@ def verify_full_message(phone_number, service_code, text):
     if not full_advisory:
         return {'success': False, 'error': 'Advisory not found'}
     
+    # The VC checked out: mark the farmer's deliveries of this advisory verified
+    record_verification(farmer_id, message_id)
+    
 
-    # Step 5: Send the Advisory SMS to the farmer's phone number
-    sms_result = send_sms_to_farmer(phone_number, full_advisory)
-    if not sms_result['success']:
-        return {'success': False, 'error': f"Failed to send SMS: {sms_result['error']}"}
+    # Step 5: Send the Advisory SMS to the farmer's phone number, rendered once per
+    # advisory (GSM-7 where safe, split into several SMS if it is very long)
+    rendered = render_advisory(message_id, full_advisory)
+    for part in rendered.parts:
+        sms_result = send_sms_to_farmer(phone_number, part)
+        if not sms_result['success']:
+            return {'success': False, 'error': f"Failed to send SMS: {sms_result['error']}"}
     
     return {
         'success': True,
         'message': 'Full advisory verified and sent successfully',
         'phone_number': phone_number,
         'verification_code': VC,
-        'advisory_content': full_advisory,
+        'advisory_content': rendered.text,
+        'sms_parts': len(rendered.parts),
+        'sms_segments': rendered.segments,
         'sms_status': 'sent'
     }
 
@@ -77,119 +101,81 @@ def extract_vc_from_service_code(service_code):
         print(f"Error extracting VC from service code: {str(e)}")
         return None
 
-def send_vc_to_smc(secret_key, vc):
+def send_vc_to_smc(secret_key, vc, farmer_id=None):
     """
     Send the extracted VC along with secret key to SMC for verification.
+    Uses the configured SMC transport and nodes (see ServerLogic/smc_client.py).
     
     Args:
-        secret_key (bytes): Secret key from database (stored as LargeBinary)
+        secret_key (bytes): Raw master key (from get_secret_key_by_phone)
         vc (str): Verification code to verify
+        farmer_id (int): Routes the farmer to the same SMC node every time
         
     Returns:
-        dict: SMC response containing message_id
+        dict: SMC response containing message_id, None on failure
     """
     try:
-        smc_url = "http://localhost:5001/get-messageID"  
-        
-        # Convert bytes to string for JSON transmission
-        # This is the HTTP/JSON layer - must be string
-        if isinstance(secret_key, bytes):
-            secret_key_str = secret_key.decode('utf-8')
-        else:
-            # If it's already a string (shouldn't happen from DB), keep it
-            secret_key_str = str(secret_key)
+        print(f"🔍 Asking SMC to decrypt VC '{vc}'")
+        return get_smc_client().get_message_id(vc, secret_key, farmer_id=farmer_id)
         
-        payload = {
-            "vc": vc,
-            "secret_key": secret_key_str  # String for JSON
-        }
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {os.getenv('SMC_API_KEY')}" 
-            
-        }
-        print("")
-        # DEBUG: Print what we're sending
-        print(f"🔍 SMC Request Debug:")
-        print(f"   URL: {smc_url}")
-        print(f"   VC: '{vc}' (type: {type(vc)})")
-        print(f"   Secret Key: '{secret_key_str}' (type: {type(secret_key_str)})")
-        print(f"   API Key: '{os.getenv('SMC_API_KEY')}'")
-        print(f"   Payload: {payload}")
-        
-        
-        # Send POST request to SMC
-        response = requests.post(
-            smc_url, 
-            json=payload, 
-            headers=headers,
-            
-        )
-        # ADD THIS DEBUG OUTPUT
-        print(f"📄 SMC Response Debug:")
-        print(f"   Status Code: {response.status_code}")
-        print(f"   Response Headers: {dict(response.headers)}")
-        print(f"   Response Text: '{response.text}'")
-
-        #Check for non-200 status codes BEFORE raise_for_status()
-        if response.status_code != 200:
-            print(f"❌ SMC returned non-200 status: {response.status_code}")
-            print(f"   Response body: {response.text}")
-            return None
-
-        
-        
-        return response.json()
-        
-    # except requests.exceptions.RequestException as e:
-    #     print(f"Error sending to SMC: {e}")
-    #     return None
-    # except Exception as e:
-    #     print(f"Unexpected error: {e}")
-    #     return None
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error sending to SMC: {e}")
-        if hasattr(e, 'response') and e.response:
-            print(f"   Error Status: {e.response.status_code}")
-            print(f"   Error Response: {e.response.text}")
-        return None
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
         return None
 
 
-def get_secret_key_by_phone(phone_number):
+def get_farmer_key_by_phone(phone_number):
     """
-    Get the secret key associated with a phone number from the database.
+    Get the farmer ID and secret key for a phone number.
+    
+    Uses the memory-mapped key snapshot when KEY_SNAPSHOT_PATH is set (no database
+    round trip) and falls back to the database for phones it does not contain.
     
     Args:
         phone_number (str): Farmer's phone number
         
     Returns:
-        bytes: Secret key if found (as bytes from LargeBinary column), None otherwise
+        tuple: (farmer_id, raw master key bytes) if found, None otherwise
     """
     try:
-        print(f"🔍 Looking up secret key for phone: {phone_number}")
+        snapshot = get_key_snapshot()
+        if snapshot:
+            found = snapshot.lookup(phone_number)
+            if found:
+                print(f"✅ Found farmer {found[0]} in key snapshot")
+                return found
         
         # Ensure we have application context
         with current_app.app_context():
             # Query the database for farmer with matching phone number
-            farmer = Farmer.query.filter_by(phone=phone_number).first()
+            farmer = farmer_by_phone(phone_number)
                 
             if farmer:
                 print(f"✅ Found farmer: {farmer.id} with secret key")
-                # Return as bytes (from LargeBinary column)
-                return farmer.secret_key  # This should be bytes from database
+                # Return the raw master key bytes, whatever format the row is stored in
+                return farmer.id, master_key(farmer.secret_key, farmer.key_version)
             else:
                 print(f"❌ No farmer found for phone: {phone_number}")
                 return None
-                    
                 
     except Exception as e:
         print(f"Error getting secret key: {str(e)}")
         return None
 
+
+def get_secret_key_by_phone(phone_number):
+    """
+    Get the secret key associated with a phone number (key snapshot or database).
+    
+    Args:
+        phone_number (str): Farmer's phone number
+        
+    Returns:
+        bytes: Raw master key if found (legacy text keys are interpreted), None otherwise
+    """
+    print(f"🔍 Looking up secret key for phone: {phone_number}")
+    farmer_key = get_farmer_key_by_phone(phone_number)
+    return farmer_key[1] if farmer_key else None
+
    
 
 
@@ -211,10 +197,12 @@ def get_full_advisory_by_message_id(message_id):
             # Query the database for advisory with matching ID
             try:
                 advisory_id = int(message_id)  # Convert to int if message_id is advisory ID
-                advisory = Advisory.query.get(advisory_id)
+                advisory = advisory_by_id(advisory_id)
             except ValueError:
-                # If message_id is not an integer, try searching by title
-                advisory = Advisory.query.filter_by(title=message_id).first()
+                # If message_id is not an integer, try searching by title (read replica if configured)
+                advisory, _ = read(lambda session: session.scalars(
+                    select(Advisory).filter_by(title=message_id).limit(1)
+                ).first(), orm=True)
             
             if advisory:
                 print(f"✅ Found advisory: {advisory.title}")
@@ -228,4 +216,38 @@ def get_full_advisory_by_message_id(message_id):
     except Exception as e:
         print(f"Error getting advisory content: {str(e)}")
         return None
-    
\ No newline at end of file
+    
+
+def record_verification(farmer_id, message_id):
+    """
+    Mark a farmer's deliveries of an advisory as verified and count them in the stats.
+    Only the first verification of a delivery counts; dialling the VC again changes nothing.
+    
+    Args:
+        farmer_id (int): Farmer who dialled the VC
+        message_id (str): Advisory message ID the VC resolved to
+        
+    Returns:
+        int: Number of deliveries newly marked verified
+    """
+    try:
+        verified_at = datetime.utcnow()
+        sent_times = db.session.execute(
+            update(FarmingAdvisory)
+            .where(FarmingAdvisory.farmer_id == farmer_id)
+            .where(FarmingAdvisory.advisory_id == int(message_id))
+            .where(FarmingAdvisory.sent_at.isnot(None))
+            .where(FarmingAdvisory.verified.is_(False))
+            .values(verified=True, verified_at=verified_at)
+            .returning(FarmingAdvisory.sent_at)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.session.commit()
+        
+        record_verified(message_id, sent_times, verified_at)
+        return len(sent_times)
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error recording verification: {str(e)}")
+        return 0
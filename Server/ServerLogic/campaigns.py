@@ -0,0 +1,474 @@
+"""
+Scheduled, time-spread broadcast campaigns.
+
+A campaign sends one advisory to a segment of farmers (see segments.py), spread
+evenly over a time window instead of all at once. Every farmer who gets the
+SMS dials the USSD code soon after, so a broadcast sent in one go turns into a
+spike on /ussd-callback, the SMC and the database together. Spread over an
+hour, the same broadcast is a steady trickle.
+
+Campaigns are stored in the campaigns table and run by a worker process:
+
+    python populate_db.py run-campaigns
+
+The worker claims campaigns that are due with a lease (CAMPAIGN_LEASE seconds,
+renewed at every checkpoint and every CAMPAIGN_LEASE/2 seconds while waiting
+between sends), so several workers can run side by side without sending a
+campaign twice. Every claim stores its own token in lease_owner, so a thread
+whose lease lapsed can't checkpoint over the claim that replaced it, even in
+the same worker. It recomputes the send rate every checkpoint
+(roughly every CAMPAIGN_CHECKPOINT_INTERVAL seconds) as the farmers left over
+the time left, capped at CAMPAIGN_MAX_RATE messages/sec, sends that many farmers
+through process_complete_advisory (which paces and routes the SMS, see SMS/),
+and then records the last farmer ID done in the same row.
+
+Progress survives a restart: a campaign whose worker died is claimed again
+once its lease runs out, and carries on from the last checkpoint. Farmers of
+the interrupted page that already have a delivery of the advisory since the
+campaign started are skipped, so nobody gets the SMS twice.
+
+Pausing, resuming and cancelling only change the status column. The worker
+sees it at its next checkpoint, or while it waits between sends (it looks
+every CAMPAIGN_CHECKPOINT_INTERVAL seconds), so a paused campaign stops within
+one checkpoint interval however slow its rate. A resumed campaign picks the
+rate back up for the window left.
+
+SMS go to the farmer's canonical E.164 number (farmers.phone_e164), or the
+number as registered for a farmer that has none yet.
+"""
+import os
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from sqlalchemy import func, or_, select, update
+
+from . import db
+from .models import Advisory, Campaign, Farmer, FarmingAdvisory
+from .segments import Segment, count_farmers, segment_select
+
+STATUS_SCHEDULED = 'scheduled'
+STATUS_RUNNING = 'running'
+STATUS_PAUSED = 'paused'
+STATUS_COMPLETED = 'completed'
+STATUS_CANCELLED = 'cancelled'
+
+# Statuses the worker picks campaigns up in (once they are due)
+RUNNABLE = (STATUS_SCHEDULED, STATUS_RUNNING)
+
+ACTION_PAUSE = 'pause'
+ACTION_RESUME = 'resume'
+ACTION_CANCEL = 'cancel'
+ACTIONS = (ACTION_PAUSE, ACTION_RESUME, ACTION_CANCEL)
+
+DEFAULT_CHECKPOINT_INTERVAL = 2.0   # seconds of sends between progress writes
+DEFAULT_LEASE = 30.0                # seconds a worker's claim holds unless renewed
+DEFAULT_MAX_RATE = 100.0            # messages/sec, also the catch-up rate once the window is over
+DEFAULT_CONCURRENCY = 8             # sends in flight per worker
+DEFAULT_POLL_INTERVAL = 5.0         # seconds between looks for due campaigns
+
+# Farmers per checkpoint at most, however high the rate
+MAX_PAGE_SIZE = 1_000
+
+
+class LeaseLost(Exception):
+    """The campaign's lease ran out and it was claimed again"""
+
+
+def parse_time(value):
+    """
+    Parse a campaign time: ISO 8601 ('2025-12-15T06:00', UTC unless it has an
+    offset) or 'now'.
+
+    Returns:
+        datetime: Naive UTC, like every other timestamp in the database
+    """
+    if value is None or (isinstance(value, str) and value.strip().lower() in ('', 'now')):
+        return datetime.utcnow()
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def create_campaign(session, advisory_id, segment, starts_at=None, ends_at=None, window_minutes=None):
+    """
+    Schedule a campaign (the caller commits).
+
+    Args:
+        session: SQLAlchemy session
+        advisory_id (int): Advisory to send
+        segment (Segment): Farmers to send it to
+        starts_at: Start of the window (see parse_time), default now
+        ends_at: End of the window; or give window_minutes
+        window_minutes (float): Length of the window
+
+    Returns:
+        Campaign: The new campaign
+
+    Raises:
+        ValueError: Unknown advisory or an empty/invalid window
+    """
+    if session.get(Advisory, advisory_id) is None:
+        raise ValueError(f"Advisory {advisory_id} not found")
+    starts_at = parse_time(starts_at)
+    if ends_at is not None:
+        ends_at = parse_time(ends_at)
+    elif window_minutes is not None:
+        ends_at = starts_at + timedelta(minutes=float(window_minutes))
+    else:
+        raise ValueError("A campaign needs an end time or a window length")
+    if ends_at <= starts_at:
+        raise ValueError("A campaign's window must end after it starts")
+
+    campaign = Campaign(
+        advisory_id=advisory_id,
+        segment=None if segment.is_everyone else segment.to_dict(),
+        starts_at=starts_at,
+        ends_at=ends_at,
+        status=STATUS_SCHEDULED,
+        sent_count=0,
+        failed_count=0,
+    )
+    session.add(campaign)
+    session.flush()
+    return campaign
+
+
+def set_campaign_status(session, campaign_id, action):
+    """
+    Pause, resume or cancel a campaign (the caller commits).
+
+    Returns:
+        Campaign: The updated campaign, None if there is no such campaign
+
+    Raises:
+        ValueError: The action doesn't apply to the campaign's current status
+    """
+    campaign = session.get(Campaign, campaign_id)
+    if campaign is None:
+        return None
+    if action == ACTION_PAUSE and campaign.status in RUNNABLE:
+        campaign.status = STATUS_PAUSED
+    elif action == ACTION_RESUME and campaign.status == STATUS_PAUSED:
+        campaign.status = STATUS_RUNNING if campaign.started_at else STATUS_SCHEDULED
+    elif action == ACTION_CANCEL and campaign.status not in (STATUS_COMPLETED, STATUS_CANCELLED):
+        campaign.status = STATUS_CANCELLED
+        campaign.completed_at = datetime.utcnow()
+    else:
+        raise ValueError(f"Cannot {action} a campaign that is {campaign.status}")
+    return campaign
+
+
+def campaign_rate(campaign, now, max_rate=DEFAULT_MAX_RATE, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+    """
+    Messages/sec that finishes the campaign at the end of its window.
+
+    Once the window is (nearly) over - the campaign was paused, or the worker
+    was down - the rest goes out at max_rate.
+    """
+    remaining = max((campaign.total or 0) - campaign.sent_count - campaign.failed_count, 1)
+    seconds_left = (campaign.ends_at - now).total_seconds()
+    if seconds_left <= checkpoint_interval:
+        return max_rate
+    return min(remaining / seconds_left, max_rate)
+
+
+def send_advisory(advisory_id, phone_number):
+    """Default send: the whole advisory workflow for one farmer"""
+    from .SMS.utils import process_complete_advisory
+    return process_complete_advisory(str(advisory_id), phone_number).get('success', False)
+
+
+class CampaignRunner:
+    """
+    Runs due campaigns in this process (see `populate_db.py run-campaigns`).
+
+    Args:
+        app: Flask app (every thread pushes its own app context)
+        send (callable): send(advisory_id, phone_number) -> bool, default send_advisory
+        concurrency (int): Sends in flight at once
+    """
+
+    def __init__(self, app, send=None, concurrency=None, max_rate=None, checkpoint_interval=None,
+                 lease=None, poll_interval=None, worker_id=None):
+        self.app = app
+        self.send = send or send_advisory
+        self.concurrency = concurrency or int(os.getenv('CAMPAIGN_CONCURRENCY', DEFAULT_CONCURRENCY))
+        self.max_rate = max_rate or float(os.getenv('CAMPAIGN_MAX_RATE', DEFAULT_MAX_RATE))
+        self.checkpoint_interval = checkpoint_interval or float(
+            os.getenv('CAMPAIGN_CHECKPOINT_INTERVAL', DEFAULT_CHECKPOINT_INTERVAL))
+        self.lease = lease or float(os.getenv('CAMPAIGN_LEASE', DEFAULT_LEASE))
+        self.poll_interval = poll_interval or DEFAULT_POLL_INTERVAL
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.active = {}
+        # Campaign ID -> monotonic time its lease was last renewed
+        self._renewed = {}
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='campaign-send')
+
+    def _send_one(self, advisory_id, phone_number):
+        try:
+            with self.app.app_context():
+                return bool(self.send(advisory_id, phone_number))
+        except Exception as e:
+            print(f"❌ Campaign send to {phone_number} failed: {e}")
+            return False
+
+    def claim_due(self):
+        """
+        Claim the campaigns that are due and not held by a live worker (or already run here).
+
+        Returns:
+            list: (campaign ID, claim token) of the campaigns claimed
+        """
+        now = datetime.utcnow()
+        claimed = []
+        due = db.session.execute(
+            select(Campaign.id)
+            .where(Campaign.status.in_(RUNNABLE), Campaign.starts_at <= now)
+            .where(or_(Campaign.lease_until.is_(None), Campaign.lease_until < now))
+            .order_by(Campaign.starts_at)
+        ).scalars().all()
+        for campaign_id in due:
+            if campaign_id in self.active:
+                # Our own thread is still on it (its lease lapsed): don't start a second one
+                continue
+            token = f"{self.worker_id[:55]}/{uuid.uuid4().hex[:8]}"
+            # Conditional on the lease still being free, so two workers can't both win
+            result = db.session.execute(
+                update(Campaign)
+                .where(Campaign.id == campaign_id, Campaign.status.in_(RUNNABLE))
+                .where(or_(Campaign.lease_until.is_(None), Campaign.lease_until < now))
+                .values(lease_owner=token, lease_until=now + timedelta(seconds=self.lease))
+            )
+            db.session.commit()
+            if result.rowcount:
+                claimed.append((campaign_id, token))
+        return claimed
+
+    def _start(self, campaign):
+        """Mark a newly claimed campaign running; count its farmers the first time"""
+        now = datetime.utcnow()
+        resumed = campaign.started_at is not None
+        if not resumed:
+            campaign.started_at = now
+            campaign.total = count_farmers(db.session.connection(), Segment.from_dict(campaign.segment))
+        campaign.status = STATUS_RUNNING
+        db.session.commit()
+        done = campaign.sent_count + campaign.failed_count
+        print(f"📣 Campaign {campaign.id} {'resumed' if resumed else 'started'}: advisory {campaign.advisory_id} "
+              f"to {campaign.total:,} farmers by {campaign.ends_at:%Y-%m-%d %H:%M} UTC"
+              + (f" ({done:,} done)" if resumed else ""))
+        return resumed
+
+    def _page(self, campaign, segment, size):
+        """The next farmers (ID, phone) after the campaign's cursor, by E.164 number where known"""
+        phone = func.coalesce(Farmer.phone_e164, Farmer.phone).label('phone')
+        stmt = segment_select(segment, db.engine.dialect.name, Farmer.id, phone)
+        if campaign.last_farmer_id is not None:
+            stmt = stmt.where(Farmer.id > campaign.last_farmer_id)
+        return db.session.execute(stmt.order_by(Farmer.id).limit(size)).all()
+
+    def _already_sent(self, campaign, farmer_ids):
+        """Farmers that got the advisory since the campaign started (a page interrupted by a restart)"""
+        return set(db.session.execute(
+            select(FarmingAdvisory.farmer_id)
+            .where(FarmingAdvisory.farmer_id.in_(farmer_ids))
+            .where(FarmingAdvisory.advisory_id == campaign.advisory_id)
+            .where(FarmingAdvisory.sent_at >= campaign.started_at)
+        ).scalars().all())
+
+    def _renew(self, campaign_id, token):
+        """
+        Extend the lease of a claim.
+
+        Raises:
+            LeaseLost: The lease lapsed and the campaign was claimed again
+        """
+        result = db.session.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id, Campaign.lease_owner == token)
+            .values(lease_until=datetime.utcnow() + timedelta(seconds=self.lease))
+        )
+        db.session.commit()
+        if not result.rowcount:
+            raise LeaseLost()
+        self._renewed[campaign_id] = time.monotonic()
+
+    def _keep_lease(self, campaign_id, token):
+        """Renew the lease if half of it has gone by since the last renewal"""
+        if time.monotonic() - self._renewed.get(campaign_id, 0.0) >= self.lease / 2:
+            self._renew(campaign_id, token)
+
+    def _status(self, campaign_id):
+        status = db.session.execute(select(Campaign.status).where(Campaign.id == campaign_id)).scalar()
+        db.session.commit()
+        return status
+
+    def _sleep(self, campaign_id, token, delay):
+        """
+        Wait between sends, renewing the lease and looking at the campaign's status
+        meanwhile (a slow campaign can wait far longer than the lease, or than a
+        pause should take, between two sends).
+
+        Returns:
+            bool: False if the runner is stopping or the campaign is no longer running
+        """
+        deadline = time.monotonic() + delay
+        while True:
+            self._keep_lease(campaign_id, token)
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return True
+            if self.stopping.wait(min(left, self.lease / 2, self.checkpoint_interval)):
+                return False
+            if time.monotonic() < deadline and self._status(campaign_id) != STATUS_RUNNING:
+                return False
+
+    def _wait_sends(self, campaign_id, token, futures):
+        """Wait for a page's sends to finish, renewing the lease meanwhile"""
+        while wait(futures, timeout=self.lease / 2).not_done:
+            self._keep_lease(campaign_id, token)
+
+    def _checkpoint(self, campaign_id, token, last_farmer_id, sent, failed, finished=False):
+        """
+        Record a page as done and renew the lease.
+
+        Returns:
+            str: The campaign's status now (paused or cancelled meanwhile: stop), None if it was claimed again
+        """
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id, Campaign.lease_owner == token)
+            .values(
+                last_farmer_id=last_farmer_id,
+                sent_count=Campaign.sent_count + sent,
+                failed_count=Campaign.failed_count + failed,
+                lease_until=now + timedelta(seconds=self.lease),
+            )
+        )
+        if not result.rowcount:
+            db.session.commit()
+            return None
+        self._renewed[campaign_id] = time.monotonic()
+        status = db.session.execute(select(Campaign.status).where(Campaign.id == campaign_id)).scalar()
+        if finished and status == STATUS_RUNNING:
+            db.session.execute(
+                update(Campaign)
+                .where(Campaign.id == campaign_id)
+                .values(status=STATUS_COMPLETED, completed_at=now, lease_owner=None, lease_until=None)
+            )
+            status = STATUS_COMPLETED
+        db.session.commit()
+        return status
+
+    def _release(self, campaign_id, token):
+        db.session.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id, Campaign.lease_owner == token)
+            .values(lease_owner=None, lease_until=None)
+        )
+        db.session.commit()
+
+    def run_campaign(self, campaign_id, token):
+        """Send a claimed campaign until it completes, is paused or cancelled, or the runner stops"""
+        with self.app.app_context():
+            try:
+                self._renewed[campaign_id] = time.monotonic()
+                campaign = db.session.get(Campaign, campaign_id)
+                check_resent = self._start(campaign)
+                segment = Segment.from_dict(campaign.segment)
+                # Sends are spaced 1/rate apart across pages, whatever each page's size
+                next_send = time.monotonic()
+                while not self.stopping.is_set():
+                    rate = campaign_rate(campaign, datetime.utcnow(), self.max_rate, self.checkpoint_interval)
+                    size = max(1, min(round(rate * self.checkpoint_interval), MAX_PAGE_SIZE))
+                    page = self._page(campaign, segment, size)
+                    skipped = self._already_sent(campaign, [row.id for row in page]) if check_resent and page else set()
+                    check_resent = False
+
+                    futures = []
+                    # Paused or cancelled while waiting: checkpoint the farmers done so far
+                    interrupted = False
+                    last_farmer_id = campaign.last_farmer_id
+                    for row in page:
+                        if row.id not in skipped:
+                            next_send = max(next_send, time.monotonic() - 1.0 / rate)
+                            delay = next_send - time.monotonic()
+                            if delay > 0 and not self._sleep(campaign_id, token, delay):
+                                interrupted = True
+                                break
+                            futures.append(self._pool.submit(self._send_one, campaign.advisory_id, row.phone))
+                            next_send += 1.0 / rate
+                        last_farmer_id = row.id
+                    if self.stopping.is_set():
+                        # Let the sends in flight finish; the rest of the page goes out after the restart
+                        # (farmers already sent are skipped then)
+                        self._wait_sends(campaign_id, token, futures)
+                        break
+                    self._wait_sends(campaign_id, token, futures)
+                    skipped_done = len([farmer_id for farmer_id in skipped if farmer_id <= (last_farmer_id or 0)])
+                    sent = sum(1 for future in futures if future.result()) + skipped_done
+                    failed = len(futures) + skipped_done - sent
+
+                    finished = len(page) < size and not interrupted
+                    status = self._checkpoint(campaign_id, token, last_farmer_id, sent, failed, finished)
+                    db.session.expire_all()
+                    campaign = db.session.get(Campaign, campaign_id)
+                    if status == STATUS_COMPLETED:
+                        print(f"✅ Campaign {campaign_id} completed: {campaign.sent_count:,} sent, "
+                              f"{campaign.failed_count:,} failed")
+                        return
+                    if status != STATUS_RUNNING:
+                        if status is not None:
+                            self._release(campaign_id, token)
+                        print(f"⏸️  Campaign {campaign_id} stopped: {status or 'taken over by another worker'} "
+                              f"at farmer {last_farmer_id}")
+                        return
+                self._release(campaign_id, token)
+                print(f"⏹️  Campaign {campaign_id} released at farmer {campaign.last_farmer_id} "
+                      f"({campaign.sent_count + campaign.failed_count:,} of {campaign.total:,} done)")
+            except LeaseLost:
+                # The sends in flight still finish; the new claim skips their farmers on resume
+                print(f"⚠️  Campaign {campaign_id} lost its lease, left to the worker that claimed it")
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Campaign {campaign_id} failed: {e}")
+            finally:
+                self._renewed.pop(campaign_id, None)
+                self.active.pop(campaign_id, None)
+
+    def run(self, once=False):
+        """
+        Poll for due campaigns and run each in its own thread until stop().
+
+        Args:
+            once (bool): Run the campaigns due now to the end, then return
+        """
+        print(f"🗓️  Campaign worker {self.worker_id}: up to {self.max_rate:.0f} msgs/sec, "
+              f"{self.concurrency} sends in flight")
+        with self.app.app_context():
+            while not self.stopping.is_set():
+                for campaign_id, token in self.claim_due():
+                    thread = threading.Thread(target=self.run_campaign, args=(campaign_id, token),
+                                              name=f'campaign-{campaign_id}', daemon=True)
+                    self.active[campaign_id] = thread
+                    thread.start()
+                if once and not self.active:
+                    break
+                self.stopping.wait(self.poll_interval if not once else 0.2)
+        for thread in list(self.active.values()):
+            thread.join()
+        self._pool.shutdown()
+
+    def stop(self):
+        """Stop after the current sends; campaigns are released for the next worker"""
+        self.stopping.set()
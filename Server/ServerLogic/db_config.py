@@ -0,0 +1,84 @@
+"""
+Database engine pool settings per deployment profile.
+
+DB_PROFILE picks a starting point and DB_POOL_* variables override single
+values. Each process keeps its own pool, so the connections a deployment can
+open are roughly processes x (pool_size + max_overflow). Keep that below the
+database's max_connections (or behind PgBouncer).
+
+    web    gunicorn gthread workers: one pooled connection per request thread
+           (GUNICORN_THREADS), a little overflow, and fast failure when the
+           pool is exhausted instead of stacking requests up
+    batch  populate_db.py and other long-running jobs: a few connections held
+           for a long time (bulk loads, streaming exports)
+    dev    the single-process development server: SQLAlchemy's default pool
+           size, overflow and timeout (5 + 10, 30s), connections never
+           recycled, plus pre-ping so a restarted database doesn't break it
+"""
+import os
+
+DB_PROFILE_WEB = 'web'
+DB_PROFILE_BATCH = 'batch'
+DB_PROFILE_DEV = 'dev'
+
+POOL_PROFILES = {
+    DB_PROFILE_WEB: {
+        'pool_size': None,          # GUNICORN_THREADS
+        'max_overflow': 4,
+        'pool_timeout': 5,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    },
+    DB_PROFILE_BATCH: {
+        'pool_size': 2,
+        'max_overflow': 2,
+        'pool_timeout': 60,
+        'pool_recycle': 3600,
+        'pool_pre_ping': True,
+    },
+    DB_PROFILE_DEV: {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': -1,
+        'pool_pre_ping': True,
+    },
+}
+
+# Environment overrides for single pool settings
+POOL_OVERRIDES = {
+    'DB_POOL_SIZE': ('pool_size', int),
+    'DB_MAX_OVERFLOW': ('max_overflow', int),
+    'DB_POOL_TIMEOUT': ('pool_timeout', float),
+    'DB_POOL_RECYCLE': ('pool_recycle', int),
+    'DB_POOL_PRE_PING': ('pool_pre_ping', lambda value: value.lower() == 'true'),
+}
+
+
+def engine_options(database_uri, profile=None):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for a database and deployment profile.
+
+    Args:
+        database_uri (str): SQLALCHEMY_DATABASE_URI
+        profile (str): 'web', 'batch' or 'dev' (default DB_PROFILE, else 'web')
+
+    Returns:
+        dict: Engine options for Flask-SQLAlchemy
+    """
+    profile = (profile or os.environ.get('DB_PROFILE', DB_PROFILE_WEB)).lower()
+    if profile not in POOL_PROFILES:
+        print(f"⚠️  Unknown DB_PROFILE '{profile}', using '{DB_PROFILE_WEB}'")
+        profile = DB_PROFILE_WEB
+
+    # SQLite has no server connections to pool - keep SQLAlchemy's own pool choice
+    if database_uri.startswith('sqlite'):
+        return {}
+
+    options = dict(POOL_PROFILES[profile])
+    if options['pool_size'] is None:
+        options['pool_size'] = int(os.environ.get('GUNICORN_THREADS', 8))
+    for variable, (option, convert) in POOL_OVERRIDES.items():
+        if os.environ.get(variable):
+            options[option] = convert(os.environ[variable])
+    return options
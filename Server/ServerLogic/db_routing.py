@@ -0,0 +1,178 @@
+"""
+Read/write routing between the primary database and read replicas.
+
+Writes (farmer creation, delivery records, the issued-VC index) always use
+db.session on the primary (SQLALCHEMY_DATABASE_URI). Read-only lookups and the
+dashboard APIs can go to one or more replicas listed in DATABASE_REPLICA_URLS,
+so verification spikes don't compete with broadcast writes for the primary.
+
+A replica is only used while it is healthy and close enough to the primary:
+
+- its replication lag is measured at most every REPLICA_LAG_CHECK_INTERVAL
+  seconds and the replica is skipped while the lag exceeds REPLICA_MAX_LAG
+  seconds (PostgreSQL; other databases report no lag);
+- a replica that fails a query is skipped for REPLICA_RETRY_AFTER seconds.
+
+When no replica is usable, reads fall back to the primary. Lookups that can
+miss a row the primary has only just written (a farmer created a moment ago)
+retry on the primary (see ServerLogic/queries.py). Reads that must see the
+caller's own writes, like stored VCs, stay on the primary.
+"""
+import os
+import time
+import itertools
+import threading
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from . import db
+from .db_config import engine_options
+
+DEFAULT_MAX_LAG = 10.0
+DEFAULT_LAG_CHECK_INTERVAL = 5.0
+DEFAULT_RETRY_AFTER = 30.0
+
+# Seconds since the last replayed transaction, 0 while the replica is fully caught up
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    """One read replica: its engine plus lag and health state"""
+
+    def __init__(self, url):
+        self.url = url
+        self.engine = create_engine(url, **engine_options(url))
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self.down_until = 0.0
+
+    @property
+    def name(self):
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def measure_lag(self, connection):
+        """
+        Replication lag in seconds.
+
+        Returns:
+            float: Seconds behind the primary (0 for databases without replication)
+        """
+        if self.engine.dialect.name != 'postgresql':
+            return 0.0
+        return float(connection.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+
+    def mark_down(self, error):
+        retry_after = float(os.getenv('REPLICA_RETRY_AFTER', DEFAULT_RETRY_AFTER))
+        self.down_until = time.monotonic() + retry_after
+        print(f"⚠️  Read replica {self.name} failed ({error}), using the primary for {retry_after:.0f}s")
+
+
+class ReplicaRouter:
+    """Picks a healthy, caught-up replica for each read"""
+
+    def __init__(self, urls):
+        self.replicas = [Replica(url) for url in urls]
+        self._next = itertools.count()
+
+    def candidates(self):
+        """Usable replicas in round-robin order"""
+        now = time.monotonic()
+        usable = [replica for replica in self.replicas if replica.down_until <= now]
+        if not usable:
+            return []
+        start = next(self._next) % len(usable)
+        return usable[start:] + usable[:start]
+
+    def lag_ok(self, replica, connection):
+        """Re-measure the replica's lag when the last measurement is stale"""
+        interval = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', DEFAULT_LAG_CHECK_INTERVAL))
+        max_lag = float(os.getenv('REPLICA_MAX_LAG', DEFAULT_MAX_LAG))
+        now = time.monotonic()
+        if now - replica.checked_at >= interval:
+            replica.lag = replica.measure_lag(connection)
+            replica.checked_at = now
+            if replica.lag > max_lag:
+                print(f"⚠️  Read replica {replica.name} is {replica.lag:.1f}s behind, reading from the primary")
+        return replica.lag <= max_lag
+
+    def run(self, fn, orm=False):
+        """
+        Run fn(connection) - or fn(session) with orm=True - on the first usable replica.
+
+        Args:
+            fn (callable): Takes a Connection (or Session) and returns fully loaded results
+            orm (bool): Pass an ORM Session bound to the replica connection
+
+        Returns:
+            tuple: (True, result) from a replica, or (False, None) if no replica could serve it
+        """
+        for replica in self.candidates():
+            try:
+                with replica.engine.connect() as connection:
+                    if not self.lag_ok(replica, connection):
+                        continue
+                    if orm:
+                        with Session(bind=connection) as session:
+                            return True, fn(session)
+                    return True, fn(connection)
+            except DBAPIError as e:
+                replica.mark_down(e)
+        return False, None
+
+    def dispose(self, close=True):
+        for replica in self.replicas:
+            replica.engine.dispose(close=close)
+
+
+# Replica engines for this process, created on first use (see get_replica_router)
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_replica_router():
+    """
+    Get the router for the replicas in DATABASE_REPLICA_URLS.
+
+    Returns:
+        ReplicaRouter: The router, None if no replicas are configured
+    """
+    global _router
+    urls = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    if not urls:
+        return None
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ReplicaRouter(urls)
+    return _router
+
+
+def dispose_replicas(close=True):
+    """Drop pooled replica connections (after a fork, like db.engine.dispose)"""
+    if _router is not None:
+        _router.dispose(close=close)
+
+
+def read(fn, orm=False):
+    """
+    Run a read-only query on a replica, falling back to the primary.
+
+    Args:
+        fn (callable): Takes a Connection (or a Session with orm=True) and returns
+                       fully loaded results - nothing lazy may outlive the call
+        orm (bool): Pass an ORM Session instead of a Connection
+
+    Returns:
+        tuple: (result, from_replica)
+    """
+    router = get_replica_router()
+    if router:
+        served, result = router.run(fn, orm=orm)
+        if served:
+            return result, True
+    return fn(db.session if orm else db.session.connection()), False
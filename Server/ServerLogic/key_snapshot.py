@@ -0,0 +1,238 @@
+"""
+Memory-mapped farmer key snapshot.
+
+USSD verification only needs phone -> (farmer_id, secret key). A snapshot file
+holds that mapping for every farmer so verification workers can resolve it
+without a database round trip:
+
+    header   := magic 'FWKS'  format:u8  kind:u8  reserved:u16
+                count:u64  max_farmer_id:u64
+    records  := count x (phone:u64  farmer_id:u64  key_offset:u32
+                         key_len:u16  key_version:u8  pad:u8), sorted by phone
+    keys     := the stored secret keys, back to back
+
+phone is the farmer's E.164 number as an integer (ServerLogic/phone.py), so
+'0712...', '2547...' and '+2547...' all find the same record. Lookups binary
+search the records straight from the mmap, so a worker process holds no copy
+of the table and every worker on a host shares the same page cache.
+
+`populate_db.py export-key-snapshot --output farmers.snap` writes a full
+snapshot; with --delta it writes `farmers.snap.delta-NNNN` holding only the
+farmers created since the newest file. Deltas are searched newest first, so a
+delta also wins for a farmer that is already in the base. Files are replaced
+atomically and readers pick up new files every KEY_SNAPSHOT_RELOAD_INTERVAL
+seconds. Set KEY_SNAPSHOT_PATH to turn lookups on; phones that are not in the
+snapshot fall back to the database.
+
+The files hold every farmer's secret key, so they are created readable by
+their owner only (0600): run the export as the user the workers run as.
+"""
+import os
+import glob
+import mmap
+import time
+import struct
+import threading
+
+from .keys import master_key
+from .phone import phone_number_key
+
+MAGIC = b'FWKS'
+FORMAT_VERSION = 2
+
+KIND_BASE = 0
+KIND_DELTA = 1
+
+HEADER = struct.Struct('!4sBBHQQ')      # magic, format, kind, reserved, count, max_farmer_id
+RECORD = struct.Struct('!QQIHBx')       # phone, farmer_id, key_offset, key_len, key_version
+PHONE = struct.Struct('!Q')
+
+DELTA_SUFFIX = '.delta-'
+
+DEFAULT_RELOAD_INTERVAL = 30.0
+
+# Snapshots hold the farmers' secret keys: owner read/write only
+FILE_MODE = 0o600
+
+
+def delta_paths(path):
+    """Existing delta files for a snapshot, oldest first"""
+    return sorted(glob.glob(glob.escape(path) + DELTA_SUFFIX + '*'))
+
+
+def next_delta_path(path):
+    """Path for the next delta file of a snapshot"""
+    existing = delta_paths(path)
+    number = int(existing[-1].rsplit(DELTA_SUFFIX, 1)[1]) + 1 if existing else 1
+    return f"{path}{DELTA_SUFFIX}{number:04d}"
+
+
+def write_snapshot(path, farmers, kind=KIND_BASE):
+    """
+    Write a snapshot file atomically, readable by its owner only.
+
+    Args:
+        path (str): File to write (replaced in one rename)
+        farmers (iterable): (farmer_id, phone, secret_key, key_version) tuples
+        kind (int): KIND_BASE or KIND_DELTA
+
+    Returns:
+        int: Number of farmers written (phones that are not valid numbers are skipped)
+    """
+    entries = []
+    for farmer_id, phone, secret_key, key_version in farmers:
+        phone_key = phone_number_key(phone)
+        if phone_key is not None:
+            entries.append((phone_key, farmer_id, bytes(secret_key), key_version))
+    entries.sort()
+    max_farmer_id = max((entry[1] for entry in entries), default=0)
+
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        # Left over from a crashed export with the same PID
+        os.unlink(temp_path)
+    except FileNotFoundError:
+        pass
+    # Created with the final mode, so the keys are never readable by others, even briefly
+    descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, FILE_MODE)
+    with os.fdopen(descriptor, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, FORMAT_VERSION, kind, 0, len(entries), max_farmer_id))
+        key_offset = 0
+        for phone_key, farmer_id, secret_key, key_version in entries:
+            output.write(RECORD.pack(phone_key, farmer_id, key_offset, len(secret_key), key_version))
+            key_offset += len(secret_key)
+        for entry in entries:
+            output.write(entry[2])
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temp_path, path)
+    return len(entries)
+
+
+class SnapshotFile:
+    """One memory-mapped snapshot or delta file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as source:
+            self.mm = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.kind, _, self.count, self.max_farmer_id = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a farmer key snapshot (format {FORMAT_VERSION})")
+        self.keys_start = HEADER.size + self.count * RECORD.size
+
+    def lookup(self, phone_key):
+        """
+        Binary search the records for a phone number key.
+
+        Returns:
+            tuple: (farmer_id, secret_key, key_version), None if not present
+        """
+        mm = self.mm
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            (candidate,) = PHONE.unpack_from(mm, offset)
+            if candidate < phone_key:
+                low = middle + 1
+            elif candidate > phone_key:
+                high = middle
+            else:
+                _, farmer_id, key_offset, key_len, key_version = RECORD.unpack_from(mm, offset)
+                start = self.keys_start + key_offset
+                return farmer_id, mm[start:start + key_len], key_version
+        return None
+
+
+class KeySnapshot:
+    """A base snapshot plus its delta files"""
+
+    def __init__(self, path):
+        self.path = path
+        self.signature = snapshot_signature(path)
+        self.base = SnapshotFile(path)
+        # Newest first: a later delta overrides anything older
+        self.deltas = [SnapshotFile(delta) for delta in reversed(delta_paths(path))]
+
+    @property
+    def max_farmer_id(self):
+        return max([self.base.max_farmer_id] + [delta.max_farmer_id for delta in self.deltas])
+
+    @property
+    def count(self):
+        return self.base.count + sum(delta.count for delta in self.deltas)
+
+    def lookup(self, phone_number):
+        """
+        Find a farmer's ID and raw master key by phone number.
+
+        Args:
+            phone_number (str): Phone number in any common format
+
+        Returns:
+            tuple: (farmer_id, raw master key bytes), None if the phone is not in the snapshot
+        """
+        phone_key = phone_number_key(phone_number)
+        if phone_key is None:
+            return None
+        for snapshot_file in self.deltas + [self.base]:
+            found = snapshot_file.lookup(phone_key)
+            if found:
+                farmer_id, secret_key, key_version = found
+                return farmer_id, master_key(secret_key, key_version)
+        return None
+
+
+def snapshot_signature(path):
+    """(path, mtime, size) of the base and every delta, to notice replaced or new files"""
+    paths = [path] + delta_paths(path)
+    signature = []
+    for file_path in paths:
+        stat = os.stat(file_path)
+        signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+# Lazily opened snapshot for this process (see get_key_snapshot)
+_snapshot = None
+_checked_path = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_key_snapshot():
+    """
+    Get the farmer key snapshot named by KEY_SNAPSHOT_PATH.
+
+    The files are re-checked at most every KEY_SNAPSHOT_RELOAD_INTERVAL seconds
+    and reopened when a new export or delta has appeared.
+
+    Returns:
+        KeySnapshot: The open snapshot, None if not configured or not readable
+    """
+    global _snapshot, _checked_path, _checked_at
+
+    path = os.getenv('KEY_SNAPSHOT_PATH')
+    if not path:
+        return None
+
+    interval = float(os.getenv('KEY_SNAPSHOT_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL))
+    if path == _checked_path and time.monotonic() - _checked_at < interval:
+        return _snapshot
+
+    with _lock:
+        if path == _checked_path and time.monotonic() - _checked_at < interval:
+            return _snapshot
+        try:
+            if _snapshot is None or _snapshot.path != path or snapshot_signature(path) != _snapshot.signature:
+                # Old maps are left to the garbage collector - other threads may still be reading them
+                _snapshot = KeySnapshot(path)
+                print(f"🔑 Key snapshot loaded: {_snapshot.count} farmers from {path}")
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Key snapshot unavailable ({e}), using the database")
+            _snapshot = None
+        _checked_path = path
+        _checked_at = time.monotonic()
+        return _snapshot
@@ -0,0 +1,86 @@
+"""
+Farmer secret key encoding.
+
+Farmer.secret_key holds the raw master key bytes the SMC derives its FF3/HMAC
+keys from. On the wire to the SMC every key is sent in one canonical form:
+
+    secret_key   = base64url(key_version_byte + raw_key), unpadded
+    key_encoding = 'b64url'
+
+so the SMC decodes it directly and random binary keys survive JSON.
+
+Farmers created before this format have key_version 0: their column holds
+text that the SMC used to interpret by sniffing (hex, then base64, then UTF-8).
+legacy_master_key() applies that interpretation once, server-side, and
+`populate_db.py normalize-keys` rewrites those rows as raw keys (version 1)
+without changing any VC that was already issued.
+"""
+import base64
+import binascii
+
+# Farmer.key_version values
+KEY_VERSION_LEGACY = 0   # column holds text the SMC used to sniff
+KEY_VERSION_RAW = 1      # column holds the raw master key bytes
+
+# Wire encodings understood by the SMC
+KEY_ENCODING_B64URL = 'b64url'
+
+HEX_DIGITS = set('0123456789abcdefABCDEF')
+
+
+def legacy_master_key(stored_key):
+    """
+    Interpret a version-0 key exactly as the SMC's old format sniffing did.
+
+    Args:
+        stored_key (bytes): Farmer.secret_key of a legacy row
+
+    Returns:
+        bytes: The master key the SMC has been using for this farmer
+    """
+    try:
+        text = stored_key.decode('utf-8')
+    except UnicodeDecodeError:
+        # Never usable over the old text wire format - treat the bytes as the key
+        return bytes(stored_key)
+
+    if len(text) % 2 == 0 and text and all(c in HEX_DIGITS for c in text):
+        return bytes.fromhex(text)
+
+    if len(text) % 4 == 0 and text.replace('=', '').replace('+', '').replace('/', '').isalnum():
+        try:
+            return base64.b64decode(text, validate=True)
+        except (binascii.Error, ValueError):
+            pass
+
+    return text.encode('utf-8')
+
+
+def master_key(stored_key, key_version):
+    """
+    Get the raw master key for a farmer row, whatever version it is stored in.
+
+    Args:
+        stored_key (bytes): Farmer.secret_key
+        key_version (int): Farmer.key_version
+
+    Returns:
+        bytes: Raw master key
+    """
+    if key_version == KEY_VERSION_RAW:
+        return bytes(stored_key)
+    return legacy_master_key(stored_key)
+
+
+def encode_secret_key(raw_key):
+    """
+    Encode a raw master key for the SMC.
+
+    Args:
+        raw_key (bytes): Raw master key
+
+    Returns:
+        tuple: (wire string, key_encoding)
+    """
+    payload = bytes([KEY_VERSION_RAW]) + bytes(raw_key)
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode('ascii'), KEY_ENCODING_B64URL
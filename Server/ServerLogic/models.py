@@ -1,5 +1,6 @@
 from ServerLogic import db
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import ARRAY
 
 class Farmer(db.Model):
     """
@@ -7,6 +8,13 @@ class Farmer(db.Model):
     Stores farmer information including ID, phone, and secret key.
     """
     __tablename__ = 'farmers'
+    __table_args__ = (
+        # Segment resolution (ServerLogic/segments.py): index scans in ID order per region/language
+        db.Index('ix_farmers_region_id', 'region', 'id'),
+        db.Index('ix_farmers_language_id', 'language', 'id'),
+        # Crop overlap/containment (&&, @>) on PostgreSQL
+        db.Index('ix_farmers_crops', 'crops', postgresql_using='gin'),
+    )
     
     # Primary key - Auto-incrementing ID
     id = db.Column(db.Integer, primary_key=True)
@@ -14,9 +22,21 @@ class Farmer(db.Model):
     # Phone number - Unique and required
     phone = db.Column(db.String(20), unique=True, nullable=False, index=True)
     
+    # Same number in canonical E.164 form (see ServerLogic/phone.py) - every lookup uses this index
+    phone_e164 = db.Column(db.String(16), unique=True, nullable=True, index=True)
+    
         # Secret key for authentication (stored as binary data)
     secret_key = db.Column(db.LargeBinary, nullable=False)
     
+    # How secret_key is stored: 0 = legacy text format, 1 = raw key bytes (see ServerLogic/keys.py)
+    key_version = db.Column(db.SmallInteger, nullable=False, default=1, server_default='0')
+    
+    # Segmentation attributes for targeted broadcasts, stored normalised (lower case)
+    region = db.Column(db.String(64), nullable=True)
+    # Array on PostgreSQL (GIN-indexed), a JSON list elsewhere
+    crops = db.Column(db.JSON().with_variant(ARRAY(db.String(32)), 'postgresql'), nullable=True)
+    language = db.Column(db.String(8), nullable=True)
+    
     # Metadata fields (good practice)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -30,6 +50,10 @@ class Farmer(db.Model):
         return {
             'id': self.id,
             'phone': self.phone,
+            'phone_e164': self.phone_e164,
+            'region': self.region,
+            'crops': self.crops,
+            'language': self.language,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
             # Note: We don't include secret_key for security
@@ -49,6 +73,12 @@ class Advisory(db.Model):
     title = db.Column(db.String(200), nullable=False)
     message = db.Column(db.Text, nullable=False)  # Text for longer messages
     
+    # VC scheme for this advisory ('ff3' or 'hmac'); NULL uses the deployment's VC_SCHEME
+    vc_scheme = db.Column(db.String(10), nullable=True)
+    
+    # Send priority ('urgent', 'normal' or 'bulk', see SMS/lanes.py); NULL is normal
+    priority = db.Column(db.String(10), nullable=True)
+    
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -63,6 +93,8 @@ class Advisory(db.Model):
             'id': self.id,
             'title': self.title,
             'message': self.message,
+            'vc_scheme': self.vc_scheme,
+            'priority': self.priority,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -71,8 +103,20 @@ class FarmingAdvisory(db.Model):
     """
     FarmingAdvisories junction table.
     Links farmers to advisories they've received, tracks delivery status.
+
+    On PostgreSQL the table is partitioned by month of sent_at (see
+    ServerLogic/partitions.py). The partitioned table has no primary key
+    constraint - ids come from the sequence and are indexed per partition.
     """
     __tablename__ = 'farming_advisories'
+    __table_args__ = (
+        # Stands in for the primary key index on the partitioned table (one per partition)
+        db.Index('ix_farming_advisories_id', 'id'),
+        # Finds the stored VC for a (farmer, advisory) pair on resends
+        db.Index('ix_farming_advisories_farmer_advisory', 'farmer_id', 'advisory_id'),
+        # Recent-delivery queries; with partitioning they only scan the months they ask for
+        db.Index('ix_farming_advisories_sent_at', 'sent_at'),
+    )
     
     # Primary key
     id = db.Column(db.Integer, primary_key=True)
@@ -84,6 +128,10 @@ class FarmingAdvisory(db.Model):
     # Delivery tracking
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     verified = db.Column(db.Boolean, default=False, nullable=False)
+    verified_at = db.Column(db.DateTime, nullable=True)
+    
+    # VC sent with this delivery, reused for resends instead of asking the SMC again
+    verification_code = db.Column(db.String(16), nullable=True)
     
     # Relationships - backref creates reverse relationships
     farmer = db.relationship('Farmer', backref='farming_advisories')
@@ -98,5 +146,188 @@ class FarmingAdvisory(db.Model):
             'farmer_id': self.farmer_id,
             'advisory_id': self.advisory_id,
             'sent_at': self.sent_at.isoformat() if self.sent_at else None,
-            'verified': self.verified
-        }
\ No newline at end of file
+            'verified': self.verified,
+            'verified_at': self.verified_at.isoformat() if self.verified_at else None,
+            'verification_code': self.verification_code
+        }
+
+
+class IssuedVerificationCode(db.Model):
+    """
+    Reverse index of issued verification codes.
+    Maps (farmer_id, verification_code) -> advisory_id so USSD verification can be
+    answered with a single indexed lookup instead of an FF3 decryption in the SMC.
+    Only populated when VC_VERIFICATION_MODE=index.
+    """
+    __tablename__ = 'issued_vcs'
+    __table_args__ = (
+        # The lookup key: one VC per farmer points at exactly one advisory
+        db.UniqueConstraint('farmer_id', 'verification_code', name='uq_issued_vcs_farmer_vc'),
+        db.Index('ix_issued_vcs_farmer_advisory', 'farmer_id', 'advisory_id'),
+    )
+    
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Foreign Keys
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id'), nullable=False)
+    advisory_id = db.Column(db.Integer, db.ForeignKey('advisories.id'), nullable=False)
+    
+    # The VC exactly as sent to the farmer
+    verification_code = db.Column(db.String(16), nullable=False)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<IssuedVerificationCode Farmer {self.farmer_id}: {self.verification_code} -> Advisory {self.advisory_id}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'farmer_id': self.farmer_id,
+            'advisory_id': self.advisory_id,
+            'verification_code': self.verification_code,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class AdvisoryStats(db.Model):
+    """
+    Delivery and verification counters, one row per advisory.
+    Row 0 (ALL_ADVISORIES in ServerLogic/stats.py) holds the totals over all advisories.
+    Kept up to date from the send and verify paths so /api/stats is a primary key
+    lookup instead of an aggregate over farming_advisories.
+    """
+    __tablename__ = 'advisory_stats'
+    
+    # Advisory ID, or 0 for the totals (no foreign key, so the totals row can exist)
+    advisory_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    
+    # Counters
+    sent_count = db.Column(db.BigInteger, nullable=False, default=0)
+    verified_count = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    # Time-to-verify: sum of (verified_at - sent_at) over the verifications with both timestamps
+    verify_seconds_total = db.Column(db.Float, nullable=False, default=0.0)
+    verify_timed_count = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    last_sent_at = db.Column(db.DateTime, nullable=True)
+    last_verified_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AdvisoryStats {self.advisory_id}: {self.sent_count} sent, {self.verified_count} verified>'
+    
+    def to_dict(self):
+        return {
+            'advisory_id': self.advisory_id or None,
+            'sent': self.sent_count,
+            'verified': self.verified_count,
+            'verification_rate': self.verified_count / self.sent_count if self.sent_count else None,
+            'avg_time_to_verify_seconds': (
+                self.verify_seconds_total / self.verify_timed_count if self.verify_timed_count else None
+            ),
+            'last_sent_at': self.last_sent_at.isoformat() if self.last_sent_at else None,
+            'last_verified_at': self.last_verified_at.isoformat() if self.last_verified_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class Campaign(db.Model):
+    """
+    A scheduled broadcast: one advisory to a segment of farmers, spread over a
+    time window (see ServerLogic/campaigns.py).
+    Progress is a keyset cursor over farmer IDs, so a worker that restarts
+    carries on where the last one stopped.
+    """
+    __tablename__ = 'campaigns'
+    __table_args__ = (
+        # The runner's poll for campaigns that are due
+        db.Index('ix_campaigns_status_starts_at', 'status', 'starts_at'),
+    )
+    
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # What to send, and to whom (Segment.to_dict(), see ServerLogic/segments.py)
+    advisory_id = db.Column(db.Integer, db.ForeignKey('advisories.id'), nullable=False)
+    segment = db.Column(db.JSON, nullable=True)
+    
+    # The window the sends are spread over (UTC)
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    
+    # 'scheduled', 'running', 'paused', 'completed' or 'cancelled'
+    status = db.Column(db.String(16), nullable=False, default='scheduled')
+    
+    # Progress: farmers in the segment when it started, sends so far, and the last farmer ID done
+    total = db.Column(db.Integer, nullable=True)
+    sent_count = db.Column(db.Integer, nullable=False, default=0)
+    failed_count = db.Column(db.Integer, nullable=False, default=0)
+    last_farmer_id = db.Column(db.Integer, nullable=True)
+    
+    # The worker running the campaign, and until when its claim holds
+    lease_owner = db.Column(db.String(64), nullable=True)
+    lease_until = db.Column(db.DateTime, nullable=True)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    advisory = db.relationship('Advisory', backref='campaigns')
+    
+    def __repr__(self):
+        return f'<Campaign {self.id}: Advisory {self.advisory_id} {self.status}>'
+    
+    def to_dict(self):
+        done = self.sent_count + self.failed_count
+        return {
+            'id': self.id,
+            'advisory_id': self.advisory_id,
+            'segment': self.segment,
+            'starts_at': self.starts_at.isoformat() if self.starts_at else None,
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None,
+            'status': self.status,
+            'total': self.total,
+            'sent': self.sent_count,
+            'failed': self.failed_count,
+            'progress': min(done / self.total, 1.0) if self.total else None,
+            'last_farmer_id': self.last_farmer_id,
+            'lease_owner': self.lease_owner,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class SMSRateShare(db.Model):
+    """
+    What one process is sending through one SMS provider account, refreshed
+    every SMS_RATE_SYNC_INTERVAL seconds (see ServerLogic/SMS/rate_share.py).
+    Every sending process reads the live rows to work out its share of the
+    account's rate, so web workers and campaign runners pace as one sender.
+    """
+    __tablename__ = 'sms_rate_shares'
+    
+    # Provider account and the process sending through it (host:pid)
+    provider = db.Column(db.String(32), primary_key=True)
+    process = db.Column(db.String(64), primary_key=True)
+    
+    # Demand per priority lane, in messages/sec (sends asked for plus the backlog)
+    urgent = db.Column(db.Float, nullable=False, default=0.0)
+    normal = db.Column(db.Float, nullable=False, default=0.0)
+    bulk = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # The process's estimate of the account rate (None: not paced yet) and when it last lowered it
+    rate = db.Column(db.Float, nullable=True)
+    throttled_at = db.Column(db.Float, nullable=True)
+    
+    # Rows not refreshed for a few intervals belong to processes that are gone
+    updated_at = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<SMSRateShare {self.provider} {self.process}>'
@@ -0,0 +1,249 @@
+"""
+Monthly partitions of farming_advisories (PostgreSQL).
+
+Migration b6f1d2e8c347 turns farming_advisories into a table partitioned by
+RANGE (sent_at), one partition per calendar month:
+
+    farming_advisories_p2025_11   sent_at in [2025-11-01, 2025-12-01)
+    farming_advisories_default    everything else: planned deliveries
+                                  (sent_at NULL) and months with no partition yet
+
+Indexes are declared on the parent and PostgreSQL creates them on every
+partition, so queries that bound sent_at (recent deliveries, stats) only touch
+the matching months, and VACUUM works on one month at a time.
+
+Two maintenance jobs (populate_db.py create-partitions / archive-partitions,
+e.g. from cron) keep it that way:
+
+- ensure_partitions() creates the partitions for the coming months ahead of
+  time. A month whose rows already landed in the default partition is moved
+  into its new partition.
+- archive_partitions() detaches partitions older than the retention period,
+  streams each to a gzip-compressed CSV file, checks the row count and drops
+  the table. restore_archive() loads such a file back.
+"""
+import os
+import re
+import gzip
+from datetime import datetime
+
+from sqlalchemy import text
+
+PARENT_TABLE = 'farming_advisories'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_PATTERN = re.compile(rf'^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+ARCHIVE_SUFFIX = '.csv.gz'
+HEADER_PATTERN = re.compile(r'^[a-z_]+(,[a-z_]+)*$')
+
+
+def month_start(moment):
+    """First instant of the month containing `moment`"""
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    """Month start `count` months after (or before) `month`"""
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def partition_month(name):
+    """Month a partition name stands for, None if it is not a monthly partition"""
+    match = PARTITION_PATTERN.match(name)
+    return datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def is_partitioned(connection):
+    """Whether farming_advisories is a partitioned table (PostgreSQL, migrated)"""
+    if connection.dialect.name != 'postgresql':
+        return False
+    return bool(connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table)"
+    ), {'table': PARENT_TABLE}).scalar())
+
+
+def attached_partitions(connection):
+    """
+    Monthly partitions currently attached to farming_advisories.
+
+    Returns:
+        dict: month start -> partition table name
+    """
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {'table': PARENT_TABLE}).scalars()
+    return {partition_month(name): name for name in names if partition_month(name)}
+
+
+def detached_partitions(connection):
+    """Monthly partition tables that exist but are no longer attached (an interrupted archive)"""
+    attached = set(attached_partitions(connection).values())
+    names = connection.execute(text(
+        "SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename LIKE :pattern"
+    ), {'pattern': f'{PARENT_TABLE}_p%'}).scalars()
+    return sorted(name for name in names if partition_month(name) and name not in attached)
+
+
+def create_partition(connection, month):
+    """
+    Create the partition for one month.
+
+    If rows for that month are already in the default partition, they are moved
+    into the new table before it is attached (PostgreSQL refuses to attach a
+    range the default partition still holds rows for).
+
+    Returns:
+        int: Rows moved out of the default partition
+    """
+    name = partition_name(month)
+    bounds = {'start': month, 'end': add_months(month, 1)}
+    values = f"FOR VALUES FROM ('{bounds['start']:%Y-%m-%d}') TO ('{bounds['end']:%Y-%m-%d}')"
+
+    misplaced = connection.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE sent_at >= :start AND sent_at < :end)"
+    ), bounds).scalar()
+    if not misplaced:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} {values}"))
+        return 0
+
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = connection.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE sent_at >= :start AND sent_at < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds).rowcount
+    connection.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} {values}"))
+    return moved
+
+
+def ensure_partitions(connection, months_ahead=3, since=None):
+    """
+    Create any missing monthly partitions up to `months_ahead` months from now.
+
+    Args:
+        connection: SQLAlchemy connection (PostgreSQL)
+        months_ahead (int): Months after the current one to prepare
+        since (datetime): First month to cover (default: the current month)
+
+    Returns:
+        list: Names of the partitions created
+    """
+    existing = attached_partitions(connection)
+    current = month_start(datetime.utcnow())
+    month = month_start(since) if since else current
+    created = []
+    while month <= add_months(current, months_ahead):
+        if month not in existing:
+            moved = create_partition(connection, month)
+            created.append(partition_name(month))
+            print(f"   🗂️  Created {partition_name(month)}" + (f" ({moved} rows moved from default)" if moved else ""))
+        month = add_months(month, 1)
+    return created
+
+
+def export_table(connection, table, path):
+    """
+    Stream a table to a gzip-compressed CSV file.
+    The header row names the columns, so archives made before a column was
+    added can still be restored.
+
+    Returns:
+        int: Rows written
+    """
+    temp_path = f'{path}.tmp'
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        with gzip.open(temp_path, 'wb', compresslevel=6) as output:
+            cursor.copy_expert(f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)", output)
+        rows = cursor.rowcount
+    finally:
+        cursor.close()
+    os.replace(temp_path, path)
+    return rows
+
+
+def archive_partition(engine, name, archive_dir, keep_table=False):
+    """
+    Detach one monthly partition, archive it to `archive_dir` and drop it.
+
+    Each step commits on its own, so an interrupted run leaves a detached table
+    that the next run picks up again.
+
+    Returns:
+        str: Path of the archive file
+    """
+    path = os.path.join(archive_dir, name + ARCHIVE_SUFFIX)
+
+    with engine.begin() as connection:
+        if name in attached_partitions(connection).values():
+            connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+
+    with engine.begin() as connection:
+        expected = connection.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+        written = export_table(connection, name, path)
+        if written != expected:
+            raise RuntimeError(f"{name}: archived {written} rows but the table has {expected} - table kept")
+        if not keep_table:
+            connection.execute(text(f"DROP TABLE {name}"))
+
+    print(f"   📦 {name}: {written} rows -> {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    return path
+
+
+def archive_partitions(engine, archive_dir, retention_months=12, keep_tables=False):
+    """
+    Archive every monthly partition older than the retention period.
+
+    Args:
+        engine: SQLAlchemy engine (PostgreSQL)
+        archive_dir (str): Directory for the .csv.gz files
+        retention_months (int): Months kept online, counting the current one
+        keep_tables (bool): Only detach and archive, leave the tables in place
+
+    Returns:
+        list: Paths of the archive files written
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = add_months(month_start(datetime.utcnow()), -(retention_months - 1))
+
+    with engine.connect() as connection:
+        names = sorted(name for month, name in attached_partitions(connection).items() if month < cutoff)
+        # Tables detached by an earlier, interrupted run
+        names += [name for name in detached_partitions(connection) if partition_month(name) < cutoff]
+
+    return [archive_partition(engine, name, archive_dir, keep_table=keep_tables) for name in sorted(set(names))]
+
+
+def restore_archive(engine, path):
+    """
+    Load an archived month back into farming_advisories.
+
+    Returns:
+        int: Rows restored
+    """
+    name = os.path.basename(path)[:-len(ARCHIVE_SUFFIX)]
+    month = partition_month(name)
+    if month is None:
+        raise ValueError(f"{path} is not a farming_advisories partition archive")
+
+    with engine.begin() as connection:
+        if month not in attached_partitions(connection):
+            create_partition(connection, month)
+        cursor = connection.connection.driver_connection.cursor()
+        try:
+            with gzip.open(path, 'rb') as source:
+                # Load the columns named in the header, the rest of the file is the data
+                columns = source.readline().decode('utf-8').strip()
+                if not HEADER_PATTERN.match(columns):
+                    raise ValueError(f"{path} does not start with a column header")
+                cursor.copy_expert(f"COPY {PARENT_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)", source)
+            return cursor.rowcount
+        finally:
+            cursor.close()
@@ -0,0 +1,82 @@
+"""
+Phone number normalisation.
+
+Gateways and operators send the same subscriber as '+254712345678',
+'254712345678', '0712345678' or '+254 712 345 678'. Every phone is reduced to
+one canonical E.164 form ('+' and 8-15 digits) before it is stored in
+Farmer.phone_e164 or used for a lookup, so lookups always hit that column's
+unique index.
+
+Numbers without a country code are taken to be in PHONE_DEFAULT_COUNTRY_CODE
+(254, Kenya, unless set). phone_number_key() turns a canonical number into an
+integer (it always fits in 64 bits) for compact keys in caches and snapshots.
+"""
+import os
+import re
+
+DEFAULT_COUNTRY_CODE = '254'
+
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+
+# Characters people and gateways put between digits
+SEPARATORS = re.compile(r'[\s\-().]')
+
+
+def default_country_code():
+    """Country calling code assumed for national-format numbers"""
+    return os.getenv('PHONE_DEFAULT_COUNTRY_CODE', DEFAULT_COUNTRY_CODE).lstrip('+')
+
+
+def normalize_phone(phone_number, country_code=None):
+    """
+    Normalise a phone number to E.164.
+
+    Args:
+        phone_number (str): Phone number in any common format
+        country_code (str): Calling code for numbers without one (default PHONE_DEFAULT_COUNTRY_CODE)
+
+    Returns:
+        str: '+<digits>', None if the input is not a valid phone number
+    """
+    if phone_number is None:
+        return None
+
+    digits = SEPARATORS.sub('', str(phone_number))
+    country_code = country_code or default_country_code()
+
+    if digits.startswith('+'):
+        digits = digits[1:]
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('0'):
+        # National trunk prefix: 0712345678 -> 254712345678
+        digits = country_code + digits[1:]
+    elif not digits.startswith(country_code):
+        # Subscriber number without trunk prefix: 712345678 -> 254712345678
+        digits = country_code + digits
+
+    # '+2540712345678': trunk prefix kept after the country code
+    if digits.startswith(country_code + '0'):
+        digits = country_code + digits[len(country_code) + 1:]
+
+    if not digits.isdigit() or digits.startswith('0'):
+        return None
+    if not E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+        return None
+    return '+' + digits
+
+
+def phone_number_key(phone_number):
+    """
+    Compact integer form of a phone number.
+
+    Args:
+        phone_number (str): Phone number in any common format
+
+    Returns:
+        int: The E.164 digits as an integer, None if the number is not valid
+    """
+    canonical = normalize_phone(phone_number)
+    return int(canonical[1:]) if canonical else None
+
@@ -0,0 +1,140 @@
+"""
+Hot-path lookups as prebuilt, cached statements.
+
+Every advisory send and every USSD verification runs these. Each statement is
+built once at import time with bind parameters, so a lookup does not rebuild
+a select(), its cache key is memoised on the statement object, and the
+compiled SQL comes straight from the engine's compiled cache. They select
+only the columns the caller needs and return plain rows (no ORM object
+loading).
+
+Farmer and advisory lookups are read-only and go to a read replica when
+DATABASE_REPLICA_URLS is set (ServerLogic/db_routing.py). A replica miss is
+retried on the primary, since the row may have been written moments ago.
+Stored and issued VC lookups must see the Server's own recent writes and
+run on the session's connection on the primary.
+
+Note they do not autoflush: they read committed or already-flushed data,
+which is all the request paths that use them need.
+
+benchmarks/query_bench.py compares them with the ORM Query versions.
+"""
+from sqlalchemy import bindparam, select
+
+from . import db
+from .db_routing import read
+from .models import Advisory, Farmer, FarmingAdvisory, IssuedVerificationCode
+from .phone import normalize_phone
+
+FARMER_COLUMNS = (Farmer.id, Farmer.secret_key, Farmer.key_version)
+
+FARMER_BY_PHONE_E164 = select(*FARMER_COLUMNS).where(Farmer.phone_e164 == bindparam('phone'))
+
+# Numbers that cannot be normalised can only match the stored phone exactly
+FARMER_BY_RAW_PHONE = select(*FARMER_COLUMNS).where(Farmer.phone == bindparam('phone'))
+
+ADVISORY_BY_ID = (
+    select(Advisory.id, Advisory.title, Advisory.message, Advisory.vc_scheme, Advisory.priority)
+    .where(Advisory.id == bindparam('advisory_id'))
+)
+
+STORED_VC = (
+    select(FarmingAdvisory.verification_code)
+    .where(FarmingAdvisory.farmer_id == bindparam('farmer_id'))
+    .where(FarmingAdvisory.advisory_id == bindparam('advisory_id'))
+    .where(FarmingAdvisory.verification_code.isnot(None))
+    .order_by(FarmingAdvisory.id.desc())
+    .limit(1)
+)
+
+ISSUED_VC_BY_PHONE_E164 = (
+    select(IssuedVerificationCode.advisory_id, IssuedVerificationCode.farmer_id)
+    .join(Farmer, Farmer.id == IssuedVerificationCode.farmer_id)
+    .where(Farmer.phone_e164 == bindparam('phone'))
+    .where(IssuedVerificationCode.verification_code == bindparam('verification_code'))
+)
+
+ISSUED_VC_BY_RAW_PHONE = (
+    select(IssuedVerificationCode.advisory_id, IssuedVerificationCode.farmer_id)
+    .join(Farmer, Farmer.id == IssuedVerificationCode.farmer_id)
+    .where(Farmer.phone == bindparam('phone'))
+    .where(IssuedVerificationCode.verification_code == bindparam('verification_code'))
+)
+
+
+def execute(stmt, params):
+    """Run a prebuilt statement on the session's connection (and transaction)"""
+    return db.session.connection().execute(stmt, params)
+
+
+def read_first(stmt, params):
+    """
+    First row of a read-only statement, from a replica when one is usable.
+    A replica miss is retried on the primary in case the row is brand new.
+    """
+    row, from_replica = read(lambda connection: connection.execute(stmt, params).first())
+    if row is None and from_replica:
+        row = execute(stmt, params).first()
+    return row
+
+
+def farmer_by_phone(phone_number):
+    """
+    Look a farmer up by phone number (through the phone_e164 unique index).
+
+    Args:
+        phone_number (str): Phone number in any common format
+
+    Returns:
+        Row: (id, secret_key, key_version), None if no farmer has this number
+    """
+    canonical = normalize_phone(phone_number)
+    if canonical:
+        return read_first(FARMER_BY_PHONE_E164, {'phone': canonical})
+    return read_first(FARMER_BY_RAW_PHONE, {'phone': phone_number})
+
+
+def advisory_by_id(advisory_id):
+    """
+    Look an advisory up by ID.
+
+    Args:
+        advisory_id (int): Advisory ID (the message ID)
+
+    Returns:
+        Row: (id, title, message, vc_scheme, priority), None if not found
+    """
+    return read_first(ADVISORY_BY_ID, {'advisory_id': advisory_id})
+
+
+def stored_vc(farmer_id, advisory_id):
+    """
+    Newest VC stored on a farmer's delivery records for an advisory.
+
+    Args:
+        farmer_id (int): Farmer ID
+        advisory_id (int): Advisory ID
+
+    Returns:
+        str: The verification code, None if none has been stored
+    """
+    return execute(STORED_VC, {'farmer_id': farmer_id, 'advisory_id': advisory_id}).scalar()
+
+
+def issued_vc(phone_number, verification_code):
+    """
+    Resolve (phone, VC) to an advisory through the issued-VC index.
+
+    Args:
+        phone_number (str): Phone number in any common format
+        verification_code (str): VC the farmer dialled
+
+    Returns:
+        Row: (advisory_id, farmer_id), None if the VC is not in the index
+    """
+    canonical = normalize_phone(phone_number)
+    if canonical:
+        stmt, phone = ISSUED_VC_BY_PHONE_E164, canonical
+    else:
+        stmt, phone = ISSUED_VC_BY_RAW_PHONE, phone_number
+    return execute(stmt, {'phone': phone, 'verification_code': verification_code}).first()
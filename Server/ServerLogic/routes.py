@@ -1,7 +1,18 @@
 from flask import request, Blueprint, jsonify, render_template
-from .models import Advisory, Farmer
+from sqlalchemy import select, text
+from . import db
+from .models import Advisory, Campaign, Farmer
 from .SMS.utils import process_complete_advisory
+from .SMS.router import get_sms_router
+from .SMS.digest import get_digester
+from .SMS.render import report as sms_report
 from .USSD.utils import verify_full_message
+from .phone import normalize_phone
+from .db_routing import read
+from .queries import advisory_by_id
+from .stats import ALL_ADVISORIES, get_stats
+from .segments import Segment, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, resolve_page, count_farmers
+from .campaigns import ACTIONS, create_campaign, set_campaign_status
 import os
 from flask import current_app
 
@@ -32,6 +43,14 @@ def send_advisory():
                 'error': 'Missing required fields: message_id and phone_number are required'
             }), 400
         
+        # One canonical E.164 form for lookups and the SMS gateway
+        phone_number = normalize_phone(phone_number)
+        if not phone_number:
+            return jsonify({
+                'success': False,
+                'error': f"Invalid phone number: {data.get('phone_number')}"
+            }), 400
+        
         print(f"📨 Processing advisory request:")
         print(f"   Message ID: {message_id}")
         print(f"   Phone Number: {phone_number}")
@@ -72,6 +91,14 @@ def verify_advisory():
                 'required': ['phone_number', 'service_code', 'text']
             }, 400
         
+        # Gateways send +2547..., 2547... or 07... - use the canonical E.164 form
+        phone_number = normalize_phone(phone_number)
+        if not phone_number:
+            return {
+                'error': 'Invalid phone number',
+                'phone_number': data.get('phone_number')
+            }, 400
+        
         response = verify_full_message(phone_number, service_code, text)
         
         # Return the actual response from verify_full_message
@@ -172,6 +199,20 @@ def ussd_callback():
     
 
 
+@routes_bp.route('/health')
+def health():
+    """
+    Health check endpoint for load balancers and orchestrators.
+    The database is probed here (on demand) instead of at app startup.
+    """
+    try:
+        db.session.execute(text('SELECT 1'))
+        return jsonify({'status': 'ok', 'database': 'ok'}), 200
+    except Exception as e:
+        print(f"❌ Health check database probe failed: {e}")
+        return jsonify({'status': 'degraded', 'database': 'unavailable', 'error': str(e)}), 503
+
+
 @routes_bp.route('/')
 def dashboard():
     """Render the main dashboard"""
@@ -181,13 +222,18 @@ def dashboard():
 def get_farmers_api():
     """API endpoint to get farmers data"""
     try:
-        farmers = Farmer.query.all()
+        # Read-only: served by a read replica when one is configured
+        farmers, _ = read(lambda session: session.scalars(select(Farmer)).all(), orm=True)
         farmers_data = []
         
         for farmer in farmers:
             farmers_data.append({
                 'id': farmer.id,
                 'phone': farmer.phone,
+                'phone_e164': farmer.phone_e164,
+                'region': farmer.region,
+                'crops': farmer.crops,
+                'language': farmer.language,
                 'secret_key_preview': farmer.secret_key[:10].decode('utf-8', errors='ignore') + '...',
                 'created_at': farmer.created_at.isoformat() if farmer.created_at else None
             })
@@ -206,7 +252,8 @@ def get_farmers_api():
 def get_advisories_api():
     """API endpoint to get advisories data"""
     try:
-        advisories = Advisory.query.all()
+        # Read-only: served by a read replica when one is configured
+        advisories, _ = read(lambda session: session.scalars(select(Advisory)).all(), orm=True)
         advisories_data = []
         
         for advisory in advisories:
@@ -225,4 +272,225 @@ def get_advisories_api():
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+@routes_bp.route('/api/advisories/<int:advisory_id>/sms-report')
+def advisory_sms_report_api(advisory_id):
+    """
+    API endpoint for an advisory's SMS cost before it is broadcast: encoding and
+    segments of the notification SMS and of the full message (see SMS/render.py)
+    """
+    try:
+        advisory = advisory_by_id(advisory_id)
+        if advisory is None:
+            return jsonify({
+                'success': False,
+                'error': f"Advisory {advisory_id} not found"
+            }), 404
+        return jsonify({
+            'success': True,
+            'report': sms_report(advisory)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@routes_bp.route('/api/stats')
+def get_stats_api():
+    """API endpoint for delivery and verification totals (one summary row, no aggregates)"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': get_stats(ALL_ADVISORIES)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@routes_bp.route('/api/stats/<int:advisory_id>')
+def get_advisory_stats_api(advisory_id):
+    """API endpoint for one advisory's delivery and verification statistics"""
+    try:
+        stats = get_stats(advisory_id)
+        if stats is None:
+            return jsonify({
+                'success': False,
+                'error': f"No statistics for advisory {advisory_id}"
+            }), 404
+        return jsonify({
+            'success': True,
+            'stats': stats
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@routes_bp.route('/api/sms/providers')
+def get_sms_providers_api():
+    """API endpoint for the SMS providers' routing state (latency, error rate, ejection), lane latency, digest queue and account sharing in this worker"""
+    try:
+        router = get_sms_router()
+        return jsonify({
+            'success': True,
+            'strategy': router.strategy,
+            'providers': router.snapshot(),
+            'lanes': router.lane_snapshot(),
+            'digest': get_digester().snapshot(),
+            'rate_share': router.rate_share.snapshot() if router.rate_share else None
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@routes_bp.route('/api/segments/resolve', methods=['POST'])
+def resolve_segment_api():
+    """
+    Resolve a farmer segment to farmer IDs, one page at a time.
+
+    Body: {"segment": {"region": ..., "crops": [...], "crops_match": "any"|"all", "language": ...},
+           "after_id": <last ID of the previous page>, "limit": <page size>, "count": true|false}
+    """
+    try:
+        data = request.get_json() or {}
+        try:
+            segment = Segment.from_dict(data.get('segment'))
+            limit = min(int(data.get('limit') or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+            after_id = int(data['after_id']) if data.get('after_id') is not None else None
+        except (ValueError, TypeError) as e:
+            return jsonify({
+                'success': False,
+                'error': f"Invalid segment request: {e}"
+            }), 400
+        
+        def resolve(connection):
+            farmer_ids = resolve_page(connection, segment, after_id=after_id, limit=limit)
+            total = count_farmers(connection, segment) if data.get('count') else None
+            return farmer_ids, total
+        
+        # Read-only: served by a read replica when one is configured
+        (farmer_ids, total), _ = read(resolve)
+        
+        return jsonify({
+            'success': True,
+            'segment': segment.to_dict(),
+            'farmer_ids': farmer_ids,
+            # Pass as after_id to get the next page; None when this was the last one
+            'next_after_id': farmer_ids[-1] if len(farmer_ids) == limit else None,
+            'count': total
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@routes_bp.route('/api/campaigns', methods=['GET', 'POST'])
+def campaigns_api():
+    """
+    List campaigns (newest first), or schedule one.
+
+    Body (POST): {"advisory_id": 3, "segment": {...}, "starts_at": "2025-12-15T06:00" | "now",
+                  "ends_at": "..." or "window_minutes": 120}
+    """
+    try:
+        if request.method == 'GET':
+            campaigns = db.session.scalars(select(Campaign).order_by(Campaign.id.desc()).limit(100)).all()
+            return jsonify({
+                'success': True,
+                'campaigns': [campaign.to_dict() for campaign in campaigns]
+            })
+        
+        data = request.get_json() or {}
+        try:
+            campaign = create_campaign(
+                db.session,
+                int(data['advisory_id']),
+                Segment.from_dict(data.get('segment')),
+                starts_at=data.get('starts_at'),
+                ends_at=data.get('ends_at'),
+                window_minutes=data.get('window_minutes')
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': f"Invalid campaign: {e}"
+            }), 400
+        db.session.commit()
+        return jsonify({
+            'success': True,
+            'campaign': campaign.to_dict(),
+            'sms': sms_report(campaign.advisory, count_farmers(db.session.connection(), Segment.from_dict(campaign.segment)))
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@routes_bp.route('/api/campaigns/<int:campaign_id>')
+def get_campaign_api(campaign_id):
+    """API endpoint for one campaign's status and progress"""
+    try:
+        campaign = db.session.get(Campaign, campaign_id)
+        if campaign is None:
+            return jsonify({
+                'success': False,
+                'error': f"Campaign {campaign_id} not found"
+            }), 404
+        return jsonify({
+            'success': True,
+            'campaign': campaign.to_dict()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@routes_bp.route('/api/campaigns/<int:campaign_id>/<action>', methods=['POST'])
+def campaign_action_api(campaign_id, action):
+    """Pause, resume or cancel a campaign (the campaign worker sees it at its next checkpoint)"""
+    try:
+        if action not in ACTIONS:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown action '{action}', use one of: {', '.join(ACTIONS)}"
+            }), 404
+        try:
+            campaign = set_campaign_status(db.session, campaign_id, action)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 409
+        if campaign is None:
+            return jsonify({
+                'success': False,
+                'error': f"Campaign {campaign_id} not found"
+            }), 404
+        db.session.commit()
+        return jsonify({
+            'success': True,
+            'campaign': campaign.to_dict()
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -0,0 +1,190 @@
+"""
+Farmer segments for targeted broadcasts.
+
+Farmers carry three segmentation attributes: region (county), crops (a list)
+and language. A segment selects farmers by any combination of them, e.g.
+
+    {"region": "nakuru", "crops": ["maize", "beans"], "crops_match": "any"}
+
+and resolves to farmer IDs in ID order, one keyset page at a time, so a
+campaign export or the selector API never loads a whole segment at once.
+
+Every attribute is indexed so resolution is an index scan, not a scan of all
+farmers: (region, id) and (language, id) b-trees and, on PostgreSQL, a GIN
+index on the crops array for the overlap (&&, any crop) and containment
+(@>, all crops) operators. On SQLite crops are a JSON list matched through
+json_each (development only - no index).
+
+Attribute values are case-insensitive: they are stored and matched in
+normalised form (see normalize_tag).
+"""
+import re
+
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, array
+
+from .models import Farmer
+
+CROPS_MATCH_ANY = 'any'
+CROPS_MATCH_ALL = 'all'
+
+# Farmer IDs per page from the selector API
+DEFAULT_PAGE_SIZE = 1_000
+MAX_PAGE_SIZE = 10_000
+
+MAX_CROPS = 16
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_tag(value):
+    """
+    Canonical form of an attribute value: trimmed, lower case, single spaces.
+
+    Returns:
+        str: The normalised value, None if it is empty
+    """
+    if value is None:
+        return None
+    value = WHITESPACE.sub(' ', str(value)).strip().lower()
+    return value or None
+
+
+def normalize_tags(values):
+    """
+    Normalise a list of values (or one comma-separated string), dropping blanks and duplicates.
+
+    Returns:
+        list: Sorted distinct values, None if there are none
+    """
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = values.split(',')
+    tags = sorted({tag for tag in (normalize_tag(value) for value in values) if tag})
+    return tags or None
+
+
+class Segment:
+    """A set of farmers selected by region, crops and/or language"""
+
+    FIELDS = ('region', 'crops', 'crops_match', 'language')
+
+    def __init__(self, regions=None, crops=None, crops_match=CROPS_MATCH_ANY, languages=None):
+        self.regions = normalize_tags(regions)
+        self.crops = normalize_tags(crops)
+        self.crops_match = crops_match or CROPS_MATCH_ANY
+        self.languages = normalize_tags(languages)
+
+        if self.crops_match not in (CROPS_MATCH_ANY, CROPS_MATCH_ALL):
+            raise ValueError(f"crops_match must be '{CROPS_MATCH_ANY}' or '{CROPS_MATCH_ALL}'")
+        if self.crops and len(self.crops) > MAX_CROPS:
+            raise ValueError(f"A segment can name at most {MAX_CROPS} crops")
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a segment from request JSON or command line options.
+        'region', 'crops' and 'language' each take one value, a list or a comma-separated string.
+
+        Raises:
+            ValueError: Unknown keys or an invalid crops_match
+        """
+        data = data or {}
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown segment fields: {', '.join(sorted(unknown))}")
+        return cls(
+            regions=data.get('region'),
+            crops=data.get('crops'),
+            crops_match=data.get('crops_match'),
+            languages=data.get('language'),
+        )
+
+    @property
+    def is_everyone(self):
+        return not (self.regions or self.crops or self.languages)
+
+    def to_dict(self):
+        return {
+            'region': self.regions,
+            'crops': self.crops,
+            'crops_match': self.crops_match,
+            'language': self.languages,
+        }
+
+    def criteria(self, dialect_name):
+        """
+        WHERE clauses selecting this segment's farmers.
+
+        Args:
+            dialect_name (str): Database dialect the statement will run on
+
+        Returns:
+            list: SQLAlchemy expressions (empty for everyone)
+        """
+        clauses = []
+        if self.regions:
+            clauses.append(Farmer.region.in_(self.regions))
+        if self.languages:
+            clauses.append(Farmer.language.in_(self.languages))
+        if self.crops:
+            clauses.append(crops_clause(self.crops, self.crops_match, dialect_name))
+        return clauses
+
+    def __repr__(self):
+        return f'<Segment {self.to_dict()}>'
+
+
+def crops_clause(crops, crops_match, dialect_name):
+    """Farmers growing any (or all) of `crops`"""
+    if dialect_name == 'postgresql':
+        # Both operators are served by the GIN index on farmers.crops
+        operator = '@>' if crops_match == CROPS_MATCH_ALL else '&&'
+        # ARRAY['maize', ...] is text[]; the column is varchar[] and there is no varchar[] && text[]
+        return Farmer.crops.op(operator)(cast(array(crops), ARRAY(String(32))))
+
+    grown = func.json_each(Farmer.crops).table_valued('value')
+    matching = select(func.count(func.distinct(grown.c.value))).where(grown.c.value.in_(crops)).scalar_subquery()
+    return matching == len(crops) if crops_match == CROPS_MATCH_ALL else matching > 0
+
+
+def segment_select(segment, dialect_name, *columns):
+    """Select `columns` (default: the farmer ID) for the farmers in a segment"""
+    return select(*(columns or (Farmer.id,))).where(*segment.criteria(dialect_name))
+
+
+def resolve_page(connection, segment, after_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of a segment's farmer IDs, in ID order.
+
+    Args:
+        connection: SQLAlchemy connection
+        segment (Segment): Segment to resolve
+        after_id (int): Only farmers with an ID greater than this (the previous page's last ID)
+        limit (int): Maximum IDs to return
+
+    Returns:
+        list: Farmer IDs
+    """
+    stmt = segment_select(segment, connection.dialect.name)
+    if after_id is not None:
+        stmt = stmt.where(Farmer.id > after_id)
+    return connection.execute(stmt.order_by(Farmer.id).limit(limit)).scalars().all()
+
+
+def iter_farmer_ids(connection, segment, batch_size=DEFAULT_PAGE_SIZE, after_id=None):
+    """Yield every farmer ID in a segment, one keyset page per query"""
+    while True:
+        page = resolve_page(connection, segment, after_id=after_id, limit=batch_size)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after_id = page[-1]
+
+
+def count_farmers(connection, segment):
+    """Number of farmers in a segment"""
+    return connection.execute(
+        select(func.count()).select_from(Farmer).where(*segment.criteria(connection.dialect.name))
+    ).scalar()
@@ -0,0 +1,458 @@
+"""
+Client for the SMC (VC generation and decryption).
+
+Two transports, chosen with SMC_TRANSPORT:
+
+- 'http' (default): JSON POSTs to the SMC URLs (/get-vc, /get-messageID) over a
+  keep-alive session per thread.
+- 'rpc': the SMC's compact binary protocol (SMC/SMC_Logic/rpc.py) on a
+  persistent TCP or Unix socket per thread ('host:port' or 'unix:/path').
+  get_vcs() pipelines a whole batch in one round trip.
+
+Several SMC nodes can be listed (SMC_URLS / SMC_RPC_ADDRESSES, comma-separated).
+Requests are routed by consistent hashing on the farmer ID, so a farmer always
+lands on the same node and that node's cipher cache stays warm. A node that
+fails at the transport level is ejected: its farmers move to the next node on
+the ring, and it is let back in once its back-off has passed and a health check
+succeeds. Adding or removing a node only moves the farmers that hash to it.
+
+All calls return the same dicts as the HTTP API ({'vc': ...} / {'message_id': ...})
+or None on failure, so callers don't care which transport or node is used.
+"""
+import os
+import time
+import bisect
+import socket
+import struct
+import hashlib
+import threading
+
+import requests
+
+from .keys import encode_secret_key
+
+TRANSPORT_HTTP = 'http'
+TRANSPORT_RPC = 'rpc'
+
+# Binary protocol constants (must match SMC/SMC_Logic/rpc.py)
+OP_GET_VC = 1
+OP_GET_MESSAGE_ID = 2
+SCHEME_CODES = {None: 0, 'ff3': 0, 'hmac': 1}
+STATUS_OK = 0
+FRAME_HEADER = struct.Struct('!I')
+REQUEST_HEADER = struct.Struct('!IBBH')
+RESPONSE_HEADER = struct.Struct('!IBH')
+
+
+# Consistent hashing: virtual points per node on the ring
+RING_REPLICAS = 160
+
+# Ejection back-off (seconds): doubles on every failed re-admission, up to the maximum
+EJECT_BACKOFF = 2.0
+EJECT_BACKOFF_MAX = 60.0
+
+
+class SMCUnavailable(Exception):
+    """Raised by a node client when the SMC node cannot be reached"""
+
+
+class HTTPSMCClient:
+    """SMC client over JSON/HTTP"""
+
+    def __init__(self, base_url, api_key=None, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update({
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.api_key}"
+            })
+        return session
+
+    def _post(self, path, payload):
+        try:
+            response = self._session().post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise SMCUnavailable(f"{self.base_url}: {e}")
+        if response.status_code >= 500:
+            raise SMCUnavailable(f"{self.base_url} returned {response.status_code}")
+        if response.status_code != 200:
+            print(f"❌ SMC returned {response.status_code}: {response.text}")
+            return None
+        return response.json()
+
+    def health_check(self, timeout=2):
+        """True if the node answers GET /health"""
+        try:
+            return requests.get(f"{self.base_url}/health", timeout=timeout).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def get_vc(self, message_id, secret_key, scheme=None):
+        """Generate the VC for a message ID with the farmer's raw master key"""
+        secret_key_str, key_encoding = encode_secret_key(secret_key)
+        payload = {"message_id": str(message_id), "secret_key": secret_key_str, "key_encoding": key_encoding}
+        if scheme:
+            payload["scheme"] = scheme
+        return self._post('/get-vc', payload)
+
+    def get_message_id(self, vc, secret_key, scheme=None):
+        """Decrypt a VC back into its message ID with the farmer's raw master key"""
+        secret_key_str, key_encoding = encode_secret_key(secret_key)
+        payload = {"vc": vc, "secret_key": secret_key_str, "key_encoding": key_encoding}
+        if scheme:
+            payload["scheme"] = scheme
+        return self._post('/get-messageID', payload)
+
+    def get_vcs(self, jobs):
+        """
+        Generate VCs for many (message_id, secret_key, scheme) jobs.
+
+        Returns:
+            list: One response dict (or None) per job, in order
+        """
+        return [self.get_vc(message_id, secret_key, scheme) for message_id, secret_key, scheme in jobs]
+
+
+class RPCSMCClient:
+    """SMC client over the binary RPC protocol, with pipelined batches"""
+
+    def __init__(self, address, timeout=30):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        if self.address.startswith('unix:'):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.address[len('unix:'):])
+        else:
+            host, _, port = self.address.rpartition(':')
+            sock = socket.create_connection((host or 'localhost', int(port)), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.buffer = bytearray()
+        self._local.next_id = 0
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _read_frames(self, sock, count):
+        """Read exactly `count` response frames from the connection"""
+        buffer = self._local.buffer
+        frames = []
+        while len(frames) < count:
+            if len(buffer) >= FRAME_HEADER.size:
+                (length,) = FRAME_HEADER.unpack_from(buffer)
+                end = FRAME_HEADER.size + length
+                if len(buffer) >= end:
+                    frames.append(bytes(buffer[FRAME_HEADER.size:end]))
+                    del buffer[:end]
+                    continue
+            data = sock.recv(64 * 1024)
+            if not data:
+                raise ConnectionError('SMC closed the connection')
+            buffer += data
+        return frames
+
+    def _call_many(self, requests_):
+        """
+        Send (op, scheme, key, arg) requests in one write and read all responses.
+
+        Returns:
+            list: (ok, value) per request, in order
+        """
+        for attempt in range(2):
+            sock = getattr(self._local, 'sock', None)
+            try:
+                if sock is None:
+                    sock = self._connect()
+                frames = []
+                first_id = self._local.next_id
+                for index, (op, scheme, key, arg) in enumerate(requests_):
+                    key = bytes(key)
+                    arg = str(arg).encode('ascii')
+                    body = (REQUEST_HEADER.pack((first_id + index) & 0xFFFFFFFF, op, SCHEME_CODES[scheme], len(key))
+                            + key + bytes([len(arg)]) + arg)
+                    frames.append(FRAME_HEADER.pack(len(body)) + body)
+                self._local.next_id = (first_id + len(requests_)) & 0xFFFFFFFF
+                sock.sendall(b''.join(frames))
+
+                results = []
+                for frame in self._read_frames(sock, len(requests_)):
+                    _, status, value_len = RESPONSE_HEADER.unpack_from(frame)
+                    value = frame[RESPONSE_HEADER.size:RESPONSE_HEADER.size + value_len].decode('utf-8')
+                    results.append((status == STATUS_OK, value))
+                return results
+
+            except (OSError, ConnectionError) as e:
+                # Stale or broken connection: reconnect once, then give up
+                self._close()
+                if attempt:
+                    raise SMCUnavailable(f"{self.address}: {e}")
+
+    def health_check(self, timeout=2):
+        """True if the node accepts a connection"""
+        try:
+            if self.address.startswith('unix:'):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(timeout)
+                sock.connect(self.address[len('unix:'):])
+            else:
+                host, _, port = self.address.rpartition(':')
+                sock = socket.create_connection((host or 'localhost', int(port)), timeout=timeout)
+            sock.close()
+            return True
+        except OSError:
+            return False
+
+    def _unwrap(self, result, field):
+        ok, value = result
+        if not ok:
+            print(f"❌ SMC RPC error: {value}")
+            return None
+        return {field: value}
+
+    def get_vc(self, message_id, secret_key, scheme=None):
+        """Generate the VC for a message ID with the farmer's raw master key"""
+        return self._unwrap(self._call_many([(OP_GET_VC, scheme, secret_key, message_id)])[0], 'vc')
+
+    def get_message_id(self, vc, secret_key, scheme=None):
+        """Decrypt a VC back into its message ID with the farmer's raw master key"""
+        return self._unwrap(self._call_many([(OP_GET_MESSAGE_ID, scheme, secret_key, vc)])[0], 'message_id')
+
+    def get_vcs(self, jobs):
+        """
+        Generate VCs for many (message_id, secret_key, scheme) jobs in one pipelined round trip.
+
+        Returns:
+            list: One response dict (or None) per job, in order
+        """
+        if not jobs:
+            return []
+        results = self._call_many([(OP_GET_VC, scheme, secret_key, message_id) for message_id, secret_key, scheme in jobs])
+        return [self._unwrap(result, 'vc') for result in results]
+
+
+class HashRing:
+    """Consistent-hash ring of node names with RING_REPLICAS virtual points each"""
+
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self._points = []   # sorted hashes
+        self._owners = []   # node name for each point
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(str(value).encode('utf-8')).digest()[:8], 'big')
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        keep = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def nodes_for(self, key):
+        """
+        Yield the distinct nodes in ring order starting at the key's position:
+        the owner first, then the nodes that take over if it is ejected.
+        """
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        seen = set()
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+
+
+class BalancedSMCClient:
+    """
+    Routes calls across SMC nodes by farmer ID, with ejection and re-admission.
+    Exposes the same get_vc / get_message_id / get_vcs API as a single node client.
+    """
+
+    def __init__(self, node_clients):
+        self._lock = threading.Lock()
+        self.clients = {}
+        self.ring = HashRing()
+        self._ejected = {}  # node -> (retry_at, backoff)
+        self.set_nodes(node_clients)
+
+    def set_nodes(self, node_clients):
+        """
+        Replace the node list (e.g. after scaling). Consistent hashing keeps
+        every farmer that hashes to an unchanged node on that node.
+
+        Args:
+            node_clients (dict): node name -> HTTPSMCClient / RPCSMCClient
+        """
+        with self._lock:
+            for node in set(self.clients) - set(node_clients):
+                self.ring.remove(node)
+                self._ejected.pop(node, None)
+            for node in set(node_clients) - set(self.clients):
+                self.ring.add(node)
+            self.clients = dict(node_clients)
+
+    def _available(self, node):
+        """True if the node may take traffic; an ejected node is re-checked once its back-off expires"""
+        with self._lock:
+            ejected = self._ejected.get(node)
+            if ejected is None:
+                return True
+            retry_at, backoff = ejected
+            if time.monotonic() < retry_at:
+                return False
+            # Claim the re-check so concurrent callers keep skipping the node meanwhile
+            self._ejected[node] = (time.monotonic() + backoff, backoff)
+
+        if self.clients[node].health_check():
+            with self._lock:
+                self._ejected.pop(node, None)
+            print(f"✅ SMC node {node} is healthy again, re-admitted")
+            return True
+        self._eject(node, escalate=True)
+        return False
+
+    def _eject(self, node, escalate=False):
+        """
+        Take a node out of rotation. Failures reported by other threads while it
+        is already out are ignored; only a failed re-admission doubles the back-off.
+        """
+        with self._lock:
+            ejected = self._ejected.get(node)
+            if ejected is None:
+                backoff = EJECT_BACKOFF
+            elif escalate:
+                backoff = min(ejected[1] * 2, EJECT_BACKOFF_MAX)
+            else:
+                return
+            self._ejected[node] = (time.monotonic() + backoff, backoff)
+        print(f"⚠️  SMC node {node} ejected for {backoff:.0f}s")
+
+    def _route(self, routing_key, call):
+        """Run call(client) on the first available node for the key, failing over along the ring"""
+        for node in self.ring.nodes_for(routing_key):
+            if not self._available(node):
+                continue
+            try:
+                return call(self.clients[node])
+            except SMCUnavailable as e:
+                print(f"❌ SMC node unavailable: {e}")
+                self._eject(node)
+        print("❌ No SMC node available")
+        return None
+
+    @staticmethod
+    def _routing_key(farmer_id, secret_key):
+        # Farmer ID when the caller knows it; the key digest is just as stable per farmer otherwise
+        if farmer_id is not None:
+            return f"farmer:{farmer_id}"
+        return f"key:{hashlib.sha256(bytes(secret_key)).hexdigest()}"
+
+    def get_vc(self, message_id, secret_key, scheme=None, farmer_id=None):
+        """Generate the VC for a message ID with the farmer's raw master key"""
+        return self._route(self._routing_key(farmer_id, secret_key),
+                           lambda client: client.get_vc(message_id, secret_key, scheme))
+
+    def get_message_id(self, vc, secret_key, scheme=None, farmer_id=None):
+        """Decrypt a VC back into its message ID with the farmer's raw master key"""
+        return self._route(self._routing_key(farmer_id, secret_key),
+                           lambda client: client.get_message_id(vc, secret_key, scheme))
+
+    def get_vcs(self, jobs):
+        """
+        Generate VCs for many (message_id, secret_key, scheme[, farmer_id]) jobs.
+        Jobs are grouped by owning node and each group goes out as one batch.
+
+        Returns:
+            list: One response dict (or None) per job, in order
+        """
+        results = [None] * len(jobs)
+        pending = list(range(len(jobs)))
+        for _ in range(len(self.clients) + 1):
+            groups = {}
+            for index in pending:
+                job = jobs[index]
+                key = self._routing_key(job[3] if len(job) > 3 else None, job[1])
+                node = next((n for n in self.ring.nodes_for(key) if self._available(n)), None)
+                if node is not None:
+                    groups.setdefault(node, []).append(index)
+
+            pending = []
+            for node, indexes in groups.items():
+                try:
+                    responses = self.clients[node].get_vcs([jobs[i][:3] for i in indexes])
+                except SMCUnavailable as e:
+                    print(f"❌ SMC node unavailable: {e}")
+                    self._eject(node)
+                    pending.extend(indexes)  # retried on the next node of the ring
+                    continue
+                for index, response in zip(indexes, responses):
+                    results[index] = response
+            if not pending:
+                break
+        return results
+
+
+def create_node_clients(transport=None):
+    """
+    Build one client per configured SMC node.
+
+    Returns:
+        dict: node name -> HTTPSMCClient / RPCSMCClient
+    """
+    transport = (transport or os.getenv('SMC_TRANSPORT', TRANSPORT_HTTP)).lower()
+    if transport == TRANSPORT_RPC:
+        addresses = os.getenv('SMC_RPC_ADDRESSES') or os.getenv('SMC_RPC_ADDRESS', 'localhost:5002')
+        return {address: RPCSMCClient(address) for address in split_list(addresses)}
+    urls = os.getenv('SMC_URLS') or os.getenv('SMC_URL', 'http://localhost:5001')
+    api_key = os.getenv('SMC_API_KEY')
+    return {url: HTTPSMCClient(url, api_key=api_key) for url in split_list(urls)}
+
+
+def split_list(value):
+    """Split a comma-separated setting into its non-empty items"""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+# Created on first use (not at import time) so importing this module stays cheap
+_smc_client = None
+
+
+def get_smc_client():
+    """
+    Return the shared SMC client for the configured transport and nodes, creating it on first use.
+
+    Returns:
+        BalancedSMCClient
+    """
+    global _smc_client
+    if _smc_client is None:
+        _smc_client = BalancedSMCClient(create_node_clients())
+    return _smc_client
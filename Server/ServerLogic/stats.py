@@ -0,0 +1,332 @@
+"""
+Delivery and verification statistics.
+
+The advisory_stats table holds running counters per advisory (sent, verified,
+time-to-verify) plus a totals row (ALL_ADVISORIES), so /api/stats and
+`populate_db.py status` read one row by primary key instead of aggregating
+farming_advisories.
+
+The send path (record_delivery) and the verify path (record_verification)
+add to an in-process buffer. The buffer is written to the database at most
+every STATS_FLUSH_INTERVAL seconds (default 5; 0 writes on every event) as one
+UPDATE per touched advisory. That keeps a broadcast to a million farmers from
+turning the advisory's stats row into a lock every send waits on. Counters
+that fail to write stay buffered for the next flush, and workers flush on exit.
+
+A worker that is killed loses at most one interval of counts, and deliveries
+inserted in bulk (generate-synthetic) bypass the buffer: `populate_db.py
+rebuild-stats` recomputes every counter from farming_advisories.
+"""
+import os
+import atexit
+import threading
+
+from sqlalchemy import and_, bindparam, case, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .db_routing import read
+from .models import AdvisoryStats, FarmingAdvisory
+
+# advisory_stats row holding the totals over all advisories
+ALL_ADVISORIES = 0
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+STATS = AdvisoryStats.__table__
+
+
+def latest(first, second):
+    """The later of two optional timestamps"""
+    if first is None or second is None:
+        return first or second
+    return max(first, second)
+
+
+class Counters:
+    """Increments for one advisory_stats row"""
+    __slots__ = ('sent', 'verified', 'verify_seconds', 'timed', 'last_sent_at', 'last_verified_at')
+
+    def __init__(self, sent=0, verified=0, verify_seconds=0.0, timed=0, last_sent_at=None, last_verified_at=None):
+        self.sent = sent
+        self.verified = verified
+        self.verify_seconds = verify_seconds
+        self.timed = timed
+        self.last_sent_at = last_sent_at
+        self.last_verified_at = last_verified_at
+
+    def add(self, other):
+        self.sent += other.sent
+        self.verified += other.verified
+        self.verify_seconds += other.verify_seconds
+        self.timed += other.timed
+        self.last_sent_at = latest(self.last_sent_at, other.last_sent_at)
+        self.last_verified_at = latest(self.last_verified_at, other.last_verified_at)
+        return self
+
+    def negated(self):
+        """Counters that undo these (timestamps are left alone)"""
+        return Counters(-self.sent, -self.verified, -self.verify_seconds, -self.timed)
+
+
+def with_totals(per_advisory):
+    """Add the ALL_ADVISORIES row summing every advisory's counters"""
+    totals = Counters()
+    for counters in per_advisory.values():
+        totals.add(counters)
+    return {**per_advisory, ALL_ADVISORIES: totals}
+
+
+def later_of(column, name):
+    """SET expression keeping the later of a column and an optional bound timestamp"""
+    value = bindparam(name, type_=db.DateTime)
+    return case(
+        (and_(value.isnot(None), or_(column.is_(None), column < value)), value),
+        else_=column
+    )
+
+
+# One executemany round trip per flush: every touched row is incremented in place
+APPLY_COUNTERS = (
+    update(STATS)
+    .where(STATS.c.advisory_id == bindparam('key'))
+    .values(
+        sent_count=STATS.c.sent_count + bindparam('sent'),
+        verified_count=STATS.c.verified_count + bindparam('verified'),
+        verify_seconds_total=STATS.c.verify_seconds_total + bindparam('verify_seconds'),
+        verify_timed_count=STATS.c.verify_timed_count + bindparam('timed'),
+        last_sent_at=later_of(STATS.c.last_sent_at, 'last_sent_at'),
+        last_verified_at=later_of(STATS.c.last_verified_at, 'last_verified_at'),
+    )
+)
+
+
+def ensure_rows(connection, keys):
+    """Create the advisory_stats rows that don't exist yet"""
+    existing = set(connection.execute(select(STATS.c.advisory_id).where(STATS.c.advisory_id.in_(keys))).scalars())
+    for key in keys:
+        if key in existing:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(STATS).values(advisory_id=key))
+        except IntegrityError:
+            # Another worker created it first
+            pass
+
+
+def apply_counters(connection, counters):
+    """
+    Add counters to their advisory_stats rows.
+
+    Args:
+        connection: SQLAlchemy connection (inside a transaction)
+        counters (dict): advisory ID -> Counters
+    """
+    # Same row order in every worker, so concurrent flushes can't deadlock
+    keys = sorted(counters)
+    if not keys:
+        return
+    ensure_rows(connection, keys)
+    connection.execute(APPLY_COUNTERS, [
+        {
+            'key': key,
+            'sent': counters[key].sent,
+            'verified': counters[key].verified,
+            'verify_seconds': counters[key].verify_seconds,
+            'timed': counters[key].timed,
+            'last_sent_at': counters[key].last_sent_at,
+            'last_verified_at': counters[key].last_verified_at,
+        }
+        for key in keys
+    ])
+
+
+def verify_seconds_expr(dialect_name):
+    """SQL for the seconds between a delivery's sent_at and verified_at"""
+    if dialect_name == 'postgresql':
+        return func.extract('epoch', FarmingAdvisory.verified_at - FarmingAdvisory.sent_at)
+    return (func.julianday(FarmingAdvisory.verified_at) - func.julianday(FarmingAdvisory.sent_at)) * 86400
+
+
+def delivery_counters(connection, *criteria):
+    """
+    Aggregate farming_advisories into per-advisory counters.
+
+    Args:
+        connection: SQLAlchemy connection
+        *criteria: Filters on FarmingAdvisory (none: the whole table)
+
+    Returns:
+        dict: advisory ID -> Counters
+    """
+    delivered = FarmingAdvisory.sent_at.isnot(None)
+    verified = and_(FarmingAdvisory.verified, delivered)
+    timed = and_(verified, FarmingAdvisory.verified_at.isnot(None))
+    stmt = (
+        select(
+            FarmingAdvisory.advisory_id,
+            func.count(FarmingAdvisory.sent_at),
+            func.sum(case((verified, 1), else_=0)),
+            func.sum(case((timed, verify_seconds_expr(connection.dialect.name)), else_=0)),
+            func.sum(case((timed, 1), else_=0)),
+            func.max(FarmingAdvisory.sent_at),
+            func.max(case((verified, FarmingAdvisory.verified_at))),
+        )
+        .where(*criteria)
+        .group_by(FarmingAdvisory.advisory_id)
+    )
+    return {
+        row[0]: Counters(int(row[1]), int(row[2] or 0), float(row[3] or 0), int(row[4] or 0), row[5], row[6])
+        for row in connection.execute(stmt)
+    }
+
+
+def rebuild_stats(connection):
+    """
+    Recompute every counter from farming_advisories (a full scan - run it offline).
+
+    Returns:
+        int: Number of advisories with statistics
+    """
+    per_advisory = delivery_counters(connection)
+    connection.execute(delete(STATS))
+    apply_counters(connection, with_totals(per_advisory))
+    return len(per_advisory)
+
+
+def subtract_deliveries(connection, *criteria):
+    """Take the deliveries matching `criteria` out of the counters (before deleting them)"""
+    per_advisory = {key: counters.negated() for key, counters in delivery_counters(connection, *criteria).items()}
+    apply_counters(connection, with_totals(per_advisory))
+
+
+class StatsBuffer:
+    """Counters recorded by this process and not yet written to advisory_stats"""
+
+    def __init__(self, engine, interval):
+        self.engine = engine
+        self.interval = interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def _schedule(self):
+        """Start the flush timer if it isn't running (call with the lock held)"""
+        if self.timer is None and self.pending:
+            self.timer = threading.Timer(self.interval, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _merge(self, pending):
+        for key, counters in pending.items():
+            self.pending.setdefault(key, Counters()).add(counters)
+
+    def add(self, advisory_id, counters):
+        with self.lock:
+            self._merge({advisory_id: counters, ALL_ADVISORIES: counters})
+            if self.interval > 0:
+                self._schedule()
+        if self.interval <= 0:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered counters.
+
+        Returns:
+            int: Number of advisory_stats rows updated
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not pending:
+            return 0
+        try:
+            with self.engine.begin() as connection:
+                apply_counters(connection, pending)
+            return len(pending)
+        except Exception as e:
+            print(f"⚠️  Could not write delivery stats ({e}), keeping them for the next flush")
+            with self.lock:
+                self._merge(pending)
+                if self.interval > 0:
+                    self._schedule()
+            return 0
+
+
+# Buffer for this process, created on first use (see get_stats_buffer)
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_stats_buffer():
+    """Get this process's stats buffer (needs an app context the first time)"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                interval = float(os.getenv('STATS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+                _buffer = StatsBuffer(db.engine, interval)
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def flush_stats():
+    """Write this process's buffered counters now (worker shutdown, tests)"""
+    return _buffer.flush() if _buffer is not None else 0
+
+
+def record_sent(advisory_id, sent_at):
+    """Count one delivery of an advisory"""
+    try:
+        get_stats_buffer().add(int(advisory_id), Counters(sent=1, last_sent_at=sent_at))
+    except Exception as e:
+        print(f"⚠️  Could not record delivery stats: {e}")
+
+
+def record_verified(advisory_id, sent_times, verified_at):
+    """
+    Count the deliveries of an advisory that a verification confirmed.
+
+    Args:
+        advisory_id (int): Advisory ID
+        sent_times (list): sent_at of each delivery newly marked verified
+        verified_at (datetime): When the farmer verified
+    """
+    if not sent_times:
+        return
+    try:
+        get_stats_buffer().add(int(advisory_id), Counters(
+            verified=len(sent_times),
+            verify_seconds=sum((verified_at - sent_at).total_seconds() for sent_at in sent_times),
+            timed=len(sent_times),
+            last_verified_at=verified_at
+        ))
+    except Exception as e:
+        print(f"⚠️  Could not record verification stats: {e}")
+
+
+def get_stats(advisory_id=ALL_ADVISORIES):
+    """
+    Statistics for one advisory, or the totals.
+
+    Args:
+        advisory_id (int): Advisory ID (ALL_ADVISORIES for the totals)
+
+    Returns:
+        dict: Counters and derived rates (see AdvisoryStats.to_dict), None if the
+              advisory has no statistics yet
+    """
+    def load(session):
+        stats = session.get(AdvisoryStats, advisory_id)
+        return stats.to_dict() if stats else None
+
+    # Read-only and tolerant of a few seconds' lag: served by a read replica when configured
+    stats, _ = read(load, orm=True)
+    if stats is None and advisory_id == ALL_ADVISORIES:
+        stats = AdvisoryStats(advisory_id=ALL_ADVISORIES, sent_count=0, verified_count=0,
+                              verify_seconds_total=0.0, verify_timed_count=0).to_dict()
+    return stats
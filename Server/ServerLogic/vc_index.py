@@ -0,0 +1,145 @@
+"""
+Issued-VC reverse index.
+
+When VC_VERIFICATION_MODE=index, every VC the Server issues is recorded as
+(farmer_id, verification_code) -> advisory_id. USSD verification then resolves
+a dialled VC with one indexed lookup, and the SMC decryption is only used as a
+fallback for VCs that were issued before the index existed.
+
+VCs made with the one-way 'hmac' scheme (VC_SCHEME=hmac, or Advisory.vc_scheme)
+cannot be decrypted by the SMC at all, so they are always verified through
+the index, and using that scheme for the whole deployment turns the index on.
+
+VCs are only 6 digits, and HMAC VCs are a truncated MAC, so two advisories
+can give a farmer the same HMAC VC. The index never re-points an entry at a
+newer advisory (the farmer's first VC would then open the wrong one):
+record_issued_vc raises VCCollision instead, and the advisory is issued an
+FF3 VC for that farmer. FF3 is a permutation of the farmer's message IDs, so
+it never collides with another FF3 VC under the same key.
+"""
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import IssuedVerificationCode
+
+VC_MODE_SMC = 'smc'
+VC_MODE_INDEX = 'index'
+VC_VERIFICATION_MODES = [VC_MODE_SMC, VC_MODE_INDEX]
+
+# VC schemes the SMC supports: 'ff3' is reversible, 'hmac' is one-way but faster
+VC_SCHEME_FF3 = 'ff3'
+VC_SCHEME_HMAC = 'hmac'
+VC_SCHEMES = [VC_SCHEME_FF3, VC_SCHEME_HMAC]
+
+
+class VCCollision(Exception):
+    """The farmer already holds this VC for another advisory"""
+
+    def __init__(self, farmer_id, verification_code, advisory_id):
+        super().__init__(
+            f"Farmer {farmer_id} already holds VC {verification_code} for advisory {advisory_id}"
+        )
+        self.farmer_id = farmer_id
+        self.verification_code = verification_code
+        self.advisory_id = advisory_id
+
+
+def vc_index_enabled():
+    """
+    Check whether issued VCs should be recorded and looked up in the index.
+
+    Returns:
+        bool: True when VC_VERIFICATION_MODE is 'index' or the deployment uses HMAC VCs
+    """
+    return (
+        current_app.config.get('VC_VERIFICATION_MODE', VC_MODE_SMC) == VC_MODE_INDEX
+        or current_app.config.get('VC_SCHEME', VC_SCHEME_FF3) == VC_SCHEME_HMAC
+    )
+
+
+def get_vc_scheme(advisory_scheme=None):
+    """
+    Resolve the VC scheme for an advisory: its own vc_scheme if set, else the deployment's VC_SCHEME.
+
+    Args:
+        advisory_scheme (str): Advisory.vc_scheme (None = use the deployment default)
+
+    Returns:
+        str: 'ff3' or 'hmac'
+    """
+    return advisory_scheme or current_app.config.get('VC_SCHEME', VC_SCHEME_FF3)
+
+
+def record_issued_vc(farmer_id, advisory_id, verification_code):
+    """
+    Record (farmer_id, verification_code) -> advisory_id in the index.
+    An entry is never re-pointed: if the farmer already has this VC for another
+    advisory, VCCollision is raised and the index is left as it was.
+
+    Args:
+        farmer_id (int): Farmer the VC was issued to
+        advisory_id (int): Advisory the VC refers to
+        verification_code (str): The VC sent to the farmer
+
+    Returns:
+        bool: True if the index entry exists after the call, False on error
+
+    Raises:
+        VCCollision: The farmer holds the same VC for another advisory
+    """
+    try:
+        advisory_id = int(advisory_id)
+        for _ in range(2):
+            entry = IssuedVerificationCode.query.filter_by(
+                farmer_id=farmer_id,
+                verification_code=verification_code
+            ).first()
+
+            if entry:
+                if entry.advisory_id != advisory_id:
+                    raise VCCollision(farmer_id, verification_code, entry.advisory_id)
+                return True
+
+            try:
+                db.session.add(IssuedVerificationCode(
+                    farmer_id=farmer_id,
+                    advisory_id=advisory_id,
+                    verification_code=verification_code
+                ))
+                db.session.commit()
+                return True
+            except IntegrityError:
+                # Another worker recorded the same VC first - loop round and check its advisory
+                db.session.rollback()
+        return False
+
+    except VCCollision:
+        raise
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error recording issued VC in index: {str(e)}")
+        return False
+
+
+def lookup_issued_vc(phone_number, verification_code):
+    """
+    Resolve a dialled VC to its advisory ID with one indexed lookup.
+
+    Args:
+        phone_number (str): Phone number the USSD request came from
+        verification_code (str): VC the farmer dialled
+
+    Returns:
+        tuple: (message_id, farmer_id) if the VC is in the index, None otherwise
+    """
+    try:
+        from .queries import issued_vc
+        
+        entry = issued_vc(phone_number, verification_code)
+        return (str(entry.advisory_id), entry.farmer_id) if entry is not None else None
+
+    except Exception as e:
+        print(f"❌ Error looking up issued VC: {str(e)}")
+        return None
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Time-spread campaigns (ServerLogic/campaigns.py) against a one-shot broadcast.
+
+Creates a throwaway SQLite database with --farmers farmers and sends them one
+advisory twice, through a stub send that takes --latency seconds and records
+when each SMS went out:
+
+    blast      every farmer at once from --concurrency threads (a plain broadcast)
+    campaign   a campaign with a --window second window, run by CampaignRunner
+
+Each farmer who gets the SMS then dials the USSD code after a random delay
+(exponential, mean --dial-delay seconds; --verify-share of farmers dial at all).
+For both runs it prints the sends and the simulated /ussd-callback
+verifications per second: their peak, and the p99 over the run. The campaign's
+verification peak should sit close to the average over its window instead of
+the blast's spike.
+
+Time is compressed: with the defaults, one second stands for a minute of a
+real broadcast (a 20 minute window, farmers dialling ~3 minutes after the SMS).
+
+--lease-check instead runs a slow campaign (4 farmers over 12 seconds, so ~3s
+between sends) with a 1 second lease, and a second worker polling alongside.
+It exits non-zero unless every farmer got exactly one SMS. That covers a rate
+below 1/lease, where the lease has to be renewed between sends.
+
+Usage (from the Server/ directory):
+    python benchmarks/campaign_bench.py
+    python benchmarks/campaign_bench.py --farmers 5000 --window 30 --dial-delay 5
+    python benchmarks/campaign_bench.py --lease-check
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_second(times, started):
+    """Events per second since `started`"""
+    counts = Counter(int(moment - started) for moment in times)
+    return [counts.get(second, 0) for second in range(max(counts, default=-1) + 1)]
+
+
+def report(label, sends, started, args, rng):
+    verifications = [sent + rng.expovariate(1.0 / args.dial_delay) for sent in sends if rng.random() < args.verify_share]
+    send_rate = per_second(sends, started)
+    verify_rate = per_second(verifications, started)
+    p99 = sorted(verify_rate)[min(int(len(verify_rate) * 0.99), len(verify_rate) - 1)] if verify_rate else 0
+    print(f"   {label:<9} sent over {max(sends) - started:5.1f}s  peak {max(send_rate):>5} SMS/s  |  "
+          f"verifications peak {max(verify_rate):>5}/s  p99 {p99:>5}/s  over {len(verify_rate)}s")
+
+
+def lease_check(app, advisory_id, phones):
+    """Run a campaign slower than one send per lease with two workers; True if nobody got it twice"""
+    from ServerLogic import db
+    from ServerLogic.models import Campaign
+    from ServerLogic.campaigns import CampaignRunner, create_campaign
+    from ServerLogic.segments import Segment
+
+    sends = Counter()
+    lock = threading.Lock()
+
+    def send(advisory_id, phone_number):
+        with lock:
+            sends[phone_number] += 1
+        return True
+
+    with app.app_context():
+        campaign = create_campaign(db.session, advisory_id, Segment(), window_minutes=0.2)
+        db.session.commit()
+        campaign_id = campaign.id
+    options = dict(send=send, concurrency=2, lease=1.0, poll_interval=0.2, checkpoint_interval=2.0)
+    first = CampaignRunner(app, worker_id='first', **options)
+    second = CampaignRunner(app, worker_id='second', **options)
+    other = threading.Thread(target=second.run)
+    started = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        first.run(once=True)
+        other.start()
+        # The first worker may leave the last page to the second: wait for the campaign to finish
+        while time.monotonic() - started < 60:
+            with app.app_context():
+                if db.session.get(Campaign, campaign_id).status == 'completed':
+                    break
+            time.sleep(0.2)
+        second.stop()
+        other.join()
+    with app.app_context():
+        campaign = db.session.get(Campaign, campaign_id)
+        done = campaign.sent_count + campaign.failed_count
+        print(f"🔒 Lease check: {len(phones)} farmers over 12s with a 1s lease, {time.monotonic() - started:.1f}s")
+        print(f"   sends per farmer {sorted(sends[phone] for phone in phones)}, campaign {campaign.status}, "
+              f"{done} of {campaign.total} done")
+        return all(sends[phone] == 1 for phone in phones) and done == campaign.total == len(phones)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare a time-spread campaign with a one-shot broadcast')
+    parser.add_argument('--farmers', type=int, default=2_000, help='Farmers to broadcast to')
+    parser.add_argument('--window', type=float, default=20.0, help='Campaign window (seconds)')
+    parser.add_argument('--concurrency', type=int, default=32, help='Sending threads')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per send (SMC call + SMS)')
+    parser.add_argument('--dial-delay', type=float, default=3.0, help='Mean seconds from SMS to USSD verification')
+    parser.add_argument('--verify-share', type=float, default=0.6, help='Share of farmers who verify')
+    parser.add_argument('--lease-check', action='store_true', help='Check a campaign slower than its lease sends each farmer once')
+    args = parser.parse_args()
+    if args.lease_check:
+        args.farmers = 4
+
+    temp_path = os.path.join(tempfile.gettempdir(), f"farmware-campaign-bench-{os.getpid()}.db")
+    os.environ['DATABASE_URL'] = f"sqlite:///{temp_path}"
+
+    from sqlalchemy import insert, select
+    from ServerLogic import create_app, db
+    from ServerLogic.models import Advisory, Farmer
+    from ServerLogic.campaigns import CampaignRunner, create_campaign
+    from ServerLogic.segments import Segment
+
+    rng = random.Random(42)
+    try:
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            db.session.execute(insert(Farmer), [
+                {'phone': f"+2547{i:08d}", 'phone_e164': f"+2547{i:08d}", 'secret_key': b'\0' * 32}
+                for i in range(args.farmers)
+            ])
+            advisory = Advisory(title='Benchmark advisory', message='Benchmark')
+            db.session.add(advisory)
+            db.session.commit()
+            advisory_id = advisory.id
+            phones = db.session.execute(select(Farmer.phone)).scalars().all()
+
+        if args.lease_check:
+            if not lease_check(app, advisory_id, phones):
+                print("❌ A farmer got the campaign SMS more or less than once")
+                sys.exit(1)
+            print("✅ Every farmer got the SMS exactly once")
+            return
+
+        sends = []
+        lock = threading.Lock()
+
+        def send(advisory_id, phone_number):
+            time.sleep(args.latency)
+            with lock:
+                sends.append(time.monotonic())
+            return True
+
+        print(f"⏱️  {args.farmers:,} farmers, {args.latency * 1000:.0f} ms per send, farmers dial "
+              f"~{args.dial_delay:.0f}s after the SMS")
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda phone: send(advisory_id, phone), phones))
+        report('blast', sends, started, args, rng)
+
+        sends.clear()
+        with app.app_context():
+            create_campaign(db.session, advisory_id, Segment(), window_minutes=args.window / 60)
+            db.session.commit()
+        runner = CampaignRunner(app, send=send, concurrency=args.concurrency, max_rate=10_000,
+                                checkpoint_interval=1.0, poll_interval=0.2)
+        started = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            runner.run(once=True)
+        report('campaign', sends, started, args, rng)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Farmer key snapshot benchmark.
+
+Writes a snapshot for N synthetic farmers (no database needed), then measures
+phone -> key lookups/sec from the mmap and how much memory the lookups cost
+the process compared with the size of the file.
+
+Usage (from the Server/ directory):
+    python benchmarks/key_snapshot_bench.py
+    python benchmarks/key_snapshot_bench.py --farmers 5000000 --lookups 500000
+    python benchmarks/key_snapshot_bench.py --path /var/lib/farmware/bench.snap --keep
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ServerLogic.keys import KEY_VERSION_RAW
+from ServerLogic.key_snapshot import KeySnapshot, write_snapshot
+
+
+def synthetic_farmers(count, seed):
+    """(farmer_id, phone, secret_key, key_version) for `count` farmers"""
+    rng = random.Random(seed)
+    for farmer_id in range(1, count + 1):
+        yield farmer_id, f"+2547{farmer_id:08d}", rng.randbytes(32), KEY_VERSION_RAW
+
+
+def rss_mb():
+    """(private, file-backed) resident MB from /proc (Linux), None elsewhere"""
+    try:
+        with open('/proc/self/status') as status:
+            fields = dict(line.split(':', 1) for line in status)
+        return int(fields['RssAnon'].split()[0]) / 1024, int(fields['RssFile'].split()[0]) / 1024
+    except (OSError, KeyError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark memory-mapped farmer key lookups')
+    parser.add_argument('--farmers', type=int, default=1_000_000, help='Farmers in the snapshot')
+    parser.add_argument('--lookups', type=int, default=200_000, help='Lookups to time')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--path', help='Snapshot file to write (defaults to a temporary file)')
+    parser.add_argument('--keep', action='store_true', help='Keep the snapshot file afterwards')
+    args = parser.parse_args()
+
+    path = args.path or os.path.join(tempfile.gettempdir(), f"farmware-bench-{os.getpid()}.snap")
+    try:
+        print(f"📝 Writing snapshot of {args.farmers:,} farmers to {path}...")
+        started = time.perf_counter()
+        write_snapshot(path, synthetic_farmers(args.farmers, args.seed))
+        print(f"   {os.path.getsize(path) / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s")
+
+        rng = random.Random(args.seed + 1)
+        phones = [f"+2547{rng.randrange(1, args.farmers + 1):08d}" for _ in range(args.lookups)]
+
+        rss_before = rss_mb()
+        snapshot = KeySnapshot(path)
+        started = time.perf_counter()
+        misses = sum(1 for phone in phones if snapshot.lookup(phone) is None)
+        elapsed = time.perf_counter() - started
+
+        print(f"✅ {args.lookups / elapsed:,.0f} lookups/sec ({elapsed * 1e6 / args.lookups:.1f} µs each, {misses} misses)")
+        rss_after = rss_mb()
+        if rss_before and rss_after:
+            print(f"   Private memory +{rss_after[0] - rss_before[0]:.1f} MB, "
+                  f"file-backed (shared page cache) +{rss_after[1] - rss_before[1]:.1f} MB")
+    finally:
+        if not args.keep and os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
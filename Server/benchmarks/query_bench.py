@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Per-query overhead of the hot lookups: ORM Query vs core select vs the
+prebuilt statements in ServerLogic/queries.py.
+
+Times farmer-by-phone and advisory-by-id the way the Server used to run them
+(Farmer.query / Advisory.query.get), as a core select() rebuilt on every call,
+as a lambda_stmt, and through ServerLogic/queries.py. The database round trip
+is the same for all of them, so the difference is Python-side statement
+building, caching and ORM loading.
+
+Uses DATABASE_URL (e.g. after `populate_db.py generate-synthetic`). With
+--setup it creates a throwaway SQLite database with --farmers farmers instead.
+
+Usage (from the Server/ directory):
+    python benchmarks/query_bench.py --setup
+    python benchmarks/query_bench.py --lookups 50000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(label, lookups, fn, session):
+    """
+    Run fn over every lookup and print µs per call.
+
+    Returns:
+        float: Microseconds per call
+    """
+    elapsed = 0.0
+    for value in lookups:
+        # A fresh session per request: nothing may come from the identity map
+        session.expunge_all()
+        started = time.perf_counter()
+        fn(value)
+        elapsed += time.perf_counter() - started
+    per_call = elapsed * 1e6 / len(lookups)
+    print(f"   {label:<36} {per_call:>8.1f} µs/query")
+    return per_call
+
+
+def setup_database(path, farmers, advisories):
+    """Create a SQLite database with synthetic farmers and advisories"""
+    from sqlalchemy import insert
+    from ServerLogic import db
+    from ServerLogic.models import Farmer, Advisory
+
+    db.create_all()
+    rng = random.Random(42)
+    db.session.execute(insert(Farmer), [
+        {'phone': f"+2547{i:08d}", 'phone_e164': f"+2547{i:08d}", 'secret_key': rng.randbytes(32)}
+        for i in range(1, farmers + 1)
+    ])
+    db.session.execute(insert(Advisory), [
+        {'title': f"Advisory {i}", 'message': f"Message {i}"} for i in range(1, advisories + 1)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare hot-lookup query styles')
+    parser.add_argument('--lookups', type=int, default=20_000, help='Lookups per measurement')
+    parser.add_argument('--setup', action='store_true', help='Use a temporary SQLite database with synthetic data')
+    parser.add_argument('--farmers', type=int, default=100_000, help='Farmers to create with --setup')
+    parser.add_argument('--advisories', type=int, default=1_000, help='Advisories to create with --setup')
+    args = parser.parse_args()
+
+    # Query.get() is the legacy API being measured - don't warn about it
+    warnings.filterwarnings('ignore', message='.*Query.get.*')
+
+    temp_path = None
+    if args.setup:
+        temp_path = os.path.join(tempfile.gettempdir(), f"farmware-query-bench-{os.getpid()}.db")
+        os.environ['DATABASE_URL'] = f"sqlite:///{temp_path}"
+
+    from sqlalchemy import func, lambda_stmt, select
+    from ServerLogic import create_app, db
+    from ServerLogic.models import Farmer, Advisory
+    from ServerLogic.queries import farmer_by_phone, advisory_by_id
+
+    try:
+        app = create_app()
+        with app.app_context():
+            if args.setup:
+                print(f"📝 Creating {args.farmers:,} farmers and {args.advisories:,} advisories in {temp_path}...")
+                setup_database(temp_path, args.farmers, args.advisories)
+
+            session = db.session
+            rng = random.Random(7)
+            farmer_ids = session.execute(select(func.min(Farmer.id), func.max(Farmer.id))).one()
+            advisory_ids = session.execute(select(func.min(Advisory.id), func.max(Advisory.id))).one()
+            if farmer_ids[0] is None or advisory_ids[0] is None:
+                print("❌ No farmers/advisories in the database - run with --setup or generate-synthetic first")
+                sys.exit(1)
+
+            phones = session.execute(
+                select(Farmer.phone_e164).where(Farmer.id.in_(
+                    [rng.randint(*farmer_ids) for _ in range(min(args.lookups, 5_000))]
+                ))
+            ).scalars().all()
+            phones = [rng.choice(phones) for _ in range(args.lookups)]
+            advisories = [rng.randint(*advisory_ids) for _ in range(args.lookups)]
+
+            # Warm up connections and statement caches
+            for phone in phones[:100]:
+                farmer_by_phone(phone)
+                Farmer.query.filter_by(phone_e164=phone).first()
+
+            print(f"⏱️  {args.lookups:,} lookups each ({db.engine.dialect.name})")
+            print("👨‍🌾 Farmer by phone")
+            orm = timed("ORM Query (.filter_by().first())", phones,
+                        lambda phone: Farmer.query.filter_by(phone_e164=phone).first(), session)
+            timed("core select, rebuilt each call", phones,
+                  lambda phone: session.execute(
+                      select(Farmer.id, Farmer.secret_key, Farmer.key_version).where(Farmer.phone_e164 == phone)
+                  ).first(), session)
+            timed("lambda_stmt", phones,
+                  lambda phone: session.execute(lambda_stmt(
+                      lambda: select(Farmer.id, Farmer.secret_key, Farmer.key_version).where(Farmer.phone_e164 == phone)
+                  )).first(), session)
+            cached = timed("prebuilt (queries.farmer_by_phone)", phones, farmer_by_phone, session)
+            print(f"   -> {orm / cached:.1f}x faster than the ORM Query")
+
+            print("📢 Advisory by ID")
+            orm = timed("ORM Query (.get())", advisories, lambda advisory_id: Advisory.query.get(advisory_id), session)
+            timed("core select, rebuilt each call", advisories,
+                  lambda advisory_id: session.execute(
+                      select(Advisory.id, Advisory.title, Advisory.message, Advisory.vc_scheme)
+                      .where(Advisory.id == advisory_id)
+                  ).first(), session)
+            timed("lambda_stmt", advisories,
+                  lambda advisory_id: session.execute(lambda_stmt(
+                      lambda: select(Advisory.id, Advisory.title, Advisory.message, Advisory.vc_scheme)
+                      .where(Advisory.id == advisory_id)
+                  )).first(), session)
+            cached = timed("prebuilt (queries.advisory_by_id)", advisories, advisory_by_id, session)
+            print(f"   -> {orm / cached:.1f}x faster than the ORM Query")
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+if __name__ == '__main__':
+    main()
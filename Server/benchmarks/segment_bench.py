@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Segment resolution over millions of farmers (ServerLogic/segments.py).
+
+For a few typical targeting segments it measures how long it takes to count the
+segment and to resolve every farmer ID in keyset pages (what a campaign export
+does), next to resolving all farmers (the untargeted broadcast). It also prints
+the query plan for the first page, which should show the region/language
+b-tree indexes and, on PostgreSQL, a bitmap scan of the GIN index on crops.
+
+Uses DATABASE_URL (e.g. PostgreSQL after `populate_db.py generate-synthetic`,
+which sets segment attributes). With --setup it creates a throwaway SQLite
+database with --farmers farmers instead; SQLite has no GIN index, so crop-only
+segments are scans there.
+
+Usage (from the Server/ directory):
+    python benchmarks/segment_bench.py --setup --farmers 1000000
+    python benchmarks/segment_bench.py --page-size 10000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEGMENTS = [
+    ('one county', {'region': 'nakuru'}),
+    ('one crop', {'crops': ['tea']}),
+    ('county + crop', {'region': 'nakuru', 'crops': ['maize']}),
+    ('3 counties, any of 2 crops, Swahili', {'region': ['kericho', 'bomet', 'nandi'], 'crops': ['tea', 'maize'], 'language': 'sw'}),
+    ('grows maize and beans', {'crops': ['maize', 'beans'], 'crops_match': 'all'}),
+]
+
+
+def setup_database(farmers, batch_size=50_000):
+    """Create farmers with synthetic segment attributes (same distributions as generate-synthetic)"""
+    from sqlalchemy import insert
+    from ServerLogic import db
+    from ServerLogic.models import Farmer
+    from populate_db import SYNTHETIC_COUNTIES, SYNTHETIC_CROPS, SYNTHETIC_LANGUAGES
+
+    db.create_all()
+    rng = random.Random(42)
+    counties = [county.lower() for county in SYNTHETIC_COUNTIES]
+    languages, weights = zip(*SYNTHETIC_LANGUAGES)
+    for start in range(0, farmers, batch_size):
+        db.session.execute(insert(Farmer), [
+            {
+                'phone': f"+2547{i:08d}",
+                'phone_e164': f"+2547{i:08d}",
+                'secret_key': b'\0' * 32,
+                'region': rng.choice(counties),
+                'crops': sorted(rng.sample(SYNTHETIC_CROPS, rng.randint(1, 3))),
+                'language': rng.choices(languages, weights)[0],
+            }
+            for i in range(start, min(start + batch_size, farmers))
+        ])
+        db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def query_plan(connection, stmt):
+    """The database's plan for a statement, one line per step"""
+    compiled = stmt.compile(connection, compile_kwargs={'literal_binds': True})
+    if connection.dialect.name == 'postgresql':
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled}").scalars()
+    else:
+        rows = (row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}"))
+    return list(rows)
+
+
+def measure(connection, segment, page_size):
+    """
+    Count a segment and resolve all of its farmer IDs.
+
+    Returns:
+        tuple: (farmers, count seconds, resolve seconds)
+    """
+    from ServerLogic.segments import count_farmers, iter_farmer_ids
+
+    started = time.perf_counter()
+    total = count_farmers(connection, segment)
+    counted = time.perf_counter()
+    resolved = sum(1 for _ in iter_farmer_ids(connection, segment, batch_size=page_size))
+    finished = time.perf_counter()
+    assert resolved == total, f"resolved {resolved} IDs but counted {total}"
+    return total, counted - started, finished - counted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure farmer segment resolution')
+    parser.add_argument('--setup', action='store_true', help='Use a temporary SQLite database with synthetic farmers')
+    parser.add_argument('--farmers', type=int, default=1_000_000, help='Farmers to create with --setup')
+    parser.add_argument('--page-size', type=int, default=10_000, help='Farmer IDs per keyset page')
+    parser.add_argument('--plans', action='store_true', help='Print the query plan of each segment')
+    args = parser.parse_args()
+
+    temp_path = None
+    if args.setup:
+        temp_path = os.path.join(tempfile.gettempdir(), f"farmware-segment-bench-{os.getpid()}.db")
+        os.environ['DATABASE_URL'] = f"sqlite:///{temp_path}"
+
+    from ServerLogic import create_app, db
+    from ServerLogic.models import Farmer
+    from ServerLogic.segments import Segment, segment_select
+
+    try:
+        app = create_app()
+        with app.app_context():
+            if args.setup:
+                print(f"📝 Creating {args.farmers:,} farmers in {temp_path}...")
+                started = time.perf_counter()
+                setup_database(args.farmers)
+                print(f"   done in {time.perf_counter() - started:.0f}s")
+
+            connection = db.session.connection()
+            print(f"⏱️  Segment resolution ({connection.dialect.name}, pages of {args.page_size:,} IDs)")
+            everyone, count_time, resolve_time = measure(connection, Segment(), args.page_size)
+            if not everyone:
+                print("❌ No farmers in the database - run with --setup or generate-synthetic first")
+                sys.exit(1)
+            print(f"   {'everyone (untargeted broadcast)':<40} {everyone:>10,} farmers  "
+                  f"count {count_time * 1000:>8.1f} ms  resolve {resolve_time * 1000:>8.1f} ms")
+
+            for label, spec in SEGMENTS:
+                segment = Segment.from_dict(spec)
+                total, count_time, resolve_time = measure(connection, segment, args.page_size)
+                share = total / everyone
+                print(f"   {label:<40} {total:>10,} farmers  count {count_time * 1000:>8.1f} ms  "
+                      f"resolve {resolve_time * 1000:>8.1f} ms  ({share:.1%} of the SMS volume)")
+                if args.plans:
+                    stmt = segment_select(segment, connection.dialect.name).order_by(Farmer.id).limit(args.page_size)
+                    for line in query_plan(connection, stmt):
+                        print(f"      {line}")
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+if __name__ == '__main__':
+    main()
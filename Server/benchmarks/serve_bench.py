@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the production serving profiles.
+
+Launches the Server or the SMC under gunicorn with its gunicorn.conf.py,
+waits until it answers, then fires requests from a pool of client threads and
+reports requests/sec and latency percentiles. The server is stopped at the end.
+
+Usage (from the Server/ directory):
+    python benchmarks/serve_bench.py --service smc --requests 5000 --concurrency 32
+    python benchmarks/serve_bench.py --service server --workers 4 --threads 16
+    python benchmarks/serve_bench.py --service smc --url http://localhost:5001   # already running
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import statistics
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(SERVER_DIR)
+
+# What each service is benchmarked with
+SERVICES = {
+    'server': {
+        'dir': SERVER_DIR,
+        'port': 5100,
+        'bind_env': 'GUNICORN_BIND',
+        'workers_env': 'GUNICORN_WORKERS',
+        'threads_env': 'GUNICORN_THREADS',
+        'method': 'GET',
+        'path': '/health',
+        'payload': None,
+    },
+    'smc': {
+        'dir': os.path.join(REPO_DIR, 'SMC'),
+        'port': 5101,
+        'bind_env': 'SMC_GUNICORN_BIND',
+        'workers_env': 'SMC_GUNICORN_WORKERS',
+        'threads_env': None,
+        'method': 'POST',
+        'path': '/get-vc',
+        # base64url(key-version byte 0x01 + b"BenchmarkSecret2025")
+        'payload': {'message_id': '42', 'secret_key': 'AUJlbmNobWFya1NlY3JldDIwMjU', 'key_encoding': 'b64url'},
+    },
+}
+
+
+def start_gunicorn(service, workers=None, threads=None):
+    """
+    Start gunicorn for a service using its own gunicorn.conf.py.
+
+    Returns:
+        tuple: (Popen process, base URL)
+    """
+    config = SERVICES[service]
+    env = dict(os.environ)
+    env[config['bind_env']] = f"127.0.0.1:{config['port']}"
+    if workers:
+        env[config['workers_env']] = str(workers)
+    if threads and config['threads_env']:
+        env[config['threads_env']] = str(threads)
+
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=config['dir'],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return process, f"http://127.0.0.1:{config['port']}"
+
+
+def wait_until_ready(url, timeout=30):
+    """Poll the server until it accepts connections"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return True
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    return False
+
+
+def run_load(service, base_url, total_requests, concurrency):
+    """
+    Send total_requests requests from `concurrency` threads (one keep-alive session each).
+
+    Returns:
+        tuple: (elapsed seconds, list of latencies in seconds, error count)
+    """
+    config = SERVICES[service]
+    url = base_url + config['path']
+    local = threading.local()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def one_request(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = session.request(config['method'], url, json=config['payload'], timeout=30)
+            ok = response.status_code < 500
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total_requests)))
+    return time.perf_counter() - started, latencies, errors[0]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Farmware services under gunicorn')
+    parser.add_argument('--service', choices=sorted(SERVICES), default='smc')
+    parser.add_argument('--requests', type=int, default=2000, help='Total requests to send')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads')
+    parser.add_argument('--workers', type=int, help='Override the profile worker count')
+    parser.add_argument('--threads', type=int, help='Override the profile thread count (Server only)')
+    parser.add_argument('--url', help='Benchmark an already running instance instead of launching one')
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if not base_url:
+        print(f"🚀 Starting {args.service} under gunicorn ({SERVICES[args.service]['dir']}/gunicorn.conf.py)...")
+        process, base_url = start_gunicorn(args.service, args.workers, args.threads)
+
+    try:
+        if not wait_until_ready(base_url):
+            print(f"❌ {args.service} did not come up at {base_url}")
+            sys.exit(1)
+
+        # Warm up every worker before measuring
+        run_load(args.service, base_url, min(200, args.requests), args.concurrency)
+
+        print(f"⏱️  Sending {args.requests} requests with {args.concurrency} concurrent clients to {base_url}...")
+        elapsed, latencies, errors = run_load(args.service, base_url, args.requests, args.concurrency)
+
+        print(f"✅ {args.requests / elapsed:.0f} requests/sec ({elapsed:.2f}s total, {errors} errors)")
+        print(f"   Latency: p50 {percentile(latencies, 50) * 1000:.1f} ms | "
+              f"p95 {percentile(latencies, 95) * 1000:.1f} ms | "
+              f"p99 {percentile(latencies, 99) * 1000:.1f} ms | "
+              f"mean {statistics.mean(latencies) * 1000:.1f} ms")
+    finally:
+        if process:
+            # SIGTERM = graceful shutdown: workers finish in-flight requests
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
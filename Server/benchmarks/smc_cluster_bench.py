@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Multi-node SMC benchmark for the Server's consistent-hash SMC client.
+
+Starts N local SMC nodes (RPC or HTTP transport) on consecutive ports, routes
+VC requests for a population of farmers across them with BalancedSMCClient,
+and reports VCs/sec, how evenly farmers spread over the nodes, and - with
+--kill-one - that a node dying mid-run is ejected without failed requests.
+Run it for 1, 2, 4... nodes to see throughput scale with the node count.
+
+Usage (from the Server/ directory):
+    python benchmarks/smc_cluster_bench.py --nodes 1
+    python benchmarks/smc_cluster_bench.py --nodes 4 --concurrency 16
+    python benchmarks/smc_cluster_bench.py --nodes 3 --kill-one
+    python benchmarks/smc_cluster_bench.py --nodes 2 --transport http
+"""
+
+import os
+import sys
+import time
+import random
+import signal
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SMC_DIR = os.path.join(os.path.dirname(SERVER_DIR), 'SMC')
+sys.path.insert(0, SERVER_DIR)
+
+from ServerLogic.smc_client import BalancedSMCClient, HTTPSMCClient, RPCSMCClient, TRANSPORT_HTTP, TRANSPORT_RPC
+
+
+def start_nodes(transport, count, base_port):
+    """
+    Start `count` single-process SMC nodes.
+
+    Returns:
+        dict: node name -> Popen process
+    """
+    nodes = {}
+    for index in range(count):
+        port = base_port + index
+        env = dict(os.environ)
+        if transport == TRANSPORT_RPC:
+            env.update({'SMC_RPC_BIND': f"127.0.0.1:{port}", 'SMC_RPC_PROCESSES': '1'})
+            command, name = [sys.executable, 'rpc_main.py'], f"127.0.0.1:{port}"
+        else:
+            env.update({'SMC_GUNICORN_BIND': f"127.0.0.1:{port}", 'SMC_GUNICORN_WORKERS': '1'})
+            command, name = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], f"http://127.0.0.1:{port}"
+        nodes[name] = subprocess.Popen(command, cwd=SMC_DIR, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return nodes
+
+
+def make_client(transport, names):
+    if transport == TRANSPORT_RPC:
+        return BalancedSMCClient({name: RPCSMCClient(name) for name in names})
+    return BalancedSMCClient({name: HTTPSMCClient(name) for name in names})
+
+
+def wait_until_healthy(client, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(node.health_check(timeout=1) for node in client.clients.values()):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark VC throughput across several SMC nodes')
+    parser.add_argument('--nodes', type=int, default=2, help='SMC nodes to start')
+    parser.add_argument('--transport', choices=[TRANSPORT_RPC, TRANSPORT_HTTP], default=TRANSPORT_RPC)
+    parser.add_argument('--farmers', type=int, default=2_000, help='Distinct farmers in the workload')
+    parser.add_argument('--count', type=int, default=10_000, help='VC requests to send')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads')
+    parser.add_argument('--base-port', type=int, default=5300)
+    parser.add_argument('--kill-one', action='store_true', help='Kill one node halfway through the run')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    keys = [rng.getrandbits(256).to_bytes(32, 'big') for _ in range(args.farmers)]
+    requests_ = [(rng.randrange(args.farmers), str(rng.randrange(1, 100_000))) for _ in range(args.count)]
+
+    print(f"🚀 Starting {args.nodes} SMC node(s) ({args.transport})...")
+    processes = start_nodes(args.transport, args.nodes, args.base_port)
+    try:
+        client = make_client(args.transport, list(processes))
+        if not wait_until_healthy(client):
+            print("❌ SMC nodes did not come up")
+            sys.exit(1)
+
+        # How farmers spread over the ring
+        owners = Counter(next(client.ring.nodes_for(f"farmer:{farmer_id}")) for farmer_id in range(args.farmers))
+        for name in processes:
+            print(f"   {name:<28} owns {owners[name] / args.farmers:6.1%} of farmers")
+
+        victim = next(iter(processes)) if args.kill_one else None
+        failures = [0]
+
+        def one_request(item):
+            position, (farmer_id, message_id) = item
+            if victim and position == args.count // 2 and processes[victim].poll() is None:
+                print(f"💥 Killing {victim}")
+                processes[victim].send_signal(signal.SIGKILL)
+            response = client.get_vc(message_id, keys[farmer_id], 'ff3', farmer_id=farmer_id)
+            if not response:
+                failures[0] += 1
+
+        # Warm-up (also warms every node's cipher cache for its farmers)
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda f: client.get_vc('1', keys[f], 'ff3', farmer_id=f), range(args.farmers)))
+
+        print(f"⏱️  Sending {args.count} VC requests from {args.concurrency} threads...")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(one_request, enumerate(requests_)))
+        elapsed = time.perf_counter() - started
+
+        print(f"✅ {args.count / elapsed:,.0f} VCs/sec across {args.nodes} node(s) "
+              f"({elapsed:.2f}s, {failures[0]} failed)")
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == '__main__':
+    main()
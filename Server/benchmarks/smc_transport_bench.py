@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+SMC transport benchmark: JSON/HTTP vs the binary RPC protocol.
+
+Requests VCs from already running SMC instances through the Server's own SMC
+clients (ServerLogic/smc_client.py) and reports VCs/sec and per-call latency
+for HTTP, RPC one call at a time, and RPC with pipelined batches.
+
+Start the SMC first (from the SMC/ directory):
+    python main.py            # HTTP on :5001
+    python rpc_main.py        # RPC on :5002
+
+Usage (from the Server/ directory):
+    python benchmarks/smc_transport_bench.py
+    python benchmarks/smc_transport_bench.py --count 20000 --batch-size 256 --concurrency 4
+    python benchmarks/smc_transport_bench.py --rpc-address unix:/tmp/smc.sock --skip-http
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ServerLogic.smc_client import HTTPSMCClient, RPCSMCClient
+
+
+def make_jobs(count, seed=42):
+    """Random (message_id, raw key, scheme) jobs over 1,000 farmer keys"""
+    rng = random.Random(seed)
+    keys = [rng.getrandbits(256).to_bytes(32, 'big') for _ in range(1000)]
+    return [(str(rng.randrange(1, 100_000)), keys[i % len(keys)], 'ff3') for i in range(count)]
+
+
+def run(label, client, jobs, batch_size, concurrency):
+    """
+    Generate VCs for all jobs, `batch_size` per call, from `concurrency` threads.
+
+    Returns:
+        float: VCs per second
+    """
+    batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+
+    def call(batch):
+        if batch_size == 1:
+            message_id, key, scheme = batch[0]
+            return [client.get_vc(message_id, key, scheme)]
+        return client.get_vcs(batch)
+
+    # Warm up connections on every thread
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, batches[:concurrency]))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = [response for batch in pool.map(call, batches) for response in batch]
+    elapsed = time.perf_counter() - started
+
+    failed = sum(1 for response in results if not response or 'vc' not in response)
+    rate = len(jobs) / elapsed
+    print(f"   {label:<28} {rate:>10,.0f} VCs/sec   {elapsed * 1e6 / len(jobs) * concurrency:>8.1f} µs per VC per thread"
+          + (f"   ({failed} failed)" if failed else ""))
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare SMC transports')
+    parser.add_argument('--count', type=int, default=5_000, help='VCs per measurement')
+    parser.add_argument('--batch-size', type=int, default=128, help='Requests per pipelined RPC batch')
+    parser.add_argument('--concurrency', type=int, default=1, help='Client threads')
+    parser.add_argument('--http-url', default=os.getenv('SMC_URL', 'http://localhost:5001'))
+    parser.add_argument('--rpc-address', default=os.getenv('SMC_RPC_ADDRESS', 'localhost:5002'))
+    parser.add_argument('--skip-http', action='store_true')
+    args = parser.parse_args()
+
+    jobs = make_jobs(args.count)
+    print(f"⏱️  {args.count} VCs per transport, {args.concurrency} client thread(s)")
+
+    rates = {}
+    if not args.skip_http:
+        rates['http'] = run(f"http ({args.http_url})", HTTPSMCClient(args.http_url), jobs, 1, args.concurrency)
+    rpc = RPCSMCClient(args.rpc_address)
+    rates['rpc'] = run(f"rpc ({args.rpc_address})", rpc, jobs, 1, args.concurrency)
+    rates['rpc-batch'] = run(f"rpc, batches of {args.batch_size}", rpc, jobs, args.batch_size, args.concurrency)
+
+    if 'http' in rates:
+        print(f"✅ rpc: {rates['rpc'] / rates['http']:.1f}x http, "
+              f"pipelined rpc: {rates['rpc-batch'] / rates['http']:.1f}x http")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Digest mode (ServerLogic/SMS/digest.py) against one SMS per advisory.
+
+--farmers farmers each get --advisories advisories, arriving at random times
+over --spread seconds (a busy week, compressed). Every advisory is queued on a
+Digester with a --window second window and a stub send that counts SMS and
+their segments instead of calling a provider.
+
+It prints the provider calls and SMS segments with and without digests, and
+how long digests held advisories back (p50/p99). With the defaults (one second
+standing for an hour) a farmer's advisories mostly share one SMS.
+
+Usage (from the Server/ directory):
+    python benchmarks/sms_digest_bench.py
+    python benchmarks/sms_digest_bench.py --farmers 5000 --advisories 5 --window 0.5 --max-segments 2
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ServerLogic.SMS.digest import DigestItem, Digester
+from ServerLogic.SMS.render import segment_count
+from ServerLogic.SMS.utils import craft_digest_sms, craft_sms
+
+TITLES = [
+    "Heavy rain expected in Nakuru this week",
+    "Fall armyworm spotted: inspect maize leaves",
+    "Maize prices up 12% at Eldoret market",
+    "Plant beans before the short rains",
+    "Free soil testing at the county office",
+    "Frost warning for highland tea farms",
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare digest SMS with one SMS per advisory')
+    parser.add_argument('--farmers', type=int, default=2_000, help='Farmers receiving advisories')
+    parser.add_argument('--advisories', type=int, default=3, help='Advisories per farmer')
+    parser.add_argument('--spread', type=float, default=4.0, help='Seconds the advisories arrive over')
+    parser.add_argument('--window', type=float, default=1.0, help='Digest window (seconds)')
+    parser.add_argument('--max-segments', type=int, default=3, help='SMS segments a digest may take')
+    args = parser.parse_args()
+    os.environ.setdefault('USSD_CODE', '*384*1234*')
+
+    rng = random.Random(42)
+    arrivals = sorted(
+        (rng.uniform(0, args.spread), farmer, advisory)
+        for farmer in range(args.farmers)
+        for advisory in rng.sample(range(len(TITLES)), args.advisories)
+    )
+    items = {
+        (farmer, advisory): DigestItem(farmer, advisory, TITLES[advisory], f"{rng.randrange(10**6):06d}", 'normal')
+        for _, farmer, advisory in arrivals
+    }
+
+    single_segments = sum(segment_count(craft_sms(item.title, item.vc)) for item in items.values())
+    print(f"⏱️  {args.farmers:,} farmers x {args.advisories} advisories over {args.spread:.0f}s, "
+          f"{args.window:.1f}s digest window, up to {args.max_segments} segments")
+    print(f"   single    {len(items):>7,} SMS  {single_segments:>7,} segments")
+
+    sent = []
+    queued_at = {}
+    lock = threading.Lock()
+
+    def send(phone_number, digest_items):
+        now = time.monotonic()
+        with lock:
+            sent.append((segment_count(craft_digest_sms(digest_items)),
+                         [now - queued_at[(phone_number, item.advisory_id)] for item in digest_items]))
+        return True
+
+    digester = Digester(window=args.window, max_segments=args.max_segments, send=send)
+    started = time.monotonic()
+    for moment, farmer, advisory in arrivals:
+        time.sleep(max(started + moment - time.monotonic(), 0))
+        queued_at[(farmer, advisory)] = time.monotonic()
+        item = items[(farmer, advisory)]
+        digester.add(farmer, farmer, advisory, item.title, item.vc)
+    digester.close()
+
+    held = [wait for _, waits in sent for wait in waits]
+    digest_segments = sum(segments for segments, _ in sent)
+    print(f"   digest    {len(sent):>7,} SMS  {digest_segments:>7,} segments  "
+          f"({1 - len(sent) / len(items):.0%} fewer SMS, {1 - digest_segments / single_segments:.0%} fewer segments)  "
+          f"held p50 {percentile(held, 0.5):.2f}s  p99 {percentile(held, 0.99):.2f}s")
+
+
+if __name__ == '__main__':
+    main()
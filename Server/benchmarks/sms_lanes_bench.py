@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Priority lanes (ServerLogic/SMS/lanes.py) under a large routine campaign.
+
+Sends a bulk campaign of --campaign messages from many threads through
+SMSRouter, against an in-process stub provider limited to --limit
+messages/sec (SMS_RATE_LIMITS knows the limit, so the campaign queues for
+pacing tokens). Meanwhile a trickle of regular advisories (normal lane) and
+emergency alerts (urgent lane) arrives at a steady pace.
+
+The run is done twice: with lanes, and with every send in the normal lane
+(the single FIFO queue there was before lanes). For each lane it reports the
+messages sent and the queue wait and total send time percentiles. Urgent
+alerts should go out in about the provider latency however deep the campaign
+backlog is, and regular advisories should wait far less than the campaign.
+
+Usage (from the Server/ directory):
+    python benchmarks/sms_lanes_bench.py
+    python benchmarks/sms_lanes_bench.py --campaign 5000 --limit 200 --urgent-every 0.5
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ServerLogic.SMS.lanes import LANE_BULK, LANE_NORMAL, LANE_URGENT, LANES
+from ServerLogic.SMS.rate_limit import RateLimiter
+from ServerLogic.SMS.router import SMSRouter
+from ServerLogic.SMS.sms_service import StubProvider
+
+
+def run(args, lanes):
+    """One campaign with the urgent and normal trickles; returns (ok, queue wait, send time) per lane"""
+    provider = StubProvider('stub', latency=args.latency, rate_limit=args.limit * 1.1, seed=1)
+    limiter = RateLimiter(provider_rates={'stub': args.limit})
+    router = SMSRouter([provider], limiter=limiter, queue_timeout=600)
+    lane = (lambda wanted: wanted) if lanes else (lambda wanted: LANE_NORMAL)
+    campaign_done = threading.Event()
+    metrics = {name: [] for name in LANES}
+
+    def send(number, wanted):
+        started = time.perf_counter()
+        result = router.send(f"+2547{number:08d}", "Benchmark advisory", lane=lane(wanted))
+        metrics[wanted].append((result.ok, result.queue_wait, time.perf_counter() - started))
+
+    def trickle(wanted, every, offset):
+        pool = ThreadPoolExecutor(max_workers=16)
+        number = offset
+        # Let the campaign build its backlog first
+        time.sleep(1.0)
+        while not campaign_done.is_set():
+            pool.submit(send, number, wanted)
+            number += 1
+            time.sleep(every)
+        pool.shutdown()
+
+    trickles = [
+        threading.Thread(target=trickle, args=(LANE_URGENT, args.urgent_every, 90_000_000)),
+        threading.Thread(target=trickle, args=(LANE_NORMAL, args.normal_every, 80_000_000)),
+    ]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in trickles:
+            thread.start()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda number: send(number, LANE_BULK), range(args.campaign)))
+        campaign_done.set()
+        for thread in trickles:
+            thread.join()
+    return metrics, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-lane SMS latency during a bulk campaign')
+    parser.add_argument('--campaign', type=int, default=3_000, help='Bulk campaign messages')
+    parser.add_argument('--concurrency', type=int, default=256, help='Campaign sending threads')
+    parser.add_argument('--limit', type=float, default=200, help='Provider rate limit (messages/sec)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Provider latency (seconds)')
+    parser.add_argument('--urgent-every', type=float, default=0.5, help='Seconds between urgent alerts')
+    parser.add_argument('--normal-every', type=float, default=0.1, help='Seconds between regular advisories')
+    args = parser.parse_args()
+
+    print(f"⏱️  Campaign of {args.campaign:,} SMS from {args.concurrency} threads at {args.limit:.0f}/s, "
+          f"an urgent alert every {args.urgent_every}s, a regular advisory every {args.normal_every}s")
+    for lanes in (False, True):
+        metrics, elapsed = run(args, lanes)
+        print(f"\n{'With lanes' if lanes else 'Without lanes (one FIFO queue)'}: {elapsed:.1f}s")
+        for name in LANES:
+            samples = metrics[name]
+            waits = [wait for _, wait, _ in samples]
+            totals = [total for _, _, total in samples]
+            failed = sum(1 for ok, _, _ in samples if not ok)
+            print(f"   {name:<7} {len(samples):>6,} msgs  failed {failed:>3}  "
+                  f"queue wait p50 {percentile(waits, 0.5) * 1000:8.1f} ms  p99 {percentile(waits, 0.99) * 1000:8.1f} ms  "
+                  f"send p50 {percentile(totals, 0.5) * 1000:8.1f} ms  p99 {percentile(totals, 0.99) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Adaptive SMS pacing (ServerLogic/SMS/rate_limit.py) against a rate-limited stub.
+
+Starts a local stub aggregator (Celcom API) that accepts at most --limit
+messages/sec and answers HTTP 429 above that, then sends a broadcast through
+SMSRouter from many threads. The router doesn't know the limit: it starts at
+--start-rate (or unpaced) and has to find it from the 429s.
+
+Prints one line per second: messages accepted, sends throttled, and the
+router's current rate. At the end it shows the sustained throughput over the
+second half of the run as a share of the real limit, the share of sends that
+were throttled, and the failed messages. Throttled sends are requeued, so
+there should be no failed messages.
+
+Usage (from the Server/ directory):
+    python benchmarks/sms_rate_bench.py
+    python benchmarks/sms_rate_bench.py --limit 500 --count 20000 --concurrency 64
+    python benchmarks/sms_rate_bench.py --start-rate 50 --retry-after 1
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sms_router_bench import start_stub
+from ServerLogic.SMS.rate_limit import RateLimiter
+from ServerLogic.SMS.router import SMSRouter
+from ServerLogic.SMS.sms_service import CelcomProvider
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure adaptive SMS pacing against a rate-limited stub')
+    parser.add_argument('--limit', type=float, default=200, help="The stub's real limit (messages/sec)")
+    parser.add_argument('--start-rate', type=float, default=None, help='Starting rate (default: unpaced until throttled)')
+    parser.add_argument('--retry-after', type=float, default=None, help='Retry-After seconds the stub sends with 429s')
+    parser.add_argument('--count', type=int, default=6_000, help='Messages to send')
+    parser.add_argument('--concurrency', type=int, default=64, help='Sending threads')
+    parser.add_argument('--latency', type=float, default=0.03, help='Stub latency (seconds)')
+    args = parser.parse_args()
+
+    stub = start_stub('celcom', args.latency, rate_limit=args.limit, retry_after=args.retry_after)
+    os.environ.update({
+        'CELCO_URL': f"http://127.0.0.1:{stub.server_port}/sms",
+        'CELCO_API_KEY': 'bench', 'CELCO_PARTNER_ID': '1', 'CELCO_SHORTCODE': 'FARMWARE',
+    })
+    limiter = RateLimiter(provider_rates={'celcom': args.start_rate} if args.start_rate else {})
+    router = SMSRouter([CelcomProvider('celcom', timeout=5)], limiter=limiter, queue_timeout=120)
+
+    failed = [0]
+    done = threading.Event()
+
+    def send(position):
+        result = router.send(f"+2547{position:08d}", "Benchmark advisory")
+        if not result.ok:
+            failed[0] += 1
+            print(f"   ❌ {result.error}", file=sys.__stdout__)
+
+    timeline = []
+
+    def sample():
+        last_count, last_rejected = 0, 0
+        while not done.wait(1.0):
+            count, rejected = stub.count, stub.rejected
+            rate = limiter.snapshot('celcom')['rate']
+            timeline.append((count - last_count, rejected - last_rejected))
+            print(f"   {len(timeline):>3}s  accepted {count - last_count:>5}/s  throttled {rejected - last_rejected:>5}/s  "
+                  f"rate {f'{rate:.0f}/s' if rate else 'unpaced'}", file=sys.__stdout__)
+            last_count, last_rejected = count, rejected
+
+    print(f"⏱️  Sending {args.count:,} SMS from {args.concurrency} threads to a stub limited to {args.limit:.0f}/s "
+          f"(starting {f'at {args.start_rate:.0f}/s' if args.start_rate else 'unpaced'})...")
+    sampler = threading.Thread(target=sample, daemon=True)
+    started = time.perf_counter()
+    sampler.start()
+    # Rate changes are printed by the limiter; the timeline shows them well enough
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(send, range(args.count)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+
+    steady = timeline[len(timeline) // 2:] or timeline
+    sustained = sum(accepted for accepted, _ in steady) / max(len(steady), 1)
+    attempts = stub.count + stub.rejected
+    print(f"✅ {args.count / elapsed:,.0f} SMS/sec overall ({elapsed:.1f}s); second half sustained {sustained:,.0f}/s "
+          f"= {sustained / args.limit:.0%} of the real limit")
+    print(f"   {stub.rejected:,} of {attempts:,} sends throttled ({stub.rejected / max(attempts, 1):.1%}), "
+          f"all requeued; {failed[0]} failed messages")
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
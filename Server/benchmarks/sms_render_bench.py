@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+SMS rendering (ServerLogic/SMS/render.py): segments saved by GSM-7 normalisation,
+and the cost of rendering per verification with and without the advisory cache.
+
+Builds --advisories synthetic advisories of --words words. Most carry the
+characters an editor or a phone keyboard slips in (curly quotes, dashes,
+ellipses, non-breaking spaces, accents), and --emoji-share of them an emoji
+that has to stay. It reports the segments every advisory takes as written
+and once rendered, then times --verifications full-message renders.
+Verifications are spread over the advisories, once through render() and once
+through render_advisory() (cached per advisory).
+
+Usage (from the Server/ directory):
+    python benchmarks/sms_render_bench.py
+    python benchmarks/sms_render_bench.py --advisories 500 --words 120 --emoji-share 0.2
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ServerLogic.SMS.render import ENCODING_UCS2, encoding_of, render, render_advisory, segment_count
+
+WORDS = ("panda mbegu bora mapema mvua inatarajiwa wiki hii tumia mbolea kwa kiasi "
+         "maize beans fertiliser spray weed harvest market price county office").split()
+# What an editor or a phone keyboard slips in
+TYPOGRAPHY = ['“', '”', '’', '—', '–', '…', ' ', 'é', 'ê', '°']
+EMOJI = ['🌧️', '🌽', '🐛', '☀️']
+
+
+def synthetic_advisory(rng, words, emoji_share):
+    text = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        if rng.random() < 0.05:
+            word += rng.choice(TYPOGRAPHY)
+        text.append(word)
+    if rng.random() < emoji_share:
+        text.insert(rng.randrange(len(text)), rng.choice(EMOJI))
+    return ' '.join(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure segments saved by GSM-7 normalisation and the render cache')
+    parser.add_argument('--advisories', type=int, default=200, help='Synthetic advisories')
+    parser.add_argument('--words', type=int, default=60, help='Words per advisory')
+    parser.add_argument('--emoji-share', type=float, default=0.1, help='Share of advisories with an emoji')
+    parser.add_argument('--verifications', type=int, default=10_000, help='Full-message renders to time')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    advisories = [synthetic_advisory(rng, args.words, args.emoji_share) for _ in range(args.advisories)]
+
+    written = [segment_count(message) for message in advisories]
+    rendered = [render(message, max_segments=1_000) for message in advisories]
+    ucs2_before = sum(1 for message in advisories if encoding_of(message) == ENCODING_UCS2)
+    ucs2_after = sum(1 for result in rendered if result.encoding == ENCODING_UCS2)
+    after = sum(result.segments for result in rendered)
+    print(f"⏱️  {args.advisories} advisories of {args.words} words, {args.emoji_share:.0%} with an emoji")
+    print(f"   as written  {sum(written):>6,} segments  ({ucs2_before} sent as UCS-2)")
+    print(f"   rendered    {after:>6,} segments  ({ucs2_after} sent as UCS-2, "
+          f"{1 - after / sum(written):.0%} fewer segments)")
+
+    picks = [rng.randrange(args.advisories) for _ in range(args.verifications)]
+    for label, render_one in (('uncached', lambda index: render(advisories[index])),
+                              ('cached', lambda index: render_advisory(index, advisories[index]))):
+        started = time.perf_counter()
+        for index in picks:
+            render_one(index)
+        elapsed = time.perf_counter() - started
+        print(f"   {label:<9} {args.verifications:,} renders in {elapsed:6.2f}s  "
+              f"({elapsed / args.verifications * 1e6:7.1f} µs per verification)")
+
+
+if __name__ == '__main__':
+    main()
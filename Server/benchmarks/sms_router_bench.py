@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+SMS provider routing and failover (ServerLogic/SMS/router.py) against local stubs.
+
+Starts two local stub aggregators that speak the Celcom and Africa's Talking
+APIs, points CelcomProvider and AfricasTalkingProvider at them, and sends a
+broadcast through SMSRouter from many threads. With --fault, Celcom degrades
+for the middle third of the run and recovers for the last third:
+
+    slow     answers after --slow-latency seconds (longer than the send timeout)
+    errors   fails half of the sends with HTTP 503
+    outage   fails every send
+
+For each third it reports messages/sec, failed messages, each provider's share
+of the traffic and the message latency percentiles. The router's ejection and
+re-admission events are printed as they happen. A healthy run has 0 failed
+messages in every phase.
+
+Usage (from the Server/ directory):
+    python benchmarks/sms_router_bench.py
+    python benchmarks/sms_router_bench.py --fault slow --count 3000 --concurrency 32
+    python benchmarks/sms_router_bench.py --fault outage --strategy cheapest
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import contextlib
+from collections import Counter
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ServerLogic.SMS.router import SMSRouter, ROUTING_STRATEGIES, ROUTING_WEIGHTED
+from ServerLogic.SMS.sms_service import AfricasTalkingProvider, CelcomProvider
+
+PHASES = ('before', 'during', 'after')
+
+
+class StubAggregator(BaseHTTPRequestHandler):
+    """Answers like the Celcom or Africa's Talking API after the injected latency, or fails"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        behaviour = self.server.behaviour
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        delay = behaviour['latency'] * random.uniform(0.8, 1.2)
+        time.sleep(delay)
+        if random.random() < behaviour['failure_rate']:
+            return self.reply(503, {'error': 'injected fault'})
+        if behaviour.get('rate_limit') and not self.server.admit(behaviour['rate_limit']):
+            return self.reply(429, {'error': 'rate limit exceeded'}, behaviour.get('retry_after'))
+
+        with self.server.lock:
+            self.server.count += 1
+            message_id = f"{self.server.flavour}-{self.server.count}"
+        if self.server.flavour == 'celcom':
+            mobile = json.loads(body)['mobile']
+            self.reply(200, {'responses': [{'response-code': 200, 'response-description': 'Success',
+                                            'mobile': mobile, 'messageid': message_id}]})
+        else:
+            number = parse_qs(body.decode())['to'][0]
+            self.reply(201, {'SMSMessageData': {'Message': 'Sent to 1/1', 'Recipients': [
+                {'statusCode': 101, 'number': number, 'status': 'Success', 'messageId': message_id}]}})
+
+    def reply(self, status, payload, retry_after=None):
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header('Retry-After', str(retry_after))
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and went away
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def admit(self, rate_limit):
+        """The aggregator's own rate limit: a bucket holding one second of sends"""
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(rate_limit, self.allowance + (now - self.checked) * rate_limit)
+            self.checked = now
+            if self.allowance < 1:
+                self.rejected += 1
+                return False
+            self.allowance -= 1
+            return True
+
+
+def start_stub(flavour, latency, rate_limit=None, retry_after=None):
+    """Start a stub aggregator on a free local port"""
+    server = StubServer(('127.0.0.1', 0), StubAggregator)
+    server.flavour = flavour
+    server.behaviour = {'latency': latency, 'failure_rate': 0.0, 'rate_limit': rate_limit, 'retry_after': retry_after}
+    server.lock = threading.Lock()
+    server.count = 0
+    server.allowance = 0.0
+    server.checked = time.monotonic()
+    server.rejected = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure SMS routing and failover against local stub aggregators')
+    parser.add_argument('--count', type=int, default=3_000, help='Messages to send')
+    parser.add_argument('--concurrency', type=int, default=32, help='Sending threads')
+    parser.add_argument('--strategy', choices=ROUTING_STRATEGIES, default=ROUTING_WEIGHTED)
+    parser.add_argument('--fault', choices=['none', 'slow', 'errors', 'outage'], default='outage',
+                        help='What happens to Celcom during the middle third of the run')
+    parser.add_argument('--latency', type=float, default=0.03, help='Normal stub latency (seconds)')
+    parser.add_argument('--slow-latency', type=float, default=5.0, help='Celcom latency with --fault slow')
+    parser.add_argument('--timeout', type=float, default=1.0, help='Provider send timeout (seconds)')
+    args = parser.parse_args()
+
+    celcom = start_stub('celcom', args.latency)
+    africastalking = start_stub('africastalking', args.latency * 1.5)
+    os.environ.update({
+        'CELCO_URL': f"http://127.0.0.1:{celcom.server_port}/sms",
+        'CELCO_API_KEY': 'bench', 'CELCO_PARTNER_ID': '1', 'CELCO_SHORTCODE': 'FARMWARE',
+        'AFRICASTALKING_URL': f"http://127.0.0.1:{africastalking.server_port}/messaging",
+        'AFRICASTALKING_API_KEY': 'bench',
+    })
+
+    # Celcom is the cheap, preferred route; Africa's Talking is the backup
+    router = SMSRouter([
+        CelcomProvider('celcom', weight=3, cost=0.35, timeout=args.timeout),
+        AfricasTalkingProvider('africastalking', weight=1, cost=0.80, timeout=args.timeout),
+    ], strategy=args.strategy, slow_latency=args.latency * 10)
+
+    faults = {
+        'none': {},
+        'slow': {'latency': args.slow_latency},
+        'errors': {'failure_rate': 0.5},
+        'outage': {'failure_rate': 1.0},
+    }[args.fault]
+    normal = dict(celcom.behaviour)
+    third = args.count // 3
+    results = [None] * args.count
+    log = io.StringIO()
+
+    def send(position):
+        if position == third and faults:
+            print(f"💥 Celcom: {args.fault} from message {position}", file=sys.__stdout__)
+            celcom.behaviour.update(faults)
+        elif position == 2 * third and faults:
+            print(f"🔧 Celcom recovers from message {position}", file=sys.__stdout__)
+            celcom.behaviour.update(normal)
+        started = time.perf_counter()
+        result = router.send(f"+2547{position:08d}", "Benchmark advisory")
+        results[position] = (result.ok, result.provider, time.perf_counter() - started)
+
+    print(f"⏱️  Sending {args.count:,} SMS from {args.concurrency} threads "
+          f"({args.strategy} routing, timeout {args.timeout}s, fault: {args.fault})...")
+    started = time.perf_counter()
+    # The router prints every failover; keep only its ejection events
+    with contextlib.redirect_stdout(log), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(send, range(args.count)))
+    elapsed = time.perf_counter() - started
+
+    lines = log.getvalue().splitlines()
+    for line in lines:
+        if 'ejected' in line or 're-admitted' in line or 'trial' in line:
+            print(f"   {line}")
+    failovers = sum(1 for line in lines if 'trying the next provider' in line)
+
+    for index, phase in enumerate(PHASES):
+        chunk = results[index * third:(index + 1) * third if index < 2 else args.count]
+        ok = [r for r in chunk if r[0]]
+        shares = Counter(provider for _, provider, _ in ok)
+        latencies = [latency for _, _, latency in chunk]
+        share_text = ', '.join(f"{name} {count / max(len(ok), 1):.0%}" for name, count in sorted(shares.items()))
+        print(f"   {phase:<7} {len(chunk):>6,} msgs  failed {len(chunk) - len(ok):>4}  "
+              f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+              f"[{share_text}]")
+
+    failed = sum(1 for r in results if not r[0])
+    print(f"✅ {args.count / elapsed:,.0f} SMS/sec overall ({elapsed:.2f}s, {failed} failed, {failovers} failovers)")
+    for stats in router.snapshot():
+        print(f"   {stats['provider']:<15} sent {stats['sent']:>6,}  failed {stats['failed']:>5,}  "
+              f"latency {stats['latency_ms']} ms  error rate {stats['error_rate']:.0%}  "
+              f"{'available' if stats['available'] else 'ejected'}")
+
+    celcom.shutdown()
+    africastalking.shutdown()
+
+
+if __name__ == '__main__':
+    main()
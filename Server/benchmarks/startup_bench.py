@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the Farmware Server app factory.
+
+Each run starts a fresh Python interpreter (like a new gunicorn worker or an
+autoscaled instance), imports ServerLogic and calls create_app(). Optionally it
+also serves the first /health request, which is where the database is probed.
+
+Usage:
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --runs 20 --health
+    python benchmarks/startup_bench.py --importtime 15
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints "<create_app seconds> <first /health seconds>"
+CHILD_SCRIPT = """
+import time
+started = time.perf_counter()
+from ServerLogic import create_app
+app = create_app()
+created = time.perf_counter() - started
+health = 0.0
+if {health}:
+    t = time.perf_counter()
+    app.test_client().get('/health')
+    health = time.perf_counter() - t
+print(f"{{created}} {{health}}")
+"""
+
+
+def run_once(health):
+    """
+    Start one interpreter and time create_app() (and optionally GET /health).
+
+    Returns:
+        tuple: (process_seconds, create_app_seconds, health_seconds)
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT.format(health=health)],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    process_seconds = time.perf_counter() - started
+    created, health_seconds = result.stdout.strip().splitlines()[-1].split()
+    return process_seconds, float(created), float(health_seconds)
+
+
+def show_import_times(top):
+    """Print the slowest imports of create_app() using python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from ServerLogic import create_app; create_app()'],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        entries.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    print(f"\n📦 Top {top} imports by cumulative time:")
+    for cumulative_us, self_us, name in sorted(entries, reverse=True)[:top]:
+        print(f"   {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {name}")
+
+
+def summarize(label, values):
+    """Print min/median/max for a list of timings in seconds"""
+    print(f"   {label:<22} min {min(values) * 1000:7.1f} ms | "
+          f"median {statistics.median(values) * 1000:7.1f} ms | max {max(values) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Farmware Server cold start')
+    parser.add_argument('--runs', type=int, default=10, help='Number of fresh interpreters to start')
+    parser.add_argument('--health', action='store_true', help='Also time the first GET /health (database probe)')
+    parser.add_argument('--importtime', type=int, metavar='N', help='Show the N slowest imports')
+    args = parser.parse_args()
+
+    print(f"⏱️  Timing {args.runs} cold starts of ServerLogic.create_app()...")
+    runs = [run_once(args.health) for _ in range(args.runs)]
+
+    summarize('Process (total)', [r[0] for r in runs])
+    summarize('import + create_app', [r[1] for r in runs])
+    if args.health:
+        summarize('First GET /health', [r[2] for r in runs])
+
+    if args.importtime:
+        show_import_times(args.importtime)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Gunicorn serving profile for the Farmware Server.
+
+The Server is I/O-bound: most of a request is spent waiting on PostgreSQL, the
+SMC and the SMS providers. It therefore runs a few processes, each with a pool
+of threads (gthread workers), so one slow upstream call doesn't block a worker.
+
+Run from the Server/ directory:
+    gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden with an environment variable (see below) or a
+command line flag, e.g. `gunicorn -c gunicorn.conf.py --workers 8`.
+"""
+import multiprocessing
+import os
+
+# The WSGI app to serve (module:variable)
+wsgi_app = 'main:app'
+
+# --- Listen socket ---
+# The master binds the socket once and every worker accepts on that shared socket.
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+
+# --- Workers (I/O-bound profile) ---
+# Threads do the waiting; processes give us one GIL per core.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# --- Preloading ---
+# Import and build the app once in the master so workers fork with it already
+# loaded (fast spawn, shared memory pages). create_app() opens no connections.
+preload_app = True
+
+# --- Graceful recycling ---
+# Restart each worker after a (jittered) number of requests to bound memory
+# growth, letting in-flight requests finish first.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# --- Logging ---
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """
+    Tell the workers how many of them share the SMS provider accounts, so each
+    paces at its share of SMS_RATE_LIMITS (workers inherit the master's environment).
+    """
+    os.environ.setdefault('SMS_RATE_PROCESSES', str(server.cfg.workers))
+
+
+def post_fork(server, worker):
+    """
+    Give each worker its own database connections.
+    Connections must never be shared across a fork, so drop any pooled
+    connections inherited from the master (without closing them under it).
+    """
+    from ServerLogic import db
+    from ServerLogic.db_routing import dispose_replicas
+
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    dispose_replicas(close=False)
+
+
+def worker_exit(server, worker):
+    """Send the digests this worker still holds, then write its buffered delivery stats"""
+    from ServerLogic.SMS.digest import close_digester
+    from ServerLogic.stats import flush_stats
+
+    close_digester()
+    flush_stats()
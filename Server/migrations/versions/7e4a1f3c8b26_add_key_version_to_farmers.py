@@ -0,0 +1,30 @@
+"""Add key_version to farmers
+
+Revision ID: 7e4a1f3c8b26
+Revises: 5c2e8b7d9f13
+Create Date: 2025-11-17 08:45:19.602147
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e4a1f3c8b26'
+down_revision = '5c2e8b7d9f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows get key_version 0 (legacy text keys); run
+    # `python populate_db.py normalize-keys` afterwards to convert them.
+    with op.batch_alter_table('farmers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('key_version', sa.SmallInteger(), server_default='0', nullable=False))
+
+
+def downgrade():
+    # Note: keys already normalised stay raw bytes; the old text-only wire format
+    # cannot carry arbitrary bytes, so downgrading is only safe before normalize-keys.
+    with op.batch_alter_table('farmers', schema=None) as batch_op:
+        batch_op.drop_column('key_version')
@@ -0,0 +1,63 @@
+"""Add phone_e164 to farmers
+
+Revision ID: 9d3c6b2a4e71
+Revises: 7e4a1f3c8b26
+Create Date: 2025-11-24 10:12:37.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from ServerLogic.phone import normalize_phone
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3c6b2a4e71'
+down_revision = '7e4a1f3c8b26'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def upgrade():
+    with op.batch_alter_table('farmers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('phone_e164', sa.String(length=16), nullable=True))
+
+    # Backfill the canonical form of every existing phone, one keyset page at a time
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text('SELECT id, phone FROM farmers WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {'last_id': last_id, 'limit': BACKFILL_BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = [{'id': row.id, 'phone_e164': normalize_phone(row.phone)} for row in rows]
+        updates = [update for update in updates if update['phone_e164']]
+        if updates:
+            connection.execute(sa.text('UPDATE farmers SET phone_e164 = :phone_e164 WHERE id = :id'), updates)
+
+    # Farmers registered twice in different formats: the oldest row keeps the canonical number
+    duplicates = connection.execute(sa.text(
+        'SELECT id, phone, phone_e164 FROM farmers f WHERE phone_e164 IS NOT NULL '
+        'AND id > (SELECT MIN(id) FROM farmers d WHERE d.phone_e164 = f.phone_e164)'
+    )).all()
+    for row in duplicates:
+        print(f"⚠️  Farmer {row.id} ({row.phone}) duplicates {row.phone_e164} - left without phone_e164")
+    if duplicates:
+        connection.execute(
+            sa.text('UPDATE farmers SET phone_e164 = NULL WHERE id = :id'),
+            [{'id': row.id} for row in duplicates]
+        )
+
+    with op.batch_alter_table('farmers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_farmers_phone_e164'), ['phone_e164'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('farmers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_farmers_phone_e164'))
+        batch_op.drop_column('phone_e164')
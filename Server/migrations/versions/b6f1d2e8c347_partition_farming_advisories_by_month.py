@@ -0,0 +1,138 @@
+"""Partition farming_advisories by month of sent_at
+
+Revision ID: b6f1d2e8c347
+Revises: 9d3c6b2a4e71
+Create Date: 2025-12-01 09:41:18.226504
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f1d2e8c347'
+down_revision = '9d3c6b2a4e71'
+branch_labels = None
+depends_on = None
+
+OLD_TABLE = 'farming_advisories_unpartitioned'
+
+# farming_advisories columns at this revision
+COLUMNS = ['id', 'farmer_id', 'advisory_id', 'sent_at', 'verified', 'verification_code']
+
+# Partitions created ahead of the current month; populate_db.py create-partitions keeps this up
+MONTHS_AHEAD = 3
+
+# Partition naming at this revision (ServerLogic/partitions.py carries on with the same names)
+DEFAULT_PARTITION = 'farming_advisories_default'
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def create_month_partitions(first, last):
+    """One partition per month from `first` to `last` (the table is still empty)"""
+    month = first
+    while month <= last:
+        end = next_month(month)
+        op.execute(
+            f"CREATE TABLE farming_advisories_p{month:%Y_%m} PARTITION OF farming_advisories "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        month = end
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        # Declarative partitioning is PostgreSQL-only; elsewhere just add the indexes
+        print("⚠️  farming_advisories is only partitioned on PostgreSQL - adding the indexes only")
+        with op.batch_alter_table('farming_advisories', schema=None) as batch_op:
+            batch_op.create_index('ix_farming_advisories_id', ['id'], unique=False)
+            batch_op.create_index('ix_farming_advisories_sent_at', ['sent_at'], unique=False)
+        return
+
+    op.execute(f'ALTER TABLE farming_advisories RENAME TO {OLD_TABLE}')
+    op.execute(f'ALTER INDEX farming_advisories_pkey RENAME TO {OLD_TABLE}_pkey')
+    op.execute(f'ALTER INDEX ix_farming_advisories_farmer_advisory RENAME TO ix_{OLD_TABLE}_farmer_advisory')
+
+    # The partition key must be part of any primary key or unique constraint, and
+    # sent_at is NULL for planned deliveries, so ids stay unique through the sequence
+    # and are indexed per partition instead.
+    op.execute("""
+        CREATE TABLE farming_advisories (
+            id INTEGER NOT NULL DEFAULT nextval('farming_advisories_id_seq'),
+            farmer_id INTEGER NOT NULL,
+            advisory_id INTEGER NOT NULL,
+            sent_at TIMESTAMP WITHOUT TIME ZONE,
+            verified BOOLEAN NOT NULL,
+            verification_code VARCHAR(16)
+        ) PARTITION BY RANGE (sent_at)
+    """)
+    op.execute('ALTER SEQUENCE farming_advisories_id_seq OWNED BY farming_advisories.id')
+
+    # Planned deliveries (sent_at NULL) and months without a partition land here
+    op.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF farming_advisories DEFAULT')
+
+    oldest = connection.execute(sa.text(f'SELECT MIN(sent_at) FROM {OLD_TABLE}')).scalar()
+    current = month_start(datetime.utcnow())
+    last = current
+    for _ in range(MONTHS_AHEAD):
+        last = next_month(last)
+    create_month_partitions(min(month_start(oldest), current) if oldest else current, last)
+
+    # Load before indexing: one sorted index build per partition instead of per-row inserts
+    columns = ', '.join(COLUMNS)
+    op.execute(f'INSERT INTO farming_advisories ({columns}) SELECT {columns} FROM {OLD_TABLE}')
+
+    # Declared on the parent, created on every partition (and on partitions added later)
+    op.execute('CREATE INDEX ix_farming_advisories_id ON farming_advisories (id)')
+    op.execute('CREATE INDEX ix_farming_advisories_farmer_advisory ON farming_advisories (farmer_id, advisory_id)')
+    op.execute('CREATE INDEX ix_farming_advisories_sent_at ON farming_advisories (sent_at)')
+    op.execute('ALTER TABLE farming_advisories ADD CONSTRAINT farming_advisories_farmer_id_fkey '
+               'FOREIGN KEY (farmer_id) REFERENCES farmers (id)')
+    op.execute('ALTER TABLE farming_advisories ADD CONSTRAINT farming_advisories_advisory_id_fkey '
+               'FOREIGN KEY (advisory_id) REFERENCES advisories (id)')
+
+    op.execute(f'DROP TABLE {OLD_TABLE}')
+    op.execute('ANALYZE farming_advisories')
+
+
+def downgrade():
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        with op.batch_alter_table('farming_advisories', schema=None) as batch_op:
+            batch_op.drop_index('ix_farming_advisories_sent_at')
+            batch_op.drop_index('ix_farming_advisories_id')
+        return
+
+    # Archived (detached and dropped) months are not brought back - restore them first
+    op.execute('ALTER TABLE farming_advisories RENAME TO farming_advisories_partitioned')
+    op.execute('ALTER INDEX ix_farming_advisories_farmer_advisory RENAME TO ix_farming_advisories_partitioned_farmer_advisory')
+
+    op.create_table('farming_advisories',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('farming_advisories_id_seq')"), nullable=False),
+    sa.Column('farmer_id', sa.Integer(), nullable=False),
+    sa.Column('advisory_id', sa.Integer(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('verified', sa.Boolean(), nullable=False),
+    sa.Column('verification_code', sa.String(length=16), nullable=True),
+    sa.ForeignKeyConstraint(['advisory_id'], ['advisories.id'], ),
+    sa.ForeignKeyConstraint(['farmer_id'], ['farmers.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('ALTER SEQUENCE farming_advisories_id_seq OWNED BY farming_advisories.id')
+
+    columns = ', '.join(COLUMNS)
+    op.execute(f'INSERT INTO farming_advisories ({columns}) SELECT {columns} FROM farming_advisories_partitioned')
+    op.execute('DROP TABLE farming_advisories_partitioned')
+
+    with op.batch_alter_table('farming_advisories', schema=None) as batch_op:
+        batch_op.create_index('ix_farming_advisories_farmer_advisory', ['farmer_id', 'advisory_id'], unique=False)
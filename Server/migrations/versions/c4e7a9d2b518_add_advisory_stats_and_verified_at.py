@@ -0,0 +1,59 @@
+"""Add advisory_stats and farming_advisories.verified_at
+
+Revision ID: c4e7a9d2b518
+Revises: b6f1d2e8c347
+Create Date: 2025-12-04 14:26:05.781932
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a9d2b518'
+down_revision = 'b6f1d2e8c347'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('farming_advisories', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('verified_at', sa.DateTime(), nullable=True))
+
+    op.create_table('advisory_stats',
+    sa.Column('advisory_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('sent_count', sa.BigInteger(), nullable=False),
+    sa.Column('verified_count', sa.BigInteger(), nullable=False),
+    sa.Column('verify_seconds_total', sa.Float(), nullable=False),
+    sa.Column('verify_timed_count', sa.BigInteger(), nullable=False),
+    sa.Column('last_sent_at', sa.DateTime(), nullable=True),
+    sa.Column('last_verified_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('advisory_id')
+    )
+
+    # One pass over the existing deliveries; from here on the send and verify paths keep
+    # the counters. Existing verifications have no verified_at, so no time-to-verify yet.
+    op.execute(
+        'INSERT INTO advisory_stats (advisory_id, sent_count, verified_count, verify_seconds_total, '
+        'verify_timed_count, last_sent_at, last_verified_at, updated_at) '
+        'SELECT advisory_id, COUNT(sent_at), '
+        'SUM(CASE WHEN verified AND sent_at IS NOT NULL THEN 1 ELSE 0 END), 0, 0, '
+        'MAX(sent_at), NULL, CURRENT_TIMESTAMP '
+        'FROM farming_advisories GROUP BY advisory_id'
+    )
+    # Row 0 holds the totals over all advisories
+    op.execute(
+        'INSERT INTO advisory_stats (advisory_id, sent_count, verified_count, verify_seconds_total, '
+        'verify_timed_count, last_sent_at, last_verified_at, updated_at) '
+        'SELECT 0, COALESCE(SUM(sent_count), 0), COALESCE(SUM(verified_count), 0), 0, 0, '
+        'MAX(last_sent_at), NULL, CURRENT_TIMESTAMP '
+        'FROM advisory_stats'
+    )
+
+
+def downgrade():
+    op.drop_table('advisory_stats')
+
+    with op.batch_alter_table('farming_advisories', schema=None) as batch_op:
+        batch_op.drop_column('verified_at')
@@ -0,0 +1,38 @@
+"""Add segmentation attributes (region, crops, language) to farmers
+
+Revision ID: d2a8f5c1e693
+Revises: c4e7a9d2b518
+Create Date: 2025-12-09 11:03:52.614870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8f5c1e693'
+down_revision = 'c4e7a9d2b518'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable without defaults: adding them does not rewrite the farmers table
+    with op.batch_alter_table('farmers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('region', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('crops', sa.JSON().with_variant(postgresql.ARRAY(sa.String(length=32)), 'postgresql'), nullable=True))
+        batch_op.add_column(sa.Column('language', sa.String(length=8), nullable=True))
+        batch_op.create_index('ix_farmers_region_id', ['region', 'id'], unique=False)
+        batch_op.create_index('ix_farmers_language_id', ['language', 'id'], unique=False)
+        batch_op.create_index('ix_farmers_crops', ['crops'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    with op.batch_alter_table('farmers', schema=None) as batch_op:
+        batch_op.drop_index('ix_farmers_crops')
+        batch_op.drop_index('ix_farmers_language_id')
+        batch_op.drop_index('ix_farmers_region_id')
+        batch_op.drop_column('language')
+        batch_op.drop_column('crops')
+        batch_op.drop_column('region')
@@ -0,0 +1,34 @@
+"""Add sms_rate_shares table
+
+Revision ID: e5c1a8f4b729
+Revises: a7d4e1b9c362
+Create Date: 2025-12-22 09:18:37.604112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c1a8f4b729'
+down_revision = 'a7d4e1b9c362'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sms_rate_shares',
+    sa.Column('provider', sa.String(length=32), nullable=False),
+    sa.Column('process', sa.String(length=64), nullable=False),
+    sa.Column('urgent', sa.Float(), nullable=False),
+    sa.Column('normal', sa.Float(), nullable=False),
+    sa.Column('bulk', sa.Float(), nullable=False),
+    sa.Column('rate', sa.Float(), nullable=True),
+    sa.Column('throttled_at', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('provider', 'process')
+    )
+
+
+def downgrade():
+    op.drop_table('sms_rate_shares')
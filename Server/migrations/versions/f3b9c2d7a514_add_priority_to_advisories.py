@@ -0,0 +1,27 @@
+"""Add priority to advisories
+
+Revision ID: f3b9c2d7a514
+Revises: d2a8f5c1e693
+Create Date: 2025-12-12 09:41:27.106538
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9c2d7a514'
+down_revision = 'd2a8f5c1e693'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable without a default (NULL is normal priority): no table rewrite
+    with op.batch_alter_table('advisories', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('priority', sa.String(length=10), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('advisories', schema=None) as batch_op:
+        batch_op.drop_column('priority')
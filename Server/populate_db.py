@@ -7,36 +7,133 @@ Can be run with different commands to perform specific operations.
 
 import os
 import sys
+import csv
+import json
+import math
+import base64
+import time
+import random
+import shlex
+import signal
 import argparse
-from datetime import datetime
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 # Add the parent directory to Python path so we can import ServerLogic
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from flask import has_app_context
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+
 from ServerLogic import create_app, db
-from ServerLogic.models import Farmer, Advisory, FarmingAdvisory
+from ServerLogic.models import Farmer, Advisory, FarmingAdvisory, IssuedVerificationCode, AdvisoryStats, Campaign
+from ServerLogic.phone import normalize_phone
+from ServerLogic.segments import Segment, normalize_tag, normalize_tags, count_farmers, resolve_page
+from ServerLogic.keys import KEY_VERSION_LEGACY, KEY_VERSION_RAW, legacy_master_key, master_key, encode_secret_key
+
+# One app (and one session) per run: create_app() is only ever called once here,
+# and every command reuses the app context pushed by main().
+_app = None
+
+# Rows removed per DELETE statement when clearing large tables. Each chunk is its
+# own short transaction, so live traffic on the same tables is never blocked for long.
+DELETE_CHUNK_SIZE = 5_000
+
+def get_app():
+    """Create the Flask app on first use and reuse it for the rest of the run"""
+    global _app
+    if _app is None:
+        # Long-running bulk commands: a small pool of long-lived connections
+        os.environ.setdefault('DB_PROFILE', 'batch')
+        _app = create_app()
+    return _app
 
 def get_app_context():
-    """Get Flask app context"""
-    app = create_app()
-    return app.app_context()
+    """Get Flask app context (a no-op if the run's context is already pushed)"""
+    if has_app_context():
+        return nullcontext()
+    return get_app().app_context()
+
+def delete_in_chunks(model, *criteria, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    Delete rows of a model in bounded chunks, committing after each chunk.
+
+    Args:
+        model: SQLAlchemy model to delete from
+        *criteria: Optional filter expressions (e.g. FarmingAdvisory.farmer_id == 3)
+        chunk_size (int): Maximum rows removed per DELETE statement
+
+    Returns:
+        int: Total number of rows deleted
+    """
+    total = 0
+    while True:
+        chunk_ids = (
+            select(model.id)
+            .where(*criteria)
+            .order_by(model.id)
+            .limit(chunk_size)
+            .scalar_subquery()
+        )
+        result = db.session.execute(
+            delete(model)
+            .where(model.id.in_(chunk_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += result.rowcount
+        if result.rowcount < chunk_size:
+            return total
+        print(f"   ... {total} rows deleted from {model.__tablename__}")
+
+def truncate_tables(*models):
+    """
+    TRUNCATE the given tables with CASCADE (PostgreSQL only).
+
+    Returns:
+        bool: True if the tables were truncated, False if the database does not support it
+    """
+    if db.engine.dialect.name != 'postgresql':
+        print("⚠️  TRUNCATE is only supported on PostgreSQL, falling back to chunked deletes")
+        return False
+    table_names = ', '.join(model.__tablename__ for model in models)
+    db.session.execute(text(f"TRUNCATE TABLE {table_names} CASCADE"))
+    db.session.commit()
+    return True
+
+def clear_statistics():
+    """Remove every advisory_stats row (a few thousand at most - one DELETE)"""
+    db.session.execute(delete(AdvisoryStats))
+    db.session.commit()
 
-def clear_database():
+def clear_campaigns(*criteria):
+    """Remove campaigns (a handful of rows - one DELETE)"""
+    deleted = db.session.execute(delete(Campaign).where(*criteria)).rowcount
+    db.session.commit()
+    return deleted
+
+def clear_database(truncate=False, chunk_size=DELETE_CHUNK_SIZE):
     """Clear all data from all tables"""
     print("🗑️  Clearing entire database...")
     try:
         with get_app_context():
+            if truncate and truncate_tables(IssuedVerificationCode, FarmingAdvisory, Campaign, Advisory, Farmer, AdvisoryStats):
+                print(f"✅ Database cleared successfully (TRUNCATE ... CASCADE)!")
+                return
+
             # Delete in reverse order of dependencies
-            deleted_fa = FarmingAdvisory.query.count()
-            deleted_advisories = Advisory.query.count()
-            deleted_farmers = Farmer.query.count()
-            
-            FarmingAdvisory.query.delete()
-            Advisory.query.delete()
-            Farmer.query.delete()
-            db.session.commit()
+            clear_statistics()
+            deleted_campaigns = clear_campaigns()
+            deleted_vcs = delete_in_chunks(IssuedVerificationCode, chunk_size=chunk_size)
+            deleted_fa = delete_in_chunks(FarmingAdvisory, chunk_size=chunk_size)
+            deleted_advisories = delete_in_chunks(Advisory, chunk_size=chunk_size)
+            deleted_farmers = delete_in_chunks(Farmer, chunk_size=chunk_size)
             
             print(f"✅ Database cleared successfully!")
+            print(f"   - Deleted {deleted_campaigns} campaigns")
+            print(f"   - Deleted {deleted_vcs} issued VC index entries")
             print(f"   - Deleted {deleted_fa} farming advisory records")
             print(f"   - Deleted {deleted_advisories} advisories") 
             print(f"   - Deleted {deleted_farmers} farmers")
@@ -47,20 +144,24 @@ def clear_database():
             db.session.rollback()
         raise
 
-def clear_farmers_table():
+def clear_farmers_table(truncate=False, chunk_size=DELETE_CHUNK_SIZE):
     """Clear only the farmers table (and related farming advisories)"""
     print("🗑️  Clearing farmers table...")
     try:
         with get_app_context():
-            # First delete farming advisories that reference farmers
-            deleted_fa = FarmingAdvisory.query.count()
-            deleted_farmers = Farmer.query.count()
-            
-            FarmingAdvisory.query.delete()
-            Farmer.query.delete()
-            db.session.commit()
+            # CASCADE also empties farming_advisories and issued_vcs, which reference farmers
+            if truncate and truncate_tables(Farmer, AdvisoryStats):
+                print(f"✅ Farmers table cleared successfully (TRUNCATE ... CASCADE)!")
+                return
+
+            # First delete issued VCs and farming advisories that reference farmers (and their stats)
+            clear_statistics()
+            deleted_vcs = delete_in_chunks(IssuedVerificationCode, chunk_size=chunk_size)
+            deleted_fa = delete_in_chunks(FarmingAdvisory, chunk_size=chunk_size)
+            deleted_farmers = delete_in_chunks(Farmer, chunk_size=chunk_size)
             
             print(f"✅ Farmers table cleared successfully!")
+            print(f"   - Deleted {deleted_vcs} issued VC index entries")
             print(f"   - Deleted {deleted_fa} farming advisory records") 
             print(f"   - Deleted {deleted_farmers} farmers")
             
@@ -70,20 +171,26 @@ def clear_farmers_table():
             db.session.rollback()
         raise
 
-def clear_advisory_table():
+def clear_advisory_table(truncate=False, chunk_size=DELETE_CHUNK_SIZE):
     """Clear only the advisory table (and related farming advisories)"""
     print("🗑️  Clearing advisory table...")
     try:
         with get_app_context():
-            # First delete farming advisories that reference advisories
-            deleted_fa = FarmingAdvisory.query.count()
-            deleted_advisories = Advisory.query.count()
-            
-            FarmingAdvisory.query.delete()
-            Advisory.query.delete()
-            db.session.commit()
+            # CASCADE also empties farming_advisories, issued_vcs and campaigns, which reference advisories
+            if truncate and truncate_tables(Advisory, AdvisoryStats):
+                print(f"✅ Advisory table cleared successfully (TRUNCATE ... CASCADE)!")
+                return
+
+            # First delete campaigns, issued VCs and farming advisories that reference advisories (and their stats)
+            clear_statistics()
+            deleted_campaigns = clear_campaigns()
+            deleted_vcs = delete_in_chunks(IssuedVerificationCode, chunk_size=chunk_size)
+            deleted_fa = delete_in_chunks(FarmingAdvisory, chunk_size=chunk_size)
+            deleted_advisories = delete_in_chunks(Advisory, chunk_size=chunk_size)
             
             print(f"✅ Advisory table cleared successfully!")
+            print(f"   - Deleted {deleted_campaigns} campaigns")
+            print(f"   - Deleted {deleted_vcs} issued VC index entries")
             print(f"   - Deleted {deleted_fa} farming advisory records")
             print(f"   - Deleted {deleted_advisories} advisories")
             
@@ -93,17 +200,26 @@ def clear_advisory_table():
             db.session.rollback()
         raise
 
-def create_farmer(phone, secret_key_text):
-    """Create a single farmer"""
+def create_farmer(phone, secret_key_text, region=None, crops=None, language=None):
+    """Create a single farmer (optionally with segmentation attributes)"""
     print(f"👨‍🌾 Creating farmer with phone: {phone}")
     try:
+        phone_e164 = normalize_phone(phone)
+        if not phone_e164:
+            raise ValueError(f"'{phone}' is not a valid phone number")
+        
         with get_app_context():
-            # Convert secret key text to bytes
-            secret_key_bytes = secret_key_text.encode('utf-8')
+            # Convert secret key text to the raw key bytes (hex, base64 or plain text, as before)
+            secret_key_bytes = legacy_master_key(secret_key_text.encode('utf-8'))
             
             farmer = Farmer(
-                phone=phone,
-                secret_key=secret_key_bytes
+                phone=phone_e164,
+                phone_e164=phone_e164,
+                secret_key=secret_key_bytes,
+                key_version=KEY_VERSION_RAW,
+                region=normalize_tag(region),
+                crops=normalize_tags(crops),
+                language=normalize_tag(language)
             )
             
             db.session.add(farmer)
@@ -113,6 +229,8 @@ def create_farmer(phone, secret_key_text):
             print(f"   - ID: {farmer.id}")
             print(f"   - Phone: {farmer.phone}")
             print(f"   - Secret Key: {secret_key_text}")
+            if farmer.region or farmer.crops or farmer.language:
+                print(f"   - Segment: region={farmer.region} crops={farmer.crops} language={farmer.language}")
             
             return farmer
             
@@ -122,14 +240,16 @@ def create_farmer(phone, secret_key_text):
             db.session.rollback()
         raise
 
-def create_advisory(title, message):
-    """Create a single advisory"""
+def create_advisory(title, message, vc_scheme=None, priority=None):
+    """Create a single advisory (vc_scheme=None uses the deployment's VC_SCHEME, priority=None is normal)"""
     print(f"📢 Creating advisory: {title}")
     try:
         with get_app_context():
             advisory = Advisory(
                 title=title,
-                message=message
+                message=message,
+                vc_scheme=vc_scheme,
+                priority=priority
             )
             
             db.session.add(advisory)
@@ -139,6 +259,10 @@ def create_advisory(title, message):
             print(f"   - ID: {advisory.id}")
             print(f"   - Title: {advisory.title}")
             print(f"   - Message: {advisory.message[:50]}...")
+            if advisory.vc_scheme:
+                print(f"   - VC scheme: {advisory.vc_scheme}")
+            if advisory.priority:
+                print(f"   - Priority: {advisory.priority}")
             
             return advisory
             
@@ -159,11 +283,14 @@ def delete_farmer(farmer_id):
                 print(f"❌ Farmer with ID {farmer_id} not found")
                 return
             
-            # Count related farming advisories that will be deleted
-            related_fa = FarmingAdvisory.query.filter_by(farmer_id=farmer_id).count()
+            # Take the farmer's deliveries out of the advisory stats before they go
+            from ServerLogic.stats import subtract_deliveries
+            subtract_deliveries(db.session.connection(), FarmingAdvisory.farmer_id == farmer_id)
+            db.session.commit()
             
-            # Delete related farming advisories first
-            FarmingAdvisory.query.filter_by(farmer_id=farmer_id).delete()
+            # Delete related issued VCs and farming advisories first (in chunks, counting as we go)
+            related_vcs = delete_in_chunks(IssuedVerificationCode, IssuedVerificationCode.farmer_id == farmer_id)
+            related_fa = delete_in_chunks(FarmingAdvisory, FarmingAdvisory.farmer_id == farmer_id)
             
             # Store farmer info for confirmation message
             farmer_phone = farmer.phone
@@ -176,6 +303,7 @@ def delete_farmer(farmer_id):
             print(f"   - ID: {farmer_id}")
             print(f"   - Phone: {farmer_phone}")
             print(f"   - Also deleted {related_fa} related farming advisory records")
+            print(f"   - Also deleted {related_vcs} related issued VC index entries")
             
     except Exception as e:
         print(f"❌ Error deleting farmer: {e}")
@@ -194,11 +322,16 @@ def delete_advisory(advisory_id):
                 print(f"❌ Advisory with ID {advisory_id} not found")
                 return
             
-            # Count related farming advisories that will be deleted
-            related_fa = FarmingAdvisory.query.filter_by(advisory_id=advisory_id).count()
+            # Take the advisory's deliveries out of the totals and drop its stats row
+            from ServerLogic.stats import subtract_deliveries
+            subtract_deliveries(db.session.connection(), FarmingAdvisory.advisory_id == advisory_id)
+            db.session.execute(delete(AdvisoryStats).where(AdvisoryStats.advisory_id == advisory_id))
+            db.session.commit()
             
-            # Delete related farming advisories first
-            FarmingAdvisory.query.filter_by(advisory_id=advisory_id).delete()
+            # Delete related campaigns, issued VCs and farming advisories first (in chunks, counting as we go)
+            related_campaigns = clear_campaigns(Campaign.advisory_id == advisory_id)
+            related_vcs = delete_in_chunks(IssuedVerificationCode, IssuedVerificationCode.advisory_id == advisory_id)
+            related_fa = delete_in_chunks(FarmingAdvisory, FarmingAdvisory.advisory_id == advisory_id)
             
             # Store advisory info for confirmation message
             advisory_title = advisory.title
@@ -210,7 +343,9 @@ def delete_advisory(advisory_id):
             print(f"✅ Advisory deleted successfully!")
             print(f"   - ID: {advisory_id}")
             print(f"   - Title: {advisory_title}")
+            print(f"   - Also deleted {related_campaigns} related campaigns")
             print(f"   - Also deleted {related_fa} related farming advisory records")
+            print(f"   - Also deleted {related_vcs} related issued VC index entries")
             
     except Exception as e:
         print(f"❌ Error deleting advisory: {e}")
@@ -267,8 +402,1047 @@ def create_sample_advisories():
     print(f"✅ Created {len(created_advisories)} sample advisories")
     return created_advisories
 
-def show_status():
-    """Show current database status (counts and basic info)"""
+# ----------------------------------------------------
+# SYNTHETIC DATA GENERATION (scale testing)
+# ----------------------------------------------------
+# Everything below is driven by generators and written with bulk inserts in
+# fixed-size batches, so memory stays flat no matter how many rows are created.
+# The same --seed always produces the same phones, keys and advisories.
+
+# Kenyan mobile prefixes (digits after +254). Each prefix covers 1,000,000 numbers.
+KENYAN_MOBILE_PREFIXES = (
+    [str(p) for p in range(700, 730)] +   # Safaricom 70x-72x
+    [str(p) for p in range(730, 740)] +   # Airtel 73x
+    ['740', '741', '742', '743', '745', '746', '748'] +  # Safaricom 74x
+    [str(p) for p in range(750, 757)] +   # Airtel 75x
+    ['757', '758', '759', '768', '769'] + # Safaricom
+    [str(p) for p in range(770, 780)] +   # Telkom 77x
+    [str(p) for p in range(780, 790)] +   # Airtel 78x
+    [str(p) for p in range(790, 800)] +   # Safaricom 79x
+    ['100', '101', '102'] +               # Airtel 10x
+    [str(p) for p in range(110, 116)]     # Safaricom 11x
+)
+
+SYNTHETIC_COUNTIES = [
+    'Nakuru', 'Kiambu', 'Meru', 'Kakamega', 'Bungoma', 'Uasin Gishu', 'Trans Nzoia',
+    'Machakos', 'Kitui', 'Embu', 'Nyeri', 'Murang\'a', 'Kisii', 'Homa Bay', 'Migori',
+    'Kericho', 'Bomet', 'Narok', 'Makueni', 'Kirinyaga', 'Nandi', 'Busia', 'Siaya',
+]
+SYNTHETIC_CROPS = [
+    'maize', 'beans', 'tomatoes', 'potatoes', 'tea', 'coffee', 'sorghum', 'cassava',
+    'kale', 'cabbages', 'avocados', 'bananas', 'wheat', 'millet', 'onions',
+]
+# (ISO 639 code, weight) - Swahili and English dominate, then the larger local languages
+SYNTHETIC_LANGUAGES = [('sw', 45), ('en', 25), ('ki', 10), ('luy', 7), ('luo', 6), ('kln', 4), ('kam', 3)]
+SYNTHETIC_TOPICS = [
+    ('Weather Alert', 'Heavy rain is expected in {county} over the next {days} days. Protect your {crop} and clear drainage channels.'),
+    ('Pest Control Advisory', 'Fall armyworm has been reported in {county}. Inspect your {crop} every {days} days and apply recommended control measures.'),
+    ('Market Price Update', 'Current {crop} prices in {county}: KES {price}/kg. Consider timing your sales over the next {days} days.'),
+    ('Fertilizer Application Reminder', 'This is the optimal time to top-dress {crop} in {county}. Apply within {days} days during cool hours.'),
+    ('Disease Warning', 'Blight cases are rising in {county}. Remove infected {crop} plants and spray within {days} days.'),
+    ('Planting Advisory', 'Soil moisture in {county} is now adequate for planting {crop}. Plant within the next {days} days for best yields.'),
+]
+
+
+def iter_batches(rows, batch_size):
+    """
+    Group any iterable of rows into lists of at most batch_size items.
+
+    Args:
+        rows (iterable): Rows to group
+        batch_size (int): Maximum rows per batch
+
+    Yields:
+        list: Next batch of rows
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_synthetic_phones(rng, count):
+    """
+    Yield `count` unique, realistic Kenyan phone numbers in E.164 format.
+
+    Uniqueness comes from affine permutations (a*i + b) mod N over the whole
+    number space, so nothing has to be remembered between rows.
+    """
+    space = len(KENYAN_MOBILE_PREFIXES) * 1_000_000
+    if count > space:
+        raise ValueError(f"Cannot generate {count} unique phones (max {space})")
+
+    # Pick a multiplier coprime with the space so the mapping is a bijection
+    multiplier = rng.randrange(1_000_003, space)
+    while math.gcd(multiplier, space) != 1:
+        multiplier += 1
+    offset = rng.randrange(space)
+
+    # A second permutation over the 6 subscriber digits hides the arithmetic pattern
+    prefix_count = len(KENYAN_MOBILE_PREFIXES)
+    digit_multiplier = rng.randrange(100_001, 1_000_000, 2)
+    while digit_multiplier % 5 == 0:
+        digit_multiplier += 2
+    digit_offset = rng.randrange(1_000_000)
+
+    for i in range(count):
+        idx = (multiplier * i + offset) % space
+        prefix = KENYAN_MOBILE_PREFIXES[idx % prefix_count]
+        subscriber = (digit_multiplier * (idx // prefix_count) + digit_offset) % 1_000_000
+        yield f"+254{prefix}{subscriber:06d}"
+
+
+def iter_synthetic_farmers(seed, count, key_bytes=32):
+    """
+    Yield farmer rows (as dicts for bulk insert) with random binary secret keys.
+    """
+    rng = random.Random(f"{seed}:farmers")
+    # Separate stream, so phones and keys stay what they were before farmers had segments
+    segment_rng = random.Random(f"{seed}:segments")
+    languages, language_weights = zip(*SYNTHETIC_LANGUAGES)
+    for phone in iter_synthetic_phones(rng, count):
+        yield {
+            'phone': phone,
+            'phone_e164': phone,
+            'secret_key': rng.getrandbits(key_bytes * 8).to_bytes(key_bytes, 'big'),
+            'region': normalize_tag(segment_rng.choice(SYNTHETIC_COUNTIES)),
+            'crops': sorted(segment_rng.sample(SYNTHETIC_CROPS, segment_rng.randint(1, 3))),
+            'language': segment_rng.choices(languages, language_weights)[0],
+        }
+
+
+def iter_synthetic_advisories(seed, count):
+    """
+    Yield advisory rows (as dicts for bulk insert) built from realistic templates.
+    """
+    rng = random.Random(f"{seed}:advisories")
+    for _ in range(count):
+        topic, template = rng.choice(SYNTHETIC_TOPICS)
+        county = rng.choice(SYNTHETIC_COUNTIES)
+        crop = rng.choice(SYNTHETIC_CROPS)
+        yield {
+            'title': f"{topic}: {crop.capitalize()} in {county}",
+            'message': template.format(
+                county=county,
+                crop=crop,
+                days=rng.randint(2, 14),
+                price=rng.randint(20, 250),
+            ),
+        }
+
+
+def iter_synthetic_deliveries(rng, farmer_ids, advisory_ids, per_farmer, history_end, history_days, verified_ratio):
+    """
+    Yield FarmingAdvisory rows for a batch of farmers.
+
+    Each farmer receives between 0 and 2*per_farmer advisories, spread randomly
+    over the `history_days` days before `history_end`.
+    """
+    window_seconds = history_days * 24 * 3600
+    max_per_farmer = max(int(round(per_farmer * 2)), 0)
+    for farmer_id in farmer_ids:
+        for _ in range(rng.randint(0, max_per_farmer)):
+            sent_at = history_end - timedelta(seconds=rng.randrange(window_seconds))
+            verified = rng.random() < verified_ratio
+            yield {
+                'farmer_id': farmer_id,
+                'advisory_id': rng.choice(advisory_ids),
+                'sent_at': sent_at,
+                'verified': verified,
+                # Most farmers dial the VC within hours of the SMS, a few days later
+                'verified_at': sent_at + timedelta(seconds=rng.expovariate(1 / 7200)) if verified else None,
+            }
+
+
+def generate_synthetic_data(farmers=1_000_000, advisories=2_000, deliveries_per_farmer=5.0,
+                            seed=42, batch_size=10_000, history_days=365, history_end=None,
+                            verified_ratio=0.6):
+    """
+    Generate a production-scale synthetic dataset.
+
+    Args:
+        farmers (int): Number of farmers to create
+        advisories (int): Number of advisories to create
+        deliveries_per_farmer (float): Average FarmingAdvisory rows per farmer
+        seed (int): Seed that makes the whole dataset reproducible
+        batch_size (int): Rows per bulk INSERT / commit
+        history_days (int): How far back delivery history goes
+        history_end (datetime): Newest possible sent_at (defaults to today, midnight UTC)
+        verified_ratio (float): Fraction of deliveries marked as verified
+
+    Returns:
+        dict: Counts of rows created per table
+    """
+
+    if history_end is None:
+        history_end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    print(f"🧪 Generating synthetic data (seed={seed}, batch size={batch_size})...")
+    print(f"   - Farmers: {farmers}")
+    print(f"   - Advisories: {advisories}")
+    print(f"   - Deliveries per farmer (avg): {deliveries_per_farmer}")
+
+    created = {'farmers': 0, 'advisories': 0, 'farming_advisories': 0}
+    started = time.perf_counter()
+
+    try:
+        with get_app_context():
+            # Remember where the new farmers start so histories only target them
+            first_new_farmer_id = (db.session.execute(select(db.func.max(Farmer.id))).scalar() or 0) + 1
+
+            # Step 1: Farmers
+            for batch in iter_batches(iter_synthetic_farmers(seed, farmers), batch_size):
+                db.session.execute(insert(Farmer), batch)
+                db.session.commit()
+                created['farmers'] += len(batch)
+                print(f"   👨‍🌾 {created['farmers']}/{farmers} farmers inserted")
+
+            # Step 2: Advisories (their IDs are small enough to keep in memory)
+            advisory_ids = []
+            for batch in iter_batches(iter_synthetic_advisories(seed, advisories), batch_size):
+                result = db.session.execute(insert(Advisory).returning(Advisory.id), batch)
+                advisory_ids.extend(result.scalars().all())
+                db.session.commit()
+                created['advisories'] += len(batch)
+                print(f"   📢 {created['advisories']}/{advisories} advisories inserted")
+
+            # Step 3: Delivery histories, walking the new farmers page by page (keyset pagination)
+            if advisory_ids and deliveries_per_farmer > 0:
+                rng = random.Random(f"{seed}:deliveries")
+                last_id = first_new_farmer_id - 1
+                while True:
+                    farmer_ids = db.session.execute(
+                        select(Farmer.id)
+                        .where(Farmer.id > last_id)
+                        .order_by(Farmer.id)
+                        .limit(batch_size)
+                    ).scalars().all()
+                    if not farmer_ids:
+                        break
+                    last_id = farmer_ids[-1]
+
+                    rows = iter_synthetic_deliveries(
+                        rng, farmer_ids, advisory_ids, deliveries_per_farmer,
+                        history_end, history_days, verified_ratio
+                    )
+                    for batch in iter_batches(rows, batch_size):
+                        db.session.execute(insert(FarmingAdvisory), batch)
+                        created['farming_advisories'] += len(batch)
+                    db.session.commit()
+                    print(f"   📱 {created['farming_advisories']} farming advisory records inserted (up to farmer {last_id})")
+
+                # Bulk inserts bypass the send path: recount the advisory stats once
+                rebuild_statistics()
+
+        elapsed = time.perf_counter() - started
+        total_rows = sum(created.values())
+        print(f"✅ Synthetic data generated in {elapsed:.1f}s ({total_rows / elapsed if elapsed else 0:.0f} rows/s)")
+        print(f"   - Created {created['farmers']} farmers")
+        print(f"   - Created {created['advisories']} advisories")
+        print(f"   - Created {created['farming_advisories']} farming advisory records")
+        return created
+
+    except Exception as e:
+        print(f"❌ Error generating synthetic data: {e}")
+        with get_app_context():
+            db.session.rollback()
+        raise
+
+# ----------------------------------------------------
+# VERIFICATION CODE BACKFILL
+# ----------------------------------------------------
+# Delivery records created before VCs were stored have verification_code NULL.
+# backfill-vcs walks them in ID order, asks the SMC for each distinct
+# (farmer, advisory) pair once - split across workers, each sending its share
+# as one get_vcs() call (a single pipelined round trip with SMC_TRANSPORT=rpc) -
+# and writes the VCs back one batch (one transaction) at a time.
+
+BACKFILL_WORKERS = 8
+
+
+def backfill_verification_codes(workers=BACKFILL_WORKERS, batch_size=1_000):
+    """
+    Compute and store the VC for every delivery record that does not have one yet.
+
+    Args:
+        workers (int): SMC requests in flight at the same time
+        batch_size (int): Delivery records per page / commit
+
+    Returns:
+        dict: Counts of records updated and failed, and of VCs that collided in the index
+    """
+    from ServerLogic.smc_client import get_smc_client
+    from ServerLogic.vc_index import vc_index_enabled, record_issued_vc, get_vc_scheme, VCCollision
+
+    print(f"🔐 Backfilling verification codes ({workers} workers, batch size {batch_size})...")
+
+    counts = {'updated': 0, 'failed': 0, 'collisions': 0}
+    started = time.perf_counter()
+
+    client = get_smc_client()
+
+    def compute_vcs(pairs):
+        responses = client.get_vcs([
+            (str(advisory_id), secret_key, scheme, farmer_id)
+            for (farmer_id, advisory_id), (secret_key, scheme) in pairs
+        ])
+        return [(pair, (response or {}).get('vc')) for (pair, _), response in zip(pairs, responses)]
+
+    try:
+        with get_app_context(), ThreadPoolExecutor(max_workers=workers) as pool:
+            index_enabled = vc_index_enabled()
+            last_id = 0
+            while True:
+                rows = db.session.execute(
+                    select(FarmingAdvisory.id, FarmingAdvisory.farmer_id, FarmingAdvisory.advisory_id,
+                           Farmer.secret_key, Farmer.key_version, Advisory.vc_scheme)
+                    .join(Farmer, Farmer.id == FarmingAdvisory.farmer_id)
+                    .join(Advisory, Advisory.id == FarmingAdvisory.advisory_id)
+                    .where(FarmingAdvisory.verification_code.is_(None))
+                    .where(FarmingAdvisory.id > last_id)
+                    .order_by(FarmingAdvisory.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                # One SMC call per distinct (farmer, advisory) pair in the batch
+                keys = {
+                    (row.farmer_id, row.advisory_id): (master_key(row.secret_key, row.key_version), get_vc_scheme(row.vc_scheme))
+                    for row in rows
+                }
+                items = list(keys.items())
+                shares = [items[i::workers] for i in range(workers)]
+                vcs = {pair: vc for share in pool.map(compute_vcs, shares) for pair, vc in share}
+
+                updates = []
+                for row in rows:
+                    vc = vcs.get((row.farmer_id, row.advisory_id))
+                    if vc:
+                        updates.append({'id': row.id, 'verification_code': vc})
+                    else:
+                        counts['failed'] += 1
+
+                if updates:
+                    # Bulk UPDATE by primary key
+                    db.session.execute(update(FarmingAdvisory), updates)
+                    db.session.commit()
+                    counts['updated'] += len(updates)
+
+                # HMAC VCs are only verifiable through the index, so they are always recorded
+                for (farmer_id, advisory_id), vc in vcs.items():
+                    if vc and (index_enabled or keys[(farmer_id, advisory_id)][1] == 'hmac'):
+                        try:
+                            record_issued_vc(farmer_id, advisory_id, vc)
+                        except VCCollision as collision:
+                            # Already sent: the farmer holds this VC, so the index keeps its first advisory
+                            counts['collisions'] += 1
+                            print(f"   ⚠️  {collision}, left pointing there")
+
+                print(f"   🔐 {counts['updated']} records updated, {counts['failed']} failed (up to record {last_id})")
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Backfill finished in {elapsed:.1f}s ({counts['updated'] / elapsed if elapsed else 0:.0f} records/s)")
+        if counts['failed']:
+            print(f"⚠️  {counts['failed']} records could not get a VC from the SMC - run backfill-vcs again to retry them")
+        if counts['collisions']:
+            print(f"⚠️  {counts['collisions']} VCs collided with a VC the farmer holds for another advisory")
+        return counts
+
+    except Exception as e:
+        print(f"❌ Error backfilling verification codes: {e}")
+        with get_app_context():
+            db.session.rollback()
+        raise
+
+# ----------------------------------------------------
+# OFFLINE CAMPAIGN VCs
+# ----------------------------------------------------
+# export-vc-jobs writes a (farmer_id, secret_key, message_id, scheme, key_encoding) CSV for
+# one advisory; the SMC's bulk_vc.py turns it into VCs on every core, and
+# load-vcs bulk-loads the result as planned delivery records (sent_at empty).
+# At send time the stored VC is reused, so the blast window does no crypto.
+
+def export_vc_jobs(advisory_id, output_path=None, limit=None, after_id=None, segment=None):
+    """
+    Export one VC job per farmer for an advisory, for SMC/bulk_vc.py.
+
+    Args:
+        advisory_id (int): Advisory the campaign sends
+        output_path (str): CSV file to write (stdout if None)
+        limit (int): Maximum farmers to export
+        after_id (int): Only export farmers with an ID greater than this
+        segment (Segment): Only export the farmers in this segment (default: everyone)
+
+    Returns:
+        int: Number of jobs written
+    """
+    from ServerLogic.vc_index import get_vc_scheme
+
+    with get_app_context():
+        advisory = db.session.get(Advisory, advisory_id)
+        if not advisory:
+            print(f"❌ Advisory with ID {advisory_id} not found", file=sys.stderr)
+            return 0
+        scheme = get_vc_scheme(advisory.vc_scheme)
+
+        output = open_output(output_path)
+        count = 0
+        try:
+            writer = csv.writer(output)
+            writer.writerow(['farmer_id', 'secret_key', 'message_id', 'scheme', 'key_encoding'])
+            stmt = select(Farmer.id, Farmer.secret_key, Farmer.key_version)
+            if segment:
+                # Resolved through the region/language/crops indexes, not a scan of every farmer
+                stmt = stmt.where(*segment.criteria(db.engine.dialect.name))
+            for row in stream_rows(stmt, Farmer.id, limit=limit, after_id=after_id):
+                # Same canonical key encoding send_to_smc uses, so offline VCs match the live ones
+                secret_key, key_encoding = encode_secret_key(master_key(row['secret_key'], row['key_version']))
+                writer.writerow([row['id'], secret_key, advisory_id, scheme, key_encoding])
+                count += 1
+        finally:
+            close_output(output)
+
+    target = f" to segment {segment.to_dict()}" if segment and not segment.is_everyone else ""
+    print(f"✅ Exported {count} VC jobs for advisory {advisory_id} ({scheme}){target}", file=sys.stderr)
+    return count
+
+
+def load_verification_codes(input_path, batch_size=10_000):
+    """
+    Bulk-load a VC file from SMC/bulk_vc.py as planned delivery records.
+
+    Safe to run again (after a partial failure, or on the same file twice): a
+    farmer who already has a planned (unsent) record for the advisory keeps it,
+    and only new records are inserted.
+
+    Args:
+        input_path (str): CSV with farmer_id, message_id, verification_code, scheme
+        batch_size (int): Rows per bulk insert / commit
+
+    Returns:
+        int: Number of records loaded
+    """
+    from ServerLogic.vc_index import vc_index_enabled, record_issued_vc, VCCollision
+
+    print(f"📥 Loading verification codes from {input_path} (batch size {batch_size})...")
+    loaded = 0
+    skipped = 0
+    started = time.perf_counter()
+
+    def iter_rows(reader):
+        for record in reader:
+            yield {
+                'farmer_id': int(record['farmer_id']),
+                'advisory_id': int(record['message_id']),
+                'verification_code': record['verification_code'],
+                'scheme': record.get('scheme'),
+            }
+
+    def planned_vcs(batch):
+        """(farmer_id, advisory_id) -> VC of the planned records a batch already has"""
+        return {
+            (farmer_id, advisory_id): verification_code
+            for farmer_id, advisory_id, verification_code in db.session.execute(
+                select(FarmingAdvisory.farmer_id, FarmingAdvisory.advisory_id, FarmingAdvisory.verification_code)
+                .where(FarmingAdvisory.farmer_id.in_({row['farmer_id'] for row in batch}))
+                .where(FarmingAdvisory.advisory_id.in_({row['advisory_id'] for row in batch}))
+                .where(FarmingAdvisory.sent_at.is_(None))
+            )
+        }
+
+    try:
+        with get_app_context(), open(input_path, newline='', encoding='utf-8') as source:
+            index_enabled = vc_index_enabled()
+            for batch in iter_batches(iter_rows(csv.DictReader(source)), batch_size):
+                # Loaded by an earlier run: keep the planned record (and the VC it holds)
+                planned = planned_vcs(batch)
+                new_rows = {}
+                for row in batch:
+                    new_rows.setdefault((row['farmer_id'], row['advisory_id']), row)
+                new_rows = [row for key, row in new_rows.items() if key not in planned]
+
+                # Planned records: sent_at stays empty until the SMS actually goes out
+                # (Core insert, because the ORM bulk insert would fill in the sent_at default)
+                if new_rows:
+                    db.session.execute(insert(FarmingAdvisory.__table__), [
+                        {
+                            'farmer_id': row['farmer_id'],
+                            'advisory_id': row['advisory_id'],
+                            'verification_code': row['verification_code'],
+                            'sent_at': None,
+                            'verified': False,
+                        }
+                        for row in new_rows
+                    ])
+                db.session.commit()
+
+                # HMAC VCs are only verifiable through the index, so they are always recorded.
+                # Rows loaded before are indexed again (a failed run may have stopped in between),
+                # unless the planned record holds another VC
+                indexed = [
+                    {key: row[key] for key in ('farmer_id', 'advisory_id', 'verification_code')}
+                    for row in batch
+                    if (index_enabled or row['scheme'] == 'hmac')
+                    and planned.get((row['farmer_id'], row['advisory_id']), row['verification_code'])
+                    == row['verification_code']
+                ]
+                if indexed:
+                    try:
+                        db.session.execute(insert(IssuedVerificationCode), indexed)
+                        db.session.commit()
+                    except IntegrityError:
+                        # Some (farmer, VC) pairs already exist - upsert this batch row by row
+                        db.session.rollback()
+                        for row in indexed:
+                            try:
+                                record_issued_vc(row['farmer_id'], row['advisory_id'], row['verification_code'])
+                            except VCCollision as collision:
+                                # Not sent yet: drop the planned VC so the send issues a new one
+                                db.session.execute(
+                                    update(FarmingAdvisory)
+                                    .where(FarmingAdvisory.farmer_id == row['farmer_id'])
+                                    .where(FarmingAdvisory.advisory_id == row['advisory_id'])
+                                    .where(FarmingAdvisory.sent_at.is_(None))
+                                    .values(verification_code=None)
+                                )
+                                db.session.commit()
+                                print(f"   ⚠️  {collision}, VC dropped to be issued again at send time")
+
+                loaded += len(new_rows)
+                skipped += len(batch) - len(new_rows)
+                print(f"   📥 {loaded} verification codes loaded" + (f", {skipped} already planned" if skipped else ""))
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Loaded {loaded} verification codes in {elapsed:.1f}s ({loaded / elapsed if elapsed else 0:.0f} rows/s)"
+              + (f", skipped {skipped} already planned" if skipped else ""))
+        return loaded
+
+    except Exception as e:
+        print(f"❌ Error loading verification codes: {e}")
+        with get_app_context():
+            db.session.rollback()
+        raise
+
+# ----------------------------------------------------
+# SECRET KEY NORMALISATION
+# ----------------------------------------------------
+# Rows with key_version 0 hold keys in the old text format, which the SMC used
+# to sniff (hex / base64 / UTF-8). normalize-keys resolves each one to the raw
+# master key the SMC was already using and stores that (key_version 1), so no
+# issued VC changes. The Server reads both versions, so it can run live.
+
+def normalize_secret_keys(batch_size=10_000):
+    """
+    Rewrite every legacy-format secret key as raw key bytes.
+
+    Args:
+        batch_size (int): Farmers per page / commit
+
+    Returns:
+        int: Number of farmers normalised
+    """
+    print(f"🔑 Normalising legacy secret keys (batch size {batch_size})...")
+    normalised = 0
+    started = time.perf_counter()
+
+    try:
+        with get_app_context():
+            last_id = 0
+            while True:
+                rows = db.session.execute(
+                    select(Farmer.id, Farmer.secret_key)
+                    .where(Farmer.key_version == KEY_VERSION_LEGACY)
+                    .where(Farmer.id > last_id)
+                    .order_by(Farmer.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                db.session.execute(update(Farmer), [
+                    {'id': row.id, 'secret_key': legacy_master_key(row.secret_key), 'key_version': KEY_VERSION_RAW}
+                    for row in rows
+                ])
+                db.session.commit()
+                normalised += len(rows)
+                print(f"   🔑 {normalised} keys normalised (up to farmer {last_id})")
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Normalised {normalised} secret keys in {elapsed:.1f}s")
+        return normalised
+
+    except Exception as e:
+        print(f"❌ Error normalising secret keys: {e}")
+        with get_app_context():
+            db.session.rollback()
+        raise
+
+def export_key_snapshot(output_path, delta=False):
+    """
+    Export phone -> secret key for every farmer to a memory-mapped snapshot file.
+
+    Args:
+        output_path (str): Snapshot file (KEY_SNAPSHOT_PATH on the verification workers)
+        delta (bool): Only export farmers created since the newest snapshot/delta file,
+                      as the next `<output>.delta-NNNN`
+
+    Returns:
+        int: Number of farmers written
+    """
+    from ServerLogic.key_snapshot import KeySnapshot, KIND_BASE, KIND_DELTA, delta_paths, next_delta_path, write_snapshot
+
+    after_id, path, kind = None, output_path, KIND_BASE
+    if delta:
+        if not os.path.exists(output_path):
+            print(f"❌ No snapshot at {output_path} - export a full snapshot first")
+            return 0
+        after_id = KeySnapshot(output_path).max_farmer_id
+        path, kind = next_delta_path(output_path), KIND_DELTA
+
+    print(f"🔑 Exporting farmer keys to {path}" + (f" (farmers after {after_id})" if delta else "") + "...")
+    started = time.perf_counter()
+
+    with get_app_context():
+        stmt = select(Farmer.id, Farmer.phone, Farmer.phone_e164, Farmer.secret_key, Farmer.key_version)
+        farmers = (
+            (row['id'], row['phone_e164'], row['secret_key'], row['key_version'])
+            for row in stream_rows(stmt, Farmer.id, after_id=after_id, batch_size=10_000)
+        )
+        if delta:
+            farmers = list(farmers)
+            if not farmers:
+                print("✅ No new farmers since the last snapshot")
+                return 0
+        stale_deltas = [] if delta else delta_paths(output_path)
+        written = write_snapshot(path, farmers, kind)
+
+    # A full snapshot supersedes every delta of the previous one
+    for stale in stale_deltas:
+        os.remove(stale)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Wrote {written} farmers to {path} ({os.path.getsize(path) / 1e6:.1f} MB) in {elapsed:.1f}s")
+    return written
+
+def load_segments(input_path, batch_size=10_000):
+    """
+    Set farmers' segmentation attributes from a CSV file.
+
+    The file has a `phone` column plus any of `region`, `crops` (comma-separated)
+    and `language`. Columns that are missing are left alone, empty cells clear the
+    attribute. `show-farmers --format csv` writes the same format.
+
+    Args:
+        input_path (str): CSV file to read
+        batch_size (int): Farmers updated per transaction
+
+    Returns:
+        int: Number of farmers updated
+    """
+    print(f"🏷️  Loading farmer segments from {input_path}...")
+    updated = unknown = 0
+    started = time.perf_counter()
+
+    with get_app_context(), open(input_path, newline='', encoding='utf-8') as source:
+        reader = csv.DictReader(source)
+        fields = [field for field in ('region', 'crops', 'language') if field in (reader.fieldnames or [])]
+        if 'phone' not in (reader.fieldnames or []) or not fields:
+            print("❌ The file needs a phone column and at least one of region, crops, language")
+            return 0
+
+        for batch in iter_batches(reader, batch_size):
+            by_phone = {}
+            for row in batch:
+                phone = normalize_phone(row['phone'])
+                if not phone:
+                    print(f"⚠️  Skipping invalid phone number: {row['phone']}")
+                    continue
+                by_phone[phone] = {
+                    'region': normalize_tag(row.get('region')),
+                    'crops': normalize_tags(row.get('crops')),
+                    'language': normalize_tag(row.get('language')),
+                }
+
+            ids = dict(db.session.execute(
+                select(Farmer.phone_e164, Farmer.id).where(Farmer.phone_e164.in_(list(by_phone)))
+            ).all())
+            unknown += len(by_phone) - len(ids)
+            updates = [
+                {'id': ids[phone], **{field: attributes[field] for field in fields}}
+                for phone, attributes in by_phone.items() if phone in ids
+            ]
+            if updates:
+                # Bulk UPDATE by primary key, one executemany per batch
+                db.session.execute(update(Farmer), updates)
+            db.session.commit()
+            updated += len(updates)
+            print(f"   🏷️  {updated} farmers updated")
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Updated segments for {updated} farmers in {elapsed:.1f}s" + (f" ({unknown} unknown phones skipped)" if unknown else ""))
+    return updated
+
+def show_segment(segment, limit=20):
+    """
+    Show how many farmers a segment selects, and the first few farmer IDs.
+
+    Returns:
+        int: Number of farmers in the segment
+    """
+    with get_app_context():
+        connection = db.session.connection()
+        started = time.perf_counter()
+        total = count_farmers(connection, segment)
+        farmer_ids = resolve_page(connection, segment, limit=limit)
+        elapsed = time.perf_counter() - started
+
+    print(f"🎯 Segment {segment.to_dict()}")
+    print(f"   👨‍🌾 {total} farmers ({elapsed * 1000:.0f} ms)")
+    if farmer_ids:
+        print(f"   First IDs: {', '.join(str(farmer_id) for farmer_id in farmer_ids)}" + (" ..." if total > len(farmer_ids) else ""))
+    return total
+
+def print_sms_report(report):
+    """Print an advisory's SMS cost (ServerLogic/SMS/render.py report())"""
+    for label, key in (('Notification SMS', 'notification'), ('Full message', 'full_message')):
+        sms = report[key]
+        line = f"   - {label}: {sms['characters']} characters, {sms['encoding']}, {sms['segments']} segment(s)"
+        if sms['parts'] > 1:
+            line += f" in {sms['parts']} SMS"
+        if sms['original_encoding'] != sms['encoding'] or sms['original_segments'] != sms['segments']:
+            line += f" (was {sms['original_encoding']}, {sms['original_segments']} before normalising)"
+        print(line)
+        if sms['non_gsm_characters']:
+            print(f"     ⚠️  Sent as UCS-2 because of: {' '.join(sms['non_gsm_characters'])}")
+    if 'farmers' in report:
+        print(f"   - {report['farmers']:,} farmers: {report['notification_segments']:,} notification segments, "
+              f"plus {report['full_message_segments_per_verification']} per verification")
+
+def show_sms_report(advisory_id, segment):
+    """Show what broadcasting an advisory to a segment costs in SMS segments, before sending it"""
+    from ServerLogic.SMS.render import report
+
+    with get_app_context():
+        advisory = db.session.get(Advisory, advisory_id)
+        if advisory is None:
+            print(f"❌ Advisory with ID {advisory_id} not found")
+            return None
+        farmers = count_farmers(db.session.connection(), segment)
+        sms_report = report(advisory, farmers)
+
+    print(f"📏 SMS report for advisory {advisory_id}: {advisory.title}")
+    if not segment.is_everyone:
+        print(f"   - Segment: {segment.to_dict()}")
+    print_sms_report(sms_report)
+    return sms_report
+
+def create_scheduled_campaign(advisory_id, segment, starts_at=None, ends_at=None, window_minutes=None):
+    """Schedule a campaign: the advisory to a segment, spread over a time window (run by run-campaigns)"""
+    from ServerLogic.campaigns import create_campaign
+    from ServerLogic.SMS.render import report
+
+    with get_app_context():
+        try:
+            campaign = create_campaign(db.session, advisory_id, segment, starts_at=starts_at,
+                                       ends_at=ends_at, window_minutes=window_minutes)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        farmers = count_farmers(db.session.connection(), segment)
+        window = (campaign.ends_at - campaign.starts_at).total_seconds()
+        sms_report = report(campaign.advisory, farmers)
+
+    print(f"🗓️  Campaign {campaign.id} scheduled: advisory {advisory_id} to {farmers:,} farmers")
+    print(f"   - Window: {campaign.starts_at:%Y-%m-%d %H:%M} to {campaign.ends_at:%Y-%m-%d %H:%M} UTC")
+    print(f"   - About {farmers / window * 60:,.1f} SMS/min")
+    if not segment.is_everyone:
+        print(f"   - Segment: {segment.to_dict()}")
+    print_sms_report(sms_report)
+    return campaign
+
+def change_campaign_status(campaign_id, action):
+    """Pause, resume or cancel a campaign (a running worker picks it up at its next checkpoint)"""
+    from ServerLogic.campaigns import set_campaign_status
+
+    with get_app_context():
+        try:
+            campaign = set_campaign_status(db.session, campaign_id, action)
+            db.session.commit()
+        except ValueError as e:
+            db.session.rollback()
+            print(f"❌ {e}")
+            return None
+        if campaign is None:
+            print(f"❌ Campaign with ID {campaign_id} not found")
+            return None
+        print(f"✅ Campaign {campaign_id} is now {campaign.status}")
+        return campaign
+
+def show_campaigns(limit=None):
+    """Show campaigns, newest first, with their progress"""
+    from ServerLogic.models import Campaign
+
+    with get_app_context():
+        campaigns = Campaign.query.order_by(Campaign.id.desc()).limit(limit or 20).all()
+        print(f"🗓️  CAMPAIGNS ({len(campaigns)} shown)")
+        print("=" * 80)
+        for campaign in campaigns:
+            done = campaign.sent_count + campaign.failed_count
+            progress = f"{done:,}/{campaign.total:,}" if campaign.total is not None else "not started"
+            print(f"   {campaign.id:>4}  advisory {campaign.advisory_id:<5} {campaign.status:<10} {progress:<16} "
+                  f"failed {campaign.failed_count:<6} {campaign.starts_at:%Y-%m-%d %H:%M} -> {campaign.ends_at:%H:%M} UTC"
+                  + (f"  [{campaign.lease_owner}]" if campaign.lease_owner else ""))
+        return campaigns
+
+def run_campaigns(concurrency=None, once=False):
+    """
+    Run due campaigns until interrupted (Ctrl-C or SIGTERM releases them for the next run).
+
+    Args:
+        concurrency (int): Sends in flight at once (default CAMPAIGN_CONCURRENCY)
+        once (bool): Return once the campaigns due now have finished
+    """
+    from ServerLogic.campaigns import CampaignRunner
+
+    runner = CampaignRunner(get_app(), concurrency=concurrency)
+
+    def stop(signum, frame):
+        print("\n⏹️  Stopping: finishing the sends in flight...")
+        runner.stop()
+
+    # Ctrl-C or a service stop: the campaigns are handed back for the next worker, not left leased
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    runner.run(once=once)
+
+def rebuild_statistics():
+    """
+    Recompute the advisory_stats counters from farming_advisories.
+    Needed after bulk loads that bypass the send path, or to correct counts a
+    killed worker never flushed. Scans the whole delivery history once.
+
+    Returns:
+        int: Number of advisories with statistics
+    """
+    from ServerLogic.stats import rebuild_stats, get_stats
+
+    print("📈 Rebuilding advisory statistics from delivery records...")
+    started = time.perf_counter()
+    with get_app_context():
+        advisories = rebuild_stats(db.session.connection())
+        db.session.commit()
+        totals = get_stats()
+
+    print(f"✅ Statistics rebuilt for {advisories} advisories in {time.perf_counter() - started:.1f}s "
+          f"({totals['sent']} sent, {totals['verified']} verified)")
+    return advisories
+
+def create_partitions(months_ahead=3):
+    """
+    Create the monthly farming_advisories partitions for the coming months.
+    Run it from cron (e.g. daily) so new deliveries never land in the default partition.
+
+    Args:
+        months_ahead (int): Months after the current one to prepare
+
+    Returns:
+        list: Names of the partitions created
+    """
+    from ServerLogic.partitions import ensure_partitions, is_partitioned
+
+    with get_app_context():
+        with db.engine.begin() as connection:
+            if not is_partitioned(connection):
+                print("❌ farming_advisories is not partitioned (PostgreSQL only, run flask db upgrade)")
+                return []
+            created = ensure_partitions(connection, months_ahead=months_ahead)
+
+    print(f"✅ {len(created)} partitions created" if created else "✅ All partitions already exist")
+    return created
+
+def archive_old_partitions(archive_dir, retention_months=12, keep_tables=False):
+    """
+    Detach farming_advisories partitions older than the retention period,
+    archive each to a compressed CSV file and drop it.
+
+    Args:
+        archive_dir (str): Directory for the .csv.gz archives
+        retention_months (int): Months kept online, counting the current one
+        keep_tables (bool): Leave the detached tables in place after archiving
+
+    Returns:
+        list: Paths of the archive files written
+    """
+    from ServerLogic.partitions import archive_partitions, is_partitioned
+
+    with get_app_context():
+        with db.engine.connect() as connection:
+            if not is_partitioned(connection):
+                print("❌ farming_advisories is not partitioned (PostgreSQL only, run flask db upgrade)")
+                return []
+
+        print(f"📦 Archiving delivery records older than {retention_months} months to {archive_dir}...")
+        paths = archive_partitions(db.engine, archive_dir, retention_months=retention_months, keep_tables=keep_tables)
+
+    print(f"✅ Archived {len(paths)} partitions" if paths else "✅ Nothing to archive")
+    return paths
+
+def restore_partition(input_path):
+    """
+    Load a month archived by archive-partitions back into farming_advisories.
+
+    Args:
+        input_path (str): farming_advisories_pYYYY_MM.csv.gz archive
+
+    Returns:
+        int: Number of rows restored
+    """
+    from ServerLogic.partitions import restore_archive
+
+    with get_app_context():
+        restored = restore_archive(db.engine, input_path)
+
+    print(f"✅ Restored {restored} delivery records from {input_path}")
+    return restored
+
+# ----------------------------------------------------
+# STREAMING TABLE DUMPS
+# ----------------------------------------------------
+# The show-* commands select only the columns they print and stream rows with
+# yield_per (a server-side cursor on PostgreSQL), so memory stays constant even
+# for millions of rows. --limit/--offset/--after-id page through a table and
+# --format csv/ndjson turns any of them into an export.
+
+EXPORT_FORMATS = ['table', 'csv', 'ndjson']
+STREAM_BATCH_SIZE = 1_000
+
+
+def farmers_select():
+    """Column-only select for the farmers table"""
+    return select(Farmer.id, Farmer.phone, Farmer.phone_e164, Farmer.secret_key, Farmer.region, Farmer.crops,
+                  Farmer.language, Farmer.created_at, Farmer.updated_at)
+
+
+def advisories_select():
+    """Column-only select for the advisories table"""
+    return select(Advisory.id, Advisory.title, Advisory.message, Advisory.created_at)
+
+
+def farming_advisories_select():
+    """Column-only select for delivery records, joined once instead of one lookup per row"""
+    return (
+        select(
+            FarmingAdvisory.id,
+            FarmingAdvisory.farmer_id,
+            Farmer.phone,
+            FarmingAdvisory.advisory_id,
+            Advisory.title,
+            FarmingAdvisory.sent_at,
+            FarmingAdvisory.verified,
+            FarmingAdvisory.verified_at,
+            FarmingAdvisory.verification_code,
+        )
+        .outerjoin(Farmer, Farmer.id == FarmingAdvisory.farmer_id)
+        .outerjoin(Advisory, Advisory.id == FarmingAdvisory.advisory_id)
+    )
+
+
+def stream_rows(stmt, id_column, limit=None, offset=None, after_id=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Execute a select in ID order and yield its rows one at a time.
+
+    Args:
+        stmt: Column-only select to run
+        id_column: Column used for ordering and --after-id keyset pagination
+        limit (int): Maximum rows to return
+        offset (int): Rows to skip (prefer after_id for deep pages)
+        after_id (int): Only return rows with an ID greater than this
+        batch_size (int): Rows fetched from the cursor at a time
+
+    Yields:
+        Row: Next row mapping
+    """
+    if after_id is not None:
+        stmt = stmt.where(id_column > after_id)
+    stmt = stmt.order_by(id_column)
+    if offset:
+        stmt = stmt.offset(offset)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    result = db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in result:
+        yield row._mapping
+
+
+def export_value(value):
+    """Convert a column value into something CSV/JSON friendly"""
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_rows(rows, fmt, output, table=None):
+    """
+    Write rows as CSV or NDJSON, one row at a time.
+
+    Args:
+        rows (iterable): Row mappings to export
+        fmt (str): 'csv' or 'ndjson'
+        output (file): Open text file to write to
+        table (str): Optional table name added to every NDJSON record
+
+    Returns:
+        int: Number of rows written
+    """
+    count = 0
+    writer = None
+    for row in rows:
+        record = {key: export_value(value) for key, value in row.items()}
+        if fmt == 'csv':
+            # Lists (farmer crops) as one comma-separated cell, the format load-segments reads
+            record = {key: ','.join(value) if isinstance(value, list) else value for key, value in record.items()}
+            if writer is None:
+                writer = csv.DictWriter(output, fieldnames=list(record.keys()))
+                writer.writeheader()
+            writer.writerow(record)
+        else:
+            if table:
+                record = {'table': table, **record}
+            output.write(json.dumps(record) + '\n')
+        count += 1
+    return count
+
+
+def open_output(path):
+    """Open the export destination (stdout when no path is given)"""
+    if path:
+        return open(path, 'w', newline='', encoding='utf-8')
+    return sys.stdout
+
+
+def close_output(output):
+    """Close the export destination unless it is stdout"""
+    if output is not sys.stdout:
+        output.close()
+    else:
+        output.flush()
+
+
+def show_status(limit=20):
+    """Show current database status (counts and the first few records)"""
     print("📊 Current Database Status:")
     try:
         with get_app_context():
@@ -279,205 +1453,275 @@ def show_status():
             print(f"   👨‍🌾 Farmers: {farmer_count}")
             print(f"   📢 Advisories: {advisory_count}")
             print(f"   📱 Farming Advisory Records: {fa_count}")
+            print(f"   🔐 Issued VC Index Entries: {IssuedVerificationCode.query.count()}")
+            print(f"   🗓️  Campaigns: {Campaign.query.count()}")
+            
+            # Running counters: one primary key lookup, no aggregate over the deliveries
+            from ServerLogic.stats import get_stats
+            stats = get_stats()
+            rate = f" ({stats['verification_rate']:.1%})" if stats['verification_rate'] is not None else ""
+            print(f"   📈 Sent: {stats['sent']} | Verified: {stats['verified']}{rate}")
+            if stats['avg_time_to_verify_seconds'] is not None:
+                print(f"   ⏱️  Average time to verify: {stats['avg_time_to_verify_seconds'] / 60:.1f} min")
             
             if farmer_count > 0:
                 print("\n👨‍🌾 Farmers:")
-                for farmer in Farmer.query.all():
-                    print(f"   ID: {farmer.id:2d} | Phone: {farmer.phone}")
+                for farmer in stream_rows(select(Farmer.id, Farmer.phone), Farmer.id, limit=limit):
+                    print(f"   ID: {farmer['id']:2d} | Phone: {farmer['phone']}")
+                if farmer_count > limit:
+                    print(f"   ... and {farmer_count - limit} more (use show-farmers --after-id/--limit to page)")
             
             if advisory_count > 0:
                 print("\n📢 Advisories:")
-                for advisory in Advisory.query.all():
-                    title = advisory.title[:40] + "..." if len(advisory.title) > 40 else advisory.title
-                    print(f"   ID: {advisory.id:2d} | Title: {title}")
+                for advisory in stream_rows(select(Advisory.id, Advisory.title), Advisory.id, limit=limit):
+                    title = advisory['title'][:40] + "..." if len(advisory['title']) > 40 else advisory['title']
+                    print(f"   ID: {advisory['id']:2d} | Title: {title}")
+                if advisory_count > limit:
+                    print(f"   ... and {advisory_count - limit} more (use show-advisories --after-id/--limit to page)")
                     
     except Exception as e:
         print(f"❌ Error getting database status: {e}")
 
-def show_all_data():
+def show_all_data(limit=None, offset=None, after_id=None, fmt='table', output_path=None):
     """Show all data from all tables with full details"""
-    print("📚 Complete Database Contents:")
+    if fmt == 'csv':
+        print("❌ CSV export needs a single table - use show-farmers, show-advisories or show-farming-advisories")
+        return
+
+    page = {'limit': limit, 'offset': offset, 'after_id': after_id}
     try:
         with get_app_context():
+            if fmt == 'ndjson':
+                output = open_output(output_path)
+                try:
+                    total = export_rows(stream_rows(farmers_select(), Farmer.id, **page), fmt, output, table='farmers')
+                    total += export_rows(stream_rows(advisories_select(), Advisory.id, **page), fmt, output, table='advisories')
+                    total += export_rows(stream_rows(farming_advisories_select(), FarmingAdvisory.id, **page), fmt, output, table='farming_advisories')
+                finally:
+                    close_output(output)
+                print(f"✅ Exported {total} records", file=sys.stderr)
+                return
+
+            print("📚 Complete Database Contents:")
+
             # Show Farmers with full details
-            farmers = Farmer.query.all()
-            print(f"\n👨‍🌾 FARMERS TABLE ({len(farmers)} records):")
+            print(f"\n👨‍🌾 FARMERS TABLE:")
             print("=" * 80)
-            
-            if farmers:
-                for farmer in farmers:
-                    secret_preview = farmer.secret_key[:20] + b'...' if len(farmer.secret_key) > 20 else farmer.secret_key
-                    print(f"ID: {farmer.id}")
-                    print(f"Phone: {farmer.phone}")
-                    print(f"Secret Key: {secret_preview}")
-                    print(f"Created: {farmer.created_at}")
-                    print(f"Updated: {farmer.updated_at}")
-                    print("-" * 80)
-            else:
-                print("No farmers found.")
+            count = 0
+            for farmer in stream_rows(farmers_select(), Farmer.id, **page):
+                secret_preview = farmer['secret_key'][:20] + b'...' if len(farmer['secret_key']) > 20 else farmer['secret_key']
+                print(f"ID: {farmer['id']}")
+                print(f"Phone: {farmer['phone']}")
+                print(f"Secret Key: {secret_preview}")
+                print(f"Created: {farmer['created_at']}")
+                print(f"Updated: {farmer['updated_at']}")
+                print("-" * 80)
+                count += 1
+            print(f"{count} records shown." if count else "No farmers found.")
             
             # Show Advisories with full details
-            advisories = Advisory.query.all()
-            print(f"\n📢 ADVISORIES TABLE ({len(advisories)} records):")
+            print(f"\n📢 ADVISORIES TABLE:")
             print("=" * 80)
-            
-            if advisories:
-                for advisory in advisories:
-                    print(f"ID: {advisory.id}")
-                    print(f"Title: {advisory.title}")
-                    print(f"Message: {advisory.message}")
-                    print(f"Created: {advisory.created_at}")
-                    print("-" * 80)
-            else:
-                print("No advisories found.")
+            count = 0
+            for advisory in stream_rows(advisories_select(), Advisory.id, **page):
+                print(f"ID: {advisory['id']}")
+                print(f"Title: {advisory['title']}")
+                print(f"Message: {advisory['message']}")
+                print(f"Created: {advisory['created_at']}")
+                print("-" * 80)
+                count += 1
+            print(f"{count} records shown." if count else "No advisories found.")
             
             # Show Farming Advisories with full details
-            farming_advisories = FarmingAdvisory.query.all()
-            print(f"\n📱 FARMING ADVISORIES TABLE ({len(farming_advisories)} records):")
+            print(f"\n📱 FARMING ADVISORIES TABLE:")
             print("=" * 80)
-            
-            if farming_advisories:
-                for fa in farming_advisories:
-                    farmer = Farmer.query.get(fa.farmer_id)
-                    advisory = Advisory.query.get(fa.advisory_id)
-                    status_icon = "✅" if fa.verified else "⏳"
-                    
-                    print(f"ID: {fa.id}")
-                    print(f"Farmer ID: {fa.farmer_id} ({farmer.phone if farmer else 'Unknown'})")
-                    print(f"Advisory ID: {fa.advisory_id} ({advisory.title if advisory else 'Unknown'})")
-                    print(f"Sent At: {fa.sent_at}")
-                    print(f"Verified: {fa.verified} {status_icon}")
-                    print("-" * 80)
-            else:
-                print("No farming advisory records found.")
+            count = 0
+            for fa in stream_rows(farming_advisories_select(), FarmingAdvisory.id, **page):
+                status_icon = "✅" if fa['verified'] else "⏳"
+                print(f"ID: {fa['id']}")
+                print(f"Farmer ID: {fa['farmer_id']} ({fa['phone'] or 'Unknown'})")
+                print(f"Advisory ID: {fa['advisory_id']} ({fa['title'] or 'Unknown'})")
+                print(f"Sent At: {fa['sent_at']}")
+                print(f"Verified: {fa['verified']} {status_icon}" + (f" at {fa['verified_at']}" if fa['verified_at'] else ""))
+                print("-" * 80)
+                count += 1
+            print(f"{count} records shown." if count else "No farming advisory records found.")
                     
     except Exception as e:
         print(f"❌ Error getting all data: {e}")
 
-def show_farmers_table():
+def show_farmers_table(limit=None, offset=None, after_id=None, fmt='table', output_path=None):
     """Show detailed farmers table data"""
-    print("👨‍🌾 FARMERS TABLE - DETAILED VIEW:")
     try:
         with get_app_context():
-            farmers = Farmer.query.all()
+            rows = stream_rows(farmers_select(), Farmer.id, limit=limit, offset=offset, after_id=after_id)
+
+            if fmt != 'table':
+                output = open_output(output_path)
+                try:
+                    total = export_rows(rows, fmt, output)
+                finally:
+                    close_output(output)
+                print(f"✅ Exported {total} farmers", file=sys.stderr)
+                return
+
+            print("👨‍🌾 FARMERS TABLE - DETAILED VIEW:")
             print("=" * 100)
-            
-            if farmers:
-                # Header
-                print(f"{'ID':<4} | {'PHONE':<15} | {'SECRET KEY':<30} | {'CREATED':<20} | {'UPDATED':<20}")
-                print("-" * 100)
-                
-                # Data rows
-                for farmer in farmers:
-                    secret_preview = farmer.secret_key[:25] + b'...' if len(farmer.secret_key) > 25 else farmer.secret_key
-                    created_str = farmer.created_at.strftime('%Y-%m-%d %H:%M') if farmer.created_at else 'N/A'
-                    updated_str = farmer.updated_at.strftime('%Y-%m-%d %H:%M') if farmer.updated_at else 'N/A'
-                    
-                    print(f"{farmer.id:<4} | {farmer.phone:<15} | {str(secret_preview):<30} | {created_str:<20} | {updated_str:<20}")
+            print(f"{'ID':<4} | {'PHONE':<15} | {'SECRET KEY':<30} | {'CREATED':<20} | {'UPDATED':<20}")
+            print("-" * 100)
+
+            # Data rows, each followed by its secret key in different formats (single pass)
+            count = 0
+            last_id = None
+            for farmer in rows:
+                secret_key = farmer['secret_key']
+                secret_preview = secret_key[:25] + b'...' if len(secret_key) > 25 else secret_key
+                created_str = farmer['created_at'].strftime('%Y-%m-%d %H:%M') if farmer['created_at'] else 'N/A'
+                updated_str = farmer['updated_at'].strftime('%Y-%m-%d %H:%M') if farmer['updated_at'] else 'N/A'
                 
+                print(f"{farmer['id']:<4} | {farmer['phone']:<15} | {str(secret_preview):<30} | {created_str:<20} | {updated_str:<20}")
+                print(f"     🔑 UTF-8: {secret_key.decode('utf-8', errors='ignore')}")
+                print(f"        Hex: {secret_key.hex()}")
+                print(f"        Base64: {base64.b64encode(secret_key).decode('utf-8')}")
+                count += 1
+                last_id = farmer['id']
+
+            if count:
                 print("-" * 100)
-                print(f"Total: {len(farmers)} farmers")
-                
-                # Show secret keys in different formats
-                print(f"\n🔑 SECRET KEY FORMATS:")
-                for farmer in farmers:
-                    print(f"Farmer {farmer.id} ({farmer.phone}):")
-                    print(f"  Raw bytes: {farmer.secret_key}")
-                    print(f"  As UTF-8: {farmer.secret_key.decode('utf-8', errors='ignore')}")
-                    print(f"  As Hex: {farmer.secret_key.hex()}")
-                    try:
-                        import base64
-                        print(f"  As Base64: {base64.b64encode(farmer.secret_key).decode('utf-8')}")
-                    except:
-                        print(f"  As Base64: (conversion error)")
-                    print()
-                    
+                print(f"Shown: {count} farmers" + (f" (next page: --after-id {last_id})" if limit and count == limit else ""))
             else:
                 print("No farmers found.")
                     
     except Exception as e:
         print(f"❌ Error showing farmers table: {e}")
 
-def show_advisories_table():
+def show_advisories_table(limit=None, offset=None, after_id=None, fmt='table', output_path=None):
     """Show detailed advisories table data"""
-    print("📢 ADVISORIES TABLE - DETAILED VIEW:")
     try:
         with get_app_context():
-            advisories = Advisory.query.all()
+            rows = stream_rows(advisories_select(), Advisory.id, limit=limit, offset=offset, after_id=after_id)
+
+            if fmt != 'table':
+                output = open_output(output_path)
+                try:
+                    total = export_rows(rows, fmt, output)
+                finally:
+                    close_output(output)
+                print(f"✅ Exported {total} advisories", file=sys.stderr)
+                return
+
+            print("📢 ADVISORIES TABLE - DETAILED VIEW:")
             print("=" * 120)
-            
-            if advisories:
-                # Show each advisory in detail
-                for advisory in advisories:
-                    print(f"ID: {advisory.id}")
-                    print(f"Title: {advisory.title}")
-                    print(f"Message: {advisory.message}")
-                    print(f"Created: {advisory.created_at}")
-                    print(f"Message Length: {len(advisory.message)} characters")
-                    print("-" * 120)
-                
-                print(f"Total: {len(advisories)} advisories")
-                    
+
+            # Show each advisory in detail
+            count = 0
+            last_id = None
+            for advisory in rows:
+                print(f"ID: {advisory['id']}")
+                print(f"Title: {advisory['title']}")
+                print(f"Message: {advisory['message']}")
+                print(f"Created: {advisory['created_at']}")
+                print(f"Message Length: {len(advisory['message'])} characters")
+                print("-" * 120)
+                count += 1
+                last_id = advisory['id']
+
+            if count:
+                print(f"Shown: {count} advisories" + (f" (next page: --after-id {last_id})" if limit and count == limit else ""))
             else:
                 print("No advisories found.")
                     
     except Exception as e:
         print(f"❌ Error showing advisories table: {e}")
 
-def show_farming_advisories_table():
+def show_farming_advisories_table(limit=None, offset=None, after_id=None, fmt='table', output_path=None):
     """Show detailed farming advisories table data"""
-    print("📱 FARMING ADVISORIES TABLE - DETAILED VIEW:")
     try:
         with get_app_context():
-            farming_advisories = FarmingAdvisory.query.all()
+            rows = stream_rows(farming_advisories_select(), FarmingAdvisory.id, limit=limit, offset=offset, after_id=after_id)
+
+            if fmt != 'table':
+                output = open_output(output_path)
+                try:
+                    total = export_rows(rows, fmt, output)
+                finally:
+                    close_output(output)
+                print(f"✅ Exported {total} farming advisory records", file=sys.stderr)
+                return
+
+            print("📱 FARMING ADVISORIES TABLE - DETAILED VIEW:")
             print("=" * 120)
-            
-            if farming_advisories:
-                # Header
-                print(f"{'ID':<4} | {'FARMER':<20} | {'ADVISORY':<40} | {'SENT AT':<20} | {'VERIFIED':<10}")
-                print("-" * 120)
-                
-                # Data rows
-                for fa in farming_advisories:
-                    farmer = Farmer.query.get(fa.farmer_id)
-                    advisory = Advisory.query.get(fa.advisory_id)
-                    
-                    farmer_info = f"{farmer.phone} (ID:{farmer.id})" if farmer else f"Unknown (ID:{fa.farmer_id})"
-                    advisory_info = advisory.title[:35] + "..." if advisory and len(advisory.title) > 35 else (advisory.title if advisory else f"Unknown (ID:{fa.advisory_id})")
-                    sent_str = fa.sent_at.strftime('%Y-%m-%d %H:%M') if fa.sent_at else 'N/A'
-                    verified_icon = "✅ Yes" if fa.verified else "⏳ No"
-                    
-                    print(f"{fa.id:<4} | {farmer_info:<20} | {advisory_info:<40} | {sent_str:<20} | {verified_icon:<10}")
+            print(f"{'ID':<4} | {'FARMER':<20} | {'ADVISORY':<40} | {'SENT AT':<20} | {'VERIFIED':<10}")
+            print("-" * 120)
+
+            # Data rows (phone and title come from the join, not per-row lookups)
+            count = 0
+            last_id = None
+            for fa in rows:
+                farmer_info = f"{fa['phone']} (ID:{fa['farmer_id']})" if fa['phone'] else f"Unknown (ID:{fa['farmer_id']})"
+                title = fa['title']
+                advisory_info = title[:35] + "..." if title and len(title) > 35 else (title if title else f"Unknown (ID:{fa['advisory_id']})")
+                sent_str = fa['sent_at'].strftime('%Y-%m-%d %H:%M') if fa['sent_at'] else 'N/A'
+                verified_icon = "✅ Yes" if fa['verified'] else "⏳ No"
                 
+                print(f"{fa['id']:<4} | {farmer_info:<20} | {advisory_info:<40} | {sent_str:<20} | {verified_icon:<10}")
+                count += 1
+                last_id = fa['id']
+
+            if count:
                 print("-" * 120)
-                print(f"Total: {len(farming_advisories)} farming advisory records")
-                    
+                print(f"Shown: {count} farming advisory records" + (f" (next page: --after-id {last_id})" if limit and count == limit else ""))
             else:
                 print("No farming advisory records found.")
                     
     except Exception as e:
         print(f"❌ Error showing farming advisories table: {e}")
 
-def main():
-    """Main function with command line argument parsing"""
+COMMANDS = [
+    'clear-all',
+    'clear-farmers', 
+    'clear-advisories',
+    'create-farmer',
+    'create-advisory',
+    'create-sample-farmers',
+    'create-sample-advisories',
+    'generate-synthetic',
+    'backfill-vcs',
+    'export-vc-jobs',
+    'load-vcs',
+    'normalize-keys',
+    'export-key-snapshot',
+    'load-segments',
+    'show-segment',
+    'sms-report',
+    'create-campaign',
+    'show-campaigns',
+    'pause-campaign',
+    'resume-campaign',
+    'cancel-campaign',
+    'run-campaigns',
+    'rebuild-stats',
+    'create-partitions',
+    'archive-partitions',
+    'restore-partition',
+    'delete-farmer',
+    'delete-advisory',
+    'status',
+    'show-all',
+    'show-farmers',
+    'show-advisories',
+    'show-farming-advisories'
+]
+
+def build_parser():
+    """Build the command line parser (also used for every line of a --script file)"""
     parser = argparse.ArgumentParser(description='Farmware Database Management')
     
-    parser.add_argument('command', choices=[
-        'clear-all',
-        'clear-farmers', 
-        'clear-advisories',
-        'create-farmer',
-        'create-advisory',
-        'create-sample-farmers',
-        'create-sample-advisories',
-        'delete-farmer',
-        'delete-advisory',
-        'status',
-        'show-all',
-        'show-farmers',
-        'show-advisories',
-        'show-farming-advisories'
-    ], help='Command to execute')
+    # Checked against COMMANDS by unknown_commands(): argparse's choices= rejects an empty
+    # nargs='*' list on some Python versions, which broke --script without a command
+    parser.add_argument('commands', nargs='*', metavar='command',
+                        help=f"Command(s) to execute in order: {', '.join(COMMANDS)}")
+    parser.add_argument('--script', help='File with one command (plus its options) per line, run in a single app context')
     
     # Arguments for create-farmer
     parser.add_argument('--phone', help='Phone number for farmer (required for create-farmer)')
@@ -486,66 +1730,280 @@ def main():
     # Arguments for create-advisory
     parser.add_argument('--title', help='Title for advisory (required for create-advisory)')
     parser.add_argument('--message', help='Message for advisory (required for create-advisory)')
+    parser.add_argument('--vc-scheme', choices=['ff3', 'hmac'], help='VC scheme for this advisory, defaults to the deployment VC_SCHEME (create-advisory)')
+    parser.add_argument('--priority', choices=['urgent', 'normal', 'bulk'], help='Send priority lane for this advisory, defaults to normal (create-advisory)')
+    
+    # Segmentation attributes (create-farmer) and segment filters (export-vc-jobs, show-segment)
+    parser.add_argument('--region', help='County/region, comma-separated for several when filtering')
+    parser.add_argument('--crops', help='Comma-separated crops')
+    parser.add_argument('--crops-match', choices=['any', 'all'], default='any', help='Filter on farmers growing any or all of --crops (default any)')
+    parser.add_argument('--language', help='Language code (e.g. sw, en), comma-separated for several when filtering')
     
     # Arguments for delete operations
-    parser.add_argument('--id', type=int, help='ID for delete operations (required for delete-farmer/delete-advisory)')
+    parser.add_argument('--id', type=int, help='ID for delete operations and campaigns (required for delete-farmer/delete-advisory/pause-campaign/resume-campaign/cancel-campaign)')
+    
+    # Arguments for clear operations
+    parser.add_argument('--truncate', action='store_true', help='Use TRUNCATE ... CASCADE instead of chunked deletes (clear-*, PostgreSQL only)')
+    parser.add_argument('--chunk-size', type=int, help=f'Rows per DELETE when clearing tables (default {DELETE_CHUNK_SIZE})')
+    
+    # Arguments for generate-synthetic
+    parser.add_argument('--farmers', type=int, default=1_000_000, help='Number of synthetic farmers (generate-synthetic)')
+    parser.add_argument('--advisories', type=int, default=2_000, help='Number of synthetic advisories (generate-synthetic)')
+    parser.add_argument('--deliveries-per-farmer', type=float, default=5.0, help='Average farming advisory records per farmer (generate-synthetic)')
+    parser.add_argument('--history-days', type=int, default=365, help='Days of delivery history to spread sent_at over (generate-synthetic)')
+    parser.add_argument('--history-end', type=lambda d: datetime.strptime(d, '%Y-%m-%d'), help='Newest sent_at as YYYY-MM-DD, defaults to today (generate-synthetic)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data (generate-synthetic)')
+    parser.add_argument('--batch-size', type=int, help='Rows per bulk insert or update (generate-synthetic/load-vcs/normalize-keys: 10000, backfill-vcs: 1000)')
+    
+    # Arguments for backfill-vcs
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS, help=f'Concurrent SMC requests (backfill-vcs, default {BACKFILL_WORKERS})')
+    
+    # Arguments for offline campaign VCs
+    parser.add_argument('--advisory-id', type=int, help='Advisory to export VC jobs for, report on or broadcast (required for export-vc-jobs/sms-report/create-campaign)')
+    parser.add_argument('--input', help='VC file written by SMC/bulk_vc.py (required for load-vcs), the CSV for load-segments, or the archive for restore-partition')
+    parser.add_argument('--delta', action='store_true', help='Only export farmers added since the last snapshot (export-key-snapshot)')
+    
+    # Arguments for scheduled campaigns
+    parser.add_argument('--starts-at', help="Start of the campaign window, ISO 8601 in UTC or 'now' (create-campaign, default now)")
+    parser.add_argument('--ends-at', help='End of the campaign window, ISO 8601 in UTC (create-campaign)')
+    parser.add_argument('--window', type=float, help='Length of the campaign window in minutes, instead of --ends-at (create-campaign)')
+    parser.add_argument('--concurrency', type=int, help='Sends in flight at once (run-campaigns, default CAMPAIGN_CONCURRENCY or 8)')
+    parser.add_argument('--once', action='store_true', help='Exit once the campaigns due now are done (run-campaigns)')
+    
+    # Arguments for farming_advisories partition maintenance
+    parser.add_argument('--months-ahead', type=int, default=3, help='Months of partitions to create ahead of the current one (create-partitions)')
+    parser.add_argument('--retention-months', type=int, default=12, help='Months of delivery records kept online (archive-partitions)')
+    parser.add_argument('--archive-dir', help='Directory for archived partitions (required for archive-partitions)')
+    parser.add_argument('--keep-tables', action='store_true', help='Detach and archive but do not drop old partitions (archive-partitions)')
+    
+    # Arguments for status/show-* (paging and export)
+    parser.add_argument('--limit', type=int, help='Maximum rows to show or export (status/show-*)')
+    parser.add_argument('--offset', type=int, help='Rows to skip before showing (show-*); prefer --after-id for deep pages')
+    parser.add_argument('--after-id', type=int, help='Only show rows with an ID greater than this (show-*)')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='table', help='Output format for show-* (table, csv, ndjson)')
+    parser.add_argument('--output', help='File to write csv/ndjson exports to (defaults to stdout), or the snapshot file for export-key-snapshot')
+    
+    return parser
+
+def run_command(command, args):
+    """
+    Run a single command with the parsed options.
+    
+    Returns:
+        bool: False if the command was rejected because of missing options
+    """
+    # Paging/export options shared by the show-* commands
+    page = {
+        'limit': args.limit,
+        'offset': args.offset,
+        'after_id': args.after_id,
+        'fmt': args.format,
+        'output_path': args.output
+    }
+    
+    # Segment filters shared by export-vc-jobs, show-segment, sms-report and create-campaign
+    segment = Segment(regions=args.region, crops=args.crops, crops_match=args.crops_match, languages=args.language)
+    
+    # Options shared by the clear-* commands
+    clear_options = {
+        'truncate': args.truncate,
+        'chunk_size': args.chunk_size or DELETE_CHUNK_SIZE
+    }
+    
+    if command == 'clear-all':
+        clear_database(**clear_options)
+        
+    elif command == 'clear-farmers':
+        clear_farmers_table(**clear_options)
+        
+    elif command == 'clear-advisories':
+        clear_advisory_table(**clear_options)
+        
+    elif command == 'create-farmer':
+        if not args.phone or not args.secret_key:
+            print("❌ Error: --phone and --secret-key are required for create-farmer")
+            return False
+        create_farmer(args.phone, args.secret_key, region=args.region, crops=args.crops, language=args.language)
+        
+    elif command == 'create-advisory':
+        if not args.title or not args.message:
+            print("❌ Error: --title and --message are required for create-advisory")
+            return False
+        create_advisory(args.title, args.message, args.vc_scheme, args.priority)
+        
+    elif command == 'create-sample-farmers':
+        create_sample_farmers()
+        
+    elif command == 'create-sample-advisories':
+        create_sample_advisories()
+        
+    elif command == 'generate-synthetic':
+        generate_synthetic_data(
+            farmers=args.farmers,
+            advisories=args.advisories,
+            deliveries_per_farmer=args.deliveries_per_farmer,
+            seed=args.seed,
+            batch_size=args.batch_size or 10_000,
+            history_days=args.history_days,
+            history_end=args.history_end
+        )
+        
+    elif command == 'backfill-vcs':
+        backfill_verification_codes(workers=args.workers, batch_size=args.batch_size or 1_000)
+        
+    elif command == 'export-vc-jobs':
+        if not args.advisory_id:
+            print("❌ Error: --advisory-id is required for export-vc-jobs")
+            return False
+        export_vc_jobs(args.advisory_id, output_path=args.output, limit=args.limit, after_id=args.after_id, segment=segment)
+        
+    elif command == 'load-vcs':
+        if not args.input:
+            print("❌ Error: --input is required for load-vcs")
+            return False
+        load_verification_codes(args.input, batch_size=args.batch_size or 10_000)
+        
+    elif command == 'normalize-keys':
+        normalize_secret_keys(batch_size=args.batch_size or 10_000)
+        
+    elif command == 'export-key-snapshot':
+        if not args.output:
+            print("❌ Error: --output is required for export-key-snapshot")
+            return False
+        export_key_snapshot(args.output, delta=args.delta)
+        
+    elif command == 'load-segments':
+        if not args.input:
+            print("❌ Error: --input is required for load-segments")
+            return False
+        load_segments(args.input, batch_size=args.batch_size or 10_000)
+        
+    elif command == 'show-segment':
+        if segment.is_everyone:
+            print("❌ Error: --region, --crops or --language is required for show-segment")
+            return False
+        show_segment(segment, limit=args.limit if args.limit is not None else 20)
+        
+    elif command == 'sms-report':
+        if not args.advisory_id:
+            print("❌ Error: --advisory-id is required for sms-report")
+            return False
+        show_sms_report(args.advisory_id, segment)
+        
+    elif command == 'create-campaign':
+        if not args.advisory_id or not (args.ends_at or args.window):
+            print("❌ Error: --advisory-id and --ends-at or --window are required for create-campaign")
+            return False
+        create_scheduled_campaign(args.advisory_id, segment, starts_at=args.starts_at, ends_at=args.ends_at,
+                                  window_minutes=args.window)
+        
+    elif command == 'show-campaigns':
+        show_campaigns(limit=args.limit)
+        
+    elif command in ('pause-campaign', 'resume-campaign', 'cancel-campaign'):
+        if not args.id:
+            print(f"❌ Error: --id is required for {command}")
+            return False
+        change_campaign_status(args.id, command.split('-')[0])
+        
+    elif command == 'run-campaigns':
+        run_campaigns(concurrency=args.concurrency, once=args.once)
+        
+    elif command == 'rebuild-stats':
+        rebuild_statistics()
+        
+    elif command == 'create-partitions':
+        create_partitions(months_ahead=args.months_ahead)
+        
+    elif command == 'archive-partitions':
+        if not args.archive_dir:
+            print("❌ Error: --archive-dir is required for archive-partitions")
+            return False
+        archive_old_partitions(args.archive_dir, retention_months=args.retention_months, keep_tables=args.keep_tables)
+        
+    elif command == 'restore-partition':
+        if not args.input:
+            print("❌ Error: --input is required for restore-partition")
+            return False
+        restore_partition(args.input)
+        
+    elif command == 'delete-farmer':
+        if not args.id:
+            print("❌ Error: --id is required for delete-farmer")
+            return False
+        delete_farmer(args.id)
+        
+    elif command == 'delete-advisory':
+        if not args.id:
+            print("❌ Error: --id is required for delete-advisory")
+            return False
+        delete_advisory(args.id)
+        
+    elif command == 'status':
+        show_status(limit=args.limit if args.limit is not None else 20)
+        
+    elif command == 'show-all':
+        show_all_data(**page)
+        
+    elif command == 'show-farmers':
+        show_farmers_table(**page)
+        
+    elif command == 'show-advisories':
+        show_advisories_table(**page)
+        
+    elif command == 'show-farming-advisories':
+        show_farming_advisories_table(**page)
+    
+    return True
+
+def unknown_commands(commands):
+    """Commands that are not in COMMANDS, in the order given"""
+    return [command for command in commands if command not in COMMANDS]
+
+def iter_script(path, parser):
+    """
+    Parse a script file into (command, args) pairs.
+    Blank lines and lines starting with '#' are ignored; every other line is
+    parsed exactly like a command line, e.g.: create-farmer --phone +2547... --secret-key Key1
+    """
+    with open(path, encoding='utf-8') as script:
+        for line_number, line in enumerate(script, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            args = parser.parse_intermixed_args(shlex.split(line))
+            if not args.commands:
+                raise ValueError(f"{path}:{line_number}: no command given")
+            unknown = unknown_commands(args.commands)
+            if unknown:
+                raise ValueError(f"{path}:{line_number}: unknown command(s): {', '.join(unknown)}")
+            for command in args.commands:
+                yield command, args
+
+def main():
+    """Main function with command line argument parsing"""
+    parser = build_parser()
+    args = parser.parse_intermixed_args()
+    
+    if not args.commands and not args.script:
+        parser.error('at least one command or --script is required')
+    unknown = unknown_commands(args.commands)
+    if unknown:
+        parser.error(f"invalid command(s): {', '.join(unknown)} (choose from {', '.join(COMMANDS)})")
     
-    args = parser.parse_args()
+    # Commands given on the command line run first, then the script (if any)
+    steps = [(command, args) for command in args.commands]
     
     try:
-        if args.command == 'clear-all':
-            clear_database()
-            
-        elif args.command == 'clear-farmers':
-            clear_farmers_table()
-            
-        elif args.command == 'clear-advisories':
-            clear_advisory_table()
-            
-        elif args.command == 'create-farmer':
-            if not args.phone or not args.secret_key:
-                print("❌ Error: --phone and --secret-key are required for create-farmer")
-                return
-            create_farmer(args.phone, args.secret_key)
-            
-        elif args.command == 'create-advisory':
-            if not args.title or not args.message:
-                print("❌ Error: --title and --message are required for create-advisory")
-                return
-            create_advisory(args.title, args.message)
-            
-        elif args.command == 'create-sample-farmers':
-            create_sample_farmers()
-            
-        elif args.command == 'create-sample-advisories':
-            create_sample_advisories()
-            
-        elif args.command == 'delete-farmer':
-            if not args.id:
-                print("❌ Error: --id is required for delete-farmer")
-                return
-            delete_farmer(args.id)
-            
-        elif args.command == 'delete-advisory':
-            if not args.id:
-                print("❌ Error: --id is required for delete-advisory")
-                return
-            delete_advisory(args.id)
-            
-        elif args.command == 'status':
-            show_status()
-            
-        elif args.command == 'show-all':
-            show_all_data()
-            
-        elif args.command == 'show-farmers':
-            show_farmers_table()
-            
-        elif args.command == 'show-advisories':
-            show_advisories_table()
-            
-        elif args.command == 'show-farming-advisories':
-            show_farming_advisories_table()
+        # Build the app once and keep a single app context (and session) for the whole run
+        with get_app().app_context():
+            if args.script:
+                steps.extend(iter_script(args.script, parser))
+            for command, command_args in steps:
+                if len(steps) > 1:
+                    print(f"\n▶️  {command}")
+                if not run_command(command, command_args):
+                    sys.exit(1)
             
     except Exception as e:
         print(f"❌ Command failed: {e}")
@@ -563,6 +2021,25 @@ if __name__ == '__main__':
         print("  create-advisory        - Create single advisory (requires --title --message)")
         print("  create-sample-farmers  - Create sample farmers for testing")
         print("  create-sample-advisories - Create sample advisories for testing")
+        print("  generate-synthetic     - Bulk-generate a large reproducible dataset (--farmers --advisories --seed)")
+        print("  backfill-vcs           - Store VCs on delivery records that have none (--workers --batch-size)")
+        print("  export-vc-jobs         - Write a VC job file for SMC/bulk_vc.py (requires --advisory-id, --output; --region/--crops/--language to target a segment)")
+        print("  load-vcs               - Load VCs made by SMC/bulk_vc.py as planned deliveries (requires --input)")
+        print("  normalize-keys         - Convert legacy text secret keys to raw key bytes (run once after upgrading)")
+        print("  export-key-snapshot    - Write the memory-mapped phone -> key snapshot (requires --output, --delta for new farmers only)")
+        print("  load-segments          - Set farmers' region/crops/language from a CSV (requires --input)")
+        print("  show-segment           - Count the farmers a segment selects (--region --crops --crops-match --language)")
+        print("  sms-report             - Show an advisory's SMS encoding and segment cost before a broadcast (requires --advisory-id; segment filters)")
+        print("  create-campaign        - Schedule a broadcast spread over a time window (requires --advisory-id, --window or --ends-at; --starts-at, segment filters)")
+        print("  show-campaigns         - Show campaigns and their progress")
+        print("  pause-campaign         - Pause a campaign (requires --id)")
+        print("  resume-campaign        - Resume a paused campaign (requires --id)")
+        print("  cancel-campaign        - Cancel a campaign (requires --id)")
+        print("  run-campaigns          - Run due campaigns until Ctrl-C (--concurrency, --once)")
+        print("  rebuild-stats          - Recompute the advisory statistics from the delivery records")
+        print("  create-partitions      - Create the monthly farming_advisories partitions ahead of time (--months-ahead)")
+        print("  archive-partitions     - Archive and drop old delivery partitions (requires --archive-dir, --retention-months)")
+        print("  restore-partition      - Load an archived month back (requires --input)")
         print("  delete-farmer          - Delete specific farmer by ID (requires --id)")
         print("  delete-advisory        - Delete specific advisory by ID (requires --id)")
         print("  status                 - Show current database status")
@@ -570,15 +2047,42 @@ if __name__ == '__main__':
         print("  show-farmers           - Show detailed farmers table data")
         print("  show-advisories        - Show detailed advisories table data")
         print("  show-farming-advisories - Show detailed farming advisories table data")
+        print("\nPaging/export options for show-*: --limit N --offset N --after-id ID --format table|csv|ndjson --output FILE")
+        print("Several commands can run in one invocation (one app, one DB session), or from a --script file.")
         print("\nExamples:")
         print("  python populate_db.py status")
         print("  python populate_db.py clear-all")
         print("  python populate_db.py create-farmer --phone '+254712345678' --secret-key 'FarmwareSecret2024'")
         print("  python populate_db.py create-advisory --title 'Weather Alert' --message 'Rain expected today'")
+        print("  python populate_db.py create-advisory --title 'Locust Alert' --message 'Swarm heading north' --priority urgent")
         print("  python populate_db.py create-sample-farmers")
+        print("  python populate_db.py generate-synthetic --farmers 2000000 --advisories 5000 --seed 7")
+        print("  python populate_db.py backfill-vcs --workers 16")
+        print("  python populate_db.py export-vc-jobs --advisory-id 3 --output jobs.csv")
+        print("  python populate_db.py load-vcs --input vcs.csv")
+        print("  python populate_db.py normalize-keys")
+        print("  python populate_db.py export-key-snapshot --output /var/lib/farmware/farmers.snap")
+        print("  python populate_db.py export-key-snapshot --output /var/lib/farmware/farmers.snap --delta")
+        print("  python populate_db.py create-farmer --phone '+254712345679' --secret-key 'Key2' --region Nakuru --crops maize,beans --language sw")
+        print("  python populate_db.py show-segment --region Nakuru --crops maize")
+        print("  python populate_db.py export-vc-jobs --advisory-id 3 --region Nakuru,Kericho --crops tea --output jobs.csv")
+        print("  python populate_db.py load-segments --input farmer_segments.csv")
+        print("  python populate_db.py sms-report --advisory-id 3 --region Nakuru")
+        print("  python populate_db.py create-campaign --advisory-id 3 --region Nakuru --starts-at 2025-12-15T06:00 --window 120")
+        print("  python populate_db.py run-campaigns")
+        print("  python populate_db.py pause-campaign --id 1")
+        print("  python populate_db.py rebuild-stats")
+        print("  python populate_db.py create-partitions --months-ahead 3")
+        print("  python populate_db.py archive-partitions --archive-dir /var/lib/farmware/archive --retention-months 12")
+        print("  python populate_db.py restore-partition --input /var/lib/farmware/archive/farming_advisories_p2024_01.csv.gz")
         print("  python populate_db.py delete-farmer --id 1")
         print("  python populate_db.py delete-advisory --id 2")
         print("  python populate_db.py show-all")
         print("  python populate_db.py show-farmers")
+        print("  python populate_db.py show-farmers --after-id 5000 --limit 100")
+        print("  python populate_db.py show-farming-advisories --format ndjson --output deliveries.ndjson")
+        print("  python populate_db.py clear-all create-sample-farmers create-sample-advisories status")
+        print("  python populate_db.py --script setup_commands.txt")
+        print("  python populate_db.py clear-all --truncate")
     else:
         main()
\ No newline at end of file
@@ -16,6 +16,7 @@ function updateLastUpdated() {
 function loadInitialData() {
     refreshFarmers();
     refreshAdvisories();
+    refreshStats();
 }
 
 function setupEventListeners() {
@@ -49,6 +50,24 @@ async function refreshFarmers() {
     }
 }
 
+// Refresh delivery statistics (one summary row on the server)
+async function refreshStats() {
+    try {
+        const response = await fetch('/api/stats');
+        const data = await response.json();
+        
+        if (data.success) {
+            const stats = data.stats;
+            document.getElementById('statsSent').textContent = stats.sent;
+            document.getElementById('statsVerified').textContent = stats.verified;
+            document.getElementById('statsRate').textContent =
+                stats.verification_rate === null ? '--' : (stats.verification_rate * 100).toFixed(1) + '%';
+        }
+    } catch (error) {
+        console.error('Error fetching stats:', error);
+    }
+}
+
 // Refresh advisories data
 async function refreshAdvisories() {
     try {
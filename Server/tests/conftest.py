@@ -0,0 +1,87 @@
+"""
+Shared fixtures: a Flask app on a throwaway SQLite database, with the stub SMS
+provider and none of the per-process singletons carried over between tests.
+
+Run from the Server/ directory:
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMC_API_KEY', 'test-api-key')
+os.environ.setdefault('USSD_CODE', '*384*1234*')
+
+
+def reset_singletons():
+    """Forget every lazily built per-process object (router, digester, stats buffer...)"""
+    from ServerLogic import stats, db_routing
+    from ServerLogic.SMS import digest, render, router
+
+    if stats._buffer is not None and stats._buffer.timer is not None:
+        stats._buffer.timer.cancel()
+    router._router = None
+    digest._digester = None
+    render._cache = None
+    stats._buffer = None
+    db_routing.dispose_replicas()
+    db_routing._router = None
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'farmware.db'}")
+    monkeypatch.setenv('SMS_PROVIDER', 'stub')
+    # No timed stats flush during a test: stats are only written when something flushes them
+    monkeypatch.setenv('STATS_FLUSH_INTERVAL', '3600')
+    # No background account sharing either: tests sync by hand
+    monkeypatch.setenv('SMS_RATE_SYNC_INTERVAL', '0')
+    for name in ('SMS_RATE_LIMITS', 'SMS_DIGEST_WINDOW', 'DATABASE_REPLICA_URLS', 'VC_SCHEME', 'VC_VERIFICATION_MODE'):
+        monkeypatch.delenv(name, raising=False)
+    reset_singletons()
+
+    from ServerLogic import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    reset_singletons()
+
+
+@pytest.fixture
+def make_farmer(app):
+    """Create a farmer with a random key; returns its ID"""
+    from ServerLogic import db
+    from ServerLogic.models import Farmer
+    from ServerLogic.phone import normalize_phone
+
+    def make(phone, **attributes):
+        with app.app_context():
+            farmer = Farmer(phone=phone, phone_e164=normalize_phone(phone), secret_key=os.urandom(32),
+                            key_version=1, **attributes)
+            db.session.add(farmer)
+            db.session.commit()
+            return farmer.id
+    return make
+
+
+@pytest.fixture
+def make_advisory(app):
+    """Create an advisory; returns its ID"""
+    from ServerLogic import db
+    from ServerLogic.models import Advisory
+
+    def make(title='Heavy rain expected this week', message='Plant early and clear the drains', **attributes):
+        with app.app_context():
+            advisory = Advisory(title=title, message=message, **attributes)
+            db.session.add(advisory)
+            db.session.commit()
+            return advisory.id
+    return make
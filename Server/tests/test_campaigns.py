@@ -0,0 +1,141 @@
+"""Time-spread campaigns (ServerLogic/campaigns.py)"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from ServerLogic import db
+from ServerLogic.campaigns import (
+    ACTION_PAUSE, STATUS_COMPLETED, STATUS_PAUSED, CampaignRunner, create_campaign, set_campaign_status,
+)
+from ServerLogic.models import Campaign, Farmer, FarmingAdvisory
+from ServerLogic.segments import Segment
+
+
+def schedule(app, advisory_id, minutes):
+    with app.app_context():
+        campaign = create_campaign(db.session, advisory_id, Segment.from_dict({}),
+                                   starts_at=datetime.utcnow() - timedelta(seconds=1), window_minutes=minutes)
+        db.session.commit()
+        return campaign.id
+
+
+def test_sends_go_to_the_e164_number_where_known(app, make_farmer, make_advisory):
+    make_farmer('0712000001')
+    legacy = make_farmer('0712000002')
+    with app.app_context():
+        db.session.get(Farmer, legacy).phone_e164 = None
+        db.session.commit()
+    campaign_id = schedule(app, make_advisory(), minutes=0.01)
+
+    sent = []
+    runner = CampaignRunner(app, send=lambda advisory_id, phone: sent.append(phone) or True, max_rate=1000)
+    runner.run(once=True)
+
+    assert sent == ['+254712000001', '0712000002']
+    with app.app_context():
+        assert db.session.get(Campaign, campaign_id).status == STATUS_COMPLETED
+
+
+def test_pause_stops_a_slow_campaign_between_sends(app, make_farmer, make_advisory):
+    first = make_farmer('0712000001')
+    make_farmer('0712000002')
+    make_farmer('0712000003')
+    # Three farmers over an hour: twenty minutes between sends
+    campaign_id = schedule(app, make_advisory(), minutes=60)
+
+    sent = []
+    first_sent = threading.Event()
+
+    def send(advisory_id, phone):
+        sent.append(phone)
+        first_sent.set()
+        return True
+
+    runner = CampaignRunner(app, send=send, checkpoint_interval=0.2)
+    thread = threading.Thread(target=runner.run, kwargs={'once': True})
+    thread.start()
+    assert first_sent.wait(5)
+    time.sleep(0.5)
+
+    paused = time.monotonic()
+    with app.app_context():
+        set_campaign_status(db.session, campaign_id, ACTION_PAUSE)
+        db.session.commit()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert time.monotonic() - paused < 2
+
+    assert sent == ['+254712000001']
+    with app.app_context():
+        campaign = db.session.get(Campaign, campaign_id)
+        assert campaign.status == STATUS_PAUSED
+        assert (campaign.last_farmer_id, campaign.sent_count, campaign.lease_owner) == (first, 1, None)
+
+
+def test_two_workers_never_send_a_campaign_twice(app, make_farmer, make_advisory):
+    for number in range(30):
+        make_farmer(f"07120000{number:02d}")
+    campaign_id = schedule(app, make_advisory(), minutes=0.01)
+
+    sent = []
+    lock = threading.Lock()
+
+    def send(advisory_id, phone):
+        with lock:
+            sent.append(phone)
+        return True
+
+    runners = [CampaignRunner(app, send=send, max_rate=1000, worker_id=f"worker-{index}") for index in range(2)]
+    threads = [threading.Thread(target=runner.run, kwargs={'once': True}) for runner in runners]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert len(sent) == 30
+    assert len(set(sent)) == 30
+    with app.app_context():
+        campaign = db.session.get(Campaign, campaign_id)
+        assert (campaign.status, campaign.sent_count) == (STATUS_COMPLETED, 30)
+
+
+def test_a_lapsed_claim_cannot_checkpoint_over_the_new_one(app, make_farmer, make_advisory):
+    make_farmer('0712000001')
+    campaign_id = schedule(app, make_advisory(), minutes=0.01)
+    first, second = CampaignRunner(app, worker_id='first'), CampaignRunner(app, worker_id='second')
+
+    with app.app_context():
+        [(_, old_token)] = first.claim_due()
+        # Nobody else can claim it while the lease holds
+        assert second.claim_due() == []
+        db.session.get(Campaign, campaign_id).lease_until = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        [(_, new_token)] = second.claim_due()
+
+        assert first._checkpoint(campaign_id, old_token, 99, sent=1, failed=0) is None
+        campaign = db.session.get(Campaign, campaign_id)
+        db.session.refresh(campaign)
+        assert (campaign.last_farmer_id, campaign.sent_count, campaign.lease_owner) == (None, 0, new_token)
+
+
+def test_a_resumed_campaign_skips_farmers_already_sent(app, make_farmer, make_advisory):
+    done = make_farmer('0712000001')
+    make_farmer('0712000002')
+    advisory_id = make_advisory()
+    campaign_id = schedule(app, advisory_id, minutes=0.01)
+    # A worker died after sending to the first farmer, before its checkpoint
+    with app.app_context():
+        campaign = db.session.get(Campaign, campaign_id)
+        campaign.started_at = datetime.utcnow() - timedelta(seconds=5)
+        campaign.total = 2
+        db.session.add(FarmingAdvisory(farmer_id=done, advisory_id=advisory_id, verification_code='123456',
+                                       sent_at=datetime.utcnow()))
+        db.session.commit()
+
+    sent = []
+    CampaignRunner(app, send=lambda advisory_id, phone: sent.append(phone) or True, max_rate=1000).run(once=True)
+
+    assert sent == ['+254712000002']
+    with app.app_context():
+        campaign = db.session.get(Campaign, campaign_id)
+        assert (campaign.status, campaign.sent_count) == (STATUS_COMPLETED, 2)
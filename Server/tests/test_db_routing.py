@@ -0,0 +1,55 @@
+"""Read replicas with fallback to the primary (ServerLogic/db_routing.py)"""
+from sqlalchemy import create_engine, text
+
+from ServerLogic import db, db_routing
+from ServerLogic.queries import farmer_by_phone
+
+
+def count_farmers(connection):
+    return connection.execute(text('SELECT COUNT(*) FROM farmers')).scalar()
+
+
+def test_reads_fall_back_to_the_primary_without_replicas(app, make_farmer):
+    make_farmer('0712000001')
+    with app.app_context():
+        assert db_routing.read(count_farmers) == (1, False)
+
+
+def test_reads_go_to_a_healthy_replica(app, tmp_path, monkeypatch, make_farmer):
+    make_farmer('0712000001')
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica = create_engine(replica_url)
+    with replica.begin() as connection:
+        connection.execute(text('CREATE TABLE farmers (id INTEGER PRIMARY KEY)'))
+    replica.dispose()
+    monkeypatch.setenv('DATABASE_REPLICA_URLS', replica_url)
+
+    with app.app_context():
+        # The replica hasn't caught up with the farmer yet
+        assert db_routing.read(count_farmers) == (0, True)
+
+
+def test_a_failing_replica_is_skipped(app, tmp_path, monkeypatch, make_farmer):
+    make_farmer('0712000001')
+    monkeypatch.setenv('DATABASE_REPLICA_URLS', f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+
+    with app.app_context():
+        assert db_routing.read(count_farmers) == (1, False)
+        assert db_routing.get_replica_router().candidates() == []
+        # Lookups still find the farmer, on the primary
+        assert farmer_by_phone('0712000001') is not None
+        db.session.rollback()
+
+
+def test_a_replica_miss_is_retried_on_the_primary(app, tmp_path, monkeypatch, make_farmer):
+    farmer_id = make_farmer('0712000001')
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    # An empty copy of the schema: the farmer hasn't replicated yet
+    replica = create_engine(replica_url)
+    db.metadata.create_all(replica)
+    replica.dispose()
+    monkeypatch.setenv('DATABASE_REPLICA_URLS', replica_url)
+
+    with app.app_context():
+        assert farmer_by_phone('+254712000001').id == farmer_id
+        db.session.rollback()
@@ -0,0 +1,55 @@
+"""Digest mode (ServerLogic/SMS/digest.py)"""
+from ServerLogic import db
+from ServerLogic.models import AdvisoryStats, FarmingAdvisory
+from ServerLogic.stats import ALL_ADVISORIES
+from ServerLogic.SMS import digest
+from ServerLogic.SMS.digest import Digester, close_digester, get_digester
+from ServerLogic.SMS.lanes import LANE_URGENT
+
+
+def test_close_sends_queued_digest_and_writes_its_stats(app, make_farmer, make_advisory):
+    farmer_id = make_farmer('+254700000001')
+    first, second = make_advisory(title='Rain'), make_advisory(title='Pests')
+
+    digester = Digester(app, window=60)
+    assert digester.add('+254700000001', farmer_id, first, 'Rain', '111111')
+    assert digester.add('+254700000001', farmer_id, second, 'Pests', '222222')
+    digester.close()
+
+    with app.app_context():
+        assert FarmingAdvisory.query.count() == 2
+        # The stats the sends counted are written even with no flush left to come
+        stats = {row.advisory_id: row.sent_count for row in AdvisoryStats.query.all()}
+    assert stats == {ALL_ADVISORIES: 2, first: 1, second: 1}
+    assert digester.snapshot()['digests_sent'] == 1
+
+
+def test_close_digester_flushes_the_process_digester(app, make_farmer, make_advisory, monkeypatch):
+    monkeypatch.setenv('SMS_DIGEST_WINDOW', '60')
+    farmer_id = make_farmer('+254700000001')
+    advisory_id = make_advisory()
+    with app.app_context():
+        get_digester().add('+254700000001', farmer_id, advisory_id, 'Rain', '111111')
+
+    assert close_digester()
+    assert digest._digester is None
+    assert not close_digester()
+    with app.app_context():
+        assert db.session.get(AdvisoryStats, advisory_id).sent_count == 1
+
+
+def test_urgent_advisories_bypass_the_digest(app):
+    digester = Digester(app, window=60, send=lambda phone, items: True)
+    assert not digester.add('+254700000001', 1, 1, 'Locusts', '111111', lane=LANE_URGENT)
+    assert digester.snapshot()['advisories_waiting'] == 0
+    digester.close()
+
+
+def test_digest_that_would_grow_too_long_is_sent_early(app):
+    sent = []
+    digester = Digester(app, window=60, max_segments=1, send=lambda phone, items: sent.append(len(items)) or True)
+    for advisory_id in range(1, 4):
+        digester.add('+254700000001', 1, advisory_id, f"Advisory number {advisory_id} with a long title", '123456')
+    digester.close()
+    # Each digest stays within one segment, and nothing is lost
+    assert sum(sent) == 3 and len(sent) > 1
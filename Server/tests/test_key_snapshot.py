@@ -0,0 +1,29 @@
+"""Memory-mapped farmer key snapshot (ServerLogic/key_snapshot.py)"""
+import os
+import stat
+
+from ServerLogic.key_snapshot import KIND_DELTA, KeySnapshot, next_delta_path, write_snapshot
+from ServerLogic.keys import KEY_VERSION_RAW
+
+
+def test_snapshot_and_delta_files_are_private(tmp_path):
+    path = str(tmp_path / 'farmers.snap')
+    write_snapshot(path, [(1, '+254712000001', b'a' * 32, KEY_VERSION_RAW)])
+    delta = next_delta_path(path)
+    write_snapshot(delta, [(2, '+254712000002', b'b' * 32, KEY_VERSION_RAW)], KIND_DELTA)
+
+    for written in (path, delta):
+        assert stat.S_IMODE(os.stat(written).st_mode) == 0o600
+    assert sorted(os.listdir(tmp_path)) == ['farmers.snap', 'farmers.snap.delta-0001']
+
+
+def test_lookup_finds_any_format_of_the_number(tmp_path):
+    path = str(tmp_path / 'farmers.snap')
+    write_snapshot(path, [(1, '+254712000001', b'a' * 32, KEY_VERSION_RAW)])
+    write_snapshot(next_delta_path(path), [(1, '0712000001', b'c' * 32, KEY_VERSION_RAW)], KIND_DELTA)
+
+    snapshot = KeySnapshot(path)
+    # The delta (a re-keyed farmer) wins over the base
+    assert snapshot.lookup('254712000001') == (1, b'c' * 32)
+    assert snapshot.lookup('+254712000001') == (1, b'c' * 32)
+    assert snapshot.lookup('0712999999') is None
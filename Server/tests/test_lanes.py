@@ -0,0 +1,49 @@
+"""Priority lanes (ServerLogic/SMS/lanes.py)"""
+from ServerLogic.SMS.lanes import LANE_BULK, LANE_NORMAL, LANE_URGENT, LaneQueue, lane_for
+
+
+def drain(queue, count):
+    order = []
+    for _ in range(count):
+        ticket, lane = queue.head()
+        queue.remove((ticket, lane), lane, granted=True)
+        order.append(lane)
+    return order
+
+
+def test_lane_for_priority():
+    assert lane_for('URGENT') == LANE_URGENT
+    assert lane_for(None) == LANE_NORMAL
+    assert lane_for('whenever') == LANE_NORMAL
+
+
+def test_urgent_sends_jump_the_queue():
+    queue = LaneQueue()
+    for index in range(3):
+        queue.push((index, LANE_BULK), LANE_BULK)
+    queue.push(('alert', LANE_URGENT), LANE_URGENT)
+    assert queue.head() == ('alert', LANE_URGENT)
+    assert queue.ahead(LANE_URGENT) == 1
+    assert queue.ahead(LANE_BULK) == 4
+
+
+def test_normal_and_bulk_share_by_weight():
+    queue = LaneQueue({LANE_NORMAL: 4, LANE_BULK: 1})
+    for index in range(20):
+        queue.push((index, LANE_NORMAL), LANE_NORMAL)
+        queue.push((index, LANE_BULK), LANE_BULK)
+    order = drain(queue, 10)
+    assert order.count(LANE_NORMAL) == 8
+    assert order.count(LANE_BULK) == 2
+
+
+def test_an_idle_lane_does_not_bank_credit():
+    queue = LaneQueue({LANE_NORMAL: 1, LANE_BULK: 1})
+    for index in range(10):
+        queue.push((index, LANE_BULK), LANE_BULK)
+    drain(queue, 10)
+    # Bulk had the provider to itself; normal arriving now alternates with it rather than taking over
+    for index in range(4):
+        queue.push((index, LANE_NORMAL), LANE_NORMAL)
+        queue.push((index + 10, LANE_BULK), LANE_BULK)
+    assert sorted(drain(queue, 4)) == [LANE_BULK, LANE_BULK, LANE_NORMAL, LANE_NORMAL]
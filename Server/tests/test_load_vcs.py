@@ -0,0 +1,54 @@
+"""Bulk-loading offline VCs (populate_db.py load-vcs)"""
+import csv
+
+from sqlalchemy import insert, select
+
+from ServerLogic import db
+from ServerLogic.models import FarmingAdvisory, IssuedVerificationCode
+
+import populate_db
+
+
+def write_vcs(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(['farmer_id', 'message_id', 'verification_code', 'scheme'])
+        writer.writerows(rows)
+    return str(path)
+
+
+def planned(app):
+    with app.app_context():
+        return sorted(db.session.execute(
+            select(FarmingAdvisory.farmer_id, FarmingAdvisory.verification_code)
+        ).all())
+
+
+def test_loading_the_same_file_twice_adds_nothing(app, tmp_path, make_farmer, make_advisory):
+    first, second = make_farmer('0712000001'), make_farmer('0712000002')
+    advisory_id = make_advisory()
+    path = write_vcs(tmp_path / 'vcs.csv', [[first, advisory_id, '1111', 'hmac'], [second, advisory_id, '2222', 'hmac']])
+
+    with app.app_context():
+        assert populate_db.load_verification_codes(path) == 2
+        assert populate_db.load_verification_codes(path) == 0
+        assert db.session.query(IssuedVerificationCode).count() == 2
+    assert planned(app) == [(first, '1111'), (second, '2222')]
+
+
+def test_a_rerun_keeps_the_vcs_already_planned(app, tmp_path, make_farmer, make_advisory):
+    first, second = make_farmer('0712000001'), make_farmer('0712000002')
+    advisory_id = make_advisory()
+    # A first run that stopped after planning the first farmer (with another VC file)
+    with app.app_context():
+        db.session.execute(insert(FarmingAdvisory.__table__).values(
+            farmer_id=first, advisory_id=advisory_id, verification_code='9999', sent_at=None, verified=False))
+        db.session.commit()
+
+    path = write_vcs(tmp_path / 'vcs.csv', [[first, advisory_id, '1111', 'hmac'], [second, advisory_id, '2222', 'hmac']])
+    with app.app_context():
+        assert populate_db.load_verification_codes(path) == 1
+        indexed = db.session.execute(select(IssuedVerificationCode.farmer_id)).scalars().all()
+    assert planned(app) == [(first, '9999'), (second, '2222')]
+    # The file's VC for the first farmer was never sent, so it isn't verifiable
+    assert indexed == [second]
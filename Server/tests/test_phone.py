@@ -0,0 +1,28 @@
+"""Phone number normalisation (ServerLogic/phone.py)"""
+import pytest
+
+from ServerLogic.phone import normalize_phone, phone_number_key
+
+
+@pytest.mark.parametrize('raw', [
+    '+254712345678', '254712345678', '0712345678', '712345678',
+    '+254 712 345 678', '(0712) 345-678', '00254712345678', '+2540712345678',
+])
+def test_common_formats_normalise_to_e164(raw):
+    assert normalize_phone(raw) == '+254712345678'
+
+
+@pytest.mark.parametrize('raw', [None, '', 'not a number', '+0712345678', '123', '+1234567890123456'])
+def test_invalid_numbers(raw):
+    assert normalize_phone(raw) is None
+
+
+def test_default_country_code(monkeypatch):
+    assert normalize_phone('0772123456', country_code='256') == '+256772123456'
+    monkeypatch.setenv('PHONE_DEFAULT_COUNTRY_CODE', '+255')
+    assert normalize_phone('0712345678') == '+255712345678'
+
+
+def test_phone_number_key():
+    assert phone_number_key('0712345678') == 254712345678
+    assert phone_number_key('nope') is None
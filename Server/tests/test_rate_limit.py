@@ -0,0 +1,98 @@
+"""Adaptive pacing (ServerLogic/SMS/rate_limit.py)"""
+import pytest
+
+from ServerLogic.SMS import rate_limit
+from ServerLogic.SMS.lanes import LANE_BULK, LANE_URGENT
+from ServerLogic.SMS.rate_limit import AdaptiveBucket, RateLimiter
+from ServerLogic.SMS.router import create_router
+from ServerLogic.SMS.sms_service import SendResult
+
+
+def test_configured_rates_are_split_between_processes():
+    limiter = RateLimiter(provider_rates={'celcom': 50}, sender_rates={'FARMWARE': 30}, processes=10)
+    assert limiter.snapshot('celcom')['rate'] == 5
+    limiter.acquire('celcom', 'FARMWARE', timeout=0)
+    snapshot = limiter.snapshot('celcom')
+    assert snapshot['rate'] == 5
+    assert snapshot['senders']['FARMWARE']['rate'] == 3
+
+
+def test_create_router_reads_sms_rate_processes(monkeypatch):
+    monkeypatch.setenv('SMS_PROVIDER', 'stub')
+    monkeypatch.setenv('SMS_RATE_LIMITS', 'stub:40')
+    monkeypatch.setenv('SMS_RATE_PROCESSES', '4')
+    assert create_router().limiter.snapshot('stub')['rate'] == 10
+
+
+def test_throttle_decreases_rate_once_per_cooldown():
+    bucket = AdaptiveBucket('celcom', rate=100.0, decrease=0.7)
+    bucket.on_throttle(1000.0)
+    assert bucket.rate == pytest.approx(70.0)
+    assert bucket.ceiling == pytest.approx(100.0)
+    # Replies of sends already in flight are the same signal
+    bucket.on_throttle(1000.0 + rate_limit.DECREASE_COOLDOWN / 2)
+    assert bucket.rate == pytest.approx(70.0)
+    bucket.on_throttle(1000.0 + rate_limit.DECREASE_COOLDOWN)
+    assert bucket.rate == pytest.approx(49.0)
+    assert bucket.throttled == 3
+
+
+def test_retry_after_pauses_the_bucket():
+    bucket = AdaptiveBucket('celcom', rate=100.0)
+    now = bucket.updated
+    bucket.on_throttle(now, retry_after=5)
+    assert bucket.wait_time(now + 1, LANE_URGENT) == pytest.approx(4.0)
+
+
+def test_rate_recovers_towards_the_throttled_rate_only_while_saturated():
+    bucket = AdaptiveBucket('celcom', rate=100.0, increase=1.0, decrease=0.5)
+    bucket.on_throttle(1000.0)
+    assert bucket.rate == pytest.approx(50.0)
+
+    # Not waiting on the bucket: no reason to send faster
+    for _ in range(50):
+        bucket.on_success(1100.0)
+    assert bucket.rate == pytest.approx(50.0)
+
+    # About a second's worth of successes while saturated closes much of the gap at once
+    bucket.last_wait = 1100.0
+    for _ in range(50):
+        bucket.on_success(1100.0)
+    assert 65.0 < bucket.rate < 75.0
+    for _ in range(1000):
+        bucket.on_success(1100.0)
+    assert bucket.rate > 99.0
+    # Past the old ceiling it probes additively: SMS_AIMD_INCREASE per second's worth of sends
+    bucket.ceiling = bucket.rate
+    before = bucket.rate
+    for _ in range(round(before)):
+        bucket.on_success(1100.0)
+    assert bucket.rate - before == pytest.approx(1.0, rel=0.05)
+
+
+def test_unconfigured_bucket_starts_pacing_at_its_observed_rate():
+    bucket = AdaptiveBucket('africastalking')
+    now = bucket.window_start
+    assert bucket.wait_time(now) == 0
+    for _ in range(40):
+        bucket.take(now + 0.5)
+    bucket.on_throttle(now + 0.5)
+    assert bucket.rate == pytest.approx(40 / 0.5 * rate_limit.DEFAULT_DECREASE, rel=0.01)
+
+
+def test_urgent_reserve_is_kept_from_bulk_sends():
+    bucket = AdaptiveBucket('celcom', rate=10.0, reserve=0.2)
+    bucket.tokens = 2.5
+    # Two tokens are reserved: bulk waits, urgent goes now
+    assert bucket.wait_time(bucket.updated, LANE_BULK) > 0
+    assert bucket.wait_time(bucket.updated, LANE_URGENT) == 0
+
+
+def test_feedback_throttles_the_account_bucket():
+    limiter = RateLimiter(provider_rates={'celcom': 100})
+    limiter.acquire('celcom', timeout=0)
+    limiter.feedback('celcom', None, SendResult(False, 'celcom', throttled=True, retryable=True))
+    assert limiter.snapshot('celcom') == {
+        'rate': 70.0, 'account_rate': 70.0, 'share': 1.0, 'throttled': 1,
+        'senders': {'default': {'rate': None, 'account_rate': None, 'share': 1.0, 'throttled': 0}},
+    }
@@ -0,0 +1,112 @@
+"""Provider capacity shared between processes (ServerLogic/SMS/rate_share.py)"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+
+from ServerLogic.models import SMSRateShare
+from ServerLogic.SMS.lanes import LANE_BULK, LANE_NORMAL, LANE_URGENT
+from ServerLogic.SMS.rate_limit import RateLimiter
+from ServerLogic.SMS.rate_share import RateShareSync, account_state, share_rates
+from ServerLogic.SMS.sms_service import SendResult
+
+
+def test_urgent_demand_is_served_before_bulk():
+    shares = share_rates({'web': {LANE_URGENT: 20.0}, 'campaign': {LANE_BULK: 100.0}}, 50.0, min_rate=1.0)
+    # 1/s floor each, the 20/s urgent demand, and the campaign gets the rest
+    assert shares['web'] * 50 == pytest.approx(21.0)
+    assert shares['campaign'] * 50 == pytest.approx(29.0)
+
+
+def test_normal_and_bulk_split_by_lane_weight():
+    demands = {'web': {LANE_NORMAL: 100.0}, 'campaign': {LANE_BULK: 100.0}}
+    shares = share_rates(demands, 52.0, weights={LANE_NORMAL: 3.0, LANE_BULK: 1.0}, min_rate=1.0)
+    assert shares['web'] * 52 == pytest.approx(1.0 + 37.5)
+    assert shares['campaign'] * 52 == pytest.approx(1.0 + 12.5)
+
+
+def test_a_flow_gets_no_more_than_it_asks_for_until_spare():
+    demands = {'web': {LANE_NORMAL: 5.0}, 'campaign': {LANE_BULK: 100.0}, 'idle': {}}
+    shares = share_rates(demands, 63.0, min_rate=1.0)
+    # The web worker asks for 5/s: the weight it doesn't use goes to the campaign
+    assert shares['web'] * 63 == pytest.approx(6.0)
+    assert shares['campaign'] * 63 == pytest.approx(56.0)
+    assert shares['idle'] * 63 == pytest.approx(1.0)
+    assert sum(shares.values()) == pytest.approx(1.0)
+
+
+def test_spare_capacity_is_split_evenly_when_nobody_asks():
+    assert share_rates({'a': {}, 'b': {}}, 10.0) == {'a': 0.5, 'b': 0.5}
+
+
+def test_the_floor_never_exceeds_the_account():
+    shares = share_rates({f"p{i}": {} for i in range(10)}, 5.0, min_rate=1.0)
+    assert sum(shares.values()) == pytest.approx(1.0)
+
+
+def test_the_latest_throttle_sets_the_account_rate():
+    rows = [
+        SimpleNamespace(rate=80.0, throttled_at=None),
+        SimpleNamespace(rate=35.0, throttled_at=200.0),
+        SimpleNamespace(rate=50.0, throttled_at=100.0),
+    ]
+    assert account_state(rows) == (35.0, 200.0)
+    assert account_state(rows[:1]) == (80.0, None)
+    assert account_state([SimpleNamespace(rate=None, throttled_at=None)]) == (None, None)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shares.db'}")
+    SMSRateShare.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_campaign_runner_gives_way_to_urgent_sends_from_a_web_worker(engine):
+    campaign = RateLimiter(provider_rates={'celcom': 50})
+    web = RateLimiter(provider_rates={'celcom': 50})
+    campaign_sync = RateShareSync(campaign, engine, providers=['celcom'], process='campaign', min_rate=1.0)
+    web_sync = RateShareSync(web, engine, providers=['celcom'], process='web', min_rate=1.0)
+
+    for _ in range(100):
+        campaign.acquire('celcom', timeout=0, lane=LANE_BULK)
+    campaign_sync.sync()
+    web_sync.sync()
+    assert web.snapshot('celcom')['rate'] == pytest.approx(1.0, abs=0.1)
+
+    for _ in range(100):
+        campaign.acquire('celcom', timeout=0, lane=LANE_BULK)
+    for _ in range(20):
+        web.acquire('celcom', timeout=0, lane=LANE_URGENT)
+    web_sync.sync()
+    shares = campaign_sync.sync()
+    assert shares['celcom'] < 0.7
+    assert web.snapshot('celcom')['rate'] > 10
+    assert campaign.snapshot('celcom')['rate'] + web.snapshot('celcom')['rate'] == pytest.approx(50.0, rel=0.1)
+
+
+def test_a_throttle_in_one_process_slows_the_others(engine):
+    first = RateLimiter(provider_rates={'celcom': 100})
+    second = RateLimiter(provider_rates={'celcom': 100})
+    first_sync = RateShareSync(first, engine, providers=['celcom'], process='first')
+    second_sync = RateShareSync(second, engine, providers=['celcom'], process='second')
+    first_sync.sync()
+    second_sync.sync()
+
+    second.feedback('celcom', None, SendResult(False, 'celcom', throttled=True, retryable=True))
+    second_sync.sync()
+    first_sync.sync()
+    assert first.snapshot('celcom')['account_rate'] == pytest.approx(70.0)
+
+
+def test_stopped_processes_give_their_share_back(engine):
+    first = RateLimiter(provider_rates={'celcom': 100})
+    second = RateLimiter(provider_rates={'celcom': 100})
+    first_sync = RateShareSync(first, engine, providers=['celcom'], process='first')
+    second_sync = RateShareSync(second, engine, providers=['celcom'], process='second')
+    first_sync.sync()
+    assert second_sync.sync() == {'celcom': pytest.approx(0.5)}
+
+    first_sync.close()
+    assert second_sync.sync() == {'celcom': pytest.approx(1.0)}
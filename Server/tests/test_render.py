@@ -0,0 +1,51 @@
+"""SMS encoding, segment counting and splitting (ServerLogic/SMS/render.py)"""
+import pytest
+
+from ServerLogic.SMS.render import ENCODING_GSM7, ENCODING_UCS2, render, segment_count
+
+
+@pytest.mark.parametrize('text, segments', [
+    ('a' * 160, 1),
+    ('a' * 161, 2),
+    ('a' * 306, 2),
+    ('a' * 307, 3),
+    # Extension characters take an escape septet each
+    ('€' * 80, 1),
+    ('a' * 159 + '€', 2),
+    # A part never ends halfway through an escape sequence
+    ('a' * 152 + '€' + 'a' * 153, 3),
+])
+def test_gsm7_segments(text, segments):
+    assert segment_count(text) == segments
+
+
+@pytest.mark.parametrize('text, segments', [
+    ('ж' * 70, 1),
+    ('ж' * 71, 2),
+    ('ж' * 134, 2),
+    ('ж' * 135, 3),
+    # Characters outside the BMP take two UTF-16 units
+    ('🌧' * 35, 1),
+    ('🌧' * 36, 2),
+])
+def test_ucs2_segments(text, segments):
+    assert segment_count(text) == segments
+
+
+def test_render_keeps_a_message_in_gsm7_when_it_safely_can():
+    rendered = render('It’s going to rain – plant early…')
+    assert rendered.text == "It's going to rain - plant early..."
+    assert (rendered.original_encoding, rendered.encoding) == (ENCODING_UCS2, ENCODING_GSM7)
+    assert rendered.segments == 1
+
+
+def test_render_splits_long_messages_between_words():
+    text = ' '.join(['maize'] * 200)
+    rendered = render(text, max_segments=2)
+
+    assert len(rendered.parts) > 1
+    assert all(segment_count(part) <= 2 for part in rendered.parts)
+    assert [part.split(' ', 1)[0] for part in rendered.parts] == [
+        f"({index}/{len(rendered.parts)})" for index in range(1, len(rendered.parts) + 1)
+    ]
+    assert ' '.join(part.split(' ', 1)[1] for part in rendered.parts) == text
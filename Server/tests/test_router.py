@@ -0,0 +1,119 @@
+"""Provider routing and failover (ServerLogic/SMS/router.py)"""
+import time
+
+from ServerLogic.SMS.rate_limit import RateLimiter
+from ServerLogic.SMS.router import EJECT_FAILURES, ROUTING_CHEAPEST, ROUTING_HEALTHIEST, SMSRouter
+from ServerLogic.SMS.sms_service import SMSProvider, SendResult
+
+
+class ScriptedProvider(SMSProvider):
+    """Answers every send with the same result and remembers who it sent to"""
+
+    def __init__(self, name, ok=True, retryable=True, **kwargs):
+        super().__init__(name, **kwargs)
+        self.ok = ok
+        self.retryable = retryable
+        self.sent = []
+
+    def send(self, phone_number, message, sender=None):
+        self.sent.append(phone_number)
+        if self.ok:
+            return SendResult(True, self.name, message_id=f"{self.name}-{len(self.sent)}")
+        return SendResult(False, self.name, error='HTTP 503', retryable=self.retryable, status=503)
+
+
+def test_failover_follows_the_routing_order():
+    down = ScriptedProvider('celcom', ok=False, cost=0.3)
+    up = ScriptedProvider('africastalking', cost=0.8)
+    spare = ScriptedProvider('backup', cost=1.5)
+    router = SMSRouter([spare, up, down], strategy=ROUTING_CHEAPEST)
+
+    result = router.send('+254712000001', 'Rain expected')
+    assert (result.ok, result.provider) == (True, 'africastalking')
+    assert (down.sent, up.sent, spare.sent) == (['+254712000001'], ['+254712000001'], [])
+
+
+def test_a_message_fails_only_after_every_provider_failed_it():
+    providers = [ScriptedProvider(name, ok=False) for name in ('celcom', 'africastalking')]
+    router = SMSRouter(providers, strategy=ROUTING_HEALTHIEST)
+
+    result = router.send('+254712000001', 'Rain expected')
+    assert not result.ok
+    assert [len(provider.sent) for provider in providers] == [1, 1]
+
+
+def test_a_rejected_number_is_not_failed_over():
+    rejecting = ScriptedProvider('celcom', ok=False, retryable=False, cost=0.3)
+    other = ScriptedProvider('africastalking', cost=0.8)
+    router = SMSRouter([rejecting, other], strategy=ROUTING_CHEAPEST)
+
+    assert not router.send('+254712000001', 'Rain expected').ok
+    assert other.sent == []
+    # The provider answered fine: it stays healthy
+    assert router.health['celcom'].consecutive_failures == 0
+
+
+def test_failing_provider_is_ejected_and_skipped():
+    down = ScriptedProvider('celcom', ok=False, cost=0.3)
+    up = ScriptedProvider('africastalking', cost=0.8)
+    # Paced far above what the test sends, so a 503 slowing celcom down doesn't move traffic by itself
+    limiter = RateLimiter(provider_rates={'celcom': 1e6, 'africastalking': 1e6})
+    router = SMSRouter([down, up], strategy=ROUTING_CHEAPEST, limiter=limiter)
+
+    for number in range(EJECT_FAILURES):
+        assert router.send(f"+2547120000{number:02d}", 'Rain expected').ok
+    assert router.health['celcom'].ejected_until is not None
+
+    router.send('+254712000099', 'Rain expected')
+    assert len(down.sent) == EJECT_FAILURES
+    assert len(up.sent) == EJECT_FAILURES + 1
+
+
+def eject(router, name):
+    """Eject a provider with its trial due now"""
+    health = router.health[name]
+    health.backoff = 5.0
+    health.ejected_until = time.monotonic() - 0.01
+
+
+def test_the_trial_is_only_claimed_by_the_send_that_uses_the_provider():
+    recovering = ScriptedProvider('celcom')
+    other = ScriptedProvider('africastalking')
+    limiter = RateLimiter(provider_rates={'celcom': 0.01, 'africastalking': 1e6})
+    # celcom has no capacity right now, so the message goes to africastalking
+    assert limiter.acquire('celcom', timeout=0)
+    router = SMSRouter([recovering, other], strategy=ROUTING_HEALTHIEST, limiter=limiter)
+    eject(router, 'celcom')
+
+    assert router.send('+254712000001', 'Rain expected').provider == 'africastalking'
+    health = router.health['celcom']
+    assert not health.on_trial
+    assert health.ejected_until <= time.monotonic()
+
+
+def test_a_throttled_trial_is_given_back():
+    class Throttling(ScriptedProvider):
+        def send(self, phone_number, message, sender=None):
+            self.sent.append(phone_number)
+            return SendResult(False, self.name, error='HTTP 429', retryable=True, status=429, throttled=True)
+
+    router = SMSRouter([Throttling('celcom'), ScriptedProvider('africastalking')], strategy=ROUTING_HEALTHIEST)
+    eject(router, 'celcom')
+
+    # Requeued behind celcom's slowed-down bucket, the message goes out on africastalking
+    assert router.send('+254712000001', 'Rain expected').provider == 'africastalking'
+    # A 429 says nothing about health: the trial is due again for the next send
+    health = router.health['celcom']
+    assert not health.on_trial
+    assert health.ejected_until <= time.monotonic()
+
+
+def test_only_one_send_gets_the_trial():
+    router = SMSRouter([ScriptedProvider('celcom'), ScriptedProvider('africastalking')])
+    eject(router, 'celcom')
+    candidates, trial = router._candidates(ROUTING_HEALTHIEST)
+    assert (candidates[0], trial) == ('celcom', 'celcom')
+
+    assert router._claim_trial('celcom')
+    assert not router._claim_trial('celcom')
+    assert router._candidates(ROUTING_HEALTHIEST) == (['africastalking'], None)
@@ -0,0 +1,54 @@
+"""Issued-VC index (ServerLogic/vc_index.py)"""
+import pytest
+
+from ServerLogic.vc_index import VCCollision, lookup_issued_vc, record_issued_vc
+
+
+def test_a_vc_resolves_to_its_advisory(app, make_farmer, make_advisory):
+    farmer_id = make_farmer('0712000001')
+    advisory_id = make_advisory()
+    with app.app_context():
+        assert record_issued_vc(farmer_id, advisory_id, '123456')
+        # Recording the same VC again is a no-op
+        assert record_issued_vc(farmer_id, advisory_id, '123456')
+        assert lookup_issued_vc('+254712000001', '123456') == (str(advisory_id), farmer_id)
+        assert lookup_issued_vc('+254712000001', '654321') is None
+
+
+def test_a_vc_is_never_repointed_to_another_advisory(app, make_farmer, make_advisory):
+    farmer_id = make_farmer('0712000001')
+    first, second = make_advisory(), make_advisory(title='Locusts sighted nearby')
+    with app.app_context():
+        record_issued_vc(farmer_id, first, '123456')
+        with pytest.raises(VCCollision) as collision:
+            record_issued_vc(farmer_id, second, '123456')
+        assert collision.value.advisory_id == first
+        assert lookup_issued_vc('0712000001', '123456') == (str(first), farmer_id)
+
+    # Another farmer may hold the same digits
+    other = make_farmer('0712000002')
+    with app.app_context():
+        assert record_issued_vc(other, second, '123456')
+
+
+def test_an_ff3_vc_colliding_with_an_hmac_one_falls_back_to_hmac(app, monkeypatch, make_farmer, make_advisory):
+    from ServerLogic.SMS import utils
+
+    farmer_id = make_farmer('0712000001')
+    first, second = make_advisory(vc_scheme='hmac'), make_advisory(title='Locusts sighted nearby')
+    app.config['VC_VERIFICATION_MODE'] = 'index'
+    # The SMC's answer per scheme: the FF3 VC for the second advisory is the farmer's HMAC VC for the first
+    monkeypatch.setattr(utils, 'issue_vc', lambda message_id, phone, farmer, scheme: (
+        True, '123456' if scheme == 'ff3' or str(message_id) == str(first) else '654321'))
+
+    with app.app_context():
+        assert utils.process_complete_advisory(str(first), '+254712000001')['verification_code'] == '123456'
+        result = utils.process_complete_advisory(str(second), '+254712000001')
+        assert result['success'], result
+        assert (result['vc_scheme'], result['verification_code']) == ('hmac', '654321')
+        assert lookup_issued_vc('+254712000001', '123456') == (str(first), farmer_id)
+        assert lookup_issued_vc('+254712000001', '654321') == (str(second), farmer_id)
+
+        # A resend reuses the stored fallback VC
+        resend = utils.process_complete_advisory(str(second), '+254712000001')
+        assert (resend['vc_source'], resend['verification_code']) == ('stored', '654321')